@@ -5,7 +5,7 @@ __author__ = "bibow"
 
 import logging
 import os
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import boto3
 
@@ -28,6 +28,83 @@ class Config:
     # Cache Configuration
     CACHE_TTL = 1800  # 30 minutes default TTL
     CACHE_ENABLED = True
+    CACHE_NEGATIVE_TTL = 60  # not-found getter results
+
+    # Byte budget for the in-process cache tier, per cache name
+    CACHE_LOCAL_MAX_BYTES = 16 * 1024 * 1024  # 16 MB default per cache name
+    CACHE_LOCAL_BUDGETS: Dict[str, int] = {}
+
+    # Upper bound in seconds on an entry's life in the in-process tier. Local
+    # tiers are only eventually consistent across containers: a key purge in one
+    # container reaches the copies held by the others once this bound expires
+    CACHE_LOCAL_TTL = 60
+
+    # Seconds an in-process copy of a namespace generation is trusted before
+    # being re-read from the shared tier (bounds cross-container purge lag)
+    CACHE_NAMESPACE_REFRESH_SECONDS = 5
+
+    # Interval in seconds for structured-log flushes of cache stats (0 disables)
+    CACHE_STATS_FLUSH_INTERVAL = 0
+
+    # Cursor pagination: HMAC secret for signing cursors (the "cursor_secret"
+    # setting is required; every container must sign with the same key) and
+    # page size bounds for `first`
+    CURSOR_SECRET: Optional[bytes] = None
+    CURSOR_DEFAULT_PAGE_SIZE = 10
+    CURSOR_MAX_PAGE_SIZE = 100
+
+    # Parallel scans (partition-less list fallbacks and exports): segments
+    # scanned concurrently, items buffered ahead of the consumer, and an
+    # optional read capacity budget (RCU/s) shared by all segments
+    SCAN_TOTAL_SEGMENTS = 8
+    SCAN_BUFFER_SIZE = 1000
+    SCAN_CAPACITY_BUDGET: Optional[float] = None
+
+    # Full-text search (models/fulltext.py): "sqlite" (FTS5 file) or "memory",
+    # the SQLite file location, and the most hits ranked per search. Embedded
+    # indexes are per container: `search` uses one only for FULL_TEXT_INDEX_MAX_AGE
+    # seconds after the rebuild_full_text_index event warmed it (0: no limit)
+    # and falls back to a contains filter otherwise
+    FULL_TEXT_INDEX_BACKEND = "sqlite"
+    FULL_TEXT_INDEX_PATH = "/tmp/ame_fulltext.db"
+    FULL_TEXT_MAX_HITS = 1000
+    FULL_TEXT_INDEX_MAX_AGE = 900
+
+    # List query planner (models/query_planner.py): items sampled per tenant
+    # partition for index statistics, and how long (seconds) they are kept
+    PLANNER_SAMPLE_SIZE = 200
+    PLANNER_STATS_TTL = 900
+
+    # Bulk upsert mutations (models/bulk.py): most items per request and the
+    # batch_get/batch_write calls run concurrently
+    BULK_MAX_ITEMS = 2500
+    BULK_MAX_WORKERS = 8
+
+    # Contact imports (models/contact_import.py): rows written per chunk, and
+    # per checkpoint
+    IMPORT_CHUNK_SIZE = 500
+
+    # Cascade deletes (models/cascade_delete.py): seconds a run may take before
+    # it saves its progress and stops, an optional write capacity budget
+    # (WCU/s), and the child places/contacts pushed on the job stack at a time
+    CASCADE_DELETE_TIME_BUDGET = 840
+    CASCADE_DELETE_CAPACITY_BUDGET: Optional[float] = None
+    CASCADE_DELETE_PAGE_SIZE = 100
+
+    # Mutation idempotency keys (models/idempotency.py): seconds a completed
+    # call's payload is replayed for, and seconds a call in progress holds its
+    # key before a retry may run it again
+    IDEMPOTENCY_TTL = 86400
+    IDEMPOTENCY_LEASE = 900
+
+    # Buffered activity history writes: events queued before a flush, and
+    # seconds the oldest queued event may wait (requests also flush at the end)
+    ACTIVITY_HISTORY_FLUSH_SIZE = 100
+    ACTIVITY_HISTORY_FLUSH_INTERVAL = 5
+
+    # Field-level diffs of entity and attribute bag writes recorded as
+    # ActivityHistory rows (models/change_capture.py)
+    CHANGE_CAPTURE_ENABLED = True
 
     # Cache name patterns for different modules
     CACHE_NAMES = {
@@ -35,35 +112,36 @@ class Config:
         "queries": "ai_marketing_engine.queries",
     }
 
-    # Cache entity metadata (module paths, getters, cache key templates)
+    # Cache entity metadata (module paths, getters, cache key templates).
+    # cache_keys list the getter's arguments in order; see models/cache_keys.py.
     CACHE_ENTITY_CONFIG = {
         "corporation_profile": {
             "module": "ai_marketing_engine.models.corporation_profile",
             "model_class": "CorporationProfileModel",
             "getter": "get_corporation_profile",
             "list_resolver": "ai_marketing_engine.queries.corporation_profile.resolve_corporation_profile_list",
-            "cache_keys": ["context:endpoint_id", "key:corporation_uuid"],
+            "cache_keys": ["context:partition_key", "key:corporation_uuid"],
         },
         "place": {
             "module": "ai_marketing_engine.models.place",
             "model_class": "PlaceModel",
             "getter": "get_place",
             "list_resolver": "ai_marketing_engine.queries.place.resolve_place_list",
-            "cache_keys": ["context:endpoint_id", "key:place_uuid"],
+            "cache_keys": ["context:partition_key", "key:place_uuid"],
         },
         "contact_profile": {
             "module": "ai_marketing_engine.models.contact_profile",
             "model_class": "ContactProfileModel",
             "getter": "get_contact_profile",
             "list_resolver": "ai_marketing_engine.queries.contact_profile.resolve_contact_profile_list",
-            "cache_keys": ["context:endpoint_id", "key:contact_uuid"],
+            "cache_keys": ["context:partition_key", "key:contact_uuid"],
         },
         "contact_request": {
             "module": "ai_marketing_engine.models.contact_request",
             "model_class": "ContactRequestModel",
             "getter": "get_contact_request",
             "list_resolver": "ai_marketing_engine.queries.contact_request.resolve_contact_request_list",
-            "cache_keys": ["context:endpoint_id", "key:request_uuid"],
+            "cache_keys": ["context:partition_key", "key:request_uuid"],
         },
         "attribute_value": {
             "module": "ai_marketing_engine.models.attribute_value",
@@ -84,7 +162,7 @@ class Config:
             "model_class": "AttributeValueModel",
             "getter": "get_attributes_data",
             # "list_resolver": "ai_marketing_engine.queries.attribute_value.resolve_attribute_value_list",
-            "cache_keys": ["context:endpoint_id", "key:data_identity", "key:data_type"],
+            "cache_keys": ["context:partition_key", "key:data_identity", "key:data_type"],
         },
     }
 
@@ -148,6 +226,7 @@ class Config:
             cls._set_parameters(setting)
             cls._setup_function_paths(setting)
             cls._initialize_aws_services(setting)
+            cls._initialize_cache_stats(logger, setting)
             if setting.get("initialize_tables"):
                 cls._initialize_tables(logger)
             logger.info("Configuration initialized successfully.")
@@ -166,6 +245,92 @@ class Config:
         if "cache_enabled" in setting:
             cls.CACHE_ENABLED = setting.get("cache_enabled", True)
 
+        # Local tier byte budgets: a default plus optional per cache name overrides
+        if setting.get("cache_local_max_bytes"):
+            cls.CACHE_LOCAL_MAX_BYTES = int(setting["cache_local_max_bytes"])
+        if setting.get("cache_local_budgets"):
+            cls.CACHE_LOCAL_BUDGETS = {
+                cache_name: int(max_bytes)
+                for cache_name, max_bytes in setting["cache_local_budgets"].items()
+            }
+        if setting.get("cache_local_max_bytes") or setting.get("cache_local_budgets"):
+            from ..models.local_cache import resize_local_caches
+
+            resize_local_caches()
+
+        if setting.get("cursor_secret"):
+            cls.CURSOR_SECRET = str(setting["cursor_secret"]).encode("utf-8")
+        if setting.get("cursor_default_page_size"):
+            cls.CURSOR_DEFAULT_PAGE_SIZE = int(setting["cursor_default_page_size"])
+        if setting.get("cursor_max_page_size"):
+            cls.CURSOR_MAX_PAGE_SIZE = int(setting["cursor_max_page_size"])
+
+        if setting.get("scan_total_segments"):
+            cls.SCAN_TOTAL_SEGMENTS = int(setting["scan_total_segments"])
+        if setting.get("scan_buffer_size"):
+            cls.SCAN_BUFFER_SIZE = int(setting["scan_buffer_size"])
+        if "scan_capacity_budget" in setting:
+            cls.SCAN_CAPACITY_BUDGET = (
+                float(setting["scan_capacity_budget"])
+                if setting["scan_capacity_budget"]
+                else None
+            )
+
+        if setting.get("full_text_index_backend"):
+            cls.FULL_TEXT_INDEX_BACKEND = setting["full_text_index_backend"]
+        if setting.get("full_text_index_path"):
+            cls.FULL_TEXT_INDEX_PATH = setting["full_text_index_path"]
+        if setting.get("full_text_max_hits"):
+            cls.FULL_TEXT_MAX_HITS = int(setting["full_text_max_hits"])
+        if "full_text_index_max_age" in setting:
+            cls.FULL_TEXT_INDEX_MAX_AGE = int(setting["full_text_index_max_age"])
+
+        if setting.get("planner_sample_size"):
+            cls.PLANNER_SAMPLE_SIZE = int(setting["planner_sample_size"])
+        if setting.get("planner_stats_ttl"):
+            cls.PLANNER_STATS_TTL = int(setting["planner_stats_ttl"])
+        if setting.get("bulk_max_items"):
+            cls.BULK_MAX_ITEMS = int(setting["bulk_max_items"])
+        if setting.get("bulk_max_workers"):
+            cls.BULK_MAX_WORKERS = int(setting["bulk_max_workers"])
+        if setting.get("import_chunk_size"):
+            cls.IMPORT_CHUNK_SIZE = int(setting["import_chunk_size"])
+        if setting.get("cascade_delete_time_budget"):
+            cls.CASCADE_DELETE_TIME_BUDGET = int(setting["cascade_delete_time_budget"])
+        if "cascade_delete_capacity_budget" in setting:
+            cls.CASCADE_DELETE_CAPACITY_BUDGET = (
+                float(setting["cascade_delete_capacity_budget"])
+                if setting["cascade_delete_capacity_budget"]
+                else None
+            )
+        if setting.get("cascade_delete_page_size"):
+            cls.CASCADE_DELETE_PAGE_SIZE = int(setting["cascade_delete_page_size"])
+        if setting.get("idempotency_ttl"):
+            cls.IDEMPOTENCY_TTL = int(setting["idempotency_ttl"])
+        if setting.get("idempotency_lease"):
+            cls.IDEMPOTENCY_LEASE = int(setting["idempotency_lease"])
+        if setting.get("activity_history_flush_size"):
+            cls.ACTIVITY_HISTORY_FLUSH_SIZE = int(
+                setting["activity_history_flush_size"]
+            )
+        if "change_capture_enabled" in setting:
+            cls.CHANGE_CAPTURE_ENABLED = setting.get("change_capture_enabled", True)
+        if "activity_history_flush_interval" in setting:
+            cls.ACTIVITY_HISTORY_FLUSH_INTERVAL = float(
+                setting["activity_history_flush_interval"]
+            )
+
+        if "cache_negative_ttl" in setting:
+            cls.CACHE_NEGATIVE_TTL = int(setting["cache_negative_ttl"])
+
+        if "cache_local_ttl" in setting:
+            cls.CACHE_LOCAL_TTL = int(setting["cache_local_ttl"])
+
+        if "cache_namespace_refresh_seconds" in setting:
+            cls.CACHE_NAMESPACE_REFRESH_SECONDS = int(
+                setting["cache_namespace_refresh_seconds"]
+            )
+
     @classmethod
     def _setup_function_paths(cls, setting: Dict[str, Any]) -> None:
         cls.module_bucket_name = setting.get("module_bucket_name")
@@ -174,6 +339,24 @@ class Config:
         os.makedirs(cls.module_zip_path, exist_ok=True)
         os.makedirs(cls.module_extract_path, exist_ok=True)
 
+    @classmethod
+    def _initialize_cache_stats(
+        cls, logger: logging.Logger, setting: Dict[str, Any]
+    ) -> None:
+        """
+        Attach the logger used for periodic cache stats flushes.
+        Args:
+            logger (logging.Logger): Logger instance for logging.
+            setting (Dict[str, Any]): Configuration dictionary.
+        """
+        from ..models.cache_stats import cache_stats
+
+        if "cache_stats_flush_interval" in setting:
+            cls.CACHE_STATS_FLUSH_INTERVAL = int(
+                setting.get("cache_stats_flush_interval") or 0
+            )
+        cache_stats.configure(logger, flush_interval=cls.CACHE_STATS_FLUSH_INTERVAL)
+
     @classmethod
     def _initialize_tables(cls, logger: logging.Logger) -> None:
         """
@@ -235,6 +418,145 @@ class Config:
         """Get the configured cache TTL."""
         return cls.CACHE_TTL
 
+    @classmethod
+    def get_cursor_secret(cls) -> bytes:
+        """Get the cursor signing secret shared by every container."""
+        if not cls.CURSOR_SECRET:
+            raise ValueError(
+                "The cursor_secret setting is required to sign pagination cursors."
+            )
+        return cls.CURSOR_SECRET
+
+    @classmethod
+    def get_cursor_default_page_size(cls) -> int:
+        """Get the page size used when only `after` is given."""
+        return cls.CURSOR_DEFAULT_PAGE_SIZE
+
+    @classmethod
+    def get_cursor_max_page_size(cls) -> int:
+        """Get the upper bound applied to `first`."""
+        return cls.CURSOR_MAX_PAGE_SIZE
+
+    @classmethod
+    def get_scan_total_segments(cls) -> int:
+        """Get the number of segments a parallel scan is split into."""
+        return cls.SCAN_TOTAL_SEGMENTS
+
+    @classmethod
+    def get_scan_buffer_size(cls) -> int:
+        """Get how many scanned items may be buffered ahead of the consumer."""
+        return cls.SCAN_BUFFER_SIZE
+
+    @classmethod
+    def get_scan_capacity_budget(cls) -> Optional[float]:
+        """Get the read capacity (RCU/s) a parallel scan may consume, if capped."""
+        return cls.SCAN_CAPACITY_BUDGET
+
+    @classmethod
+    def get_full_text_index_backend(cls) -> str:
+        """Get the full-text index backend name ("sqlite" or "memory")."""
+        return cls.FULL_TEXT_INDEX_BACKEND
+
+    @classmethod
+    def get_full_text_index_path(cls) -> str:
+        """Get the SQLite file backing the full-text index."""
+        return cls.FULL_TEXT_INDEX_PATH
+
+    @classmethod
+    def get_full_text_max_hits(cls) -> int:
+        """Get the maximum number of ranked hits a search returns."""
+        return cls.FULL_TEXT_MAX_HITS
+
+    @classmethod
+    def get_full_text_index_max_age(cls) -> int:
+        """Get how long (seconds) a rebuilt embedded index serves searches."""
+        return cls.FULL_TEXT_INDEX_MAX_AGE
+
+    @classmethod
+    def get_planner_sample_size(cls) -> int:
+        """Get the number of items sampled for list query planner statistics."""
+        return cls.PLANNER_SAMPLE_SIZE
+
+    @classmethod
+    def get_planner_stats_ttl(cls) -> int:
+        """Get the TTL (seconds) of the list query planner statistics."""
+        return cls.PLANNER_STATS_TTL
+
+    @classmethod
+    def get_bulk_max_items(cls) -> int:
+        """Get the most items a bulk upsert mutation accepts."""
+        return cls.BULK_MAX_ITEMS
+
+    @classmethod
+    def get_bulk_max_workers(cls) -> int:
+        """Get the number of batch calls a bulk upsert runs concurrently."""
+        return cls.BULK_MAX_WORKERS
+
+    @classmethod
+    def get_import_chunk_size(cls) -> int:
+        """Get the number of rows a contact import writes per chunk."""
+        return cls.IMPORT_CHUNK_SIZE
+
+    @classmethod
+    def get_cascade_delete_time_budget(cls) -> int:
+        """Get the seconds one cascade delete run may take before it stops."""
+        return cls.CASCADE_DELETE_TIME_BUDGET
+
+    @classmethod
+    def get_cascade_delete_capacity_budget(cls) -> Optional[float]:
+        """Get the write capacity (WCU/s) a cascade delete may consume, if capped."""
+        return cls.CASCADE_DELETE_CAPACITY_BUDGET
+
+    @classmethod
+    def get_cascade_delete_page_size(cls) -> int:
+        """Get the number of child entities a cascade delete stacks at a time."""
+        return cls.CASCADE_DELETE_PAGE_SIZE
+
+    @classmethod
+    def get_idempotency_ttl(cls) -> int:
+        """Get the seconds a mutation payload is kept for idempotent replays."""
+        return cls.IDEMPOTENCY_TTL
+
+    @classmethod
+    def get_idempotency_lease(cls) -> int:
+        """Get the seconds an idempotency key is held by a call in progress."""
+        return cls.IDEMPOTENCY_LEASE
+
+    @classmethod
+    def get_activity_history_flush_size(cls) -> int:
+        """Get the number of buffered activity history events that forces a flush."""
+        return cls.ACTIVITY_HISTORY_FLUSH_SIZE
+
+    @classmethod
+    def get_activity_history_flush_interval(cls) -> float:
+        """Get the seconds a buffered activity history event may wait for a flush."""
+        return cls.ACTIVITY_HISTORY_FLUSH_INTERVAL
+
+    @classmethod
+    def is_change_capture_enabled(cls) -> bool:
+        """Check if entity writes record their field changes in ActivityHistory."""
+        return cls.CHANGE_CAPTURE_ENABLED
+
+    @classmethod
+    def get_cache_negative_ttl(cls) -> int:
+        """Get the TTL for cached not-found results."""
+        return cls.CACHE_NEGATIVE_TTL
+
+    @classmethod
+    def get_cache_local_budget(cls, cache_name: str) -> int:
+        """Get the local tier byte budget for a cache name."""
+        return cls.CACHE_LOCAL_BUDGETS.get(cache_name, cls.CACHE_LOCAL_MAX_BYTES)
+
+    @classmethod
+    def get_cache_local_ttl(cls) -> int:
+        """Get the longest time an entry is kept in the local tier."""
+        return cls.CACHE_LOCAL_TTL
+
+    @classmethod
+    def get_cache_namespace_refresh_seconds(cls) -> int:
+        """Get how long a namespace generation is memoized in-process."""
+        return cls.CACHE_NAMESPACE_REFRESH_SECONDS
+
     @classmethod
     def is_cache_enabled(cls) -> bool:
         """Check if caching is enabled."""
@@ -5,6 +5,7 @@ from __future__ import print_function
 __author__ = "bibow"
 
 import logging
+import time
 from typing import Any, Dict, List
 
 from graphene import Schema
@@ -13,6 +14,19 @@ from silvaengine_dynamodb_base import BaseModel
 from silvaengine_utility import Graphql
 
 from .handlers.config import Config
+from .models.activity_history import flush_activity_history
+from .models.cache_stats import get_cache_stats
+from .models.cascade_delete import (
+    get_cascade_delete_job,
+    get_unfinished_cascade_delete_jobs,
+    run_cascade_delete,
+)
+from .models.contact_import import import_contact_profiles
+from .models.fulltext import FULL_TEXT_FIELDS, rebuild_full_text_index
+from .models.place import backfill_place_geohashes
+from .models.scan import export_entities
+from .models.search import SEARCH_NAME_FIELDS, backfill_search_names
+from .models.unique_guards import UNIQUE_FIELDS, backfill_unique_guards
 from .schema import Mutations, Query, type_class
 
 
@@ -51,6 +65,10 @@ def deploy() -> List:
                             "action": "placeList",
                             "label": "View Question Place List",
                         },
+                        {
+                            "action": "placesNear",
+                            "label": "View Places Near",
+                        },
                         {
                             "action": "contactProfile",
                             "label": "View Contact Profile",
@@ -107,6 +125,10 @@ def deploy() -> List:
                             "action": "utmTagDataCollectionList",
                             "label": "View Utm Tag Data Collection List",
                         },
+                        {
+                            "action": "cacheStats",
+                            "label": "View Cache Stats",
+                        },
                     ],
                     "mutation": [
                         {
@@ -189,6 +211,10 @@ def deploy() -> List:
                             "action": "deleteUtmTagDataCollection",
                             "label": "Delete Utm Tag Data Collection",
                         },
+                        {
+                            "action": "purgeTenantCache",
+                            "label": "Purge Tenant Cache",
+                        },
                     ],
                     "type": "RequestResponse",
                     "support_methods": ["POST"],
@@ -197,6 +223,76 @@ def deploy() -> List:
                     "settings": "beta_core_ai_agent",
                     "disabled_in_resources": True,  # Ignore adding to resource list.
                 },
+                "cache_stats": {
+                    "is_static": False,
+                    "label": "Cache Stats",
+                    "type": "Event",
+                    "support_methods": ["POST"],
+                    "is_auth_required": False,
+                    "is_graphql": False,
+                    "settings": "beta_core_ai_agent",
+                    "disabled_in_resources": True,  # Ignore adding to resource list.
+                },
+                "export_entities": {
+                    "is_static": False,
+                    "label": "Export Entities",
+                    "type": "Event",
+                    "support_methods": ["POST"],
+                    "is_auth_required": False,
+                    "is_graphql": False,
+                    "settings": "beta_core_ai_agent",
+                    "disabled_in_resources": True,  # Ignore adding to resource list.
+                },
+                "import_contact_profiles": {
+                    "is_static": False,
+                    "label": "Import Contact Profiles",
+                    "type": "Event",
+                    "support_methods": ["POST"],
+                    "is_auth_required": False,
+                    "is_graphql": False,
+                    "settings": "beta_core_ai_agent",
+                    "disabled_in_resources": True,  # Ignore adding to resource list.
+                },
+                "cascade_delete": {
+                    "is_static": False,
+                    "label": "Cascade Delete",
+                    "type": "Event",
+                    "support_methods": ["POST"],
+                    "is_auth_required": False,
+                    "is_graphql": False,
+                    "settings": "beta_core_ai_agent",
+                    "disabled_in_resources": True,  # Ignore adding to resource list.
+                },
+                "rebuild_full_text_index": {
+                    "is_static": False,
+                    "label": "Rebuild Full Text Index",
+                    "type": "Event",
+                    "support_methods": ["POST"],
+                    "is_auth_required": False,
+                    "is_graphql": False,
+                    "settings": "beta_core_ai_agent",
+                    "disabled_in_resources": True,  # Ignore adding to resource list.
+                },
+                "backfill_index_attributes": {
+                    "is_static": False,
+                    "label": "Backfill Index Attributes",
+                    "type": "Event",
+                    "support_methods": ["POST"],
+                    "is_auth_required": False,
+                    "is_graphql": False,
+                    "settings": "beta_core_ai_agent",
+                    "disabled_in_resources": True,  # Ignore adding to resource list.
+                },
+                "backfill_unique_guards": {
+                    "is_static": False,
+                    "label": "Backfill Unique Guards",
+                    "type": "Event",
+                    "support_methods": ["POST"],
+                    "is_auth_required": False,
+                    "is_graphql": False,
+                    "settings": "beta_core_ai_agent",
+                    "disabled_in_resources": True,  # Ignore adding to resource list.
+                },
             },
         }
     ]
@@ -269,7 +365,185 @@ class AIMarketingEngine(Graphql):
 
     def ai_marketing_graphql(self, **params: Dict[str, Any]) -> Any:
         self._apply_partition_defaults(params)
-        return self.execute(self.__class__.build_graphql_schema(), **params)
+        try:
+            return self.execute(self.__class__.build_graphql_schema(), **params)
+        finally:
+            # Activity history events the request's mutations buffered
+            flush_activity_history(self.logger)
+
+    def cache_stats(self, **params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Admin view of this container's cache telemetry across tenants; the
+        cacheStats GraphQL query only ever shows the caller's own tenant.
+
+        Args:
+            params (Dict[str, Any]): optional cache_name and partition_key
+                (defaults to every tenant).
+        """
+        return get_cache_stats(
+            cache_name=params.get("cache_name"),
+            partition_key=params.get("partition_key"),
+        )
+
+    def export_entities(self, **params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Admin export of one entity table to S3 as JSON lines.
+
+        Args:
+            params (Dict[str, Any]): entity_type, plus optional bucket_name
+                (defaults to the aws_s3_bucket setting) and object_key.
+        """
+        entity_type = params["entity_type"]
+        if entity_type not in Config.get_cache_entity_config():
+            raise ValueError(f"Unknown entity_type: {entity_type}")
+
+        bucket_name = params.get("bucket_name") or self.setting.get("aws_s3_bucket")
+        object_key = params.get(
+            "object_key",
+            f"exports/{entity_type}/{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}.jsonl",
+        )
+        return export_entities(self.logger, entity_type, bucket_name, object_key)
+
+    def import_contact_profiles(self, **params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Import contact profiles from a local JSONL or CSV file; rerun with the
+        same parameters to resume an import that stopped part way.
+
+        Args:
+            params (Dict[str, Any]): file_path and updated_by, plus optional
+                file_format ("jsonl"/"csv", defaults to the file extension),
+                place_uuid for new contacts without one, and checkpoint_path.
+        """
+        self._apply_partition_defaults(params)
+        try:
+            return import_contact_profiles(
+                self.logger,
+                params["context"],
+                params["file_path"],
+                params["updated_by"],
+                file_format=params.get("file_format"),
+                place_uuid=params.get("place_uuid"),
+                checkpoint_path=params.get("checkpoint_path"),
+            )
+        finally:
+            # Activity history events the imported writes buffered
+            flush_activity_history(self.logger)
+
+    def rebuild_full_text_index(self, **params: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Warm the container's embedded full-text index from the tables. Until it
+        has run (and again FULL_TEXT_INDEX_MAX_AGE seconds after), `search`
+        falls back to a contains filter, so schedule it within that interval.
+        Returns the number of items indexed per entity type.
+
+        Args:
+            params (Dict[str, Any]): optional entity_type (defaults to every
+                entity type with full-text fields).
+        """
+        entity_types = (
+            [params["entity_type"]] if params.get("entity_type") else FULL_TEXT_FIELDS
+        )
+        for entity_type in entity_types:
+            if entity_type not in FULL_TEXT_FIELDS:
+                raise ValueError(f"No full-text fields for entity_type: {entity_type}")
+
+        return {
+            entity_type: rebuild_full_text_index(self.logger, entity_type)
+            for entity_type in entity_types
+        }
+
+    def backfill_index_attributes(self, **params: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Write the attributes the search_name-index and geohash-index key on
+        for items saved before they existed. Run once after initialize_tables
+        has added the indexes. Returns the number of items updated per
+        entity type (geohash under "place_geohash").
+
+        Args:
+            params (Dict[str, Any]): optional entity_type (defaults to every
+                entity type with a search_name, plus the place geohashes).
+        """
+        if params.get("entity_type"):
+            entity_type = params["entity_type"]
+            if entity_type not in SEARCH_NAME_FIELDS:
+                raise ValueError(f"No search_name for entity_type: {entity_type}")
+            entity_types = [entity_type]
+        else:
+            entity_types = list(SEARCH_NAME_FIELDS)
+
+        updated = {
+            entity_type: backfill_search_names(self.logger, entity_type)
+            for entity_type in entity_types
+        }
+        if "place" in entity_types:
+            updated["place_geohash"] = backfill_place_geohashes(self.logger)
+        return updated
+
+    def backfill_unique_guards(self, **params: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Reserve guards for the unique values (email, external_id) of entities
+        saved before guards existed. Run once after deploying the guard table;
+        until it completes, writes also check the value through the table's
+        index. Returns the number of guards written per entity type.
+
+        Args:
+            params (Dict[str, Any]): optional entity_type (defaults to every
+                entity type with a unique field).
+        """
+        entity_types = (
+            [params["entity_type"]] if params.get("entity_type") else UNIQUE_FIELDS
+        )
+        for entity_type in entity_types:
+            if entity_type not in UNIQUE_FIELDS:
+                raise ValueError(f"No unique field for entity_type: {entity_type}")
+
+        return {
+            entity_type: backfill_unique_guards(self.logger, entity_type)
+            for entity_type in entity_types
+        }
+
+    def cascade_delete(self, **params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Run the tenant's cascade delete jobs (started by a delete mutation with
+        cascade: true) within the run-time budget; rerun to resume unfinished
+        ones. Returns each job's status and deleted counts.
+
+        Args:
+            params (Dict[str, Any]): optional job_uuid (defaults to every
+                unfinished job of the tenant), time_budget (seconds) and
+                capacity_budget (WCU/s).
+        """
+        self._apply_partition_defaults(params)
+        partition_key = params["context"]["partition_key"]
+        if params.get("job_uuid"):
+            job = get_cascade_delete_job(partition_key, params["job_uuid"])
+            if job is None:
+                raise ValueError(f"Cascade delete job not found: {params['job_uuid']}")
+            jobs = [job]
+        else:
+            jobs = get_unfinished_cascade_delete_jobs(partition_key)
+
+        try:
+            return [
+                {
+                    "job_uuid": job.job_uuid,
+                    "status": job.status,
+                    "deleted": job.deleted.as_dict(),
+                }
+                for job in (
+                    run_cascade_delete(
+                        self.logger,
+                        params["context"],
+                        job,
+                        time_budget=params.get("time_budget"),
+                        capacity_budget=params.get("capacity_budget"),
+                    )
+                    for job in jobs
+                )
+            ]
+        finally:
+            # Activity history events the deletes buffered
+            flush_activity_history(self.logger)
 
     @staticmethod
     def build_graphql_schema() -> Schema:
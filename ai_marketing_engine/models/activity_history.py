@@ -6,10 +6,11 @@ __author__ = "bibow"
 
 import functools
 import logging
+import threading
 import time
 import traceback
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 
 import pendulum
 from graphene import ResolveInfo
@@ -24,13 +25,22 @@ from silvaengine_dynamodb_base import (
     BaseModel,
     delete_decorator,
     monitor_decorator,
-    resolve_list_decorator,
 )
-from silvaengine_utility import Serializer, Utility, method_cache
+from silvaengine_utility import Serializer, Utility
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from ..handlers.config import Config
 from ..types.activity_history import ActivityHistoryListType, ActivityHistoryType
+from .bulk import BATCH_WRITE_SIZE, _chunks
+from .fulltext import (
+    FullTextSearch,
+    index_full_text_item,
+    is_full_text_index_complete,
+    maintain_full_text_index,
+)
+from .local_cache import method_cache
+from .pagination import paginated_list_decorator
+from .scan import ParallelScan
 
 
 class TypeIdIndex(GlobalSecondaryIndex):
@@ -61,40 +71,173 @@ class ActivityHistoryModel(BaseModel):
     type_id_index = TypeIdIndex()
 
 
-def purge_cache():
+class ActivityHistoryWriter(object):
+    """
+    Per-container buffer of activity history puts. Events are written with
+    chunked batch_write once ACTIVITY_HISTORY_FLUSH_SIZE of them are buffered
+    or the oldest is ACTIVITY_HISTORY_FLUSH_INTERVAL seconds old, and at the
+    end of every GraphQL request or admin event. A failing chunk is retried
+    with backoff before flush returns; an event leaves the buffer only when
+    its chunk was written, so one still failing is retried by the next flush
+    (at-least-once; a replay overwrites the same id/timestamp). Written events
+    are full-text indexed and purged from the caches here, so every producer
+    (insert_activity_history, change capture) is covered and unsaved events
+    never show up in search.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # (id, timestamp) -> (item, partition_key); a key queued twice keeps
+        # its last item, as two save() calls would
+        self._pending: Dict[Tuple[str, int], Tuple[ActivityHistoryModel, str]] = {}
+        self._oldest: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(
+        self,
+        logger: logging.Logger,
+        item: ActivityHistoryModel,
+        partition_key: Optional[str],
+    ) -> None:
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending[(item.id, item.timestamp)] = (item, partition_key)
+            due = (
+                len(self._pending) >= Config.get_activity_history_flush_size()
+                or time.monotonic() - self._oldest
+                >= Config.get_activity_history_flush_interval()
+            )
+        if due:
+            self.flush(logger)
+
+    def flush(self, logger: logging.Logger) -> int:
+        """Write the buffered events; returns how many were written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            oldest, self._oldest = self._oldest, None
+        if not pending:
+            return 0
+
+        written: List[Tuple[ActivityHistoryModel, str]] = []
+        failed: Dict[Tuple[str, int], Tuple[ActivityHistoryModel, str]] = {}
+        for chunk in _chunks(list(pending.items()), BATCH_WRITE_SIZE):
+            try:
+                _save_chunk([item for _, (item, _) in chunk])
+                written.extend(entry for _, entry in chunk)
+            except Exception:
+                logger.error(traceback.format_exc())
+                failed.update(chunk)
+
+        if failed:
+            with self._lock:
+                # Events queued meanwhile are newer than the failed ones.
+                failed.update(self._pending)
+                self._pending = failed
+                self._oldest = min(
+                    value for value in (oldest, self._oldest) if value is not None
+                )
+            logger.error(f"{len(failed)} activity history events stay queued.")
+
+        from ..models.cache import purge_entity_cascading_cache
+        from ..models.cache_keys import build_purge_keys
+
+        for item, partition_key in written:
+            try:
+                context_keys, entity_keys = build_purge_keys(
+                    "activity_history",
+                    {"partition_key": partition_key},
+                    {"id": item.id, "timestamp": item.timestamp},
+                )
+                purge_entity_cascading_cache(
+                    logger,
+                    entity_type="activity_history",
+                    context_keys=context_keys,
+                    entity_keys=entity_keys,
+                    cascade_depth=3,
+                )
+            except Exception:
+                logger.error(traceback.format_exc())
+            try:
+                index_full_text_item("activity_history", item)
+            except Exception:
+                logger.error(traceback.format_exc())
+        return len(written)
+
+
+@retry(
+    reraise=True,
+    wait=wait_exponential(multiplier=1, max=60),
+    stop=stop_after_attempt(5),
+)
+def _save_chunk(items: List[ActivityHistoryModel]) -> None:
+    # batch_write raises once its own unprocessed-item retries run out.
+    with ActivityHistoryModel.batch_write() as batch:
+        for item in items:
+            batch.save(item)
+
+
+activity_history_writer = ActivityHistoryWriter()
+
+_last_timestamp = 0  # microseconds
+_last_timestamp_lock = threading.Lock()
+
+
+def new_timestamp(updated_at: datetime) -> float:
+    """
+    Range key of a new event: epoch seconds to the microsecond, strictly
+    increasing within the container, so two events of one id written in the
+    same second keep separate rows (and still sort with whole-second keys).
+    """
+    global _last_timestamp
+    with _last_timestamp_lock:
+        _last_timestamp = max(
+            int(updated_at.timestamp() * 1_000_000), _last_timestamp + 1
+        )
+        return _last_timestamp / 1_000_000
+
+
+def flush_activity_history(logger: logging.Logger) -> int:
+    """Write the activity history events buffered so far (end of a request)."""
+    return activity_history_writer.flush(logger)
+
+
+def purge_cache(list_fields: Optional[List[str]] = None):
+    """
+    Purge the entity's caches after a successful write. list_fields names the
+    attributes list resolvers filter on; updates leaving them untouched keep
+    the cached key lists.
+    """
+
     def actual_decorator(original_function):
         @functools.wraps(original_function)
         def wrapper_function(*args, **kwargs):
             try:
+                from ..models.list_cache import membership_changed
+
+                invalidate_lists = membership_changed(kwargs, list_fields)
+
                 # Execute original function first
                 result = original_function(*args, **kwargs)
 
                 # Then purge cache after successful operation
                 from ..models.cache import purge_entity_cascading_cache
+                from ..models.cache_keys import build_purge_keys
 
-                # Get entity keys from entity parameter (for updates)
-                entity_keys = {}
-                entity = kwargs.get("entity")
-                if entity:
-                    entity_keys["id"] = getattr(entity, "id", None)
-                    entity_keys["timestamp"] = getattr(entity, "timestamp", None)
-
-                # Fallback to kwargs (for creates/deletes)
-                if not entity_keys.get("id"):
-                    entity_keys["id"] = kwargs.get("id")
-                if not entity_keys.get("timestamp"):
-                    entity_keys["timestamp"] = kwargs.get("timestamp")
-
-                endpoint_id = args[0].context.get("endpoint_id") or kwargs.get(
-                    "endpoint_id"
+                # Same key registry the getter and batch loader write through
+                context_keys, entity_keys = build_purge_keys(
+                    "activity_history", args[0].context, kwargs
                 )
 
                 purge_entity_cascading_cache(
                     args[0].context.get("logger"),
                     entity_type="activity_history",
-                    context_keys={"endpoint_id": endpoint_id} if endpoint_id else None,
-                    entity_keys=entity_keys if entity_keys else None,
+                    context_keys=context_keys,
+                    entity_keys=entity_keys,
                     cascade_depth=3,
+                    invalidate_lists=invalidate_lists,
                 )
 
                 return result
@@ -117,9 +260,22 @@ def purge_cache():
     ttl=Config.get_cache_ttl(),
     cache_name=Config.get_cache_name("models", "activity_history"),
     cache_enabled=Config.is_cache_enabled,
+    cache_none=True,
+)
+def get_activity_history(id: str, timestamp: float) -> ActivityHistoryModel | None:
+    return _get_activity_history(id, timestamp)
+
+
+@retry(
+    reraise=True,
+    wait=wait_exponential(multiplier=1, max=60),
+    stop=stop_after_attempt(5),
 )
-def get_activity_history(id: str, timestamp: int) -> ActivityHistoryModel:
-    return ActivityHistoryModel.get(id, timestamp)
+def _get_activity_history(id: str, timestamp: float) -> ActivityHistoryModel | None:
+    try:
+        return ActivityHistoryModel.get(id, timestamp)
+    except ActivityHistoryModel.DoesNotExist:
+        return None
 
 
 def get_activity_history_type(
@@ -131,15 +287,16 @@ def get_activity_history_type(
 
 def resolve_activity_history(
     info: ResolveInfo, **kwargs: Dict[str, Any]
-) -> ActivityHistoryType:
-    return get_activity_history_type(
-        info,
-        get_activity_history(kwargs.get("id"), kwargs.get("timestamp")),
-    )
+) -> ActivityHistoryType | None:
+    activity_history = get_activity_history(kwargs.get("id"), kwargs.get("timestamp"))
+    if activity_history is None:
+        return None
+
+    return get_activity_history_type(info, activity_history)
 
 
 @monitor_decorator
-@resolve_list_decorator(
+@paginated_list_decorator(
     attributes_to_get=["id", "timestamp"],
     list_type_class=ActivityHistoryListType,
     type_funct=get_activity_history_type,
@@ -153,8 +310,27 @@ def resolve_activity_history_list(info: ResolveInfo, **kwargs: Dict[str, Any]) -
     if activity_type is None:
         activity_types = kwargs.get("activity_types")
 
+    search = kwargs.get("search")
+    if search and is_full_text_index_complete("activity_history"):
+        # Ranked full-text hits; the other arguments narrow them down.
+        def accept(activity_history: ActivityHistoryModel) -> bool:
+            return (
+                (not id or activity_history.id == id)
+                and (not activity_type or activity_history.type == activity_type)
+                and (not activity_types or activity_history.type in activity_types)
+                and (not log or log in (activity_history.log or ""))
+            )
+
+        search = FullTextSearch(
+            "activity_history",
+            info.context.get("partition_key"),
+            search,
+            accept=accept,
+        )
+        return search, search.count, []
+
     args = []
-    inquiry_funct = ActivityHistoryModel.scan
+    inquiry_funct = ParallelScan(ActivityHistoryModel)
     count_funct = ActivityHistoryModel.count
     if id:
         args = [id, None]
@@ -167,6 +343,9 @@ def resolve_activity_history_list(info: ResolveInfo, **kwargs: Dict[str, Any]) -
     the_filters = None  # We can add filters for the query.
     if log:
         the_filters &= ActivityHistoryModel.log.contains(log)
+    if search:
+        # The full-text index is not warm in this container; match substrings.
+        the_filters &= ActivityHistoryModel.log.contains(search)
     if activity_types:
         the_filters &= ActivityHistoryModel.type.is_in(*activity_types)
     if activity_type and id:
@@ -181,10 +360,15 @@ def resolve_activity_history_list(info: ResolveInfo, **kwargs: Dict[str, Any]) -
 def insert_activity_history(
     info: ResolveInfo, **kwargs: Dict[str, Any]
 ) -> ActivityHistoryType:
+    """
+    Queue the event on activity_history_writer; the put, the full-text index
+    entry and the cache purge happen when the writer flushes. The result is
+    built from the queued item.
+    """
     id = kwargs.get("id")
     updated_at = pendulum.now("UTC")
-    timestamp = int(datetime.timestamp(updated_at))
-    ActivityHistoryModel(
+    timestamp = new_timestamp(updated_at)
+    activity_history = ActivityHistoryModel(
         id,
         timestamp,
         **{
@@ -194,16 +378,17 @@ def insert_activity_history(
             "updated_by": kwargs.get("updated_by"),
             "updated_at": updated_at,
         },
-    ).save()
+    )
+    activity_history_writer.add(
+        info.context.get("logger"),
+        activity_history,
+        info.context.get("partition_key"),
+    )
     info.context.get("logger").info(
-        f"The activity history with the id/timestamp ({id}/{timestamp}) is inserted at {time.strftime('%X')}."
+        f"The activity history with the id/timestamp ({id}/{timestamp}) is queued at {time.strftime('%X')}."
     )
 
-    return ActivityHistoryType(
-        **Serializer.json_normalize(
-            get_activity_history(id, timestamp).__dict__["attribute_values"]
-        )
-    )
+    return get_activity_history_type(info, activity_history)
 
 
 @delete_decorator(
@@ -211,9 +396,13 @@ def insert_activity_history(
         "hash_key": "id",
         "range_key": "timestamp",
     },
-    model_funct=get_activity_history,
+    model_funct=_get_activity_history,
 )
 @purge_cache()
+@maintain_full_text_index("activity_history", deleting=True)
 def delete_activity_history(info: ResolveInfo, **kwargs: Dict[str, Any]) -> bool:
+    if kwargs.get("entity") is None:
+        return False
+
     kwargs.get("entity").delete()
     return True
@@ -7,7 +7,7 @@ __author__ = "bibow"
 import functools
 import logging
 import traceback
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 
 import pendulum
 from graphene import ResolveInfo
@@ -18,14 +18,18 @@ from silvaengine_dynamodb_base import (
     delete_decorator,
     insert_update_decorator,
     monitor_decorator,
-    resolve_list_decorator,
 )
-from silvaengine_utility import method_cache
 from silvaengine_utility.serializer import Serializer
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from ..handlers.config import Config
 from ..types.attribute_value import AttributeValueListType, AttributeValueType
+from .bulk import new_range_key
+from .change_capture import record_data_changes
+from .local_cache import method_cache
+from .pagination import paginated_list_decorator
+from .scan import ParallelScan
+from .unit_of_work import UnitOfWork
 
 
 class DataIdentityDataTypeAttributeNameIndex(GlobalSecondaryIndex):
@@ -75,48 +79,44 @@ class AttributeValueModel(BaseModel):
     )
 
 
-def purge_cache():
+# Attributes the list resolver filters or indexes on
+ATTRIBUTE_VALUE_LIST_FIELDS = ["data_identity", "value", "status"]
+
+
+def purge_cache(list_fields: Optional[List[str]] = None):
+    """
+    Purge the entity's caches after a successful write. list_fields names the
+    attributes list resolvers filter on; updates leaving them untouched keep
+    the cached key lists.
+    """
+
     def actual_decorator(original_function):
         @functools.wraps(original_function)
         def wrapper_function(*args, **kwargs):
             try:
+                from ..models.list_cache import membership_changed
+
+                invalidate_lists = membership_changed(kwargs, list_fields)
+
                 # Execute original function first
                 result = original_function(*args, **kwargs)
 
                 # Then purge cache after successful operation
                 from ..models.cache import purge_entity_cascading_cache
+                from ..models.cache_keys import build_purge_keys
 
-                # Get entity keys from entity parameter (for updates)
-                entity_keys = {}
-                entity = kwargs.get("entity")
-                if entity:
-                    entity_keys["data_type_attribute_name"] = getattr(
-                        entity, "data_type_attribute_name", None
-                    )
-                    entity_keys["value_version_uuid"] = getattr(
-                        entity, "value_version_uuid", None
-                    )
-
-                # Fallback to kwargs (for creates/deletes)
-                if not entity_keys.get("data_type_attribute_name"):
-                    entity_keys["data_type_attribute_name"] = kwargs.get(
-                        "data_type_attribute_name"
-                    )
-                if not entity_keys.get("value_version_uuid"):
-                    entity_keys["value_version_uuid"] = kwargs.get("value_version_uuid")
-
-                partition_key = args[0].context.get("endpoint_id") or kwargs.get(
-                    "partition_key"
+                # Same key registry the getter and batch loader write through
+                context_keys, entity_keys = build_purge_keys(
+                    "attribute_value", args[0].context, kwargs
                 )
 
                 purge_entity_cascading_cache(
                     args[0].context.get("logger"),
                     entity_type="attribute_value",
-                    context_keys=(
-                        {"endpoint_id": partition_key} if partition_key else None
-                    ),
-                    entity_keys=entity_keys if entity_keys else None,
+                    context_keys=context_keys,
+                    entity_keys=entity_keys,
                     cascade_depth=3,
+                    invalidate_lists=invalidate_lists,
                 )
 
                 return result
@@ -139,11 +139,12 @@ def purge_cache():
     ttl=Config.get_cache_ttl(),
     cache_name=Config.get_cache_name("models", "attribute_value"),
     cache_enabled=Config.is_cache_enabled,
+    cache_none=True,
 )
 def get_attribute_value(
     data_type_attribute_name: str, value_version_uuid: str
-) -> AttributeValueModel:
-    return AttributeValueModel.get(data_type_attribute_name, value_version_uuid)
+) -> AttributeValueModel | None:
+    return _get_attribute_value(data_type_attribute_name, value_version_uuid)
 
 
 @retry(
@@ -153,8 +154,11 @@ def get_attribute_value(
 )
 def _get_attribute_value(
     data_type_attribute_name: str, value_version_uuid: str
-) -> AttributeValueModel:
-    return AttributeValueModel.get(data_type_attribute_name, value_version_uuid)
+) -> AttributeValueModel | None:
+    try:
+        return AttributeValueModel.get(data_type_attribute_name, value_version_uuid)
+    except AttributeValueModel.DoesNotExist:
+        return None
 
 
 @retry(
@@ -183,10 +187,9 @@ def _get_active_attribute_value(
 def get_attribute_value_count(
     data_type_attribute_name: str, value_version_uuid: str
 ) -> int:
-    return AttributeValueModel.count(
-        data_type_attribute_name,
-        AttributeValueModel.value_version_uuid == value_version_uuid,
-    )
+    """Existence check of the write decorators, read uncached (never stale)."""
+    attribute_value = _get_attribute_value(data_type_attribute_name, value_version_uuid)
+    return 0 if attribute_value is None else 1
 
 
 def get_attribute_value_type(
@@ -202,29 +205,25 @@ def resolve_attribute_value(
     info: ResolveInfo, **kwargs: Dict[str, Any]
 ) -> AttributeValueType | None:
     if "data_identity" in kwargs:
-        return get_attribute_value_type(
-            info,
-            _get_active_attribute_value(
-                kwargs["data_type_attribute_name"], kwargs["data_identity"]
-            ),
+        attribute_value = _get_active_attribute_value(
+            kwargs["data_type_attribute_name"], kwargs["data_identity"]
         )
+        if attribute_value is None:
+            return None
 
-    count = get_attribute_value_count(
+        return get_attribute_value_type(info, attribute_value)
+
+    attribute_value = get_attribute_value(
         kwargs["data_type_attribute_name"], kwargs["value_version_uuid"]
     )
-    if count == 0:
+    if attribute_value is None:
         return None
 
-    return get_attribute_value_type(
-        info,
-        get_attribute_value(
-            kwargs["data_type_attribute_name"], kwargs["value_version_uuid"]
-        ),
-    )
+    return get_attribute_value_type(info, attribute_value)
 
 
 @monitor_decorator
-@resolve_list_decorator(
+@paginated_list_decorator(
     attributes_to_get=[
         "data_type_attribute_name",
         "value_version_uuid",
@@ -241,7 +240,7 @@ def resolve_attribute_value_list(info: ResolveInfo, **kwargs: Dict[str, Any]) ->
     statuses = kwargs.get("statuses")
 
     args = []
-    inquiry_funct = AttributeValueModel.scan
+    inquiry_funct = ParallelScan(AttributeValueModel)
     count_funct = AttributeValueModel.count
     if data_type_attribute_name:
         args = [data_type_attribute_name, None]
@@ -299,7 +298,7 @@ def _inactivate_attribute_values(
     count_funct=get_attribute_value_count,
     type_funct=get_attribute_value_type,
 )
-@purge_cache()
+@purge_cache(list_fields=ATTRIBUTE_VALUE_LIST_FIELDS)
 def insert_update_attribute_value(info: ResolveInfo, **kwargs: Dict[str, Any]) -> None:
     data_type_attribute_name = kwargs.get("data_type_attribute_name")
     value_version_uuid = kwargs.get("value_version_uuid")
@@ -389,10 +388,12 @@ def insert_update_attribute_value(info: ResolveInfo, **kwargs: Dict[str, Any]) -
         "hash_key": "data_type_attribute_name",
         "range_key": "value_version_uuid",
     },
-    model_funct=get_attribute_value,
+    model_funct=_get_attribute_value,
 )
 @purge_cache()
 def delete_attribute_value(info: ResolveInfo, **kwargs: Dict[str, Any]) -> bool:
+    if kwargs.get("entity") is None:
+        return False
 
     if kwargs["entity"].status == "active":
         results = AttributeValueModel.data_identity_index.query(
@@ -418,28 +419,24 @@ def purge_attributes_data_cache():
         @functools.wraps(original_function)
         def wrapper_function(*args, **kwargs):
             try:
+                # Write first so a concurrent read can't re-cache the old bag
+                result = original_function(*args, **kwargs)
+
                 from ..models.cache import purge_entity_cascading_cache
+                from ..models.cache_keys import build_purge_keys
 
-                partition_key = args[0].context.get("partition_key") or args[
-                    0
-                ].context.get("endpoint_id")
-                entity_keys = {}
-                if kwargs.get("data_identity"):
-                    entity_keys["data_identity"] = kwargs.get("data_identity")
-                if kwargs.get("data_type"):
-                    entity_keys["data_type"] = kwargs.get("data_type")
+                context_keys, entity_keys = build_purge_keys(
+                    "attributes_data", args[0].context, kwargs
+                )
 
-                result = purge_entity_cascading_cache(
+                purge_entity_cascading_cache(
                     args[0].context.get("logger"),
                     entity_type="attributes_data",
-                    context_keys=(
-                        {"endpoint_id": partition_key} if partition_key else None
-                    ),
-                    entity_keys=entity_keys if entity_keys else None,
+                    context_keys=context_keys,
+                    entity_keys=entity_keys,
                     cascade_depth=3,
                 )
 
-                result = original_function(*args, **kwargs)
                 return result
             except Exception as e:
                 log = traceback.format_exc()
@@ -451,44 +448,172 @@ def purge_attributes_data_cache():
     return actual_decorator
 
 
-@purge_attributes_data_cache()
-def insert_update_attribute_values(
-    info: ResolveInfo, **kwargs: Dict[str, Any]
-) -> Dict[str, Any]:
-    # Insert/update attribute values
-    data_type = kwargs.get("data_type")
-    data_identity = kwargs.get("data_identity")
-    data = kwargs.get("data")
-    updated_by = kwargs.get("updated_by")
-    partition_key = kwargs.get("partition_key")
-    attribute_values = []
-    for attribute_name, value in data.items():
-        active_attribute_value = _get_active_attribute_value(
-            f"{data_type}-{attribute_name}", data_identity
+class AttributeBagChanges(object):
+    """
+    What writing an entity's data bag changes: the attribute value versions to
+    add and the active versions they retire. The active versions come from one
+    data_identity index query rather than a read per attribute; add_to puts
+    the writes on a UnitOfWork so they commit with the entity.
+    """
+
+    def __init__(
+        self,
+        info: ResolveInfo,
+        data_type: str,
+        data_identity: str,
+        updated_by: str,
+        data: Optional[Dict[str, Any]],
+        partition_key: Optional[str] = None,
+    ) -> None:
+        self.data_type = data_type
+        self.data_identity = data_identity
+        self.updated_by = updated_by
+        self.partition_key = (
+            partition_key
+            or info.context.get("partition_key")
+            or info.context.get("endpoint_id")
         )
-        if active_attribute_value and active_attribute_value.value == value:
-            attribute_values.append(active_attribute_value)
-            continue
-
-        insert_params = {
-            "data_type_attribute_name": f"{data_type}-{attribute_name}",
-            "data_identity": data_identity,
-            "value": value,
-            "updated_by": updated_by,
-        }
-        if partition_key:
-            insert_params["partition_key"] = partition_key
+        # attribute name -> (active versions to retire, new version)
+        self.changes: Dict[str, Tuple[List[AttributeValueModel], Any]] = {}
+        self.data: Dict[str, Any] = {}
+        self.data_diff: Dict[str, Dict[str, Any]] = {}
+        if not data:
+            return
+
+        active: Dict[str, List[AttributeValueModel]] = {}
+        for attribute_value in (
+            AttributeValueModel.data_identity_data_type_attribute_name_index.query(
+                data_identity,
+                AttributeValueModel.data_type_attribute_name.startswith(
+                    f"{data_type}-"
+                ),
+                filter_condition=(AttributeValueModel.status == "active"),
+            )
+        ):
+            active.setdefault(attribute_value.data_type_attribute_name, []).append(
+                attribute_value
+            )
 
-        attribute_value = insert_update_attribute_value(
-            info,
-            **insert_params,
-        )
-        attribute_values.append(attribute_value)
+        now = pendulum.now("UTC")
+        for attribute_name, value in data.items():
+            self.data[attribute_name] = value
+            current = sorted(
+                active.get(f"{data_type}-{attribute_name}", []),
+                key=lambda attribute_value: attribute_value.updated_at,
+                reverse=True,
+            )
+            if current and current[0].value == value:
+                continue
+
+            self.changes[attribute_name] = (
+                current,
+                AttributeValueModel(
+                    f"{data_type}-{attribute_name}",
+                    new_range_key(),
+                    data_identity=data_identity,
+                    partition_key=self.partition_key,
+                    value=value,
+                    status="active",
+                    updated_by=updated_by,
+                    created_at=now,
+                    updated_at=now,
+                ),
+            )
+            self.data_diff[attribute_name] = {
+                "old": current[0].value if current else None,
+                "new": value,
+            }
 
-    return {
-        attribute_value.data_type_attribute_name.split("-")[1]: attribute_value.value
-        for attribute_value in attribute_values
-    }
+    def __len__(self) -> int:
+        return len(self.changes)
+
+    def add_to(self, unit: UnitOfWork) -> None:
+        """Put each changed attribute's retire-and-add on unit, kept together."""
+        for retired, attribute_value in self.changes.values():
+            with unit.group():
+                for active_attribute_value in retired:
+                    # A concurrent write that retired it first cancels this one.
+                    unit.update(
+                        active_attribute_value,
+                        actions=[AttributeValueModel.status.set("inactive")],
+                        condition=(AttributeValueModel.status == "active"),
+                    )
+                unit.save(
+                    attribute_value,
+                    condition=AttributeValueModel.value_version_uuid.does_not_exist(),
+                )
+
+    def committed(self, info: ResolveInfo) -> None:
+        """Purge the caches the committed versions touch and record the change."""
+        if not self.changes:
+            return
+
+        from ..models.cache import purge_entity_cascading_cache
+        from ..models.cache_keys import build_purge_keys
+
+        logger = info.context.get("logger")
+        try:
+            for _, attribute_value in self.changes.values():
+                context_keys, entity_keys = build_purge_keys(
+                    "attribute_value",
+                    info.context,
+                    attribute_value.attribute_values,
+                )
+                purge_entity_cascading_cache(
+                    logger,
+                    entity_type="attribute_value",
+                    context_keys=context_keys,
+                    entity_keys=entity_keys,
+                    cascade_depth=3,
+                )
+            context_keys, entity_keys = build_purge_keys(
+                "attributes_data",
+                info.context,
+                {
+                    "data_type": self.data_type,
+                    "data_identity": self.data_identity,
+                    "partition_key": self.partition_key,
+                },
+            )
+            purge_entity_cascading_cache(
+                logger,
+                entity_type="attributes_data",
+                context_keys=context_keys,
+                entity_keys=entity_keys,
+                cascade_depth=3,
+            )
+        except Exception:
+            logger.error(traceback.format_exc())
+
+        try:
+            # The active versions read up front are the old values.
+            record_data_changes(
+                info,
+                self.data_type,
+                self.data_identity,
+                self.updated_by,
+                self.data_diff,
+            )
+        except Exception:
+            logger.error(traceback.format_exc())
+
+
+def insert_update_attribute_values(
+    info: ResolveInfo, **kwargs: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Write a data bag on its own; its versions commit in one transaction."""
+    attributes = AttributeBagChanges(
+        info,
+        kwargs.get("data_type"),
+        kwargs.get("data_identity"),
+        kwargs.get("updated_by"),
+        kwargs.get("data"),
+        partition_key=kwargs.get("partition_key"),
+    )
+    with UnitOfWork(AttributeValueModel) as unit:
+        attributes.add_to(unit)
+    attributes.committed(info)
+    return attributes.data
 
 
 @retry(
@@ -7,6 +7,8 @@ __author__ = "bibow"
 from typing import Any, Dict
 
 from silvaengine_utility.cache import HybridCacheEngine
+from ..cache_keys import resolve_key_values
+from ..local_cache import TieredCacheEngine
 from .attribute_data_loader import AttributeDataLoader
 from .contact_profile_loader import ContactProfileLoader
 from .corporation_profile_loader import CorporationProfileLoader
@@ -40,25 +42,17 @@ class RequestLoaders:
         if not self.cache_enabled:
             return
 
-        if entity_type == "place" and "place_uuid" in entity_keys:
-            cache_key = self.place_loader.generate_cache_key(
-                (entity_keys.get("endpoint_id"), entity_keys["place_uuid"])
-            )
-            if hasattr(self.place_loader, "cache"):
-                self.place_loader.cache.delete(cache_key)
-        elif entity_type == "corporation_profile" and "corporation_uuid" in entity_keys:
-            cache_key = self.corporation_loader.generate_cache_key(
-                (entity_keys.get("endpoint_id"), entity_keys["corporation_uuid"])
-            )
-            if hasattr(self.corporation_loader, "cache"):
-                self.corporation_loader.cache.delete(cache_key)
-        elif entity_type == "contact_profile" and "contact_uuid" in entity_keys:
-            cache_key = self.contact_profile_loader.generate_cache_key(
-                (entity_keys.get("endpoint_id"), entity_keys["contact_uuid"])
-            )
-            if hasattr(self.contact_profile_loader, "cache"):
-                self.contact_profile_loader.cache.delete(cache_key)
+        loader = {
+            "place": self.place_loader,
+            "corporation_profile": self.corporation_loader,
+            "contact_profile": self.contact_profile_loader,
+        }.get(entity_type)
+        if loader is None or not hasattr(loader, "cache"):
+            return
 
+        key = resolve_key_values(entity_type, entity_keys, entity_keys)
+        if key is not None:
+            loader.cache.delete(loader.generate_cache_key(key))
 
 def get_loaders(context: Dict[str, Any]) -> RequestLoaders:
     """Fetch or initialize request-scoped loaders from the GraphQL context."""
@@ -85,6 +79,7 @@ __all__ = [
     "get_loaders",
     "clear_loaders",
     "HybridCacheEngine",
+    "TieredCacheEngine",
     "AttributeDataLoader",
     "ContactProfileLoader",
     "CorporationProfileLoader",
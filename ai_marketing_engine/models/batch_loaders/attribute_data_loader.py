@@ -4,12 +4,14 @@ from __future__ import print_function
 
 __author__ = "bibow"
 
+import time
 from typing import Any, Dict, List, Optional, Tuple
 
 from promise import Promise
-from silvaengine_utility.cache import HybridCacheEngine
 
 from ...handlers.config import Config
+from ..cache_keys import build_entity_key
+from ..local_cache import TieredCacheEngine, is_not_found
 from .base import SafeDataLoader
 
 Key = Tuple[str, str]
@@ -28,31 +30,25 @@ class AttributeDataLoader(SafeDataLoader):
         )
         self.data_type = data_type
         if self.cache_enabled:
-            self.cache = HybridCacheEngine(
+            self.cache = TieredCacheEngine(
                 Config.get_cache_name("models", "attributes_data")
             )
-            cache_meta = Config.get_cache_entity_config().get("attributes_data")
-            self.cache_func_prefix = ""
-            if cache_meta:
-                self.cache_func_prefix = ".".join([cache_meta.get("module"), cache_meta.get("getter")])
 
     def generate_cache_key(self, key: Key) -> str:
-        key_data = ":".join([str(key), str({})])
-        return self.cache._generate_key(
-            self.cache_func_prefix,
-            key_data
-        )
-    
+        return build_entity_key(self.cache, "attributes_data", key)
+
     def get_cache_data(self, key: Key) -> Dict[str, Any] | None:
         cache_key = self.generate_cache_key(key)
-        cached_item = self.cache.get(cache_key)
-        if cached_item is None:  # pragma: no cover - defensive
+        cached_item = self.cache.get(cache_key, partition_key=key[0])
+        if cached_item is None or is_not_found(cached_item):
             return None
         return cached_item
 
     def set_cache_data(self, key: Key, data: Any) -> None:
         cache_key = self.generate_cache_key(key)
-        self.cache.set(cache_key, data, ttl=Config.get_cache_ttl())
+        self.cache.set(
+            cache_key, data, ttl=Config.get_cache_ttl(), partition_key=key[0]
+        )
 
     def batch_load_fn(self, keys: List[Key]) -> Promise:
         from ..utils import get_data  # Import locally to avoid circular dependency
@@ -69,12 +65,16 @@ class AttributeDataLoader(SafeDataLoader):
 
             # Fetch from database
             try:
+                started = time.perf_counter()
                 data = get_data(partition_key, data_identity, self.data_type)
                 results.append(data)
 
                 if self.cache_enabled:
                     key = (partition_key, data_identity, self.data_type)
                     self.set_cache_data(key, data)
+                    self.cache.record_fill(
+                        partition_key, (time.perf_counter() - started) * 1000
+                    )
 
             except Exception as exc:  # pragma: no cover - defensive
                 if self.logger:
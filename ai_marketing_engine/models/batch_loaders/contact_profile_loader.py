@@ -4,12 +4,14 @@ from __future__ import print_function
 
 __author__ = "bibow"
 
+import time
 from typing import Any, Dict, List, Tuple
 
 from promise import Promise
-from silvaengine_utility.cache import HybridCacheEngine
 
 from ...handlers.config import Config
+from ..cache_keys import build_entity_key
+from ..local_cache import TieredCacheEngine, is_not_found
 from .base import SafeDataLoader, normalize_model
 
 Key = Tuple[str, str]
@@ -23,25 +25,17 @@ class ContactProfileLoader(SafeDataLoader):
             logger=logger, cache_enabled=cache_enabled, **kwargs
         )
         if self.cache_enabled:
-            self.cache = HybridCacheEngine(
+            self.cache = TieredCacheEngine(
                 Config.get_cache_name("models", "contact_profile")
             )
-            cache_meta = Config.get_cache_entity_config().get("contact_profile")
-            self.cache_func_prefix = ""
-            if cache_meta:
-                self.cache_func_prefix = ".".join([cache_meta.get("module"), cache_meta.get("getter")])
 
     def generate_cache_key(self, key: Key) -> str:
-        key_data = ":".join([str(key), str({})])
-        return self.cache._generate_key(
-            self.cache_func_prefix,
-            key_data
-        )
-    
+        return build_entity_key(self.cache, "contact_profile", key)
+
     def get_cache_data(self, key: Key) -> Dict[str, Any] | None:
         cache_key = self.generate_cache_key(key)
-        cached_item = self.cache.get(cache_key)
-        if cached_item is None:  # pragma: no cover - defensive
+        cached_item = self.cache.get(cache_key, partition_key=key[0])
+        if cached_item is None or is_not_found(cached_item):
             return None
         if isinstance(cached_item, dict):  # pragma: no cover - defensive
             return cached_item
@@ -49,9 +43,12 @@ class ContactProfileLoader(SafeDataLoader):
 
     def set_cache_data(self, key: Key, data: Any) -> None:
         cache_key = self.generate_cache_key(key)
-        self.cache.set(cache_key, data, ttl=Config.get_cache_ttl())
+        self.cache.set(
+            cache_key, data, ttl=Config.get_cache_ttl(), partition_key=key[0]
+        )
 
-    def batch_load_fn(self, keys: List[Key]) -> Promise:
+    def batch_load_fn(self, keys: List[Key], raise_errors: bool = False) -> Promise:
+        """raise_errors re-raises a failed batch_get rather than returning None."""
         from ..contact_profile import ContactProfileModel # Import locally to avoid circular dependency
         unique_keys = list(dict.fromkeys(keys))
         key_map: Dict[Key, Dict[str, Any]] = {}
@@ -74,12 +71,19 @@ class ContactProfileLoader(SafeDataLoader):
             try:
                 # batch_get expects (hash_key, range_key) tuples
                 # ContactProfileModel uses partition_key as hash_key
-                for item in ContactProfileModel.batch_get(uncached_keys):
+                started = time.perf_counter()
+                items = list(ContactProfileModel.batch_get(uncached_keys))
+                # batch_get fetches in bulk, so spread the latency across items
+                latency_ms = (time.perf_counter() - started) * 1000 / max(
+                    len(items), 1
+                )
+                for item in items:
                     # Map by partition_key
                     key = (item.partition_key, item.contact_uuid)
 
                     if self.cache_enabled:
                         self.set_cache_data(key, item)
+                        self.cache.record_fill(item.partition_key, latency_ms)
 
                     normalized = normalize_model(item)
                     key_map[key] = normalized
@@ -87,5 +91,7 @@ class ContactProfileLoader(SafeDataLoader):
             except Exception as exc:  # pragma: no cover - defensive
                 if self.logger:
                     self.logger.exception(exc)
+                if raise_errors:
+                    raise
 
         return Promise.resolve([key_map.get(key) for key in keys])
@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import logging
+import traceback
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import pendulum
+from graphene import ResolveInfo
+from pynamodb.exceptions import DeleteError, PutError
+
+from ..handlers.config import Config
+from .cache import purge_entity_caches_in_bulk
+from .cache_keys import get_key_fields
+from .counters import _counter_deltas, _dimension_values, adjust_entity_counter
+from .foreign_keys import find_missing_references, get_references, reference_error
+from .list_cache import get_model_class
+from .unique_guards import (
+    UNIQUE_FIELDS,
+    UniqueGuardModel,
+    duplicate_message,
+    get_guard_key,
+    get_unique_owner,
+    get_unique_owners,
+    guard_changes,
+    guard_item,
+)
+
+# DynamoDB request limits: BatchGetItem reads 100 keys, BatchWriteItem 25 puts.
+BATCH_GET_SIZE = 100
+BATCH_WRITE_SIZE = 25
+
+
+def _chunks(items: Sequence[Any], size: int) -> List[Sequence[Any]]:
+    return [items[start : start + size] for start in range(0, len(items), size)]
+
+
+def new_range_key() -> str:
+    """Range key for a new entity, made the way insert_update_decorator makes it."""
+    return str(uuid.uuid1().int >> 64)
+
+
+def merge_item(
+    model_class: Any,
+    entity: Any,
+    kwargs: Dict[str, Any],
+    fields: Sequence[str],
+    cols: Optional[Dict[str, Any]] = None,
+) -> Any:
+    """
+    The full item a batch put writes to update entity: its stored attributes
+    with the given fields applied ("null" clears one), then cols on top. A None
+    value leaves the attribute out of the item.
+    """
+    values = dict(entity.attribute_values)
+    for field in fields:
+        if field in kwargs:
+            values[field] = None if kwargs[field] == "null" else kwargs[field]
+    values.update(cols or {})
+    values["updated_by"] = kwargs["updated_by"]
+    values["updated_at"] = pendulum.now("UTC")
+    hash_key = values.pop(model_class._hash_key_attribute().attr_name)
+    range_key = values.pop(model_class._range_key_attribute().attr_name)
+    return model_class(
+        hash_key,
+        range_key,
+        **{field: value for field, value in values.items() if value is not None},
+    )
+
+
+class BulkItem(object):
+    """One input item of a bulk upsert and its outcome."""
+
+    def __init__(self, index: int, kwargs: Dict[str, Any]) -> None:
+        self.index = index
+        self.kwargs = kwargs
+        self.entity: Optional[Any] = None
+        self.item: Optional[Any] = None
+        self.error: Optional[str] = None
+        # Unique value claimed and given up by the write (see unique_guards)
+        self.reserve: Optional[str] = None
+        self.release: Optional[str] = None
+
+    def result(self, range_field: str) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "key": self.kwargs.get(range_field),
+            "created": self.entity is None,
+            "ok": self.error is None,
+            "error": self.error,
+        }
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, KeyError):
+        return f"Missing argument: {error.args[0]}"
+    return str(error)
+
+
+def _check_unique_values(
+    entity_type: str, partition_key: str, bulk_items: List[BulkItem]
+) -> None:
+    """Fail items whose unique value another entity, or an earlier item, owns."""
+    field, owner_field = UNIQUE_FIELDS[entity_type]
+    claims = []
+    for bulk_item in bulk_items:
+        if bulk_item.error is not None:
+            continue
+        bulk_item.reserve, bulk_item.release = guard_changes(
+            getattr(bulk_item.entity, field, None), getattr(bulk_item.item, field, None)
+        )
+        if bulk_item.reserve is not None:
+            claims.append(bulk_item)
+
+    owners = get_unique_owners(
+        partition_key, field, [bulk_item.reserve for bulk_item in claims]
+    )
+    for bulk_item in claims:
+        owner_key = bulk_item.kwargs[owner_field]
+        if owners[bulk_item.reserve] not in (None, owner_key):
+            bulk_item.error = duplicate_message(
+                entity_type, bulk_item.reserve, owners[bulk_item.reserve]
+            )
+            continue
+        owners[bulk_item.reserve] = owner_key
+
+
+def _check_foreign_keys(
+    context: Dict[str, Any], entity_type: str, bulk_items: List[BulkItem]
+) -> None:
+    """Fail items referencing missing entities; one loader call per entity type."""
+    references = {
+        bulk_item.index: get_references(
+            entity_type, context["partition_key"], bulk_item.kwargs
+        )
+        for bulk_item in bulk_items
+        if bulk_item.error is None
+    }
+    missing = find_missing_references(
+        context,
+        [reference for pairs in references.values() for _, reference in pairs],
+    )
+    if not missing:
+        return
+
+    for bulk_item in bulk_items:
+        for field, reference in references.get(bulk_item.index, []):
+            if reference in missing:
+                bulk_item.error = reference_error(field, reference)
+                break
+
+
+def _owned_by(owner_key: str) -> Any:
+    return UniqueGuardModel.guard_key.does_not_exist() | (
+        UniqueGuardModel.owner_key == owner_key
+    )
+
+
+def _reserve_unique_value(
+    entity_type: str, partition_key: str, bulk_item: BulkItem
+) -> None:
+    """
+    Claim the item's new unique value with a conditional put, before its entity
+    is written; fail the item if another entity claimed the value meanwhile.
+    """
+    field, owner_field = UNIQUE_FIELDS[entity_type]
+    owner_key = bulk_item.kwargs[owner_field]
+    try:
+        guard_item(partition_key, field, bulk_item.reserve, owner_key).save(
+            condition=_owned_by(owner_key)
+        )
+    except PutError as error:
+        if error.cause_response_code != "ConditionalCheckFailedException":
+            bulk_item.error = _error_message(error)
+        else:
+            bulk_item.error = duplicate_message(
+                entity_type,
+                bulk_item.reserve,
+                get_unique_owner(partition_key, field, bulk_item.reserve),
+            )
+        bulk_item.reserve = None
+
+
+def _release_unique_value(
+    entity_type: str, partition_key: str, bulk_item: BulkItem, value: str
+) -> None:
+    """Drop the item's guard on value unless another entity owns it now."""
+    field, owner_field = UNIQUE_FIELDS[entity_type]
+    try:
+        UniqueGuardModel(get_guard_key(partition_key, field, value)).delete(
+            condition=_owned_by(bulk_item.kwargs[owner_field])
+        )
+    except DeleteError as error:
+        if error.cause_response_code != "ConditionalCheckFailedException":
+            raise
+
+
+def bulk_insert_update(
+    info: ResolveInfo,
+    entity_type: str,
+    items: List[Dict[str, Any]],
+    build_item: Callable[[ResolveInfo, Dict[str, Any], Optional[Any]], Any],
+    after_write: Optional[Callable[[ResolveInfo, List[BulkItem]], None]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Insert or update many entities of one tenant in a few round trips:
+    existing items are pre-read with chunked batch_get, every item is written
+    as a full put through chunked batch_write calls run in parallel, counters
+    move by their net deltas, and the caches are purged once for the batch.
+    Unique values (UNIQUE_FIELDS) are claimed with conditional guard puts
+    before the entity writes, so concurrent requests cannot both take one;
+    an item whose claim fails, fails. Unlike the single-item mutations the
+    guard and entity writes are not one transaction: a claim is given back
+    when its entity write fails, and released values are dropped after.
+    build_item(info, kwargs, entity) returns the item to put (entity is None
+    for creates); after_write runs follow-up writes for the items that were
+    stored and may set .error on them (all of them when it raises). Returns
+    one result
+    per input item, in input order; a failed item never fails the batch.
+    """
+    if len(items) > Config.get_bulk_max_items():
+        raise ValueError(
+            f"A bulk request takes at most {Config.get_bulk_max_items()} items."
+        )
+
+    logger = info.context.get("logger") or logging.getLogger(__name__)
+    partition_key = info.context["partition_key"]
+    model_class = get_model_class(entity_type)
+    range_field = get_key_fields(entity_type)[1]
+
+    bulk_items = []
+    for index, item in enumerate(items):
+        # Unset input fields arrive as None; "null" is how a field is cleared.
+        kwargs = {key: value for key, value in item.items() if value is not None}
+        kwargs["partition_key"] = partition_key
+        kwargs.setdefault(range_field, new_range_key())
+        bulk_items.append(BulkItem(index, kwargs))
+
+    workers = Config.get_bulk_max_workers()
+    keys = list(
+        dict.fromkeys(
+            (partition_key, bulk_item.kwargs[range_field])
+            for bulk_item in bulk_items
+        )
+    )
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="ame-bulk"
+    ) as executor:
+        existing = {
+            (entity.partition_key, getattr(entity, range_field)): entity
+            for entities in executor.map(
+                lambda chunk: list(model_class.batch_get(chunk)),
+                _chunks(keys, BATCH_GET_SIZE),
+            )
+            for entity in entities
+        }
+        for bulk_item in bulk_items:
+            bulk_item.entity = existing.get(
+                (partition_key, bulk_item.kwargs[range_field])
+            )
+
+        for bulk_item in bulk_items:
+            if bulk_item.error is not None:
+                continue
+            try:
+                bulk_item.item = build_item(info, bulk_item.kwargs, bulk_item.entity)
+            except Exception as error:
+                bulk_item.error = _error_message(error)
+
+        _check_foreign_keys(info.context, entity_type, bulk_items)
+        if entity_type in UNIQUE_FIELDS:
+            # Reads the guards once to fail taken and repeated values early.
+            _check_unique_values(entity_type, partition_key, bulk_items)
+
+        def write(chunk: Sequence[BulkItem]) -> None:
+            try:
+                with model_class.batch_write() as batch:
+                    for bulk_item in chunk:
+                        batch.save(bulk_item.item)
+            except Exception as error:
+                logger.error(traceback.format_exc())
+                for bulk_item in chunk:
+                    bulk_item.error = _error_message(error)
+
+        # A key repeated in one request is written once, with its last item.
+        latest = {
+            bulk_item.kwargs[range_field]: bulk_item
+            for bulk_item in bulk_items
+            if bulk_item.error is None
+        }
+        for bulk_item in bulk_items:
+            if bulk_item.error is not None:
+                continue
+            if latest[bulk_item.kwargs[range_field]] is not bulk_item:
+                bulk_item.error = "Superseded by a later item with the same key."
+
+        claims = []
+        if entity_type in UNIQUE_FIELDS:
+            claims = [
+                bulk_item
+                for bulk_item in latest.values()
+                if bulk_item.reserve is not None
+            ]
+            list(
+                executor.map(
+                    lambda bulk_item: _reserve_unique_value(
+                        entity_type, partition_key, bulk_item
+                    ),
+                    claims,
+                )
+            )
+        list(
+            executor.map(
+                write,
+                _chunks(
+                    [
+                        bulk_item
+                        for bulk_item in latest.values()
+                        if bulk_item.error is None
+                    ],
+                    BATCH_WRITE_SIZE,
+                ),
+            )
+        )
+
+        # Release what failed writes had claimed and what written items gave up.
+        releases = [
+            (bulk_item, bulk_item.reserve)
+            for bulk_item in claims
+            if bulk_item.error is not None and bulk_item.reserve is not None
+        ] + [
+            (bulk_item, bulk_item.release)
+            for bulk_item in latest.values()
+            if bulk_item.error is None and bulk_item.release is not None
+        ]
+
+        def release(claim: Any) -> None:
+            try:
+                _release_unique_value(entity_type, partition_key, *claim)
+            except Exception:
+                logger.error(traceback.format_exc())
+
+        list(executor.map(release, releases))
+
+    written = [bulk_item for bulk_item in bulk_items if bulk_item.error is None]
+    try:
+        deltas: Counter = Counter()
+        for bulk_item in written:
+            old_values = (
+                _dimension_values(entity_type, bulk_item.entity)
+                if bulk_item.entity is not None
+                else None
+            )
+            new_values = _dimension_values(entity_type, bulk_item.item)
+            for counter_key, delta in _counter_deltas(
+                entity_type, old_values, new_values
+            ):
+                deltas[counter_key] += delta
+        for counter_key, delta in deltas.items():
+            if delta:
+                adjust_entity_counter(partition_key, counter_key, delta)
+    except Exception:
+        logger.error(traceback.format_exc())
+
+    try:
+        if written and after_write is not None:
+            after_write(info, written)
+    except Exception as error:
+        logger.error(traceback.format_exc())
+        for bulk_item in written:
+            if bulk_item.error is None:
+                bulk_item.error = (
+                    f"Saved, but its follow-up writes failed: {_error_message(error)}"
+                )
+    finally:
+        # The entities are stored either way.
+        if written:
+            purge_entity_caches_in_bulk(logger, entity_type, partition_key)
+
+    return [bulk_item.result(range_field) for bulk_item in bulk_items]
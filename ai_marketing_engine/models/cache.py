@@ -5,7 +5,7 @@ __author__ = "bibow"
 
 import logging
 from functools import lru_cache
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from silvaengine_dynamodb_base.cache_utils import (
     CacheConfigResolvers,
@@ -32,13 +32,108 @@ def purge_entity_cascading_cache(
     context_keys: Optional[Dict[str, Any]] = None,
     entity_keys: Optional[Dict[str, Any]] = None,
     cascade_depth: int = 3,
+    invalidate_lists: bool = True,
 ) -> Dict[str, Any]:
-    """Universal function to purge entity cache with cascading child cache support."""
+    """
+    Universal function to purge entity cache with cascading child cache support.
+    List caches hold only keys, so they are retired just when invalidate_lists
+    says the write changed list membership (see list_cache.membership_changed).
+    """
     purger = _get_cascading_cache_purger()
-    return purger.purge_entity_cascading_cache(
+    result = purger.purge_entity_cascading_cache(
         logger,
         entity_type,
         context_keys=context_keys,
         entity_keys=entity_keys,
         cascade_depth=cascade_depth,
-    )
\ No newline at end of file
+    )
+
+    from ..handlers.config import Config
+    from .cache_keys import build_entity_key, resolve_key_values
+    from .cache_namespace import bump_namespace_generation
+    from .cache_stats import cache_stats
+    from .local_cache import TieredCacheEngine
+
+    # Evict the entity's own entry under the exact key its getter and loader
+    # wrote, independent of how the shared purger derives keys. This drops the
+    # local copy too; cascaded children's local copies expire within
+    # CACHE_LOCAL_TTL, as they do in every other container.
+    key_values = resolve_key_values(entity_type, context_keys, entity_keys)
+    if key_values is not None:
+        cache = TieredCacheEngine(Config.get_cache_name("models", entity_type))
+        cache.delete(build_entity_key(cache, entity_type, key_values))
+
+    cache_names = _get_cascading_cache_names(entity_type, cascade_depth)
+    context_keys = context_keys or {}
+    partition_key = context_keys.get("partition_key")
+    for cache_name in cache_names:
+        cache_stats.record_purge(cache_name, partition_key)
+
+    # List resolvers are keyed by their filter arguments, so any of the tenant's
+    # lists may gain or lose the entity; retire them by bumping their namespace.
+    if partition_key and invalidate_lists:
+        cache_name = Config.get_cache_name("queries", entity_type)
+        bump_namespace_generation(partition_key, cache_name)
+        cache_stats.record_purge(cache_name, partition_key)
+    return result
+
+
+def purge_entity_caches_in_bulk(
+    logger: logging.Logger,
+    entity_type: str,
+    partition_key: str,
+    cascade_depth: int = 3,
+) -> List[str]:
+    """
+    One purge for a batch of writes to a tenant's entities: instead of evicting
+    each entity and its children one by one, bump the tenant's namespace of
+    every cache the entity type cascades to (entities and lists alike). Other
+    tenants' entries, local tiers included, are left alone.
+    """
+    from .cache_namespace import bump_namespace_generation
+    from .cache_stats import cache_stats
+
+    cache_names = _get_cascading_cache_names(
+        entity_type, cascade_depth
+    ) + _get_cascading_cache_names(entity_type, cascade_depth, module_type="queries")
+    for cache_name in cache_names:
+        bump_namespace_generation(partition_key, cache_name)
+        cache_stats.record_purge(cache_name, partition_key)
+    logger.info(
+        f"Purged {len(cache_names)} {entity_type} cache namespaces of {partition_key}"
+    )
+    return cache_names
+
+
+def purge_tenant_cache(logger: logging.Logger, partition_key: str) -> int:
+    """
+    Invalidate every cached entry of one tenant, across all cache names, in O(1).
+    Entries are not deleted; they stop matching the tenant's namespace generation
+    and age out through their TTL or the local LRU.
+    """
+    from .cache_namespace import bump_namespace_generation
+    from .cache_stats import cache_stats
+
+    generation = bump_namespace_generation(partition_key)
+    cache_stats.record_purge("*", partition_key)
+    logger.info(f"Purged tenant cache namespace {partition_key} -> {generation}")
+    return generation
+
+
+def _get_cascading_cache_names(
+    entity_type: str, cascade_depth: int, module_type: str = "models"
+) -> List[str]:
+    """Collect cache names for an entity type and its cascading children."""
+    from ..handlers.config import Config
+
+    cache_names = [Config.get_cache_name(module_type, entity_type)]
+    if cascade_depth <= 0:
+        return cache_names
+
+    for child in Config.get_entity_children(entity_type):
+        for cache_name in _get_cascading_cache_names(
+            child["entity_type"], cascade_depth - 1, module_type=module_type
+        ):
+            if cache_name not in cache_names:
+                cache_names.append(cache_name)
+    return cache_names
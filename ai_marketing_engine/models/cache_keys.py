@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import inspect
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..handlers.config import Config
+
+# Single source of truth for entity cache keys. method_cache, the batch loaders
+# and purge_entity_cascading_cache all build keys through this module so an
+# entry written by one path is always the entry evicted by another.
+#
+# Key templates come from Config.CACHE_ENTITY_CONFIG["<entity>"]["cache_keys"]:
+# "context:<name>" values are taken from the request context (partition_key),
+# "key:<name>" values from the entity or mutation arguments. Their order is the
+# getter's positional argument order.
+
+CONTEXT_SOURCE = "context"
+
+
+def get_key_template(entity_type: str) -> List[str]:
+    return Config.get_cache_entity_config()[entity_type]["cache_keys"]
+
+
+def get_key_fields(entity_type: str) -> List[str]:
+    """Field names of an entity's cache key, in getter argument order."""
+    return [template.split(":", 1)[1] for template in get_key_template(entity_type)]
+
+
+def get_cache_prefix(entity_type: str) -> str:
+    """Prefix shared by the getter and loader entries ("<module>.<getter>")."""
+    entity_config = Config.get_cache_entity_config()[entity_type]
+    return ".".join([entity_config["module"], entity_config["getter"]])
+
+
+def normalize_key_value(value: Any) -> Any:
+    """
+    One form per key value: numeric range keys (activity timestamps) arrive as
+    int from DynamoDB but as Decimal/float from GraphQL; whole numbers are int.
+    """
+    if isinstance(value, (Decimal, float)) and value == int(value):
+        return int(value)
+    return value
+
+
+def build_key_data(values: Sequence[Any], kwargs: Optional[Dict] = None) -> str:
+    """Serialize key values the way method_cache always has: "<args>:<kwargs>"."""
+    return ":".join(
+        [
+            str(tuple(normalize_key_value(value) for value in values)),
+            str(
+                {
+                    key: normalize_key_value(value)
+                    for key, value in (kwargs or {}).items()
+                }
+            ),
+        ]
+    )
+
+
+def canonical_call_values(
+    signature: inspect.Signature, args: Tuple, kwargs: Dict[str, Any]
+) -> Tuple:
+    """
+    Positional view of a call, so get_place(pk, uuid) and
+    get_place(partition_key=pk, place_uuid=uuid) map to the same entry.
+    """
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return tuple(bound.arguments.values())
+
+
+def build_entity_key(cache: Any, entity_type: str, values: Sequence[Any]) -> str:
+    """Cache key of one entity as written by its getter and batch loader."""
+    return cache._generate_key(get_cache_prefix(entity_type), build_key_data(values))
+
+
+def resolve_key_values(
+    entity_type: str,
+    context_keys: Optional[Dict[str, Any]],
+    entity_keys: Optional[Dict[str, Any]],
+) -> Optional[Tuple]:
+    """Assemble an entity's key tuple from purge arguments; None if incomplete."""
+    context_keys = context_keys or {}
+    entity_keys = entity_keys or {}
+    values = []
+    for template in get_key_template(entity_type):
+        source, field = template.split(":", 1)
+        value = (context_keys if source == CONTEXT_SOURCE else entity_keys).get(field)
+        if value is None:
+            return None
+        values.append(value)
+    return tuple(values)
+
+
+def build_purge_keys(
+    entity_type: str, context: Dict[str, Any], kwargs: Dict[str, Any]
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Context and entity keys for purge_entity_cascading_cache, taken from the
+    mutated entity when present (updates/deletes) and the arguments otherwise.
+    """
+    entity = kwargs.get("entity")
+    context_keys: Dict[str, Any] = {}
+    entity_keys: Dict[str, Any] = {}
+    for template in get_key_template(entity_type):
+        source, field = template.split(":", 1)
+        if source == CONTEXT_SOURCE:
+            # An explicit argument (e.g. attribute bags written for another
+            # partition) wins over the request context.
+            context_keys[field] = kwargs.get(field) or context.get(field)
+            continue
+        value = getattr(entity, field, None) if entity is not None else None
+        entity_keys[field] = value if value is not None else kwargs.get(field)
+
+    # Lists are namespaced per tenant even for entities keyed without one.
+    context_keys.setdefault("partition_key", context.get("partition_key"))
+    return context_keys, entity_keys
+
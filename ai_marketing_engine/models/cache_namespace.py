@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from silvaengine_utility.cache import HybridCacheEngine
+
+from ..handlers.config import Config
+
+NAMESPACE_CACHE_NAME = "ai_marketing_engine.namespaces"
+
+# Marker key of the envelope that stamps cached values with their namespace.
+ENVELOPE_KEY = "__ame_ns__"
+
+# Generations live far longer than any entry they stamp.
+NAMESPACE_TTL = 7 * 24 * 3600
+
+_generations: Dict[str, Tuple[int, float]] = {}
+_generations_lock = threading.Lock()
+
+
+def _scope(partition_key: str, cache_name: Optional[str] = None) -> str:
+    if cache_name:
+        return f"{partition_key}|{cache_name}"
+    return partition_key
+
+
+def get_namespace_generation(
+    partition_key: str, cache_name: Optional[str] = None
+) -> int:
+    """
+    Current generation of a tenant namespace, or of one cache name inside it.
+    Generations are memoized in-process and re-read from the shared tier after
+    Config.CACHE_NAMESPACE_REFRESH_SECONDS so bumps reach every container.
+    """
+    scope = _scope(partition_key, cache_name)
+    now = time.monotonic()
+    memo = _generations.get(scope)
+    if memo is not None and memo[1] > now:
+        return memo[0]
+
+    generation = HybridCacheEngine(NAMESPACE_CACHE_NAME).get(scope) or 0
+    with _generations_lock:
+        _generations[scope] = (
+            generation,
+            now + Config.get_cache_namespace_refresh_seconds(),
+        )
+    return generation
+
+
+def bump_namespace_generation(
+    partition_key: str, cache_name: Optional[str] = None
+) -> int:
+    """
+    Invalidate every entry stamped with the current generation in O(1).
+    A fresh time-based token is written instead of incrementing so concurrent
+    bumps from different containers never need a read-modify-write.
+    """
+    scope = _scope(partition_key, cache_name)
+    generation = time.time_ns()
+    HybridCacheEngine(NAMESPACE_CACHE_NAME).set(scope, generation, ttl=NAMESPACE_TTL)
+    with _generations_lock:
+        _generations[scope] = (
+            generation,
+            time.monotonic() + Config.get_cache_namespace_refresh_seconds(),
+        )
+    return generation
+
+
+def current_stamp(partition_key: str, cache_name: str) -> Tuple[int, int]:
+    return (
+        get_namespace_generation(partition_key),
+        get_namespace_generation(partition_key, cache_name),
+    )
+
+
+def wrap_value(
+    value: Any, partition_key: str, cache_name: str, ttl: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Stamp a value with the tenant and cache-name generations it was cached under,
+    and with the wall-clock time its ttl runs out so copies never outlive it.
+    """
+    envelope = {
+        ENVELOPE_KEY: list(current_stamp(partition_key, cache_name)),
+        "value": value,
+    }
+    if ttl:
+        envelope["expires_at"] = time.time() + ttl
+    return envelope
+
+
+def remaining_ttl(envelope: Any) -> Optional[float]:
+    """Seconds left before a stamped entry expires (None when unknown)."""
+    if not isinstance(envelope, dict) or "expires_at" not in envelope:
+        return None
+    return envelope["expires_at"] - time.time()
+
+
+def unwrap_value(envelope: Any, partition_key: str, cache_name: str) -> Any:
+    """Return the wrapped value, or None when its namespace has been purged since."""
+    if not isinstance(envelope, dict) or ENVELOPE_KEY not in envelope:
+        # Entries written before namespacing can't be validated; treat as misses.
+        return None
+    if tuple(envelope[ENVELOPE_KEY]) != current_stamp(partition_key, cache_name):
+        return None
+    return envelope.get("value")
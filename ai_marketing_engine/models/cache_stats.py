@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from graphene import ResolveInfo
+
+from ..types.cache_stats import CacheStatsEntryType, CacheStatsType
+
+StatsKey = Tuple[str, str]
+
+# Partition label used when a cache entry is not tied to a tenant
+# (e.g. activity history keyed by id/timestamp).
+NO_PARTITION = "-"
+
+
+class CacheStatsRecorder:
+    """
+    Process-wide counters for cache hits, misses, fills and purges,
+    aggregated per cache name and partition_key.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[StatsKey, Dict[str, float]] = {}
+        self._started_at = time.time()
+        self._last_flush = time.monotonic()
+        self.logger: Optional[logging.Logger] = None
+        self.flush_interval = 0
+
+    def configure(self, logger: logging.Logger, flush_interval: int = 0) -> None:
+        """Set the logger and the periodic flush interval (0 disables flushing)."""
+        self.logger = logger
+        self.flush_interval = flush_interval
+
+    def record_hit(self, cache_name: str, partition_key: Optional[str]) -> None:
+        self._increment(cache_name, partition_key, "hits")
+
+    def record_miss(self, cache_name: str, partition_key: Optional[str]) -> None:
+        self._increment(cache_name, partition_key, "misses")
+
+    def record_fill(
+        self, cache_name: str, partition_key: Optional[str], latency_ms: float
+    ) -> None:
+        self._increment(cache_name, partition_key, "fills")
+        self._increment(cache_name, partition_key, "fill_latency_ms", latency_ms)
+
+    def record_purge(
+        self, cache_name: str, partition_key: Optional[str], count: int = 1
+    ) -> None:
+        self._increment(cache_name, partition_key, "purges", count)
+
+    def snapshot(
+        self,
+        cache_name: Optional[str] = None,
+        partition_key: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Return counters with derived hit rate and average fill latency."""
+        with self._lock:
+            items = [
+                (key, dict(counters)) for key, counters in self._counters.items()
+            ]
+
+        entries = []
+        for (name, partition), counters in sorted(items):
+            if cache_name and name != cache_name:
+                continue
+            if partition_key and partition != partition_key:
+                continue
+
+            hits = int(counters.get("hits", 0))
+            misses = int(counters.get("misses", 0))
+            fills = int(counters.get("fills", 0))
+            lookups = hits + misses
+            entries.append(
+                {
+                    "cache_name": name,
+                    "partition_key": partition,
+                    "hits": hits,
+                    "misses": misses,
+                    "fills": fills,
+                    "purges": int(counters.get("purges", 0)),
+                    "hit_rate": round(hits / lookups, 4) if lookups else None,
+                    "avg_fill_latency_ms": (
+                        round(counters.get("fill_latency_ms", 0) / fills, 2)
+                        if fills
+                        else None
+                    ),
+                }
+            )
+        return entries
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._started_at = time.time()
+
+    @property
+    def started_at(self) -> float:
+        return self._started_at
+
+    def flush(self) -> None:
+        """Write the current counters as one structured log line."""
+        self._last_flush = time.monotonic()
+        if self.logger is None:
+            return
+        self.logger.info(
+            json.dumps(
+                {
+                    "event": "ai_marketing_engine.cache_stats",
+                    "since": self._started_at,
+                    "stats": self.snapshot(),
+                },
+                default=str,
+            )
+        )
+
+    def _increment(
+        self,
+        cache_name: str,
+        partition_key: Optional[str],
+        counter: str,
+        amount: float = 1,
+    ) -> None:
+        key = (cache_name, partition_key or NO_PARTITION)
+        with self._lock:
+            counters = self._counters.setdefault(key, {})
+            counters[counter] = counters.get(counter, 0) + amount
+
+        if (
+            self.flush_interval
+            and time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+
+cache_stats = CacheStatsRecorder()
+
+
+def get_cache_stats(
+    cache_name: Optional[str] = None, partition_key: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Counters of this process, for every tenant when partition_key is None.
+    local_tiers describes the container-wide local tiers whatever the
+    partition_key, so this is for admin entry points (main.py) only.
+    """
+    from .local_cache import get_local_cache_stats
+
+    return {
+        "since": int(cache_stats.started_at),
+        "entries": cache_stats.snapshot(
+            cache_name=cache_name, partition_key=partition_key
+        ),
+        "local_tiers": [
+            stats
+            for stats in get_local_cache_stats()
+            if not cache_name or stats["cache_name"] == cache_name
+        ],
+    }
+
+
+def resolve_cache_stats(info: ResolveInfo, **kwargs: Dict[str, Any]) -> CacheStatsType:
+    # Always the caller's own tenant; there is no argument to widen it.
+    partition_key = info.context.get("partition_key")
+    if not partition_key:
+        raise ValueError("cacheStats requires a partition_key in the context.")
+
+    # Only the tenant's own counters; the container-wide local tiers stay on
+    # the admin cache_stats event.
+    return CacheStatsType(
+        since=int(cache_stats.started_at),
+        entries=[
+            CacheStatsEntryType(**entry)
+            for entry in cache_stats.snapshot(
+                cache_name=kwargs.get("cache_name"), partition_key=partition_key
+            )
+        ],
+    )
@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import itertools
+import logging
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import pendulum
+from graphene import ResolveInfo
+from pynamodb.attributes import (
+    ListAttribute,
+    MapAttribute,
+    UnicodeAttribute,
+    UTCDateTimeAttribute,
+)
+from silvaengine_dynamodb_base import BaseModel
+from silvaengine_utility.serializer import Serializer
+
+from ..handlers.config import Config
+from ..types.cascade_delete import CascadeDeleteJobType
+from .bulk import BATCH_WRITE_SIZE, _chunks, new_range_key
+from .cache import purge_entity_caches_in_bulk
+from .cache_keys import get_key_fields
+from .counters import _counter_deltas, _dimension_values, adjust_entity_counter
+from .fulltext import _scope, encode_doc_id, get_full_text_index
+from .list_cache import _key_value
+
+# Entity types a cascade delete can start from
+CASCADE_ROOTS = ("corporation_profile", "place", "contact_profile")
+
+# Job states; a job that is not completed is resumed by the next run
+PENDING, RUNNING, COMPLETED, FAILED = "pending", "running", "completed", "failed"
+
+
+class CascadeDeleteJobModel(BaseModel):
+    """
+    Progress of one cascade delete. The stack holds the entities whose children
+    are still being deleted ("<entity_type>#<uuid>", root first); a run works
+    on the top entry and persists the stack, so a stopped job resumes there.
+    """
+
+    class Meta(BaseModel.Meta):
+        table_name = "ame-cascade_delete_jobs"
+
+    partition_key = UnicodeAttribute(hash_key=True)
+    job_uuid = UnicodeAttribute(range_key=True)
+    entity_type = UnicodeAttribute()
+    entity_uuid = UnicodeAttribute()
+    status = UnicodeAttribute(default=PENDING)
+    stack = ListAttribute(of=UnicodeAttribute, default=list)
+    # Items deleted so far, per entity type
+    deleted = MapAttribute(default=dict)
+    error = UnicodeAttribute(null=True)
+    created_at = UTCDateTimeAttribute()
+    updated_at = UTCDateTimeAttribute()
+
+
+class _Budget(object):
+    """Run-time budget (seconds) and write capacity budget (WCU/s) of a run."""
+
+    def __init__(
+        self, time_budget: Optional[float], capacity_budget: Optional[float]
+    ) -> None:
+        self.deadline = time.monotonic() + time_budget if time_budget else None
+        self.capacity_budget = capacity_budget
+        self.started = time.monotonic()
+        self.spent = 0
+
+    def exhausted(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def spend(self, units: int) -> None:
+        # Deletes of items under 1 KB cost one write unit each.
+        self.spent += units
+        if self.capacity_budget:
+            ahead = self.spent / self.capacity_budget - (
+                time.monotonic() - self.started
+            )
+            if ahead > 0:
+                time.sleep(ahead)
+
+
+def _node(entity_type: str, uuid: str) -> str:
+    return f"{entity_type}#{uuid}"
+
+
+def _nested_children(
+    entity_type: str, partition_key: str, uuid: str
+) -> Iterator[str]:
+    """Child entities that have children of their own, deleted as stack nodes."""
+    from .contact_profile import ContactProfileModel
+    from .place import PlaceModel
+
+    if entity_type == "corporation_profile":
+        # Places carry no corporation_uuid index; filter the tenant's places.
+        for place in PlaceModel.query(
+            partition_key,
+            filter_condition=(PlaceModel.corporation_uuid == uuid),
+            attributes_to_get=["place_uuid"],
+        ):
+            yield _node("place", place.place_uuid)
+    elif entity_type == "place":
+        for contact_profile in ContactProfileModel.place_uuid_index.query(
+            partition_key, ContactProfileModel.place_uuid == uuid
+        ):
+            yield _node("contact_profile", contact_profile.contact_uuid)
+
+
+def _leaf_children(
+    entity_type: str, partition_key: str, uuid: str
+) -> List[Iterable[Any]]:
+    """Queries for the childless items of an entity, batch deleted in pages."""
+    from .attribute_value import AttributeValueModel
+    from .contact_request import ContactRequestModel
+
+    def attribute_values(data_type: str) -> Iterable[Any]:
+        return AttributeValueModel.data_identity_data_type_attribute_name_index.query(
+            uuid,
+            AttributeValueModel.data_type_attribute_name.startswith(f"{data_type}-"),
+            filter_condition=(AttributeValueModel.partition_key == partition_key),
+        )
+
+    if entity_type == "corporation_profile":
+        return [attribute_values("corporation")]
+    if entity_type == "place":
+        return [
+            ContactRequestModel.place_uuid_index.query(
+                partition_key, ContactRequestModel.place_uuid == uuid
+            )
+        ]
+    return [
+        ContactRequestModel.contact_uuid_index.query(
+            partition_key, ContactRequestModel.contact_uuid == uuid
+        ),
+        attribute_values("contact"),
+    ]
+
+
+def _entity_type_of(item: Any) -> str:
+    from .list_cache import get_model_class
+
+    for entity_type in ("contact_request", "attribute_value"):
+        if isinstance(item, get_model_class(entity_type)):
+            return entity_type
+    raise ValueError(f"Unexpected cascade child: {item!r}")
+
+
+def _after_leaf_delete(
+    logger: logging.Logger, entity_type: str, partition_key: str, items: List[Any]
+) -> None:
+    """Counters and full-text documents of batch-deleted items."""
+    try:
+        deltas: Dict[str, int] = {}
+        for item in items:
+            for counter_key, delta in _counter_deltas(
+                entity_type, _dimension_values(entity_type, item), None
+            ):
+                deltas[counter_key] = deltas.get(counter_key, 0) + delta
+        for counter_key, delta in deltas.items():
+            adjust_entity_counter(partition_key, counter_key, delta)
+
+        if entity_type == "contact_request":
+            index = get_full_text_index()
+            scope = _scope(entity_type, partition_key)
+            for item in items:
+                index.remove(
+                    scope,
+                    entity_type,
+                    encode_doc_id(
+                        [
+                            _key_value(getattr(item, field))
+                            for field in get_key_fields(entity_type)
+                        ]
+                    ),
+                )
+    except Exception:
+        logger.error(traceback.format_exc())
+
+
+def _batch_delete(items: List[Any]) -> None:
+    """Delete items of one model with chunked batch_write calls run in parallel."""
+    model_class = type(items[0])
+
+    def delete_chunk(chunk: List[Any]) -> None:
+        with model_class.batch_write() as batch:
+            for item in chunk:
+                batch.delete(item)
+
+    with ThreadPoolExecutor(
+        max_workers=Config.get_bulk_max_workers(), thread_name_prefix="ame-cascade"
+    ) as executor:
+        list(executor.map(delete_chunk, _chunks(items, BATCH_WRITE_SIZE)))
+
+
+def _delete_leaves(
+    logger: logging.Logger,
+    job: CascadeDeleteJobModel,
+    entity_type: str,
+    uuid: str,
+    budget: _Budget,
+) -> bool:
+    """Delete an entity's leaf children page by page; False if out of budget."""
+    page_size = BATCH_WRITE_SIZE * Config.get_bulk_max_workers()
+    for results in _leaf_children(entity_type, job.partition_key, uuid):
+        results = iter(results)
+        while True:
+            if budget.exhausted():
+                return False
+            page = list(itertools.islice(results, page_size))
+            if not page:
+                break
+
+            _batch_delete(page)
+            budget.spend(len(page))
+            child_type = _entity_type_of(page[0])
+            _after_leaf_delete(logger, child_type, job.partition_key, page)
+            _count(job, child_type, len(page))
+    return True
+
+
+def _delete_node(info: SimpleNamespace, entity_type: str, uuid: str) -> bool:
+    """Delete a nested entity through its delete function (guards, counters)."""
+    from .contact_profile import delete_contact_profile
+    from .place import delete_place
+
+    if entity_type == "place":
+        return delete_place(info, place_uuid=uuid)
+    return delete_contact_profile(info, contact_uuid=uuid)
+
+
+def _node_exists(partition_key: str, entity_type: str, uuid: str) -> bool:
+    """Uncached read of a nested entity, checked after a delete that did nothing."""
+    from .contact_profile import _get_contact_profile
+    from .place import _get_place
+
+    if entity_type == "place":
+        return _get_place(partition_key, uuid) is not None
+    return _get_contact_profile(partition_key, uuid) is not None
+
+
+def _count(job: CascadeDeleteJobModel, entity_type: str, count: int) -> None:
+    deleted = job.deleted.as_dict()
+    deleted[entity_type] = int(deleted.get(entity_type, 0)) + count
+    job.deleted = deleted
+
+
+def _save(job: CascadeDeleteJobModel, status: str, error: Optional[str] = None) -> None:
+    job.status = status
+    job.error = error
+    job.updated_at = pendulum.now("UTC")
+    job.save()
+
+
+def start_cascade_delete(
+    partition_key: str, entity_type: str, entity_uuid: str
+) -> CascadeDeleteJobModel:
+    """Record a job deleting everything below an entity (the entity itself is not)."""
+    if entity_type not in CASCADE_ROOTS:
+        raise ValueError(f"Cascade delete is not supported for {entity_type}.")
+
+    now = pendulum.now("UTC")
+    job = CascadeDeleteJobModel(
+        partition_key,
+        new_range_key(),
+        entity_type=entity_type,
+        entity_uuid=entity_uuid,
+        status=PENDING,
+        stack=[_node(entity_type, entity_uuid)],
+        deleted={},
+        created_at=now,
+        updated_at=now,
+    )
+    job.save()
+    return job
+
+
+def start_cascade_delete_job(
+    info: ResolveInfo, entity_type: str, entity_uuid: str
+) -> CascadeDeleteJobType:
+    job = start_cascade_delete(info.context["partition_key"], entity_type, entity_uuid)
+    info.context["logger"].info(
+        f"Cascade delete {job.job_uuid} of {entity_type} {entity_uuid} is pending."
+    )
+    return get_cascade_delete_job_type(info, job)
+
+
+def run_cascade_delete(
+    logger: logging.Logger,
+    context: Dict[str, Any],
+    job: CascadeDeleteJobModel,
+    time_budget: Optional[float] = None,
+    capacity_budget: Optional[float] = None,
+) -> CascadeDeleteJobModel:
+    """
+    Work a cascade delete job until it completes or its run-time budget is
+    spent. Children are found through the place_uuid, contact_uuid and
+    data_identity indexes; places and contacts are pushed on the job's stack
+    and emptied before they are deleted, while contact requests and attribute
+    values are deleted in pages of parallel batch_write calls held to the write
+    capacity budget. The stack is saved as nodes finish, so a rerun (of a
+    stopped or failed job) repeats at most one page of queries. A node leaves
+    the stack only once it is gone; one its delete function left in place
+    fails the job instead of being found and stacked again.
+    """
+    if job.status == COMPLETED:
+        return job
+
+    info = SimpleNamespace(context=dict(context, logger=logger))
+    budget = _Budget(
+        time_budget or Config.get_cascade_delete_time_budget(),
+        capacity_budget or Config.get_cascade_delete_capacity_budget(),
+    )
+    root = _node(job.entity_type, job.entity_uuid)
+    # Nodes deleted by this run; the indexes may list them for a while yet.
+    finished = set()
+    error = None
+    _save(job, RUNNING)
+
+    try:
+        while job.stack:
+            if budget.exhausted():
+                break
+
+            node = job.stack[-1]
+            entity_type, uuid = node.split("#", 1)
+            # Children left over from an earlier run are found again here.
+            nested = [
+                child
+                for child in itertools.islice(
+                    _nested_children(entity_type, job.partition_key, uuid),
+                    Config.get_cascade_delete_page_size(),
+                )
+                if child not in job.stack and child not in finished
+            ]
+            if nested:
+                job.stack = job.stack + nested
+                _save(job, RUNNING)
+                continue
+
+            if not _delete_leaves(logger, job, entity_type, uuid, budget):
+                break
+            if node != root:
+                if _delete_node(info, entity_type, uuid):
+                    budget.spend(1)
+                    _count(job, entity_type, 1)
+                elif _node_exists(job.partition_key, entity_type, uuid):
+                    error = f"{node} still exists after its delete."
+                    break
+            job.stack = job.stack[:-1]
+            finished.add(node)
+            _save(job, RUNNING)
+    except Exception as error:
+        logger.error(traceback.format_exc())
+        _save(job, FAILED, error=str(error))
+        raise
+    finally:
+        # One namespace purge per entity type deleted, instead of per item.
+        purged = set(job.deleted.as_dict())
+        if "attribute_value" in purged:
+            purged.add("attributes_data")
+        for entity_type in sorted(purged):
+            purge_entity_caches_in_bulk(logger, entity_type, job.partition_key)
+
+    if error:
+        logger.error(f"Cascade delete {job.job_uuid} failed: {error}")
+        _save(job, FAILED, error=error)
+    else:
+        _save(job, RUNNING if job.stack else COMPLETED)
+    logger.info(
+        f"Cascade delete {job.job_uuid} of {root}: {job.status}, "
+        f"deleted {job.deleted.as_dict()}"
+    )
+    return job
+
+
+def get_cascade_delete_job(
+    partition_key: str, job_uuid: str
+) -> CascadeDeleteJobModel | None:
+    try:
+        return CascadeDeleteJobModel.get(partition_key, job_uuid)
+    except CascadeDeleteJobModel.DoesNotExist:
+        return None
+
+
+def get_unfinished_cascade_delete_jobs(
+    partition_key: str,
+) -> List[CascadeDeleteJobModel]:
+    return list(
+        CascadeDeleteJobModel.query(
+            partition_key, filter_condition=(CascadeDeleteJobModel.status != COMPLETED)
+        )
+    )
+
+
+def get_cascade_delete_job_type(
+    info: ResolveInfo, job: CascadeDeleteJobModel
+) -> CascadeDeleteJobType:
+    values = dict(job.__dict__["attribute_values"])
+    values["pending"] = len(values.pop("stack", []))
+    values["deleted"] = job.deleted.as_dict()
+    return CascadeDeleteJobType(**Serializer.json_normalize(values))
+
+
+def resolve_cascade_delete_job(
+    info: ResolveInfo, **kwargs: Dict[str, Any]
+) -> CascadeDeleteJobType | None:
+    job = get_cascade_delete_job(info.context["partition_key"], kwargs["job_uuid"])
+    if job is None:
+        return None
+
+    return get_cascade_delete_job_type(info, job)
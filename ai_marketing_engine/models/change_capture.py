@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import datetime
+import decimal
+import functools
+import traceback
+from typing import Any, Callable, Dict, List, Optional
+
+import pendulum
+from graphene import ResolveInfo
+from pynamodb.attributes import MapAttribute
+
+from ..handlers.config import Config
+from .activity_history import (
+    ActivityHistoryModel,
+    activity_history_writer,
+    new_timestamp,
+)
+
+CREATED, UPDATED = "created", "updated"
+
+# Context key of the entity capture_changes is recording; its attribute bag
+# changes join the entity's row instead of getting one of their own
+CAPTURE_SCOPE = "change_capture_scope"
+
+
+def _plain(value: Any) -> Any:
+    """A value a raw MapAttribute (data_diff) can store."""
+    if isinstance(value, MapAttribute):
+        return _plain(value.as_dict())
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_plain(item) for item in value]
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def entity_values(entity: Any, fields: List[str]) -> Dict[str, Any]:
+    """Snapshot of an entity's fields, taken before the write changes it."""
+    return {field: _plain(getattr(entity, field, None)) for field in fields}
+
+
+def diff_values(
+    old_values: Dict[str, Any], new_values: Dict[str, Any]
+) -> Dict[str, Dict[str, Any]]:
+    """{field: {"old": ..., "new": ...}} for each field whose value changed."""
+    return {
+        field: {"old": old_values.get(field), "new": value}
+        for field, value in new_values.items()
+        if old_values.get(field) != value
+    }
+
+
+def record_changes(
+    info: ResolveInfo,
+    entity_type: str,
+    id: str,
+    updated_by: Optional[str],
+    data_diff: Dict[str, Dict[str, Any]],
+    log: str = UPDATED,
+) -> None:
+    """Queue an audit row of data_diff on activity_history_writer."""
+    if not data_diff or not Config.is_change_capture_enabled():
+        return
+
+    updated_at = pendulum.now("UTC")
+    activity_history_writer.add(
+        info.context.get("logger"),
+        ActivityHistoryModel(
+            id,
+            new_timestamp(updated_at),
+            log=log,
+            data_diff=_plain(data_diff),
+            type=entity_type,
+            updated_by=updated_by,
+            updated_at=updated_at,
+        ),
+        info.context.get("partition_key"),
+    )
+
+
+def record_data_changes(
+    info: ResolveInfo,
+    data_type: str,
+    data_identity: str,
+    updated_by: Optional[str],
+    data_diff: Dict[str, Dict[str, Any]],
+) -> None:
+    """
+    Record attribute bag changes: under "data" in the row of the entity being
+    captured when the bag belongs to it, as a "<data_type>_data" row otherwise.
+    """
+    if not data_diff:
+        return
+
+    scope = info.context.get(CAPTURE_SCOPE)
+    if scope is not None and scope["id"] == data_identity:
+        scope["data_diff"].setdefault("data", {}).update(data_diff)
+        return
+
+    record_changes(info, f"{data_type}_data", data_identity, updated_by, data_diff)
+
+
+def capture_changes(entity_type: str, fields: List[str], range_key: str) -> Callable:
+    """
+    Record an insert_update function's field changes in ActivityHistory. The
+    old values come from the entity insert_update_decorator loaded (or the
+    Upserted the write returned), the new ones from the arguments, so the
+    audit trail costs no extra read. Capture failures are logged, never raised.
+    """
+
+    def actual_decorator(original_function):
+        @functools.wraps(original_function)
+        def wrapper_function(info: ResolveInfo, **kwargs: Dict[str, Any]) -> Any:
+            entity = kwargs.get("entity")
+            # Model.update refreshes the entity in place, so snapshot it first.
+            old_values = entity_values(entity, fields) if entity is not None else None
+
+            outer_scope = info.context.get(CAPTURE_SCOPE)
+            scope = {"id": kwargs[range_key], "data_diff": {}}
+            info.context[CAPTURE_SCOPE] = scope
+            try:
+                result = original_function(info, **kwargs)
+            finally:
+                info.context[CAPTURE_SCOPE] = outer_scope
+
+            try:
+                from .upsert import Upserted
+
+                if isinstance(result, Upserted):
+                    old_values = (
+                        entity_values(result.old, fields)
+                        if result.old is not None
+                        else None
+                    )
+                    new_values = {
+                        field: value
+                        for field, value in entity_values(result.new, fields).items()
+                        if old_values is not None or value is not None
+                    }
+                else:
+                    new_values = {
+                        field: _plain(kwargs[field])
+                        for field in fields
+                        if field in kwargs
+                    }
+                    # "null" clears an attribute.
+                    new_values.update(
+                        {
+                            field: None
+                            for field, value in new_values.items()
+                            if value == "null"
+                        }
+                    )
+                data_diff = diff_values(old_values or {}, new_values)
+                data_diff.update(scope["data_diff"])
+                record_changes(
+                    info,
+                    entity_type,
+                    kwargs[range_key],
+                    kwargs.get("updated_by"),
+                    data_diff,
+                    log=CREATED if old_values is None else UPDATED,
+                )
+            except Exception:
+                info.context.get("logger").error(traceback.format_exc())
+
+            return result
+
+        return wrapper_function
+
+    return actual_decorator
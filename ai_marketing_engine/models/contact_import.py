@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import csv
+import itertools
+import json
+import logging
+import os
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+from ..handlers.config import Config
+from .bulk import bulk_insert_update, new_range_key
+from .contact_profile import (
+    CONTACT_PROFILE_FIELDS,
+    build_contact_profile_item,
+    find_contact_uuids_by_email,
+    insert_update_contact_data,
+)
+
+# Row columns stored on the profile; any other CSV column goes to its data bag.
+IMPORT_FIELDS = ["contact_uuid"] + CONTACT_PROFILE_FIELDS
+
+
+def _file_format(file_path: str, file_format: Optional[str]) -> str:
+    file_format = (file_format or os.path.splitext(file_path)[1].lstrip(".")).lower()
+    if file_format not in ("jsonl", "csv"):
+        raise ValueError(f"Unsupported import format: {file_format}")
+    return file_format
+
+
+def read_import_rows(
+    file_path: str, file_format: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream contact rows from a JSONL or CSV file, one dict per row. JSONL rows
+    carry their attribute bag under "data"; CSV columns other than the profile
+    fields become the bag. Blank values are dropped.
+    """
+    file_format = _file_format(file_path, file_format)
+    with open(file_path, newline="", encoding="utf-8") as source:
+        if file_format == "csv":
+            for record in csv.DictReader(source):
+                row = {
+                    key: value
+                    for key, value in record.items()
+                    if key in IMPORT_FIELDS and value not in (None, "")
+                }
+                data = {
+                    key: value
+                    for key, value in record.items()
+                    if key and key not in IMPORT_FIELDS and value not in (None, "")
+                }
+                if data:
+                    row["data"] = data
+                yield row
+            return
+
+        for line in source:
+            if line.strip():
+                yield {
+                    key: value
+                    for key, value in json.loads(line).items()
+                    if value not in (None, "")
+                }
+
+
+class ImportCheckpoint(object):
+    """
+    Progress of one import, saved next to the source file after every chunk so
+    a crashed import resumes at the first row not yet written. A checkpoint
+    written for a different version of the file is ignored.
+    """
+
+    def __init__(self, path: str, file_path: str) -> None:
+        stat = os.stat(file_path)
+        self.path = path
+        self.source = {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+
+    def load(self, logger: logging.Logger) -> "ImportCheckpoint":
+        if not os.path.exists(self.path):
+            return self
+        with open(self.path, encoding="utf-8") as checkpoint:
+            saved = json.load(checkpoint)
+        if saved.get("source") != self.source:
+            logger.warning(f"Ignoring checkpoint {self.path} of a different file.")
+            return self
+
+        self.rows, self.created, self.updated, self.failed = (
+            saved["rows"],
+            saved["created"],
+            saved["updated"],
+            saved["failed"],
+        )
+        logger.info(f"Resuming import after row {self.rows}.")
+        return self
+
+    def save(self) -> None:
+        # Write then rename, so a crash never leaves a half-written checkpoint.
+        with open(f"{self.path}.tmp", "w", encoding="utf-8") as checkpoint:
+            json.dump(dict(self.summary(), source=self.source), checkpoint)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "failed": self.failed,
+        }
+
+
+def _import_chunk(
+    info: SimpleNamespace,
+    rows: List[Dict[str, Any]],
+    first_row: int,
+    emails: Dict[str, str],
+    updated_by: str,
+    place_uuid: Optional[str],
+) -> List[Dict[str, Any]]:
+    logger = info.context["logger"]
+    partition_key = info.context["partition_key"]
+
+    # Emails not seen earlier in this run are looked up together.
+    unseen = [
+        row["email"] for row in rows if row.get("email") and row["email"] not in emails
+    ]
+    for email, contact_uuid in find_contact_uuids_by_email(
+        partition_key, unseen
+    ).items():
+        if contact_uuid is not None:
+            emails[email] = contact_uuid
+
+    # Rows for one contact are merged (later rows win), so each is written once.
+    items: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        email = row.get("email")
+        contact_uuid = emails.get(email) or row.get("contact_uuid")
+        created = contact_uuid is None
+        if created:
+            contact_uuid = new_range_key()
+        if email:
+            emails[email] = contact_uuid
+
+        item = items.setdefault(contact_uuid, {"updated_by": updated_by})
+        item.update({key: value for key, value in row.items() if key != "data"})
+        item["contact_uuid"] = contact_uuid
+        if row.get("data"):
+            item.setdefault("data", {}).update(row["data"])
+        if created and place_uuid:
+            item.setdefault("place_uuid", place_uuid)
+
+    results = bulk_insert_update(
+        info,
+        "contact_profile",
+        list(items.values()),
+        build_contact_profile_item,
+        after_write=insert_update_contact_data,
+    )
+    for result in results:
+        if not result["ok"]:
+            logger.error(
+                f"Import rows from {first_row}: contact {result['key']} failed: "
+                f"{result['error']}"
+            )
+    return results
+
+
+def import_contact_profiles(
+    logger: logging.Logger,
+    context: Dict[str, Any],
+    file_path: str,
+    updated_by: str,
+    file_format: Optional[str] = None,
+    place_uuid: Optional[str] = None,
+    checkpoint_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Import contact profiles from a local JSONL or CSV file into one tenant.
+    Rows are streamed in chunks of Config.IMPORT_CHUNK_SIZE; each chunk
+    resolves its new emails against the email guards (emails seen earlier in
+    the run come from memory), then upserts the profiles and their attribute
+    bags through the bulk writer, which rejects rows whose place_uuid does not
+    exist. Rows matching an existing email update that contact; place_uuid is
+    the default for new contacts without one.
+    """
+    started = time.perf_counter()
+    info = SimpleNamespace(context=dict(context, logger=logger))
+    checkpoint = ImportCheckpoint(
+        checkpoint_path or f"{file_path}.checkpoint", file_path
+    ).load(logger)
+
+    emails: Dict[str, str] = {}
+    chunk_size = Config.get_import_chunk_size()
+    rows: List[Dict[str, Any]] = []
+
+    def flush() -> None:
+        results = _import_chunk(
+            info, rows, checkpoint.rows, emails, updated_by, place_uuid
+        )
+        checkpoint.created += sum(
+            1 for result in results if result["ok"] and result["created"]
+        )
+        checkpoint.updated += sum(
+            1 for result in results if result["ok"] and not result["created"]
+        )
+        checkpoint.failed += sum(1 for result in results if not result["ok"])
+        checkpoint.rows += len(rows)
+        checkpoint.save()
+        rows.clear()
+
+    for row in itertools.islice(
+        read_import_rows(file_path, file_format), checkpoint.rows, None
+    ):
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            flush()
+    if rows:
+        flush()
+
+    checkpoint.clear()
+    summary = checkpoint.summary()
+    logger.info(
+        f"Imported {summary['rows']} contact row(s) from {file_path} in "
+        f"{time.perf_counter() - started:.1f}s: {summary}"
+    )
+    return summary
@@ -7,25 +7,53 @@ __author__ = "bibow"
 import functools
 import logging
 import traceback
-from typing import Any, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 
 import pendulum
 from graphene import ResolveInfo
 from pynamodb.attributes import UnicodeAttribute, UTCDateTimeAttribute
-from pynamodb.indexes import AllProjection, LocalSecondaryIndex
+from pynamodb.indexes import AllProjection, GlobalSecondaryIndex, LocalSecondaryIndex
 from silvaengine_dynamodb_base import (
     BaseModel,
     delete_decorator,
     insert_update_decorator,
     monitor_decorator,
-    resolve_list_decorator,
 )
-from silvaengine_utility import method_cache
 from silvaengine_utility.serializer import Serializer
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from ..handlers.config import Config
 from ..types.contact_profile import ContactProfileListType, ContactProfileType
+from .attribute_value import AttributeBagChanges
+from .bulk import BulkItem, bulk_insert_update, merge_item
+from .change_capture import capture_changes
+from .counters import maintain_entity_counters
+from .foreign_keys import validate_foreign_keys
+from .local_cache import method_cache
+from .pagination import paginated_list_decorator
+from .query_planner import (
+    BEGINS_WITH,
+    EQ,
+    RANGE,
+    IndexSpec,
+    QueryPlanner,
+    updated_window,
+)
+from .search import (
+    build_search_name,
+    normalize_search_key,
+    search_name_action,
+    search_name_changed,
+)
+from .unique_guards import (
+    get_unique_owners,
+    guard_changes,
+    release_unique,
+    reserve_unique,
+    unique_guarded,
+)
+from .unit_of_work import UnitOfWork
 from .utils import insert_update_attribute_values
 
 
@@ -57,6 +85,30 @@ class PlaceUuidIndex(LocalSecondaryIndex):
     place_uuid = UnicodeAttribute(range_key=True)
 
 
+class SearchNameIndex(GlobalSecondaryIndex):
+    class Meta:
+        # index_name is optional, but can be provided to override the default name
+        index_name = "search_name-index"
+        billing_mode = "PAY_PER_REQUEST"
+        projection = AllProjection()
+
+    # Normalized name (see models/search.py) for begins_with key conditions
+    partition_key = UnicodeAttribute(hash_key=True)
+    search_name = UnicodeAttribute(range_key=True)
+
+
+class UpdatedAtIndex(GlobalSecondaryIndex):
+    class Meta:
+        # index_name is optional, but can be provided to override the default name
+        index_name = "updated_at-index"
+        billing_mode = "PAY_PER_REQUEST"
+        projection = AllProjection()
+
+    # Time-ordered per tenant, for incremental sync (updated_since/updated_before)
+    partition_key = UnicodeAttribute(hash_key=True)
+    updated_at = UTCDateTimeAttribute(range_key=True)
+
+
 class ContactProfileModel(BaseModel):
     class Meta(BaseModel.Meta):
         table_name = "ame-contact_profiles"
@@ -72,39 +124,73 @@ class ContactProfileModel(BaseModel):
     updated_by = UnicodeAttribute()
     created_at = UTCDateTimeAttribute()
     updated_at = UTCDateTimeAttribute()
+    search_name = UnicodeAttribute(null=True)
     email_index = EmailIndex()
     place_uuid_index = PlaceUuidIndex()
+    search_name_index = SearchNameIndex()
+    updated_at_index = UpdatedAtIndex()
+
+
+# Access paths the list resolver can key on
+CONTACT_PROFILE_QUERY_PLANNER = QueryPlanner(
+    "contact_profile",
+    ContactProfileModel,
+    [
+        IndexSpec(),
+        IndexSpec(ContactProfileModel.place_uuid_index, "place_uuid"),
+        IndexSpec(ContactProfileModel.email_index, "email"),
+        IndexSpec(
+            ContactProfileModel.search_name_index,
+            "search_name",
+            operators=(BEGINS_WITH,),
+        ),
+        IndexSpec(
+            ContactProfileModel.updated_at_index, "updated_at", operators=(RANGE,)
+        ),
+    ],
+)
+
+# Attributes the list resolver filters or indexes on
+CONTACT_PROFILE_LIST_FIELDS = ["place_uuid", "email", "first_name", "last_name"]
+
+# Attributes a contact profile mutation sets
+CONTACT_PROFILE_FIELDS = ["email", "place_uuid", "first_name", "last_name"]
 
 
-def purge_cache():
+def purge_cache(list_fields: Optional[List[str]] = None):
+    """
+    Purge the entity's caches after a successful write. list_fields names the
+    attributes list resolvers filter on; updates leaving them untouched keep
+    the cached key lists.
+    """
+
     def actual_decorator(original_function):
         @functools.wraps(original_function)
         def wrapper_function(*args, **kwargs):
             try:
+                from ..models.list_cache import membership_changed
+
+                invalidate_lists = membership_changed(kwargs, list_fields)
+
                 # Execute original function first
                 result = original_function(*args, **kwargs)
 
                 # Then purge cache after successful operation
                 from ..models.cache import purge_entity_cascading_cache
+                from ..models.cache_keys import build_purge_keys
 
-                # Get entity keys from entity parameter (for updates)
-                entity_keys = {}
-                entity = kwargs.get("entity")
-                if entity:
-                    entity_keys["contact_uuid"] = getattr(entity, "contact_uuid", None)
-
-                # Fallback to kwargs (for creates/deletes)
-                if not entity_keys.get("contact_uuid"):
-                    entity_keys["contact_uuid"] = kwargs.get("contact_uuid")
-
-                partition_key = args[0].context.get("partition_key")
+                # Same key registry the getter and batch loader write through
+                context_keys, entity_keys = build_purge_keys(
+                    "contact_profile", args[0].context, kwargs
+                )
 
                 purge_entity_cascading_cache(
                     args[0].context.get("logger"),
                     entity_type="contact_profile",
-                    context_keys={"partition_key": partition_key},
-                    entity_keys=entity_keys if entity_keys else None,
+                    context_keys=context_keys,
+                    entity_keys=entity_keys,
                     cascade_depth=3,
+                    invalidate_lists=invalidate_lists,
                 )
 
                 return result
@@ -127,9 +213,12 @@ def purge_cache():
     ttl=Config.get_cache_ttl(),
     cache_name=Config.get_cache_name("models", "contact_profile"),
     cache_enabled=Config.is_cache_enabled,
+    cache_none=True,
 )
-def get_contact_profile(partition_key: str, contact_uuid: str) -> ContactProfileModel:
-    return ContactProfileModel.get(partition_key, contact_uuid)
+def get_contact_profile(
+    partition_key: str, contact_uuid: str
+) -> ContactProfileModel | None:
+    return _get_contact_profile(partition_key, contact_uuid)
 
 
 @retry(
@@ -137,14 +226,18 @@ def get_contact_profile(partition_key: str, contact_uuid: str) -> ContactProfile
     wait=wait_exponential(multiplier=1, max=60),
     stop=stop_after_attempt(5),
 )
-def _get_contact_profile(partition_key: str, contact_uuid: str) -> ContactProfileModel:
-    return ContactProfileModel.get(partition_key, contact_uuid)
+def _get_contact_profile(
+    partition_key: str, contact_uuid: str
+) -> ContactProfileModel | None:
+    try:
+        return ContactProfileModel.get(partition_key, contact_uuid)
+    except ContactProfileModel.DoesNotExist:
+        return None
 
 
 def get_contact_profile_count(partition_key: str, contact_uuid: str) -> int:
-    return ContactProfileModel.count(
-        partition_key, ContactProfileModel.contact_uuid == contact_uuid
-    )
+    """Existence check of the write decorators, read uncached (never stale)."""
+    return 0 if _get_contact_profile(partition_key, contact_uuid) is None else 1
 
 
 def get_contact_profile_type(
@@ -175,18 +268,15 @@ def resolve_contact_profile(
         if existing_profiles:
             return get_contact_profile_type(info, existing_profiles[0])
 
-    count = get_contact_profile_count(partition_key, kwargs.get("contact_uuid"))
-    if count == 0:
+    contact_profile = get_contact_profile(partition_key, kwargs.get("contact_uuid"))
+    if contact_profile is None:
         return None
 
-    return get_contact_profile_type(
-        info,
-        get_contact_profile(partition_key, kwargs.get("contact_uuid")),
-    )
+    return get_contact_profile_type(info, contact_profile)
 
 
 @monitor_decorator
-@resolve_list_decorator(
+@paginated_list_decorator(
     attributes_to_get=["partition_key", "contact_uuid", "email", "place_uuid"],
     list_type_class=ContactProfileListType,
     type_funct=get_contact_profile_type,
@@ -197,38 +287,124 @@ def resolve_contact_profile_list(info: ResolveInfo, **kwargs: Dict[str, Any]) ->
     first_name = kwargs.get("first_name")
     last_name = kwargs.get("last_name")
     partition_key = info.context.get("partition_key")
+    search = normalize_search_key(kwargs.get("search"))
 
-    args = []
-    inquiry_funct = ContactProfileModel.scan
-    count_funct = ContactProfileModel.count
-
-    if partition_key:
-        args = [partition_key, None]
-        inquiry_funct = ContactProfileModel.query
-
-        if place_uuid:
-            # Use place_uuid_index to query by place_uuid
-            inquiry_funct = ContactProfileModel.place_uuid_index.query
-            args[1] = ContactProfileModel.place_uuid == place_uuid
-            count_funct = ContactProfileModel.place_uuid_index.count
-        if email:
-            # Use email_index to query by email
-            inquiry_funct = ContactProfileModel.email_index.query
-            args[1] = ContactProfileModel.email == email
-            count_funct = ContactProfileModel.email_index.count
-
-    the_filters = None  # We can add filters for the query.
+    the_filters = []  # Conditions no index can serve.
     if first_name:
-        the_filters &= ContactProfileModel.first_name.contains(first_name)
+        the_filters.append(ContactProfileModel.first_name.contains(first_name))
     if last_name:
-        the_filters &= ContactProfileModel.last_name.contains(last_name)
-    if place_uuid and email:
-        # If both place_uuid and email are specified, add place_uuid as a filter
-        the_filters &= ContactProfileModel.place_uuid == place_uuid
-    if the_filters is not None:
-        args.append(the_filters)
+        the_filters.append(ContactProfileModel.last_name.contains(last_name))
+
+    # The planner keys on whichever of place_uuid, email and the name prefix
+    # is most selective for the tenant and filters on the others.
+    plan = CONTACT_PROFILE_QUERY_PLANNER.plan(
+        partition_key,
+        {
+            "place_uuid": (EQ, place_uuid),
+            "email": (EQ, email),
+            "search_name": (BEGINS_WITH, search),
+            "updated_at": (RANGE, updated_window(kwargs)),
+        },
+        the_filters,
+        # Sync reads (updated_since/updated_before) stream in time order.
+        order_by="updated_at",
+    )
+    return plan.inquiry_funct, plan.count_funct, plan.args
+
+
+def _new_contact_profile_cols(
+    info: ResolveInfo, kwargs: Dict[str, Any]
+) -> Dict[str, Any]:
+    cols = {
+        "email": kwargs["email"],
+        "place_uuid": kwargs["place_uuid"],
+        "endpoint_id": info.context.get("endpoint_id"),
+        "part_id": kwargs.get("part_id", info.context.get("part_id")),
+        "updated_by": kwargs["updated_by"],
+        "created_at": pendulum.now("UTC"),
+        "updated_at": pendulum.now("UTC"),
+    }
+    for key in [
+        "first_name",
+        "last_name",
+    ]:
+        if key in kwargs:
+            cols[key] = kwargs[key]
+    search_name = build_search_name("contact_profile", kwargs)
+    if search_name is not None:
+        cols["search_name"] = search_name
+    return cols
+
+
+def build_contact_profile_item(
+    info: ResolveInfo,
+    kwargs: Dict[str, Any],
+    entity: Optional[ContactProfileModel] = None,
+) -> ContactProfileModel:
+    """The full item insertUpdateContactProfiles puts (entity None to create)."""
+    if entity is None:
+        return ContactProfileModel(
+            kwargs["partition_key"],
+            kwargs["contact_uuid"],
+            **_new_contact_profile_cols(info, kwargs),
+        )
+
+    return merge_item(
+        ContactProfileModel,
+        entity,
+        kwargs,
+        CONTACT_PROFILE_FIELDS,
+        cols={"search_name": build_search_name("contact_profile", kwargs, entity)},
+    )
+
+
+def _transaction() -> UnitOfWork:
+    return UnitOfWork(ContactProfileModel)
+
+
+def find_contact_uuids_by_email(
+    partition_key: str, emails: List[str]
+) -> Dict[str, Optional[str]]:
+    """Owner contact_uuid of each email in the tenant (None if free)."""
+    return get_unique_owners(partition_key, "email", emails)
 
-    return inquiry_funct, count_funct, args
+
+def insert_update_contact_data(info: ResolveInfo, bulk_items: List[BulkItem]) -> None:
+    """Attribute bags of written profiles, several profiles at a time."""
+    logger = info.context["logger"]
+
+    def insert_update(bulk_item: BulkItem) -> None:
+        try:
+            insert_update_attribute_values(
+                info,
+                "contact",
+                bulk_item.kwargs["contact_uuid"],
+                bulk_item.kwargs["updated_by"],
+                bulk_item.kwargs["data"],
+            )
+        except Exception:
+            logger.error(traceback.format_exc())
+            bulk_item.error = "Contact profile saved, its data failed."
+
+    with ThreadPoolExecutor(max_workers=Config.get_bulk_max_workers()) as executor:
+        list(
+            executor.map(
+                insert_update,
+                [bulk_item for bulk_item in bulk_items if bulk_item.kwargs.get("data")],
+            )
+        )
+
+
+def insert_update_contact_profiles(
+    info: ResolveInfo, items: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    return bulk_insert_update(
+        info,
+        "contact_profile",
+        items,
+        build_contact_profile_item,
+        after_write=insert_update_contact_data,
+    )
 
 
 @insert_update_decorator(
@@ -240,49 +416,35 @@ def resolve_contact_profile_list(info: ResolveInfo, **kwargs: Dict[str, Any]) ->
     count_funct=get_contact_profile_count,
     type_funct=get_contact_profile_type,
 )
-@purge_cache()
+@purge_cache(list_fields=CONTACT_PROFILE_LIST_FIELDS)
+@maintain_entity_counters("contact_profile")
+@validate_foreign_keys("contact_profile")
+@capture_changes("contact_profile", CONTACT_PROFILE_FIELDS, "contact_uuid")
 def insert_update_contact_profile(info: ResolveInfo, **kwargs: Dict[str, Any]) -> None:
     partition_key = kwargs.get("partition_key")
     contact_uuid = kwargs.get("contact_uuid")
     if kwargs.get("entity") is None:
-        # Check if email already exists
-        email = kwargs["email"]
-        existing_profiles = list(
-            ContactProfileModel.email_index.query(
-                partition_key, ContactProfileModel.email == email, limit=1
-            )
-        )
-        if existing_profiles:
-            raise ValueError(
-                f"Contact profile with email '{email}' already exists for contact_uuid: "
-                f"{existing_profiles[0].contact_uuid}"
-            )
-
-        cols = {
-            "email": email,
-            "place_uuid": kwargs["place_uuid"],
-            "endpoint_id": info.context.get("endpoint_id"),
-            "part_id": kwargs.get("part_id", info.context.get("part_id")),
-            "updated_by": kwargs["updated_by"],
-            "created_at": pendulum.now("UTC"),
-            "updated_at": pendulum.now("UTC"),
-        }
-        for key in [
-            "first_name",
-            "last_name",
-        ]:
-            if key in kwargs:
-                cols[key] = kwargs[key]
-        ContactProfileModel(
+        contact_profile = ContactProfileModel(
             partition_key,
             contact_uuid,
-            **cols,
-        ).save()
-
-        data = insert_update_attribute_values(
-            info, "contact", contact_uuid, kwargs["updated_by"], kwargs.get("data", {})
+            **_new_contact_profile_cols(info, kwargs),
+        )
+        attributes = AttributeBagChanges(
+            info, "contact", contact_uuid, kwargs["updated_by"], kwargs.get("data")
+        )
+        # The profile, its email guard and its attribute values land together;
+        # a taken email rejects the whole write.
+        email = kwargs["email"]
+        with unique_guarded(
+            "contact_profile", _transaction, partition_key, contact_uuid, email
+        ) as transaction:
+            transaction.save(contact_profile)
+            reserve_unique(transaction, partition_key, "email", email, contact_uuid)
+            attributes.add_to(transaction)
+        attributes.committed(info)
+        info.context["logger"].info(
+            f"Contact profile data: {attributes.data} has been updated."
         )
-        info.context["logger"].info(f"Contact profile data: {data} has been updated.")
 
         return
 
@@ -305,13 +467,39 @@ def insert_update_contact_profile(info: ResolveInfo, **kwargs: Dict[str, Any]) -
         if key in kwargs:  # Check if the key exists in kwargs
             actions.append(field.set(None if kwargs[key] == "null" else kwargs[key]))
 
-    # Update the contact profile
-    contact_profile.update(actions=actions)
+    if search_name_changed("contact_profile", kwargs):
+        actions.append(
+            search_name_action(
+                ContactProfileModel, "contact_profile", contact_profile, kwargs
+            )
+        )
 
-    data = insert_update_attribute_values(
-        info, "contact", contact_uuid, kwargs["updated_by"], kwargs.get("data", {})
+    attributes = AttributeBagChanges(
+        info, "contact", contact_uuid, kwargs["updated_by"], kwargs.get("data")
+    )
+    reserve, release = guard_changes(
+        contact_profile.email, kwargs.get("email", contact_profile.email)
+    )
+    if reserve is not None or release is not None or attributes:
+        with unique_guarded(
+            "contact_profile", _transaction, partition_key, contact_uuid, reserve
+        ) as transaction:
+            transaction.update(contact_profile, actions=actions)
+            if reserve is not None:
+                reserve_unique(
+                    transaction, partition_key, "email", reserve, contact_uuid
+                )
+            if release is not None:
+                release_unique(
+                    transaction, partition_key, "email", release, contact_uuid
+                )
+            attributes.add_to(transaction)
+    else:
+        contact_profile.update(actions=actions)
+    attributes.committed(info)
+    info.context["logger"].info(
+        f"Contact profile data: {attributes.data} has been updated."
     )
-    info.context["logger"].info(f"Contact profile data: {data} has been updated.")
 
     return
 
@@ -321,9 +509,26 @@ def insert_update_contact_profile(info: ResolveInfo, **kwargs: Dict[str, Any]) -
         "hash_key": "partition_key",
         "range_key": "contact_uuid",
     },
-    model_funct=get_contact_profile,
+    model_funct=_get_contact_profile,
 )
 @purge_cache()
+@maintain_entity_counters("contact_profile", deleting=True)
 def delete_contact_profile(info: ResolveInfo, **kwargs: Dict[str, Any]) -> bool:
-    kwargs.get("entity").delete()
+    if kwargs.get("entity") is None:
+        return False
+
+    contact_profile = kwargs.get("entity")
+    if not contact_profile.email:
+        contact_profile.delete()
+        return True
+
+    with _transaction() as transaction:
+        transaction.delete(contact_profile)
+        release_unique(
+            transaction,
+            contact_profile.partition_key,
+            "email",
+            contact_profile.email,
+            contact_profile.contact_uuid,
+        )
     return True
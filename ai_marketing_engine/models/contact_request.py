@@ -7,26 +7,41 @@ __author__ = "bibow"
 import functools
 import logging
 import traceback
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 import pendulum
 from graphene import ResolveInfo
 from pynamodb.attributes import UnicodeAttribute, UTCDateTimeAttribute
-from pynamodb.indexes import AllProjection, LocalSecondaryIndex
+from pynamodb.indexes import AllProjection, GlobalSecondaryIndex, LocalSecondaryIndex
 from silvaengine_dynamodb_base import (
     BaseModel,
     delete_decorator,
     insert_update_decorator,
     monitor_decorator,
-    resolve_list_decorator,
 )
-from silvaengine_utility import method_cache
 from silvaengine_utility.serializer import Serializer
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from ..handlers.config import Config
 from ..types.contact_request import ContactRequestListType, ContactRequestType
-from .contact_profile import get_contact_profile_count
+from .change_capture import capture_changes
+from .counters import maintain_entity_counters
+from .foreign_keys import validate_foreign_keys
+from .fulltext import (
+    FullTextSearch,
+    is_full_text_index_complete,
+    maintain_full_text_index,
+)
+from .local_cache import method_cache
+from .pagination import paginated_list_decorator
+from .query_planner import (
+    EQ,
+    RANGE,
+    IndexSpec,
+    QueryPlanner,
+    in_range,
+    updated_window,
+)
 
 
 class PlaceUuidIndex(LocalSecondaryIndex):
@@ -57,6 +72,18 @@ class ContactUuidIndex(LocalSecondaryIndex):
     contact_uuid = UnicodeAttribute(range_key=True)
 
 
+class UpdatedAtIndex(GlobalSecondaryIndex):
+    class Meta:
+        # index_name is optional, but can be provided to override the default name
+        index_name = "updated_at-index"
+        billing_mode = "PAY_PER_REQUEST"
+        projection = AllProjection()
+
+    # Time-ordered per tenant, for incremental sync (updated_since/updated_before)
+    partition_key = UnicodeAttribute(hash_key=True)
+    updated_at = UTCDateTimeAttribute(range_key=True)
+
+
 class ContactRequestModel(BaseModel):
     class Meta(BaseModel.Meta):
         table_name = "ame-contact_requests"
@@ -73,38 +100,75 @@ class ContactRequestModel(BaseModel):
     created_at = UTCDateTimeAttribute()
     updated_at = UTCDateTimeAttribute()
     place_uuid_index = PlaceUuidIndex()
+    updated_at_index = UpdatedAtIndex()
     contact_uuid_index = ContactUuidIndex()
 
 
-def purge_cache():
+# Access paths the list resolver can key on
+CONTACT_REQUEST_QUERY_PLANNER = QueryPlanner(
+    "contact_request",
+    ContactRequestModel,
+    [
+        IndexSpec(),
+        IndexSpec(ContactRequestModel.place_uuid_index, "place_uuid"),
+        IndexSpec(ContactRequestModel.contact_uuid_index, "contact_uuid"),
+        IndexSpec(
+            ContactRequestModel.updated_at_index, "updated_at", operators=(RANGE,)
+        ),
+    ],
+)
+
+# Attributes a contact request mutation sets
+CONTACT_REQUEST_FIELDS = [
+    "contact_uuid",
+    "place_uuid",
+    "request_title",
+    "request_detail",
+]
+
+# Attributes the list resolver filters or indexes on
+CONTACT_REQUEST_LIST_FIELDS = [
+    "contact_uuid",
+    "place_uuid",
+    "request_title",
+    "request_detail",
+]
+
+
+def purge_cache(list_fields: Optional[List[str]] = None):
+    """
+    Purge the entity's caches after a successful write. list_fields names the
+    attributes list resolvers filter on; updates leaving them untouched keep
+    the cached key lists.
+    """
+
     def actual_decorator(original_function):
         @functools.wraps(original_function)
         def wrapper_function(*args, **kwargs):
             try:
+                from ..models.list_cache import membership_changed
+
+                invalidate_lists = membership_changed(kwargs, list_fields)
+
                 # Execute original function first
                 result = original_function(*args, **kwargs)
 
                 # Then purge cache after successful operation
                 from ..models.cache import purge_entity_cascading_cache
+                from ..models.cache_keys import build_purge_keys
 
-                # Get entity keys from entity parameter (for updates)
-                entity_keys = {}
-                entity = kwargs.get("entity")
-                if entity:
-                    entity_keys["request_uuid"] = getattr(entity, "request_uuid", None)
-
-                # Fallback to kwargs (for creates/deletes)
-                if not entity_keys.get("request_uuid"):
-                    entity_keys["request_uuid"] = kwargs.get("request_uuid")
-
-                partition_key = args[0].context.get("partition_key")
+                # Same key registry the getter and batch loader write through
+                context_keys, entity_keys = build_purge_keys(
+                    "contact_request", args[0].context, kwargs
+                )
 
                 purge_entity_cascading_cache(
                     args[0].context.get("logger"),
                     entity_type="contact_request",
-                    context_keys={"partition_key": partition_key},
-                    entity_keys=entity_keys if entity_keys else None,
+                    context_keys=context_keys,
+                    entity_keys=entity_keys,
                     cascade_depth=3,
+                    invalidate_lists=invalidate_lists,
                 )
 
                 return result
@@ -127,9 +191,12 @@ def purge_cache():
     ttl=Config.get_cache_ttl(),
     cache_name=Config.get_cache_name("models", "contact_request"),
     cache_enabled=Config.is_cache_enabled,
+    cache_none=True,
 )
-def get_contact_request(partition_key: str, request_uuid: str) -> ContactRequestModel:
-    return ContactRequestModel.get(partition_key, request_uuid)
+def get_contact_request(
+    partition_key: str, request_uuid: str
+) -> ContactRequestModel | None:
+    return _get_contact_request(partition_key, request_uuid)
 
 
 @retry(
@@ -137,14 +204,18 @@ def get_contact_request(partition_key: str, request_uuid: str) -> ContactRequest
     wait=wait_exponential(multiplier=1, max=60),
     stop=stop_after_attempt(5),
 )
-def _get_contact_request(partition_key: str, request_uuid: str) -> ContactRequestModel:
-    return ContactRequestModel.get(partition_key, request_uuid)
+def _get_contact_request(
+    partition_key: str, request_uuid: str
+) -> ContactRequestModel | None:
+    try:
+        return ContactRequestModel.get(partition_key, request_uuid)
+    except ContactRequestModel.DoesNotExist:
+        return None
 
 
 def get_contact_request_count(partition_key: str, request_uuid: str) -> int:
-    return ContactRequestModel.count(
-        partition_key, ContactRequestModel.request_uuid == request_uuid
-    )
+    """Existence check of the write decorators, read uncached (never stale)."""
+    return 0 if _get_contact_request(partition_key, request_uuid) is None else 1
 
 
 def get_contact_request_type(
@@ -165,18 +236,15 @@ def resolve_contact_request(
     info: ResolveInfo, **kwargs: Dict[str, Any]
 ) -> ContactRequestType | None:
     partition_key = info.context["partition_key"]
-    count = get_contact_request_count(partition_key, kwargs.get("request_uuid"))
-    if count == 0:
+    contact_request = get_contact_request(partition_key, kwargs.get("request_uuid"))
+    if contact_request is None:
         return None
 
-    return get_contact_request_type(
-        info,
-        get_contact_request(partition_key, kwargs.get("request_uuid")),
-    )
+    return get_contact_request_type(info, contact_request)
 
 
 @monitor_decorator
-@resolve_list_decorator(
+@paginated_list_decorator(
     attributes_to_get=["partition_key", "contact_uuid", "request_uuid", "place_uuid"],
     list_type_class=ContactRequestListType,
     type_funct=get_contact_request_type,
@@ -188,37 +256,62 @@ def resolve_contact_request_list(info: ResolveInfo, **kwargs: Dict[str, Any]) ->
     request_detail = kwargs.get("request_detail")
     place_uuid = kwargs.get("place_uuid")
 
-    args = []
-    inquiry_funct = ContactRequestModel.scan
-    count_funct = ContactRequestModel.count
-
-    # Use place_uuid_index if both partition_key and place_uuid are provided
-    if partition_key:
-        args = [partition_key, None]
-        inquiry_funct = ContactRequestModel.query
-        if place_uuid:
-            inquiry_funct = ContactRequestModel.place_uuid_index.query
-            args[1] = ContactRequestModel.place_uuid == place_uuid
-            count_funct = ContactRequestModel.place_uuid_index.count
-        if contact_uuid:
-            inquiry_funct = ContactRequestModel.contact_uuid_index.query
-            args[1] = ContactRequestModel.contact_uuid == contact_uuid
-            count_funct = ContactRequestModel.contact_uuid_index.count
-
-    the_filters = None
-    if place_uuid and contact_uuid:
-        the_filters &= ContactRequestModel.place_uuid == place_uuid
+    search = kwargs.get("search")
+    if search and is_full_text_index_complete("contact_request"):
+        # Ranked full-text hits; the other arguments narrow them down.
+        updated_since, updated_before = updated_window(kwargs)
+
+        def accept(contact_request: ContactRequestModel) -> bool:
+            return (
+                (not contact_uuid or contact_request.contact_uuid == contact_uuid)
+                and (not place_uuid or contact_request.place_uuid == place_uuid)
+                and (
+                    not request_title
+                    or request_title in (contact_request.request_title or "")
+                )
+                and (
+                    not request_detail
+                    or request_detail in (contact_request.request_detail or "")
+                )
+                and (
+                    (updated_since is None and updated_before is None)
+                    or in_range(
+                        contact_request.updated_at, updated_since, updated_before
+                    )
+                )
+            )
+
+        search = FullTextSearch(
+            "contact_request", partition_key, search, accept=accept
+        )
+        return search, search.count, []
+
+    the_filters = []  # Conditions no index can serve.
+    if search:
+        # The full-text index is not warm in this container; match substrings.
+        the_filters.append(
+            ContactRequestModel.request_title.contains(search)
+            | ContactRequestModel.request_detail.contains(search)
+        )
     if request_title:
-        the_filters &= ContactRequestModel.request_title.contains(request_title)
+        the_filters.append(ContactRequestModel.request_title.contains(request_title))
     if request_detail:
-        the_filters &= ContactRequestModel.request_detail.contains(request_detail)
-    if place_uuid and contact_uuid:
-        # If both place_uuid and contact_uuid are specified, add place_uuid as a filter
-        the_filters &= ContactRequestModel.place_uuid == place_uuid
-    if the_filters is not None:
-        args.append(the_filters)
+        the_filters.append(
+            ContactRequestModel.request_detail.contains(request_detail)
+        )
 
-    return inquiry_funct, count_funct, args
+    plan = CONTACT_REQUEST_QUERY_PLANNER.plan(
+        partition_key,
+        {
+            "place_uuid": (EQ, place_uuid),
+            "contact_uuid": (EQ, contact_uuid),
+            "updated_at": (RANGE, updated_window(kwargs)),
+        },
+        the_filters,
+        # Sync reads (updated_since/updated_before) stream in time order.
+        order_by="updated_at",
+    )
+    return plan.inquiry_funct, plan.count_funct, plan.args
 
 
 @insert_update_decorator(
@@ -230,18 +323,15 @@ def resolve_contact_request_list(info: ResolveInfo, **kwargs: Dict[str, Any]) ->
     count_funct=get_contact_request_count,
     type_funct=get_contact_request_type,
 )
-@purge_cache()
+@purge_cache(list_fields=CONTACT_REQUEST_LIST_FIELDS)
+@maintain_entity_counters("contact_request")
+@maintain_full_text_index("contact_request")
+@validate_foreign_keys("contact_request")
+@capture_changes("contact_request", CONTACT_REQUEST_FIELDS, "request_uuid")
 def insert_update_contact_request(info: ResolveInfo, **kwargs: Dict[str, Any]) -> None:
     partition_key = kwargs.get("partition_key") or info.context.get("partition_key")
     request_uuid = kwargs.get("request_uuid")
 
-    assert (
-        get_contact_profile_count(
-            partition_key=partition_key, contact_uuid=kwargs["contact_uuid"]
-        )
-        == 1
-    ), "Contact profile not found."
-
     if kwargs.get("entity") is None:
         cols = {
             "contact_uuid": kwargs["contact_uuid"],
@@ -282,9 +372,14 @@ def insert_update_contact_request(info: ResolveInfo, **kwargs: Dict[str, Any]) -
         "hash_key": "partition_key",
         "range_key": "request_uuid",
     },
-    model_funct=get_contact_request,
+    model_funct=_get_contact_request,
 )
 @purge_cache()
+@maintain_entity_counters("contact_request", deleting=True)
+@maintain_full_text_index("contact_request", deleting=True)
 def delete_contact_request(info: ResolveInfo, **kwargs: Dict[str, Any]) -> bool:
+    if kwargs.get("entity") is None:
+        return False
+
     kwargs.get("entity").delete()
     return True
@@ -7,7 +7,7 @@ __author__ = "bibow"
 import functools
 import logging
 import traceback
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 import pendulum
 from graphene import ResolveInfo
@@ -17,15 +17,13 @@ from pynamodb.attributes import (
     UnicodeAttribute,
     UTCDateTimeAttribute,
 )
-from pynamodb.indexes import AllProjection, LocalSecondaryIndex
+from pynamodb.indexes import AllProjection, GlobalSecondaryIndex, LocalSecondaryIndex
 from silvaengine_dynamodb_base import (
     BaseModel,
     delete_decorator,
     insert_update_decorator,
     monitor_decorator,
-    resolve_list_decorator,
 )
-from silvaengine_utility import method_cache
 from silvaengine_utility.serializer import Serializer
 from tenacity import retry, stop_after_attempt, wait_exponential
 
@@ -34,6 +32,35 @@ from ..types.corporation_profile import (
     CorporationProfileListType,
     CorporationProfileType,
 )
+from .attribute_value import AttributeBagChanges
+from .bulk import BulkItem, bulk_insert_update, merge_item
+from .change_capture import capture_changes
+from .counters import maintain_entity_counters
+from .list_cache import hydrate_entities
+from .local_cache import method_cache
+from .pagination import paginated_list_decorator
+from .query_planner import (
+    BEGINS_WITH,
+    EQ,
+    RANGE,
+    IndexSpec,
+    QueryPlanner,
+    updated_window,
+)
+from .scan import parallel_scan
+from .search import (
+    build_search_name,
+    normalize_search_key,
+    search_name_action,
+    search_name_changed,
+)
+from .unique_guards import (
+    guard_changes,
+    release_unique,
+    reserve_unique,
+    unique_guarded,
+)
+from .unit_of_work import UnitOfWork
 from .utils import insert_update_attribute_values
 
 
@@ -65,6 +92,30 @@ class ExternalIdIndex(LocalSecondaryIndex):
     external_id = UnicodeAttribute(range_key=True)
 
 
+class SearchNameIndex(GlobalSecondaryIndex):
+    class Meta:
+        # index_name is optional, but can be provided to override the default name
+        index_name = "search_name-index"
+        billing_mode = "PAY_PER_REQUEST"
+        projection = AllProjection()
+
+    # Normalized name (see models/search.py) for begins_with key conditions
+    partition_key = UnicodeAttribute(hash_key=True)
+    search_name = UnicodeAttribute(range_key=True)
+
+
+class UpdatedAtIndex(GlobalSecondaryIndex):
+    class Meta:
+        # index_name is optional, but can be provided to override the default name
+        index_name = "updated_at-index"
+        billing_mode = "PAY_PER_REQUEST"
+        projection = AllProjection()
+
+    # Time-ordered per tenant, for incremental sync (updated_since/updated_before)
+    partition_key = UnicodeAttribute(hash_key=True)
+    updated_at = UTCDateTimeAttribute(range_key=True)
+
+
 class CorporationProfileModel(BaseModel):
     class Meta(BaseModel.Meta):
         table_name = "ame-corporation_profiles"
@@ -81,41 +132,131 @@ class CorporationProfileModel(BaseModel):
     updated_by = UnicodeAttribute()
     created_at = UTCDateTimeAttribute()
     updated_at = UTCDateTimeAttribute()
+    search_name = UnicodeAttribute(null=True)
     external_id_index = ExternalIdIndex()
     corporation_type_index = CorporationTypeIndex()
+    search_name_index = SearchNameIndex()
+    updated_at_index = UpdatedAtIndex()
+
+
+class CorporationCategoryModel(BaseModel):
+    """
+    Category membership fan-out: one item per (tenant, category, corporation),
+    written in the same transaction as the profile, so a category browse is a
+    key-condition query instead of a filtered scan of the tenant.
+    """
+
+    class Meta(BaseModel.Meta):
+        table_name = "ame-corporation_categories"
+
+    # "<partition_key>#<category>"
+    category_key = UnicodeAttribute(hash_key=True)
+    corporation_uuid = UnicodeAttribute(range_key=True)
+    partition_key = UnicodeAttribute()
+    category = UnicodeAttribute()
+    updated_at = UTCDateTimeAttribute()
+
+
+# Access paths the list resolver can key on
+CORPORATION_PROFILE_QUERY_PLANNER = QueryPlanner(
+    "corporation_profile",
+    CorporationProfileModel,
+    [
+        IndexSpec(),
+        IndexSpec(CorporationProfileModel.external_id_index, "external_id"),
+        IndexSpec(
+            CorporationProfileModel.corporation_type_index, "corporation_type"
+        ),
+        IndexSpec(
+            CorporationProfileModel.search_name_index,
+            "search_name",
+            operators=(BEGINS_WITH,),
+        ),
+        IndexSpec(
+            CorporationProfileModel.updated_at_index, "updated_at", operators=(RANGE,)
+        ),
+    ],
+)
+
+# Attributes a corporation profile mutation sets
+CORPORATION_PROFILE_FIELDS = [
+    "external_id",
+    "corporation_type",
+    "business_name",
+    "categories",
+    "address",
+]
+
+# Attributes the list resolver filters or indexes on
+CORPORATION_PROFILE_LIST_FIELDS = [
+    "external_id",
+    "corporation_type",
+    "business_name",
+    "categories",
+    "address",
+]
+
+
+def get_category_key(partition_key: str, category: str) -> str:
+    return f"{partition_key}#{category}"
+
+
+def _categories(value: Any) -> List[str]:
+    if value in (None, "null"):
+        return []
+    return list(dict.fromkeys(value))
+
 
+def _category_member(
+    partition_key: str, corporation_uuid: str, category: str
+) -> CorporationCategoryModel:
+    return CorporationCategoryModel(
+        get_category_key(partition_key, category),
+        corporation_uuid,
+        partition_key=partition_key,
+        category=category,
+        updated_at=pendulum.now("UTC"),
+    )
+
+
+def _transaction() -> UnitOfWork:
+    return UnitOfWork(CorporationProfileModel)
+
+
+def purge_cache(list_fields: Optional[List[str]] = None):
+    """
+    Purge the entity's caches after a successful write. list_fields names the
+    attributes list resolvers filter on; updates leaving them untouched keep
+    the cached key lists.
+    """
 
-def purge_cache():
     def actual_decorator(original_function):
         @functools.wraps(original_function)
         def wrapper_function(*args, **kwargs):
             try:
+                from ..models.list_cache import membership_changed
+
+                invalidate_lists = membership_changed(kwargs, list_fields)
+
                 # Execute original function first
                 result = original_function(*args, **kwargs)
 
                 # Then purge cache after successful operation
                 from ..models.cache import purge_entity_cascading_cache
+                from ..models.cache_keys import build_purge_keys
 
-                # Get entity keys from entity parameter (for updates)
-                entity_keys = {}
-                entity = kwargs.get("entity")
-                if entity:
-                    entity_keys["corporation_uuid"] = getattr(
-                        entity, "corporation_uuid", None
-                    )
-
-                # Fallback to kwargs (for creates/deletes)
-                if not entity_keys.get("corporation_uuid"):
-                    entity_keys["corporation_uuid"] = kwargs.get("corporation_uuid")
-
-                partition_key = args[0].context.get("partition_key")
+                # Same key registry the getter and batch loader write through
+                context_keys, entity_keys = build_purge_keys(
+                    "corporation_profile", args[0].context, kwargs
+                )
 
                 purge_entity_cascading_cache(
                     args[0].context.get("logger"),
                     entity_type="corporation_profile",
-                    context_keys={"partition_key": partition_key},
-                    entity_keys=entity_keys if entity_keys else None,
+                    context_keys=context_keys,
+                    entity_keys=entity_keys,
                     cascade_depth=3,
+                    invalidate_lists=invalidate_lists,
                 )
 
                 return result
@@ -138,11 +279,12 @@ def purge_cache():
     ttl=Config.get_cache_ttl(),
     cache_name=Config.get_cache_name("models", "corporation_profile"),
     cache_enabled=Config.is_cache_enabled,
+    cache_none=True,
 )
 def get_corporation_profile(
     partition_key: str, corporation_uuid: str
-) -> CorporationProfileModel:
-    return CorporationProfileModel.get(partition_key, corporation_uuid)
+) -> CorporationProfileModel | None:
+    return _get_corporation_profile(partition_key, corporation_uuid)
 
 
 @retry(
@@ -152,14 +294,16 @@ def get_corporation_profile(
 )
 def _get_corporation_profile(
     partition_key: str, corporation_uuid: str
-) -> CorporationProfileModel:
-    return CorporationProfileModel.get(partition_key, corporation_uuid)
+) -> CorporationProfileModel | None:
+    try:
+        return CorporationProfileModel.get(partition_key, corporation_uuid)
+    except CorporationProfileModel.DoesNotExist:
+        return None
 
 
 def get_corporation_profile_count(partition_key: str, corporation_uuid: str) -> int:
-    return CorporationProfileModel.count(
-        partition_key, CorporationProfileModel.corporation_uuid == corporation_uuid
-    )
+    """Existence check of the write decorators, read uncached (never stale)."""
+    return 0 if _get_corporation_profile(partition_key, corporation_uuid) is None else 1
 
 
 def get_corporation_profile_type(
@@ -184,18 +328,68 @@ def resolve_corporation_profile(
     info: ResolveInfo, **kwargs: Dict[str, Any]
 ) -> CorporationProfileType | None:
     partition_key = info.context["partition_key"]
-    count = get_corporation_profile_count(partition_key, kwargs.get("corporation_uuid"))
-    if count == 0:
+    corporation_profile = get_corporation_profile(partition_key, kwargs.get("corporation_uuid"))
+    if corporation_profile is None:
         return None
 
-    return get_corporation_profile_type(
-        info,
-        get_corporation_profile(partition_key, kwargs.get("corporation_uuid")),
-    )
+    return get_corporation_profile_type(info, corporation_profile)
+
+
+class CategoryResults(list):
+    """Hydrated members of a category page, with the attributes resolvers read."""
+
+    def __init__(self, items: List[Any], last_evaluated_key: Any = None) -> None:
+        super(CategoryResults, self).__init__(items)
+        self.last_evaluated_key = last_evaluated_key
+
+    @property
+    def total_count(self) -> int:
+        return len(self)
+
+
+class CategoryMembers(object):
+    """
+    inquiry_funct for a `category` argument: corporation_uuids are read from
+    the membership fan-out with a key condition, and the profiles hydrated
+    through the corporation_profile cache CorporationProfileLoader shares.
+    """
+
+    def __init__(
+        self,
+        partition_key: str,
+        category: str,
+        accept: Optional[Any] = None,
+    ) -> None:
+        self.partition_key = partition_key
+        self.category_key = get_category_key(partition_key, category)
+        self.accept = accept
+
+    def __call__(
+        self,
+        *args: Any,
+        limit: Optional[int] = None,
+        last_evaluated_key: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> CategoryResults:
+        members = CorporationCategoryModel.query(
+            self.category_key,
+            limit=limit,
+            last_evaluated_key=last_evaluated_key,
+        )
+        keys = [[self.partition_key, member.corporation_uuid] for member in members]
+        entities = hydrate_entities("corporation_profile", keys)
+        if self.accept is not None:
+            entities = [entity for entity in entities if self.accept(entity)]
+        return CategoryResults(entities, members.last_evaluated_key)
+
+    def count(self, *args: Any, **kwargs: Any) -> int:
+        if self.accept is None:
+            return CorporationCategoryModel.count(self.category_key)
+        return len(self())
 
 
 @monitor_decorator
-@resolve_list_decorator(
+@paginated_list_decorator(
     attributes_to_get=[
         "partition_key",
         "corporation_uuid",
@@ -214,33 +408,169 @@ def resolve_corporation_profile_list(
     business_name = kwargs.get("business_name")
     category = kwargs.get("category")
     address = kwargs.get("address")
+    search = normalize_search_key(kwargs.get("search"))
+    updated_since, updated_before = updated_window(kwargs)
+
+    # Category browse reads the membership fan-out, unless external_id pins a
+    # single item, a sync read needs time order, or address (not checkable
+    # off the item) is given.
+    if (
+        category
+        and partition_key
+        and not (external_id or address)
+        and updated_since is None
+        and updated_before is None
+    ):
+
+        def accept(corporation_profile: CorporationProfileModel) -> bool:
+            return (
+                (
+                    not corporation_type
+                    or corporation_profile.corporation_type == corporation_type
+                )
+                and (
+                    not business_name
+                    or corporation_profile.business_name == business_name
+                )
+                and (
+                    not search
+                    or (corporation_profile.search_name or "").startswith(search)
+                )
+            )
 
-    args = []
-    inquiry_funct = CorporationProfileModel.scan
-    count_funct = CorporationProfileModel.count
-    if partition_key:
-        args = [partition_key, None]
-        inquiry_funct = CorporationProfileModel.query
-        if external_id:
-            inquiry_funct = CorporationProfileModel.external_id_index.query
-            args[1] = CorporationProfileModel.external_id == external_id
-            count_funct = CorporationProfileModel.external_id_index.count
-        if corporation_type:
-            inquiry_funct = CorporationProfileModel.corporation_type_index.query
-            args[1] = CorporationProfileModel.corporation_type == corporation_type
-            count_funct = CorporationProfileModel.corporation_type_index.count
-
-    the_filters = None  # We can add filters for the query.
+        members = CategoryMembers(
+            partition_key,
+            category,
+            accept=accept if (corporation_type or business_name or search) else None,
+        )
+        return members, members.count, []
+
+    the_filters = []  # Conditions no index can serve.
     if business_name:
-        the_filters &= CorporationProfileModel.business_name == business_name
+        the_filters.append(CorporationProfileModel.business_name == business_name)
     if category:
-        the_filters &= CorporationProfileModel.categories.contains(category)
+        the_filters.append(CorporationProfileModel.categories.contains(category))
     if address:
-        the_filters &= CorporationProfileModel.address.contains(address)
-    if the_filters is not None:
-        args.append(the_filters)
+        the_filters.append(CorporationProfileModel.address.contains(address))
+
+    # external_id, corporation_type and the name prefix all apply: one keys
+    # the query and the others are filters.
+    plan = CORPORATION_PROFILE_QUERY_PLANNER.plan(
+        partition_key,
+        {
+            "external_id": (EQ, external_id),
+            "corporation_type": (EQ, corporation_type),
+            "search_name": (BEGINS_WITH, search),
+            "updated_at": (RANGE, updated_window(kwargs)),
+        },
+        the_filters,
+        # Sync reads (updated_since/updated_before) stream in time order.
+        order_by="updated_at",
+    )
+    return plan.inquiry_funct, plan.count_funct, plan.args
+
+
+def _new_corporation_profile_cols(
+    info: ResolveInfo, kwargs: Dict[str, Any]
+) -> Dict[str, Any]:
+    cols = {
+        "external_id": kwargs["external_id"],
+        "endpoint_id": info.context.get("endpoint_id"),
+        "part_id": kwargs.get("part_id", info.context.get("part_id")),
+        "corporation_type": kwargs["corporation_type"],
+        "business_name": kwargs["business_name"],
+        "address": kwargs["address"],
+        "updated_by": kwargs["updated_by"],
+        "created_at": pendulum.now("UTC"),
+        "updated_at": pendulum.now("UTC"),
+    }
+    for key in ["categories"]:
+        if key in kwargs:
+            cols[key] = kwargs[key]
+    search_name = build_search_name("corporation_profile", kwargs)
+    if search_name is not None:
+        cols["search_name"] = search_name
+    return cols
+
+
+def build_corporation_profile_item(
+    info: ResolveInfo,
+    kwargs: Dict[str, Any],
+    entity: Optional[CorporationProfileModel] = None,
+) -> CorporationProfileModel:
+    """The full item insertUpdateCorporationProfiles puts (entity None to create)."""
+    if entity is None:
+        return CorporationProfileModel(
+            kwargs["partition_key"],
+            kwargs["corporation_uuid"],
+            **_new_corporation_profile_cols(info, kwargs),
+        )
 
-    return inquiry_funct, count_funct, args
+    return merge_item(
+        CorporationProfileModel,
+        entity,
+        kwargs,
+        CORPORATION_PROFILE_FIELDS,
+        cols={
+            "search_name": build_search_name("corporation_profile", kwargs, entity)
+        },
+    )
+
+
+def _after_corporation_profiles(
+    info: ResolveInfo, bulk_items: List[BulkItem]
+) -> None:
+    """
+    Category memberships and attribute data of the written profiles. Unlike the
+    single-item mutation, memberships are batch-written after the profiles
+    rather than in one transaction with them; backfill_corporation_categories
+    repairs any a failed batch leaves behind.
+    """
+    added, removed = [], []
+    for bulk_item in bulk_items:
+        profile = bulk_item.item
+        current = _categories(getattr(bulk_item.entity, "categories", None))
+        updated = _categories(profile.categories)
+        added.extend(
+            _category_member(profile.partition_key, profile.corporation_uuid, category)
+            for category in updated
+            if category not in current
+        )
+        removed.extend(
+            _category_member(profile.partition_key, profile.corporation_uuid, category)
+            for category in current
+            if category not in updated
+        )
+    if added or removed:
+        with CorporationCategoryModel.batch_write() as batch:
+            for member in added:
+                batch.save(member)
+            for member in removed:
+                batch.delete(member)
+
+    for bulk_item in bulk_items:
+        if not bulk_item.kwargs.get("data"):
+            continue
+        insert_update_attribute_values(
+            info,
+            "corporation",
+            bulk_item.kwargs["corporation_uuid"],
+            bulk_item.kwargs["updated_by"],
+            bulk_item.kwargs["data"],
+            bulk_item.kwargs["partition_key"],
+        )
+
+
+def insert_update_corporation_profiles(
+    info: ResolveInfo, items: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    return bulk_insert_update(
+        info,
+        "corporation_profile",
+        items,
+        build_corporation_profile_item,
+        after_write=_after_corporation_profiles,
+    )
 
 
 @insert_update_decorator(
@@ -252,44 +582,57 @@ def resolve_corporation_profile_list(
     count_funct=get_corporation_profile_count,
     type_funct=get_corporation_profile_type,
 )
-@purge_cache()
+@purge_cache(list_fields=CORPORATION_PROFILE_LIST_FIELDS)
+@maintain_entity_counters("corporation_profile")
+@capture_changes("corporation_profile", CORPORATION_PROFILE_FIELDS, "corporation_uuid")
 def insert_update_corporation_profile(
     info: ResolveInfo, **kwargs: Dict[str, Any]
 ) -> None:
     partition_key = kwargs.get("partition_key")
     corporation_uuid = kwargs.get("corporation_uuid")
     if kwargs.get("entity") is None:
-        cols = {
-            "external_id": kwargs["external_id"],
-            "endpoint_id": info.context.get("endpoint_id"),
-            "part_id": kwargs.get("part_id", info.context.get("part_id")),
-            "corporation_type": kwargs["corporation_type"],
-            "business_name": kwargs["business_name"],
-            "address": kwargs["address"],
-            "updated_by": kwargs["updated_by"],
-            "created_at": pendulum.now("UTC"),
-            "updated_at": pendulum.now("UTC"),
-        }
-        for key in ["categories"]:
-            if key in kwargs:
-                cols[key] = kwargs[key]
-        CorporationProfileModel(
+        cols = _new_corporation_profile_cols(info, kwargs)
+        corporation_profile = CorporationProfileModel(
             partition_key,
             corporation_uuid,
             **cols,
-        ).save()
-
-        # Handle dynamic attributes (data field)
-        data = insert_update_attribute_values(
+        )
+        external_id = guard_changes(None, cols["external_id"])[0]
+        attributes = AttributeBagChanges(
             info,
             "corporation",
             corporation_uuid,
             kwargs["updated_by"],
-            kwargs.get("data", {}),
+            kwargs.get("data"),
             partition_key,
         )
+        # The profile, its external_id guard, its category memberships and its
+        # attribute values land together or not at all; a taken external_id
+        # cancels the write.
+        with unique_guarded(
+            "corporation_profile",
+            _transaction,
+            partition_key,
+            corporation_uuid,
+            external_id,
+        ) as transaction:
+            transaction.save(corporation_profile)
+            if external_id is not None:
+                reserve_unique(
+                    transaction,
+                    partition_key,
+                    "external_id",
+                    external_id,
+                    corporation_uuid,
+                )
+            for category in _categories(cols.get("categories")):
+                transaction.save(
+                    _category_member(partition_key, corporation_uuid, category)
+                )
+            attributes.add_to(transaction)
+        attributes.committed(info)
         info.context["logger"].info(
-            f"Corporation profile data: {data} has been updated."
+            f"Corporation profile data: {attributes.data} has been updated."
         )
 
         return
@@ -314,17 +657,73 @@ def insert_update_corporation_profile(
         if key in kwargs:  # Check if the key exists in kwargs
             actions.append(field.set(None if kwargs[key] == "null" else kwargs[key]))
 
-    corporation_profile.update(actions=actions)
+    if search_name_changed("corporation_profile", kwargs):
+        actions.append(
+            search_name_action(
+                CorporationProfileModel, "corporation_profile", corporation_profile, kwargs
+            )
+        )
 
-    data = insert_update_attribute_values(
+    current = _categories(corporation_profile.categories)
+    updated = _categories(kwargs["categories"]) if "categories" in kwargs else current
+    added = [category for category in updated if category not in current]
+    removed = [category for category in current if category not in updated]
+    reserve, release = guard_changes(
+        corporation_profile.external_id,
+        kwargs.get("external_id", corporation_profile.external_id),
+    )
+    attributes = AttributeBagChanges(
         info,
         "corporation",
         corporation_uuid,
         kwargs["updated_by"],
-        kwargs.get("data", {}),
+        kwargs.get("data"),
         corporation_profile.partition_key,
     )
-    info.context["logger"].info(f"Corporation profile data: {data} has been updated.")
+    if added or removed or reserve is not None or release is not None or attributes:
+        with unique_guarded(
+            "corporation_profile",
+            _transaction,
+            corporation_profile.partition_key,
+            corporation_uuid,
+            reserve,
+        ) as transaction:
+            transaction.update(corporation_profile, actions=actions)
+            if reserve is not None:
+                reserve_unique(
+                    transaction,
+                    corporation_profile.partition_key,
+                    "external_id",
+                    reserve,
+                    corporation_uuid,
+                )
+            if release is not None:
+                release_unique(
+                    transaction,
+                    corporation_profile.partition_key,
+                    "external_id",
+                    release,
+                    corporation_uuid,
+                )
+            for category in added:
+                transaction.save(
+                    _category_member(
+                        corporation_profile.partition_key, corporation_uuid, category
+                    )
+                )
+            for category in removed:
+                transaction.delete(
+                    _category_member(
+                        corporation_profile.partition_key, corporation_uuid, category
+                    )
+                )
+            attributes.add_to(transaction)
+    else:
+        corporation_profile.update(actions=actions)
+    attributes.committed(info)
+    info.context["logger"].info(
+        f"Corporation profile data: {attributes.data} has been updated."
+    )
 
     return
 
@@ -334,9 +733,55 @@ def insert_update_corporation_profile(
         "hash_key": "partition_key",
         "range_key": "corporation_uuid",
     },
-    model_funct=get_corporation_profile,
+    model_funct=_get_corporation_profile,
 )
 @purge_cache()
+@maintain_entity_counters("corporation_profile", deleting=True)
 def delete_corporation_profile(info: ResolveInfo, **kwargs: Dict[str, Any]) -> bool:
-    kwargs.get("entity").delete()
+    if kwargs.get("entity") is None:
+        return False
+
+    corporation_profile = kwargs.get("entity")
+    categories = _categories(corporation_profile.categories)
+    if not categories and not corporation_profile.external_id:
+        corporation_profile.delete()
+        return True
+
+    with _transaction() as transaction:
+        transaction.delete(corporation_profile)
+        if corporation_profile.external_id:
+            release_unique(
+                transaction,
+                corporation_profile.partition_key,
+                "external_id",
+                corporation_profile.external_id,
+                corporation_profile.corporation_uuid,
+            )
+        for category in categories:
+            transaction.delete(
+                _category_member(
+                    corporation_profile.partition_key,
+                    corporation_profile.corporation_uuid,
+                    category,
+                )
+            )
     return True
+
+
+def backfill_corporation_categories(logger: logging.Logger) -> int:
+    """Write category memberships for profiles saved before the fan-out existed."""
+    written = 0
+    with CorporationCategoryModel.batch_write() as batch:
+        for corporation_profile in parallel_scan(CorporationProfileModel):
+            for category in _categories(corporation_profile.categories):
+                batch.save(
+                    _category_member(
+                        corporation_profile.partition_key,
+                        corporation_profile.corporation_uuid,
+                        category,
+                    )
+                )
+                written += 1
+
+    logger.info(f"Backfilled {written} corporation category membership(s).")
+    return written
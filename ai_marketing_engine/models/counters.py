@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import functools
+import logging
+import traceback
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pendulum
+from graphene import ResolveInfo
+from pynamodb.attributes import (
+    BooleanAttribute,
+    NumberAttribute,
+    UnicodeAttribute,
+    UTCDateTimeAttribute,
+)
+from silvaengine_dynamodb_base import BaseModel
+
+# Dimensions maintained per entity besides the tenant-wide total. Each maps to
+# the index the list resolver queries when that argument is given.
+ENTITY_COUNTER_DIMENSIONS: Dict[str, List[str]] = {
+    "place": ["region"],
+    "contact_profile": ["place_uuid"],
+    "contact_request": ["contact_uuid", "place_uuid"],
+    "corporation_profile": ["corporation_type"],
+}
+
+
+class EntityCounterModel(BaseModel):
+    class Meta(BaseModel.Meta):
+        table_name = "ame-entity_counters"
+
+    partition_key = UnicodeAttribute(hash_key=True)
+    # "<entity_type>" or "<entity_type>#<dimension>#<value>"
+    counter_key = UnicodeAttribute(range_key=True)
+    value = NumberAttribute(default=0)
+    # Counters only answer totals once seeded from a real count; deltas applied
+    # before that are overwritten by the seed.
+    seeded = BooleanAttribute(default=False)
+    updated_at = UTCDateTimeAttribute(null=True)
+
+
+def get_counter_key(
+    entity_type: str, dimension: Optional[str] = None, value: Optional[str] = None
+) -> str:
+    if dimension is None:
+        return entity_type
+    return f"{entity_type}#{dimension}#{value}"
+
+
+def _counter_keys(entity_type: str, values: Dict[str, Any]) -> List[str]:
+    keys = [get_counter_key(entity_type)]
+    for dimension in ENTITY_COUNTER_DIMENSIONS.get(entity_type, []):
+        if values.get(dimension) is not None:
+            keys.append(get_counter_key(entity_type, dimension, values[dimension]))
+    return keys
+
+
+def adjust_entity_counter(partition_key: str, counter_key: str, delta: int) -> None:
+    """Atomically add delta to a counter, creating the item on first use."""
+    EntityCounterModel(partition_key, counter_key).update(
+        actions=[
+            EntityCounterModel.value.add(delta),
+            EntityCounterModel.updated_at.set(pendulum.now("UTC")),
+        ]
+    )
+
+
+def get_entity_count(partition_key: str, counter_key: str) -> Optional[int]:
+    """Maintained count, or None while the counter has not been seeded."""
+    try:
+        counter = EntityCounterModel.get(partition_key, counter_key)
+    except EntityCounterModel.DoesNotExist:
+        return None
+    if not counter.seeded:
+        return None
+    return int(counter.value)
+
+
+def seed_entity_counter(partition_key: str, counter_key: str, count: int) -> None:
+    """
+    Set a counter from a real count, once. Writes racing the count may be off
+    by their own delta until the counter is reseeded.
+    """
+    try:
+        EntityCounterModel(partition_key, counter_key).update(
+            actions=[
+                EntityCounterModel.value.set(count),
+                EntityCounterModel.seeded.set(True),
+                EntityCounterModel.updated_at.set(pendulum.now("UTC")),
+            ],
+            condition=(
+                EntityCounterModel.seeded.does_not_exist()
+                | (EntityCounterModel.seeded == False)  # noqa: E712
+            ),
+        )
+    except Exception:
+        # Another request seeded it first.
+        pass
+
+
+class CounterCount(object):
+    """
+    count_funct for list resolvers that reads a maintained counter instead of
+    counting the matching range. Pass the dimension the query is keyed on
+    (e.g. region=region); with none set, the tenant-wide total is used.
+    Unseeded counters fall back to the real count and are seeded from it.
+    """
+
+    def __init__(
+        self,
+        entity_type: str,
+        partition_key: str,
+        fallback: Callable[..., int],
+        **dimensions: Optional[str],
+    ) -> None:
+        dimension, value = next(
+            ((name, value) for name, value in dimensions.items() if value),
+            (None, None),
+        )
+        self.partition_key = partition_key
+        self.counter_key = get_counter_key(entity_type, dimension, value)
+        self.fallback = fallback
+
+    def __call__(self, *args: Any, **kwargs: Any) -> int:
+        count = get_entity_count(self.partition_key, self.counter_key)
+        if count is not None:
+            return count
+
+        count = self.fallback(*args, **kwargs)
+        seed_entity_counter(self.partition_key, self.counter_key, count)
+        return count
+
+
+def _dimension_values(entity_type: str, source: Any) -> Dict[str, Any]:
+    if isinstance(source, dict):
+        return {
+            dimension: (None if source.get(dimension) == "null" else source.get(dimension))
+            for dimension in ENTITY_COUNTER_DIMENSIONS.get(entity_type, [])
+        }
+    return {
+        dimension: getattr(source, dimension, None)
+        for dimension in ENTITY_COUNTER_DIMENSIONS.get(entity_type, [])
+    }
+
+
+def _counter_deltas(
+    entity_type: str,
+    old_values: Optional[Dict[str, Any]],
+    new_values: Optional[Dict[str, Any]],
+) -> List[Tuple[str, int]]:
+    old_keys = set(_counter_keys(entity_type, old_values)) if old_values else set()
+    new_keys = set(_counter_keys(entity_type, new_values)) if new_values else set()
+    return [(key, -1) for key in sorted(old_keys - new_keys)] + [
+        (key, 1) for key in sorted(new_keys - old_keys)
+    ]
+
+
+def maintain_entity_counters(entity_type: str, deleting: bool = False) -> Callable:
+    """
+    Keep an entity's counters in step with its insert_update/delete function.
+    Creates and deletes move every counter the entity belongs to; updates only
+    move the dimension counters whose value changed; upserts returning an
+    Upserted (models/upsert.py) are compared old against new. Counter failures
+    are logged and never fail the write.
+    """
+
+    def actual_decorator(original_function):
+        @functools.wraps(original_function)
+        def wrapper_function(info: ResolveInfo, **kwargs: Dict[str, Any]) -> Any:
+            entity = kwargs.get("entity")
+            old_values = (
+                _dimension_values(entity_type, entity) if entity is not None else None
+            )
+
+            result = original_function(info, **kwargs)
+
+            from .upsert import Upserted
+
+            if isinstance(result, Upserted):
+                # Upserts learn the stored entity from the write itself.
+                old_values = (
+                    _dimension_values(entity_type, result.old)
+                    if result.old is not None
+                    else None
+                )
+                new_values = _dimension_values(entity_type, result.new)
+            elif deleting:
+                if not result:
+                    return result
+                new_values = None
+            elif old_values is None:
+                new_values = _dimension_values(entity_type, kwargs)
+            else:
+                new_values = dict(old_values)
+                new_values.update(
+                    {
+                        dimension: value
+                        for dimension, value in _dimension_values(
+                            entity_type, kwargs
+                        ).items()
+                        if dimension in kwargs
+                    }
+                )
+
+            partition_key = kwargs.get("partition_key") or info.context.get(
+                "partition_key"
+            )
+            try:
+                for counter_key, delta in _counter_deltas(
+                    entity_type, old_values, new_values
+                ):
+                    adjust_entity_counter(partition_key, counter_key, delta)
+            except Exception:
+                logger = info.context.get("logger") or logging.getLogger(__name__)
+                logger.error(traceback.format_exc())
+
+            return result
+
+        return wrapper_function
+
+    return actual_decorator
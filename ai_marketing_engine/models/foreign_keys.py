@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import functools
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
+
+from graphene import ResolveInfo
+
+from .batch_loaders import get_loaders
+
+# Reference attributes of each entity and the entity type they point at.
+# References are scoped to the writer's tenant (partition_key).
+FOREIGN_KEYS: Dict[str, Dict[str, str]] = {
+    "place": {"corporation_uuid": "corporation_profile"},
+    "contact_profile": {"place_uuid": "place"},
+    "contact_request": {"contact_uuid": "contact_profile", "place_uuid": "place"},
+}
+
+# Request loader serving each referenced entity type
+REFERENCE_LOADERS: Dict[str, str] = {
+    "place": "place_loader",
+    "corporation_profile": "corporation_loader",
+    "contact_profile": "contact_profile_loader",
+}
+
+Reference = Tuple[str, str, str]  # (entity_type, partition_key, uuid)
+
+
+def get_references(
+    entity_type: str, partition_key: str, kwargs: Dict[str, Any]
+) -> List[Tuple[str, Reference]]:
+    """(field, reference) pairs a write sets; cleared ("null") fields are skipped."""
+    return [
+        (field, (target, partition_key, kwargs[field]))
+        for field, target in FOREIGN_KEYS.get(entity_type, {}).items()
+        if kwargs.get(field) not in (None, "", "null")
+    ]
+
+
+def find_missing_references(
+    context: Dict[str, Any], references: Iterable[Reference]
+) -> Set[Reference]:
+    """
+    References whose entity does not exist. Each entity type is resolved with
+    one call into its request loader, which answers from the model cache and
+    batch_gets only the misses (filling the cache for the next request). A
+    failed batch_get raises rather than reading as a missing reference.
+    """
+    keys_by_type: Dict[str, List[Tuple[str, str]]] = {}
+    for entity_type, partition_key, uuid in references:
+        keys = keys_by_type.setdefault(entity_type, [])
+        if (partition_key, uuid) not in keys:
+            keys.append((partition_key, uuid))
+
+    loaders = get_loaders(context)
+    missing: Set[Reference] = set()
+    for entity_type, keys in keys_by_type.items():
+        loader = getattr(loaders, REFERENCE_LOADERS[entity_type])
+        found_items = loader.batch_load_fn(keys, raise_errors=True).get()
+        for key, found in zip(keys, found_items):
+            if not found:
+                missing.add((entity_type,) + key)
+    return missing
+
+
+def reference_error(field: str, reference: Reference) -> str:
+    label = reference[0].replace("_", " ").capitalize()
+    return f"{label} not found for {field}: {reference[2]}"
+
+
+def validate_foreign_keys(entity_type: str) -> Callable:
+    """
+    Reject an insert_update whose reference attributes (FOREIGN_KEYS) point at
+    entities that do not exist, before anything is written.
+    """
+
+    def actual_decorator(original_function):
+        @functools.wraps(original_function)
+        def wrapper_function(info: ResolveInfo, **kwargs: Dict[str, Any]) -> Any:
+            partition_key = kwargs.get("partition_key") or info.context.get(
+                "partition_key"
+            )
+            references = get_references(entity_type, partition_key, kwargs)
+            if references:
+                missing = find_missing_references(
+                    info.context, [reference for _, reference in references]
+                )
+                for field, reference in references:
+                    if reference in missing:
+                        raise ValueError(reference_error(field, reference))
+
+            return original_function(info, **kwargs)
+
+        return wrapper_function
+
+    return actual_decorator
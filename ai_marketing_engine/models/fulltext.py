@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import functools
+import json
+import logging
+import math
+import re
+import sqlite3
+import threading
+import time
+import traceback
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from graphene import ResolveInfo
+
+from ..handlers.config import Config
+from .cache_keys import CONTEXT_SOURCE, get_key_fields, get_key_template
+from .list_cache import _key_value, get_model_class, hydrate_entities
+from .scan import parallel_scan
+from .search import normalize_search_key
+
+# Text attributes indexed per entity; documents are keyed by the entity's
+# cache key values (see models/cache_keys.py) so hits hydrate like any getter.
+FULL_TEXT_FIELDS: Dict[str, List[str]] = {
+    "contact_request": ["request_title", "request_detail"],
+    "activity_history": ["log"],
+}
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall(normalize_search_key(text) or "")
+
+
+class FullTextIndex(object):
+    """
+    Interface of a full-text backend. Documents are scoped by partition and
+    entity type; search returns (doc_id, score) pairs, best first.
+    """
+
+    def index(
+        self, scope: str, entity_type: str, doc_id: str, text: str
+    ) -> None:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def remove(
+        self, scope: str, entity_type: str, doc_id: str
+    ) -> None:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def search(
+        self, scope: str, entity_type: str, query: str, limit: int
+    ) -> List[Tuple[str, float]]:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def is_complete(self, entity_type: str) -> bool:
+        """
+        Whether the index holds every item of the entity's table. A backend
+        shared by all containers sees every write, so it is complete as is.
+        """
+        return True
+
+    def mark_built(self, entity_type: str, built_at: float) -> None:
+        """Record that a rebuild indexed the whole table as of built_at."""
+
+
+class EmbeddedFullTextIndex(FullTextIndex):
+    """
+    A container-local backend: it only sees the writes made through its own
+    container, so it counts as complete for Config.FULL_TEXT_INDEX_MAX_AGE
+    seconds after a rebuild and not before one.
+    """
+
+    def built_at(self, entity_type: str) -> Optional[float]:  # pragma: no cover
+        raise NotImplementedError
+
+    def is_complete(self, entity_type: str) -> bool:
+        built_at = self.built_at(entity_type)
+        if built_at is None:
+            return False
+        max_age = Config.get_full_text_index_max_age()
+        return not max_age or time.time() - built_at <= max_age
+
+
+class SQLiteFullTextIndex(EmbeddedFullTextIndex):
+    """File-backed SQLite FTS5 index ranked by bm25, with diacritics folded."""
+
+    def __init__(self, path: str) -> None:
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5("
+                "scope UNINDEXED, entity_type UNINDEXED, doc_id UNINDEXED, body, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS builds "
+                "(entity_type TEXT PRIMARY KEY, built_at REAL)"
+            )
+
+    def built_at(self, entity_type: str) -> Optional[float]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT built_at FROM builds WHERE entity_type = ?", (entity_type,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def mark_built(self, entity_type: str, built_at: float) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO builds (entity_type, built_at) VALUES (?, ?)",
+                (entity_type, built_at),
+            )
+
+    def _delete(self, scope: str, entity_type: str, doc_id: str) -> None:
+        self._connection.execute(
+            "DELETE FROM documents WHERE scope = ? AND entity_type = ? AND doc_id = ?",
+            (scope, entity_type, doc_id),
+        )
+
+    def index(self, scope: str, entity_type: str, doc_id: str, text: str) -> None:
+        with self._lock, self._connection:
+            self._delete(scope, entity_type, doc_id)
+            self._connection.execute(
+                "INSERT INTO documents (scope, entity_type, doc_id, body) "
+                "VALUES (?, ?, ?, ?)",
+                (scope, entity_type, doc_id, text),
+            )
+
+    def remove(self, scope: str, entity_type: str, doc_id: str) -> None:
+        with self._lock, self._connection:
+            self._delete(scope, entity_type, doc_id)
+
+    def search(
+        self, scope: str, entity_type: str, query: str, limit: int
+    ) -> List[Tuple[str, float]]:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # Quoted prefix terms, implicitly ANDed; user input never reaches the
+        # FTS5 query syntax unquoted.
+        match = " ".join(f'"{token}"*' for token in tokens)
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT doc_id, bm25(documents) FROM documents "
+                "WHERE documents MATCH ? AND scope = ? AND entity_type = ? "
+                "ORDER BY bm25(documents) LIMIT ?",
+                (match, scope, entity_type, limit),
+            ).fetchall()
+        # bm25() is lower-is-better; flip it so scores sort descending.
+        return [(doc_id, -score) for doc_id, score in rows]
+
+
+class InMemoryFullTextIndex(EmbeddedFullTextIndex):
+    """In-process postings index ranked by TF-IDF; tokens match by prefix."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._built: Dict[str, float] = {}
+        # (scope, entity_type) -> token -> doc_id -> term frequency
+        self._postings: Dict[Tuple[str, str], Dict[str, Dict[str, int]]] = (
+            defaultdict(lambda: defaultdict(dict))
+        )
+        self._documents: Dict[Tuple[str, str], Dict[str, List[str]]] = defaultdict(
+            dict
+        )
+
+    def _remove_locked(self, scope: str, entity_type: str, doc_id: str) -> None:
+        tokens = self._documents[(scope, entity_type)].pop(doc_id, [])
+        postings = self._postings[(scope, entity_type)]
+        for token in set(tokens):
+            postings[token].pop(doc_id, None)
+            if not postings[token]:
+                del postings[token]
+
+    def index(self, scope: str, entity_type: str, doc_id: str, text: str) -> None:
+        tokens = tokenize(text)
+        with self._lock:
+            self._remove_locked(scope, entity_type, doc_id)
+            self._documents[(scope, entity_type)][doc_id] = tokens
+            postings = self._postings[(scope, entity_type)]
+            for token in tokens:
+                postings[token][doc_id] = postings[token].get(doc_id, 0) + 1
+
+    def remove(self, scope: str, entity_type: str, doc_id: str) -> None:
+        with self._lock:
+            self._remove_locked(scope, entity_type, doc_id)
+
+    def built_at(self, entity_type: str) -> Optional[float]:
+        return self._built.get(entity_type)
+
+    def mark_built(self, entity_type: str, built_at: float) -> None:
+        self._built[entity_type] = built_at
+
+    def search(
+        self, scope: str, entity_type: str, query: str, limit: int
+    ) -> List[Tuple[str, float]]:
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            postings = self._postings[(scope, entity_type)]
+            total_documents = max(len(self._documents[(scope, entity_type)]), 1)
+            scores: Optional[Dict[str, float]] = None
+            for term in terms:
+                term_scores: Dict[str, float] = defaultdict(float)
+                for token, documents in postings.items():
+                    if not token.startswith(term):
+                        continue
+                    idf = math.log(1 + total_documents / len(documents))
+                    for doc_id, frequency in documents.items():
+                        term_scores[doc_id] += frequency * idf
+                # Every query term must match, as with FTS5.
+                scores = (
+                    dict(term_scores)
+                    if scores is None
+                    else {
+                        doc_id: score + term_scores[doc_id]
+                        for doc_id, score in scores.items()
+                        if doc_id in term_scores
+                    }
+                )
+
+        ranked = sorted(scores.items(), key=lambda pair: (-pair[1], pair[0]))
+        return ranked[:limit]
+
+
+_full_text_index: Optional[FullTextIndex] = None
+_full_text_index_lock = threading.Lock()
+
+
+def get_full_text_index() -> FullTextIndex:
+    """Process-wide index built from Config.FULL_TEXT_INDEX_BACKEND."""
+    global _full_text_index
+    if _full_text_index is None:
+        with _full_text_index_lock:
+            if _full_text_index is None:
+                if Config.get_full_text_index_backend() == "sqlite":
+                    _full_text_index = SQLiteFullTextIndex(
+                        Config.get_full_text_index_path()
+                    )
+                else:
+                    _full_text_index = InMemoryFullTextIndex()
+    return _full_text_index
+
+
+def set_full_text_index(index: Optional[FullTextIndex]) -> None:
+    """Install a backend (e.g. a shared one); None rebuilds from Config on next use."""
+    global _full_text_index
+    with _full_text_index_lock:
+        _full_text_index = index
+
+
+def is_full_text_index_complete(entity_type: str) -> bool:
+    """
+    Whether `search` may be served from the index. List resolvers fall back
+    to a contains filter otherwise, rather than return incomplete hits.
+    """
+    return get_full_text_index().is_complete(entity_type)
+
+
+def _scope(entity_type: str, partition_key: Optional[str]) -> str:
+    # Entities without a tenant in their key (activity history) share one scope.
+    partitioned = get_key_template(entity_type)[0].startswith(f"{CONTEXT_SOURCE}:")
+    return (partition_key or "") if partitioned else ""
+
+
+def encode_doc_id(values: Sequence[Any]) -> str:
+    return json.dumps(list(values), default=str)
+
+
+def decode_doc_id(doc_id: str) -> List[Any]:
+    return json.loads(doc_id)
+
+
+def _field_value(field: str, sources: Sequence[Any]) -> Any:
+    for source in sources:
+        if isinstance(source, dict):
+            if field in source:
+                return source[field]
+        elif source is not None and getattr(source, field, None) is not None:
+            return getattr(source, field)
+    return None
+
+
+def maintain_full_text_index(entity_type: str, deleting: bool = False) -> Callable:
+    """
+    Keep the full-text index in step with an insert/update/delete function.
+    Field values are taken from the function's result, then its arguments,
+    then the entity being updated. Index failures are logged, never raised.
+    """
+
+    def actual_decorator(original_function):
+        @functools.wraps(original_function)
+        def wrapper_function(info: ResolveInfo, **kwargs: Dict[str, Any]) -> Any:
+            result = original_function(info, **kwargs)
+            if deleting and not result:
+                return result
+
+            try:
+                sources = [result, kwargs, kwargs.get("entity")]
+                values = []
+                for field in get_key_fields(entity_type):
+                    value = _field_value(field, sources)
+                    if value is None and field == "partition_key":
+                        value = info.context.get("partition_key")
+                    values.append(_key_value(value))
+                if None in values:
+                    return result
+
+                index = get_full_text_index()
+                scope = _scope(entity_type, info.context.get("partition_key"))
+                doc_id = encode_doc_id(values)
+                if deleting:
+                    index.remove(scope, entity_type, doc_id)
+                else:
+                    text = " ".join(
+                        str(value)
+                        for value in (
+                            _field_value(field, sources)
+                            for field in FULL_TEXT_FIELDS[entity_type]
+                        )
+                        if value not in (None, "null")
+                    )
+                    index.index(scope, entity_type, doc_id, text)
+            except Exception:
+                logger = info.context.get("logger") or logging.getLogger(__name__)
+                logger.error(traceback.format_exc())
+
+            return result
+
+        return wrapper_function
+
+    return actual_decorator
+
+
+class FullTextResults(list):
+    """Ranked, hydrated hits with the ResultIterator attributes resolvers read."""
+
+    last_evaluated_key = None
+
+    @property
+    def total_count(self) -> int:
+        return len(self)
+
+
+class FullTextSearch(object):
+    """
+    inquiry_funct for a `search` argument: ranked document keys from the
+    full-text index, hydrated through the per-entity caches the batch
+    loaders share (one batch_get for the misses).
+    """
+
+    def __init__(
+        self,
+        entity_type: str,
+        partition_key: Optional[str],
+        query: str,
+        accept: Optional[Callable[[Any], bool]] = None,
+    ) -> None:
+        self.entity_type = entity_type
+        self.scope = _scope(entity_type, partition_key)
+        self.query = query
+        self.accept = accept
+
+    def _hits(self) -> List[Tuple[str, float]]:
+        return get_full_text_index().search(
+            self.scope,
+            self.entity_type,
+            self.query,
+            Config.get_full_text_max_hits(),
+        )
+
+    def __call__(
+        self, *args: Any, limit: Optional[int] = None, **kwargs: Any
+    ) -> FullTextResults:
+        keys = [decode_doc_id(doc_id) for doc_id, _ in self._hits()]
+        entities = hydrate_entities(self.entity_type, keys)
+        if self.accept is not None:
+            entities = [entity for entity in entities if self.accept(entity)]
+        return FullTextResults(entities[:limit] if limit else entities)
+
+    def count(self, *args: Any, **kwargs: Any) -> int:
+        if self.accept is None:
+            return len(self._hits())
+        return len(self())
+
+
+def index_full_text_item(entity_type: str, item: Any) -> None:
+    """Index a stored item (model instance) under its key."""
+    values = [_key_value(getattr(item, field)) for field in get_key_fields(entity_type)]
+    text = " ".join(
+        str(getattr(item, field))
+        for field in FULL_TEXT_FIELDS[entity_type]
+        if getattr(item, field, None) is not None
+    )
+    get_full_text_index().index(
+        _scope(entity_type, getattr(item, "partition_key", None)),
+        entity_type,
+        encode_doc_id(values),
+        text,
+    )
+
+
+def rebuild_full_text_index(logger: logging.Logger, entity_type: str) -> int:
+    """
+    Re-index every item of an entity's table; run by the rebuild_full_text_index
+    event to warm a container's embedded index before it serves searches.
+    """
+    # Writes during the scan are indexed by their write paths as well.
+    started_at = time.time()
+    indexed = 0
+    for item in parallel_scan(get_model_class(entity_type)):
+        index_full_text_item(entity_type, item)
+        indexed += 1
+
+    get_full_text_index().mark_built(entity_type, started_at)
+    logger.info(f"Indexed {indexed} {entity_type} item(s) for full-text search.")
+    return indexed
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import math
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Precision of the geohash stored on each place (~4.8m x 4.8m cells).
+GEOHASH_PRECISION = 9
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_KM_PER_LAT_DEGREE = 110.574
+_KM_PER_LON_DEGREE = 111.320
+
+
+def parse_coordinate(value: Any) -> Optional[float]:
+    """Float value of a stored latitude/longitude string, or None if unusable."""
+    if value in (None, "", "null"):
+        return None
+    try:
+        coordinate = float(value)
+    except (TypeError, ValueError):
+        return None
+    return coordinate if math.isfinite(coordinate) else None
+
+
+def encode_geohash(
+    latitude: float, longitude: float, precision: int = GEOHASH_PRECISION
+) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        coordinate, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if coordinate >= middle:
+            bits |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def place_geohash(latitude: Any, longitude: Any) -> Optional[str]:
+    """Geohash for a place's stored coordinates, or None if they don't parse."""
+    latitude = parse_coordinate(latitude)
+    longitude = parse_coordinate(longitude)
+    if latitude is None or longitude is None:
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return encode_geohash(latitude, longitude)
+
+
+def cell_size_degrees(precision: int) -> Tuple[float, float]:
+    """(latitude, longitude) span in degrees of a geohash cell."""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 - lon_bits
+    return 180.0 / 2**lat_bits, 360.0 / 2**lon_bits
+
+
+def _search_precision(latitude: float, radius_km: float) -> int:
+    # Longest prefix whose cells are at least radius_km on each side, so the
+    # 3x3 block around the center cell contains the whole search circle.
+    radius_degrees = radius_km / _KM_PER_LAT_DEGREE
+    edge_cos = math.cos(math.radians(min(abs(latitude) + radius_degrees, 90.0)))
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_span, lon_span = cell_size_degrees(precision)
+        if (
+            lat_span * _KM_PER_LAT_DEGREE >= radius_km
+            and lon_span * _KM_PER_LON_DEGREE * edge_cos >= radius_km
+        ):
+            return precision
+    return 0
+
+
+def covering_cells(latitude: float, longitude: float, radius_km: float) -> List[str]:
+    """
+    Geohash prefixes whose union covers the circle around the point: the
+    center cell and its neighbours. An empty prefix means the radius is too
+    large for any cell size and the whole partition has to be read.
+    """
+    precision = _search_precision(latitude, radius_km)
+    if precision == 0:
+        return [""]
+
+    lat_span, lon_span = cell_size_degrees(precision)
+    cells = []
+    for lat_step in (-1, 0, 1):
+        neighbour_lat = latitude + lat_step * lat_span
+        if not -90 <= neighbour_lat <= 90:
+            continue
+        for lon_step in (-1, 0, 1):
+            neighbour_lon = (longitude + lon_step * lon_span + 180) % 360 - 180
+            cell = encode_geohash(neighbour_lat, neighbour_lon, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def haversine_km(
+    latitude: float,
+    longitude: float,
+    latitudes: Sequence[float],
+    longitudes: Sequence[float],
+) -> np.ndarray:
+    """Great-circle distances in km from one point to many, vectorized."""
+    lat1 = np.radians(latitude)
+    lon1 = np.radians(longitude)
+    lat2 = np.radians(np.asarray(latitudes, dtype=float))
+    lon2 = np.radians(np.asarray(longitudes, dtype=float))
+
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
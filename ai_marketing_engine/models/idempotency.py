@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import datetime
+import decimal
+import functools
+import hashlib
+import json
+import traceback
+from typing import Any, Callable, Dict, Optional
+
+import pendulum
+from graphene import DateTime, ObjectType, ResolveInfo
+from graphene import Decimal as DecimalType
+from graphene.types.structures import List as ListType
+from graphene.types.structures import Structure
+from pynamodb.attributes import TTLAttribute, UnicodeAttribute, UTCDateTimeAttribute
+from pynamodb.exceptions import PutError
+from silvaengine_dynamodb_base import BaseModel
+
+from ..handlers.config import Config
+
+PENDING, COMPLETED = "pending", "completed"
+
+
+class IdempotencyRecordModel(BaseModel):
+    """
+    Ledger entry of one mutation call made with an idempotencyKey. It is put
+    conditionally before the mutation runs, so only the first of concurrent or
+    retried calls writes; the others get the stored result back.
+    """
+
+    class Meta(BaseModel.Meta):
+        table_name = "ame-idempotency_keys"
+
+    # "<partition_key>#<mutation>#<idempotency_key>"
+    record_key = UnicodeAttribute(hash_key=True)
+    status = UnicodeAttribute(default=PENDING)
+    # Digest of the mutation arguments; a key is bound to one set of arguments
+    arguments_hash = UnicodeAttribute()
+    # Mutation payload as JSON, once completed
+    result = UnicodeAttribute(null=True)
+    created_at = UTCDateTimeAttribute()
+    # DynamoDB TTL; pending records expire after the lease so a crashed call
+    # does not block its retries until the TTL
+    expires_at = TTLAttribute()
+
+
+def get_record_key(partition_key: str, mutation: str, idempotency_key: str) -> str:
+    return f"{partition_key}#{mutation}#{idempotency_key}"
+
+
+def _arguments_hash(kwargs: Dict[str, Any]) -> str:
+    return hashlib.sha256(
+        json.dumps(kwargs, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def dump_payload(value: Any) -> Any:
+    """JSON-ready form of a mutation payload (ObjectTypes become dicts)."""
+    if isinstance(value, ObjectType):
+        return {
+            name: dump_payload(getattr(value, name, None))
+            for name in type(value)._meta.fields
+        }
+    if isinstance(value, (list, tuple)):
+        return [dump_payload(item) for item in value]
+    if isinstance(value, dict):
+        return {key: dump_payload(item) for key, item in value.items()}
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value
+
+
+def load_payload(graphene_type: Any, value: Any) -> Any:
+    """Rebuild a value of graphene_type from dump_payload's output."""
+    if value is None:
+        return None
+    if isinstance(graphene_type, Structure):
+        if isinstance(graphene_type, ListType):
+            return [load_payload(graphene_type.of_type, item) for item in value]
+        return load_payload(graphene_type.of_type, value)
+    if isinstance(graphene_type, type):
+        if issubclass(graphene_type, ObjectType):
+            return graphene_type(
+                **{
+                    name: load_payload(field.type, value.get(name))
+                    for name, field in graphene_type._meta.fields.items()
+                }
+            )
+        if issubclass(graphene_type, DateTime):
+            return pendulum.parse(value)
+        if issubclass(graphene_type, DecimalType):
+            return decimal.Decimal(value)
+    return value
+
+
+def _reserve(record_key: str, arguments_hash: str) -> Optional[IdempotencyRecordModel]:
+    """Claim the key; the existing record when another call already holds it."""
+    now = pendulum.now("UTC")
+    record = IdempotencyRecordModel(
+        record_key,
+        status=PENDING,
+        arguments_hash=arguments_hash,
+        created_at=now,
+        expires_at=now.add(seconds=Config.get_idempotency_lease()),
+    )
+    try:
+        # TTL deletion lags, so an expired record counts as missing.
+        record.save(
+            condition=(
+                IdempotencyRecordModel.record_key.does_not_exist()
+                | (IdempotencyRecordModel.expires_at < now)
+            )
+        )
+        return None
+    except PutError as error:
+        if error.cause_response_code != "ConditionalCheckFailedException":
+            raise
+    try:
+        return IdempotencyRecordModel.get(record_key, consistent_read=True)
+    except IdempotencyRecordModel.DoesNotExist:
+        # Expired and removed in between; let this call run.
+        return None
+
+
+def idempotent_mutation(mutate: Callable) -> Callable:
+    """
+    Make a Mutation.mutate honour an optional idempotency_key argument: the
+    first call with a key runs and stores its payload for
+    Config.IDEMPOTENCY_TTL seconds, and replays within that time return the
+    stored payload without touching the entity tables or purging caches. Keys
+    are scoped to the tenant and mutation; reusing one with other arguments,
+    or while its first call is still running, is an error.
+    """
+
+    @functools.wraps(mutate)
+    def wrapper(root: Any, info: ResolveInfo, **kwargs: Dict[str, Any]) -> Any:
+        idempotency_key = kwargs.pop("idempotency_key", None)
+        if not idempotency_key:
+            return mutate(root, info, **kwargs)
+
+        mutation_class = info.return_type.graphene_type
+        record_key = get_record_key(
+            info.context.get("partition_key"),
+            mutation_class.__name__,
+            idempotency_key,
+        )
+        arguments_hash = _arguments_hash(kwargs)
+        record = _reserve(record_key, arguments_hash)
+        if record is not None:
+            if record.arguments_hash != arguments_hash:
+                raise ValueError(
+                    f"Idempotency key {idempotency_key} was used with other "
+                    "arguments."
+                )
+            if record.status != COMPLETED:
+                raise ValueError(
+                    f"A request with idempotency key {idempotency_key} is still "
+                    "in progress."
+                )
+            info.context.get("logger").info(
+                f"Replayed {mutation_class.__name__} for idempotency key "
+                f"{idempotency_key}."
+            )
+            return load_payload(mutation_class, json.loads(record.result))
+
+        try:
+            payload = mutate(root, info, **kwargs)
+        except Exception:
+            # Failed calls leave nothing behind, so a retry runs again.
+            IdempotencyRecordModel(record_key).delete()
+            raise
+
+        try:
+            IdempotencyRecordModel(record_key).update(
+                actions=[
+                    IdempotencyRecordModel.status.set(COMPLETED),
+                    IdempotencyRecordModel.result.set(
+                        json.dumps(dump_payload(payload))
+                    ),
+                    IdempotencyRecordModel.expires_at.set(
+                        pendulum.now("UTC").add(
+                            seconds=Config.get_idempotency_ttl()
+                        )
+                    ),
+                ]
+            )
+        except Exception:
+            # The write succeeded; a retry after the lease simply runs again.
+            info.context.get("logger").error(traceback.format_exc())
+        return payload
+
+    return wrapper
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import functools
+import importlib
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from graphene import ResolveInfo
+
+from ..handlers.config import Config
+from ..types.ai_marketing import PageInfoType
+from .cache_keys import (
+    CONTEXT_SOURCE,
+    build_entity_key,
+    build_key_data,
+    get_key_fields,
+    get_key_template,
+    normalize_key_value,
+)
+from .local_cache import TieredCacheEngine, is_not_found
+
+# Paging metadata carried over from the resolver's ListObjectType.
+PAGE_FIELDS = ("page_size", "page_number", "total")
+UNCACHED_ARGUMENTS = ("explain", "updated_since", "updated_before")
+
+
+def get_model_class(entity_type: str) -> Any:
+    entity_config = Config.get_cache_entity_config()[entity_type]
+    return getattr(
+        importlib.import_module(entity_config["module"]), entity_config["model_class"]
+    )
+
+
+def _key_value(value: Any) -> Any:
+    # batch_get and the getter keys use the same form (see cache_keys).
+    return normalize_key_value(value)
+
+
+def membership_changed(
+    kwargs: Dict[str, Any], list_fields: Optional[Sequence[str]]
+) -> bool:
+    """
+    Whether a write can add, drop or reorder the entity in any cached list.
+    Creates and deletes always can; updates only when a field a list resolver
+    filters or indexes on is being changed. Must run before the write, since
+    Model.update refreshes the entity in place.
+    """
+    entity = kwargs.get("entity")
+    if entity is None or list_fields is None:
+        return True
+
+    for field in list_fields:
+        if field not in kwargs:
+            continue
+        value = None if kwargs[field] == "null" else kwargs[field]
+        if value != getattr(entity, field, None):
+            return True
+    return False
+
+
+def hydrate_entities(entity_type: str, keys: Sequence[Sequence[Any]]) -> List[Any]:
+    """
+    Load entities in key order through the per-entity cache, fetching misses
+    with one batch_get and writing them back for the getter and loaders.
+    Keys that no longer resolve (deleted since the list was cached) are dropped.
+    """
+    cache = TieredCacheEngine(Config.get_cache_name("models", entity_type))
+    partitioned = get_key_template(entity_type)[0].startswith(f"{CONTEXT_SOURCE}:")
+    key_fields = get_key_fields(entity_type)
+
+    entities: Dict[Tuple, Any] = {}
+    misses = []
+    for key in map(tuple, keys):
+        cached = cache.get(
+            build_entity_key(cache, entity_type, key),
+            partition_key=key[0] if partitioned else None,
+        )
+        if is_not_found(cached):
+            continue
+        if cached is None or isinstance(cached, dict):
+            misses.append(key)
+        else:
+            entities[key] = cached
+
+    if misses:
+        started = time.perf_counter()
+        items = list(get_model_class(entity_type).batch_get(misses))
+        latency_ms = (time.perf_counter() - started) * 1000 / max(len(items), 1)
+        for item in items:
+            key = tuple(getattr(item, field) for field in key_fields)
+            partition_key = key[0] if partitioned else None
+            cache.set(
+                build_entity_key(cache, entity_type, key),
+                item,
+                ttl=Config.get_cache_ttl(),
+                partition_key=partition_key,
+            )
+            cache.record_fill(partition_key, latency_ms)
+            entities[key] = item
+
+    return [entities[key] for key in map(tuple, keys) if key in entities]
+
+
+def key_list_cache(
+    entity_type: str,
+    list_type_class: Any,
+    type_funct: Callable[[ResolveInfo, Any], Any],
+    ttl: int,
+    cache_name: str,
+    cache_enabled: Callable[[], bool] | bool = True,
+) -> Callable:
+    """
+    Cache a list resolver as ordered primary keys plus paging metadata.
+    Pages are rebuilt from the per-entity caches, so an entity update is seen by
+    every cached page without invalidating them, and each page costs only its keys.
+    """
+    list_field = f"{entity_type}_list"
+    key_fields = get_key_fields(entity_type)
+
+    def actual_decorator(original_function):
+        func_prefix = ".".join(
+            [original_function.__module__, original_function.__name__]
+        )
+
+        @functools.wraps(original_function)
+        def wrapper_function(info: ResolveInfo, **kwargs: Dict[str, Any]) -> Any:
+            enabled = cache_enabled() if callable(cache_enabled) else cache_enabled
+            # explain reports the plan of a real read, and sync reads
+            # (updated_since/updated_before) must see every write, so neither
+            # goes through the cache.
+            if not enabled or any(
+                kwargs.get(argument) is not None for argument in UNCACHED_ARGUMENTS
+            ):
+                return original_function(info, **kwargs)
+
+            partition_key = info.context.get("partition_key")
+            cache = TieredCacheEngine(cache_name)
+            cache_key = cache._generate_key(
+                func_prefix, build_key_data((partition_key,), kwargs)
+            )
+
+            cached_page = cache.get(cache_key, partition_key=partition_key)
+            if cached_page is not None:
+                entities = hydrate_entities(entity_type, cached_page["keys"])
+                page_fields = {
+                    field: cached_page[field]
+                    for field in PAGE_FIELDS
+                    if cached_page.get(field) is not None
+                }
+                if cached_page.get("page_info") is not None:
+                    page_fields["page_info"] = PageInfoType(**cached_page["page_info"])
+                return list_type_class(
+                    **{list_field: [type_funct(info, entity) for entity in entities]},
+                    **page_fields,
+                )
+
+            started = time.perf_counter()
+            result = original_function(info, **kwargs)
+            if result is None:
+                return result
+
+            keys = [
+                [_key_value(getattr(item, field, None)) for field in key_fields]
+                for item in getattr(result, list_field, None) or []
+            ]
+            if all(None not in key for key in keys):
+                page = {
+                    "keys": keys,
+                    **{field: getattr(result, field, None) for field in PAGE_FIELDS},
+                }
+                page_info = getattr(result, "page_info", None)
+                if isinstance(page_info, PageInfoType):
+                    page["page_info"] = {
+                        "end_cursor": page_info.end_cursor,
+                        "has_next_page": page_info.has_next_page,
+                        "high_watermark": page_info.high_watermark,
+                    }
+                cache.set(
+                    cache_key,
+                    page,
+                    ttl=ttl,
+                    partition_key=partition_key,
+                )
+                cache.record_fill(
+                    partition_key, (time.perf_counter() - started) * 1000
+                )
+            return result
+
+        return wrapper_function
+
+    return actual_decorator
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import functools
+import inspect
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from silvaengine_utility.cache import HybridCacheEngine
+
+from ..handlers.config import Config
+from .cache_keys import build_key_data, canonical_call_values
+from .cache_namespace import remaining_ttl, unwrap_value, wrap_value
+from .cache_stats import cache_stats
+
+
+# Cached in place of a getter's None so a known-missing key costs no read.
+NOT_FOUND = "__ame_not_found__"
+
+
+def is_not_found(value: Any) -> bool:
+    return isinstance(value, str) and value == NOT_FOUND
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Estimate the in-memory footprint of a cached value in bytes.
+    The pickled length is used as a stable proxy for model objects and nested dicts;
+    values that can't be pickled fall back to sys.getsizeof.
+    """
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+class LocalCacheTier:
+    """
+    Byte-bounded LRU used as the in-process tier for one cache name.
+    Entries are evicted in least-recently-used order once the byte budget is exceeded.
+    """
+
+    def __init__(self, name: str, max_bytes: int) -> None:
+        self.name = name
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, int, Optional[float]]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.RLock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            # A single entry larger than the whole budget would evict everything.
+            if size > self.max_bytes:
+                self.rejections += 1
+                return
+
+            expires_at = time.monotonic() + ttl if ttl else None
+            self._entries[key] = (value, size, expires_at)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes and self._entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def resize(self, max_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = max_bytes
+            while self.current_bytes > self.max_bytes and self._entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "cache_name": self.name,
+                "max_bytes": self.max_bytes,
+                "current_bytes": self.current_bytes,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "rejections": self.rejections,
+            }
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+
+_local_caches: Dict[str, LocalCacheTier] = {}
+_local_caches_lock = threading.Lock()
+
+
+def get_local_cache(cache_name: str) -> LocalCacheTier:
+    """Fetch or create the process-wide local tier for a cache name."""
+    local_cache = _local_caches.get(cache_name)
+    if local_cache is not None:
+        return local_cache
+
+    with _local_caches_lock:
+        if cache_name not in _local_caches:
+            _local_caches[cache_name] = LocalCacheTier(
+                cache_name, Config.get_cache_local_budget(cache_name)
+            )
+        return _local_caches[cache_name]
+
+
+def get_local_cache_stats() -> List[Dict[str, Any]]:
+    """Eviction, hit/miss counters and byte footprint for every local tier."""
+    with _local_caches_lock:
+        local_caches = list(_local_caches.values())
+    return [local_cache.stats() for local_cache in local_caches]
+
+
+def resize_local_caches() -> None:
+    """Re-apply the configured byte budgets to tiers created before configuration."""
+    with _local_caches_lock:
+        local_caches = list(_local_caches.items())
+    for cache_name, local_cache in local_caches:
+        local_cache.resize(Config.get_cache_local_budget(cache_name))
+
+
+def clear_local_caches(cache_names: Optional[List[str]] = None) -> None:
+    """Drop local entries for the given cache names (all tiers when omitted)."""
+    with _local_caches_lock:
+        local_caches = [
+            local_cache
+            for name, local_cache in _local_caches.items()
+            if cache_names is None or name in cache_names
+        ]
+    for local_cache in local_caches:
+        local_cache.clear()
+
+
+class TieredCacheEngine:
+    """
+    Cache engine that fronts HybridCacheEngine with a byte-bounded local tier.
+    Reads are served from the local tier first and fall through to the shared tier;
+    writes and deletes go to both.
+
+    Entries written with a partition_key are stamped with that tenant's namespace
+    generations, so purge_tenant_cache() invalidates them without touching keys.
+
+    The local tier is only eventually consistent across containers: a local copy
+    lives no longer than the shared entry it came from, nor Config.CACHE_LOCAL_TTL.
+    """
+
+    def __init__(self, cache_name: str) -> None:
+        self.cache_name = cache_name
+        self.local = get_local_cache(cache_name)
+        self.shared = HybridCacheEngine(cache_name)
+
+    def _generate_key(self, *args: Any) -> str:
+        return self.shared._generate_key(*args)
+
+    @staticmethod
+    def _local_ttl(ttl: Optional[float]) -> int:
+        local_ttl = Config.get_cache_local_ttl()
+        return local_ttl if ttl is None else max(1, min(int(ttl), local_ttl))
+
+    def get(self, key: str, partition_key: Optional[str] = None) -> Any:
+        value = self.local.get(key)
+        if value is None:
+            value = self.shared.get(key)
+            remaining = remaining_ttl(value)
+            if remaining is not None and remaining <= 0:
+                value = None
+            elif value is not None:
+                # Refill with what is left of the entry's own ttl, so a short-lived
+                # NOT_FOUND marker is not kept for the full CACHE_TTL.
+                self.local.set(key, value, ttl=self._local_ttl(remaining))
+
+        if value is not None and partition_key:
+            value = unwrap_value(value, partition_key, self.cache_name)
+            if value is None:
+                # Stamped under a purged namespace; free the local slot early.
+                self.local.delete(key)
+
+        if value is None:
+            cache_stats.record_miss(self.cache_name, partition_key)
+        else:
+            cache_stats.record_hit(self.cache_name, partition_key)
+        return value
+
+    def record_fill(self, partition_key: Optional[str], latency_ms: float) -> None:
+        cache_stats.record_fill(self.cache_name, partition_key, latency_ms)
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[int] = None,
+        partition_key: Optional[str] = None,
+    ) -> None:
+        if partition_key:
+            value = wrap_value(value, partition_key, self.cache_name, ttl=ttl)
+        self.local.set(key, value, ttl=self._local_ttl(ttl))
+        self.shared.set(key, value, ttl=ttl)
+
+    def delete(self, key: str) -> None:
+        self.local.delete(key)
+        self.shared.delete(key)
+
+
+def _is_resolve_info(value: Any) -> bool:
+    return isinstance(getattr(value, "context", None), dict) and hasattr(
+        value, "field_name"
+    )
+
+
+def method_cache(
+    ttl: int,
+    cache_name: str,
+    cache_enabled: Callable[[], bool] | bool = True,
+    cache_none: bool = False,
+) -> Callable:
+    """
+    Cache a getter's return value through TieredCacheEngine.
+    Keys are built through models/cache_keys.py, the same way the batch loaders
+    and purges build theirs, so all three address the same entries.
+
+    With cache_none, a None result is remembered as NOT_FOUND for
+    Config.CACHE_NEGATIVE_TTL seconds; creates purge it like any other entry.
+
+    Resolvers taking a graphene ResolveInfo first are keyed by the caller's
+    partition_key instead of the (per-request) info object.
+    """
+
+    def actual_decorator(original_function):
+        func_prefix = ".".join(
+            [original_function.__module__, original_function.__name__]
+        )
+        signature = inspect.signature(original_function)
+        parameter_names = list(signature.parameters)
+        has_partition_key = "partition_key" in parameter_names
+
+        @functools.wraps(original_function)
+        def wrapper_function(*args, **kwargs):
+            enabled = cache_enabled() if callable(cache_enabled) else cache_enabled
+            if not enabled:
+                return original_function(*args, **kwargs)
+
+            partition_key = None
+            if args and _is_resolve_info(args[0]):
+                partition_key = args[0].context.get("partition_key")
+                key_data = build_key_data((partition_key,) + tuple(args[1:]), kwargs)
+            else:
+                key_values = canonical_call_values(signature, args, kwargs)
+                if has_partition_key:
+                    partition_key = key_values[parameter_names.index("partition_key")]
+                key_data = build_key_data(key_values)
+
+            cache = TieredCacheEngine(cache_name)
+            cache_key = cache._generate_key(func_prefix, key_data)
+            cached_value = cache.get(cache_key, partition_key=partition_key)
+            if cached_value is not None:
+                return None if is_not_found(cached_value) else cached_value
+
+            started = time.perf_counter()
+            result = original_function(*args, **kwargs)
+            if result is not None:
+                cache.set(cache_key, result, ttl=ttl, partition_key=partition_key)
+            elif cache_none:
+                cache.set(
+                    cache_key,
+                    NOT_FOUND,
+                    ttl=Config.get_cache_negative_ttl(),
+                    partition_key=partition_key,
+                )
+            else:
+                return result
+            cache.record_fill(partition_key, (time.perf_counter() - started) * 1000)
+            return result
+
+        return wrapper_function
+
+    return actual_decorator
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import base64
+import datetime
+import functools
+import hashlib
+import hmac
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+import pendulum
+from graphene import ResolveInfo
+from silvaengine_dynamodb_base import resolve_list_decorator
+
+from ..handlers.config import Config
+from ..types.ai_marketing import PageInfoType
+
+CURSOR_ARGUMENTS = ("after", "first")
+PAGING_ARGUMENTS = CURSOR_ARGUMENTS + ("page_number", "limit", "with_total")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: bytes) -> bytes:
+    return hmac.new(Config.get_cursor_secret(), payload, hashlib.sha256).digest()
+
+
+def encode_cursor(partition_key: Optional[str], last_evaluated_key: Dict) -> str:
+    """
+    Opaque cursor for a DynamoDB LastEvaluatedKey, signed together with the
+    caller's partition_key so it can't be replayed from another tenant.
+    """
+    payload = json.dumps(
+        {"p": partition_key, "k": last_evaluated_key},
+        sort_keys=True,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+
+def decode_cursor(cursor: str, partition_key: Optional[str]) -> Dict:
+    """Verify a cursor and return its LastEvaluatedKey."""
+    try:
+        encoded_payload, encoded_signature = cursor.split(".", 1)
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise ValueError("Invalid cursor.")
+
+    data = json.loads(payload)
+    if data.get("p") != partition_key:
+        raise ValueError("Invalid cursor.")
+    return data["k"]
+
+
+def _page_size(first: Optional[int]) -> int:
+    if first is None:
+        return Config.get_cursor_default_page_size()
+    return max(1, min(int(first), Config.get_cursor_max_page_size()))
+
+
+def _skip_count(*args: Any, **kwargs: Any) -> None:
+    return None
+
+
+def high_watermark(items: List[Any]) -> Optional[str]:
+    """Latest updated_at among items (models or types) as ISO 8601, or None."""
+    latest = None
+    for item in items:
+        value = getattr(item, "updated_at", None)
+        if isinstance(value, str):
+            try:
+                value = pendulum.parse(value)
+            except ValueError:
+                continue
+        if isinstance(value, datetime.datetime) and (latest is None or value > latest):
+            latest = value
+    if latest is None:
+        return None
+    return latest.astimezone(datetime.timezone.utc).isoformat()
+
+
+def _without_count(original_function: Callable) -> Callable:
+    @functools.wraps(original_function)
+    def wrapper_function(info: ResolveInfo, **kwargs: Dict[str, Any]) -> Any:
+        inquiry_funct, _, args = original_function(info, **kwargs)
+        return inquiry_funct, _skip_count, args
+
+    return wrapper_function
+
+
+def paginated_list_decorator(
+    attributes_to_get: List[str],
+    list_type_class: Any,
+    type_funct: Callable[[ResolveInfo, Any], Any],
+) -> Callable:
+    """
+    resolve_list_decorator with cursor pagination. Requests carrying `after` or
+    `first` read one page straight from the query/scan, resuming at the cursor's
+    LastEvaluatedKey, so each page costs the same regardless of depth.
+    Requests without them keep the page_number/limit behaviour.
+    `with_total: false` skips the count_funct call entirely; cursor pages are
+    only counted when `with_total: true` is asked for. `explain: true` adds the
+    query planner's chosen plan and estimated read units as `query_plan`.
+    Every page reports the latest updated_at it holds as
+    `page_info.high_watermark`, the resume point for incremental sync.
+    """
+
+    def actual_decorator(original_function):
+        list_field = original_function.__name__[len("resolve_") :]
+        page_number_resolver = resolve_list_decorator(
+            attributes_to_get=attributes_to_get,
+            list_type_class=list_type_class,
+            type_funct=type_funct,
+        )(original_function)
+        uncounted_resolver = resolve_list_decorator(
+            attributes_to_get=attributes_to_get,
+            list_type_class=list_type_class,
+            type_funct=type_funct,
+        )(_without_count(original_function))
+
+        def list_resolver(info: ResolveInfo, **kwargs: Dict[str, Any]) -> Any:
+            with_total = kwargs.pop("with_total", None)
+            if not any(kwargs.get(argument) is not None for argument in CURSOR_ARGUMENTS):
+                if with_total is False:
+                    return uncounted_resolver(info, **kwargs)
+                return page_number_resolver(info, **kwargs)
+
+            after = kwargs.pop("after", None)
+            first = _page_size(kwargs.pop("first", None))
+            partition_key = info.context.get("partition_key")
+
+            inquiry_funct, count_funct, args = original_function(info, **kwargs)
+            inquiry_results = inquiry_funct(
+                *args,
+                limit=first,
+                last_evaluated_key=(
+                    decode_cursor(after, partition_key) if after else None
+                ),
+            )
+            results = list(inquiry_results)
+            items = [type_funct(info, item) for item in results]
+            last_evaluated_key = inquiry_results.last_evaluated_key
+
+            return list_type_class(
+                **{list_field: items},
+                page_size=first,
+                total=count_funct(*args) if with_total else None,
+                page_info=PageInfoType(
+                    end_cursor=(
+                        encode_cursor(partition_key, last_evaluated_key)
+                        if last_evaluated_key
+                        else None
+                    ),
+                    has_next_page=last_evaluated_key is not None,
+                    high_watermark=high_watermark(results),
+                ),
+            )
+
+        @functools.wraps(original_function)
+        def wrapper_function(info: ResolveInfo, **kwargs: Dict[str, Any]) -> Any:
+            explain = kwargs.pop("explain", None)
+            result = list_resolver(info, **kwargs)
+            if not hasattr(result, "page_info"):
+                return result
+
+            if result.page_info is None:
+                result.page_info = PageInfoType(
+                    high_watermark=high_watermark(
+                        getattr(result, list_field, None) or []
+                    )
+                )
+            if explain:
+                # Planning again is cheap: the partition statistics are cached.
+                inquiry_funct, _, _ = original_function(
+                    info,
+                    **{
+                        key: value
+                        for key, value in kwargs.items()
+                        if key not in PAGING_ARGUMENTS
+                    },
+                )
+                plan = getattr(inquiry_funct, "plan", None)
+                result.query_plan = plan.explain() if plan is not None else None
+            return result
+
+        return wrapper_function
+
+    return actual_decorator
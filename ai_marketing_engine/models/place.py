@@ -7,25 +7,46 @@ __author__ = "bibow"
 import functools
 import logging
 import traceback
-from typing import Any, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 
 import pendulum
 from graphene import ResolveInfo
 from pynamodb.attributes import ListAttribute, UnicodeAttribute, UTCDateTimeAttribute
-from pynamodb.indexes import AllProjection, LocalSecondaryIndex
+from pynamodb.exceptions import UpdateError
+from pynamodb.indexes import AllProjection, GlobalSecondaryIndex, LocalSecondaryIndex
 from silvaengine_dynamodb_base import (
     BaseModel,
     delete_decorator,
-    insert_update_decorator,
     monitor_decorator,
-    resolve_list_decorator,
 )
-from silvaengine_utility import method_cache
 from silvaengine_utility.serializer import Serializer
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from ..handlers.config import Config
 from ..types.place import PlaceListType, PlaceType
+from .bulk import bulk_insert_update, merge_item
+from .change_capture import capture_changes
+from .counters import maintain_entity_counters
+from .foreign_keys import validate_foreign_keys
+from .geo import covering_cells, haversine_km, parse_coordinate, place_geohash
+from .local_cache import method_cache
+from .pagination import paginated_list_decorator
+from .query_planner import (
+    BEGINS_WITH,
+    EQ,
+    RANGE,
+    IndexSpec,
+    QueryPlanner,
+    updated_window,
+)
+from .scan import ParallelScan, parallel_scan
+from .search import (
+    build_search_name,
+    normalize_search_key,
+    search_name_changed,
+)
+from .upsert import Upserted, upsert_decorator, upsert_item
 
 
 class RegionIndex(LocalSecondaryIndex):
@@ -42,6 +63,42 @@ class RegionIndex(LocalSecondaryIndex):
     region = UnicodeAttribute(range_key=True)
 
 
+class SearchNameIndex(GlobalSecondaryIndex):
+    class Meta:
+        # index_name is optional, but can be provided to override the default name
+        index_name = "search_name-index"
+        billing_mode = "PAY_PER_REQUEST"
+        projection = AllProjection()
+
+    # Normalized name (see models/search.py) for begins_with key conditions
+    partition_key = UnicodeAttribute(hash_key=True)
+    search_name = UnicodeAttribute(range_key=True)
+
+
+class GeohashIndex(GlobalSecondaryIndex):
+    class Meta:
+        # index_name is optional, but can be provided to override the default name
+        index_name = "geohash-index"
+        billing_mode = "PAY_PER_REQUEST"
+        projection = AllProjection()
+
+    # Geohash of latitude/longitude (see models/geo.py); cells are prefixes
+    partition_key = UnicodeAttribute(hash_key=True)
+    geohash = UnicodeAttribute(range_key=True)
+
+
+class UpdatedAtIndex(GlobalSecondaryIndex):
+    class Meta:
+        # index_name is optional, but can be provided to override the default name
+        index_name = "updated_at-index"
+        billing_mode = "PAY_PER_REQUEST"
+        projection = AllProjection()
+
+    # Time-ordered per tenant, for incremental sync (updated_since/updated_before)
+    partition_key = UnicodeAttribute(hash_key=True)
+    updated_at = UTCDateTimeAttribute(range_key=True)
+
+
 class PlaceModel(BaseModel):
     class Meta(BaseModel.Meta):
         table_name = "ame-places"
@@ -62,38 +119,94 @@ class PlaceModel(BaseModel):
     updated_by = UnicodeAttribute()
     created_at = UTCDateTimeAttribute()
     updated_at = UTCDateTimeAttribute()
+    search_name = UnicodeAttribute(null=True)
+    geohash = UnicodeAttribute(null=True)
     region_index = RegionIndex()
+    search_name_index = SearchNameIndex()
+    geohash_index = GeohashIndex()
+    updated_at_index = UpdatedAtIndex()
+
+
+# Access paths the list resolver can key on
+PLACE_QUERY_PLANNER = QueryPlanner(
+    "place",
+    PlaceModel,
+    [
+        IndexSpec(),
+        IndexSpec(PlaceModel.region_index, "region"),
+        IndexSpec(
+            PlaceModel.search_name_index, "search_name", operators=(BEGINS_WITH,)
+        ),
+        IndexSpec(PlaceModel.updated_at_index, "updated_at", operators=(RANGE,)),
+    ],
+    scan_funct=ParallelScan(PlaceModel),
+)
 
+# Attributes a place mutation sets
+PLACE_FIELDS = [
+    "region",
+    "latitude",
+    "longitude",
+    "business_name",
+    "address",
+    "phone_number",
+    "website",
+    "types",
+    "corporation_uuid",
+]
+
+# Arguments a place cannot be created without
+PLACE_REQUIRED_FIELDS = ["region", "latitude", "longitude", "business_name", "address"]
+
+# Attributes the list resolver filters or indexes on
+PLACE_LIST_FIELDS = [
+    "region",
+    "latitude",
+    "longitude",
+    "business_name",
+    "address",
+    "website",
+    "corporation_uuid",
+]
+
+
+def purge_cache(list_fields: Optional[List[str]] = None):
+    """
+    Purge the entity's caches after a successful write. list_fields names the
+    attributes list resolvers filter on; updates leaving them untouched keep
+    the cached key lists.
+    """
 
-def purge_cache():
     def actual_decorator(original_function):
         @functools.wraps(original_function)
         def wrapper_function(*args, **kwargs):
             try:
+                from ..models.list_cache import membership_changed
+
+                invalidate_lists = membership_changed(kwargs, list_fields)
+
                 # Execute original function first
                 result = original_function(*args, **kwargs)
+                if isinstance(result, Upserted):
+                    # Upserts have no entity up front; compare both sides.
+                    invalidate_lists = result.changed(list_fields)
 
                 # Then purge cache after successful operation
                 from ..models.cache import purge_entity_cascading_cache
+                from ..models.cache_keys import build_purge_keys
 
-                # Get entity keys from entity parameter (for updates)
-                entity_keys = {}
-                entity = kwargs.get("entity")
-                if entity:
-                    entity_keys["place_uuid"] = getattr(entity, "place_uuid", None)
-
-                # Fallback to kwargs (for creates/deletes)
-                if not entity_keys.get("place_uuid"):
-                    entity_keys["place_uuid"] = kwargs.get("place_uuid")
-
-                partition_key = args[0].context.get("partition_key")
+                # Same key registry the getter and batch loader write through
+                context_keys, entity_keys = build_purge_keys(
+                    "place", args[0].context, kwargs
+                )
 
                 purge_entity_cascading_cache(
                     args[0].context.get("logger"),
                     entity_type="place",
-                    context_keys={"partition_key": partition_key},
-                    entity_keys=entity_keys if entity_keys else None,
+                    context_keys=context_keys,
+                    entity_keys=entity_keys,
                     cascade_depth=3,
+                    invalidate_lists=invalidate_lists,
                 )
 
                 return result
@@ -116,9 +229,10 @@ def purge_cache():
     ttl=Config.get_cache_ttl(),
     cache_name=Config.get_cache_name("models", "place"),
     cache_enabled=Config.is_cache_enabled,
+    cache_none=True,
 )
-def get_place(partition_key: str, place_uuid: str) -> PlaceModel:
-    return PlaceModel.get(partition_key, place_uuid)
+def get_place(partition_key: str, place_uuid: str) -> PlaceModel | None:
+    return _get_place(partition_key, place_uuid)
 
 
 @retry(
@@ -126,12 +240,16 @@ def get_place(partition_key: str, place_uuid: str) -> PlaceModel:
     wait=wait_exponential(multiplier=1, max=60),
     stop=stop_after_attempt(5),
 )
-def _get_place(partition_key: str, place_uuid: str) -> PlaceModel:
-    return PlaceModel.get(partition_key, place_uuid)
+def _get_place(partition_key: str, place_uuid: str) -> PlaceModel | None:
+    try:
+        return PlaceModel.get(partition_key, place_uuid)
+    except PlaceModel.DoesNotExist:
+        return None
 
 
 def get_place_count(partition_key: str, place_uuid: str) -> int:
-    return PlaceModel.count(partition_key, PlaceModel.place_uuid == place_uuid)
+    """Existence check of the write decorators, read uncached (never stale)."""
+    return 0 if _get_place(partition_key, place_uuid) is None else 1
 
 
 def get_place_type(info: ResolveInfo, place: PlaceModel) -> PlaceType:
@@ -151,18 +269,15 @@ def get_place_type(info: ResolveInfo, place: PlaceModel) -> PlaceType:
 
 def resolve_place(info: ResolveInfo, **kwargs: Dict[str, Any]) -> PlaceType | None:
     partition_key = info.context["partition_key"]
-    count = get_place_count(partition_key, kwargs.get("place_uuid"))
-    if count == 0:
+    place = get_place(partition_key, kwargs.get("place_uuid"))
+    if place is None:
         return None
 
-    return get_place_type(
-        info,
-        get_place(partition_key, kwargs.get("place_uuid")),
-    )
+    return get_place_type(info, place)
 
 
 @monitor_decorator
-@resolve_list_decorator(
+@paginated_list_decorator(
     attributes_to_get=["partition_key", "place_uuid", "region"],
     list_type_class=PlaceListType,
     type_funct=get_place_type,
@@ -176,105 +291,245 @@ def resolve_place_list(info: ResolveInfo, **kwargs: Dict[str, Any]) -> Any:
     address = kwargs.get("address")
     website = kwargs.get("website")
     coorporation_uuid = kwargs.get("corporation_uuid")
+    search = normalize_search_key(kwargs.get("search"))
 
-    args = []
-    inquiry_funct = PlaceModel.scan
-    count_funct = PlaceModel.count
-    if partition_key:
-        args = [partition_key, None]
-        inquiry_funct = PlaceModel.query
-        if region:
-            inquiry_funct = PlaceModel.region_index.query
-            args[1] = PlaceModel.region == region
-            count_funct = PlaceModel.region_index.count
-
-    the_filters = None  # We can add filters for the query.
+    the_filters = []  # Conditions no index can serve.
     if latitude:
-        the_filters &= PlaceModel.latitude == latitude
+        the_filters.append(PlaceModel.latitude == latitude)
     if longitude:
-        the_filters &= PlaceModel.longitude == longitude
+        the_filters.append(PlaceModel.longitude == longitude)
     if business_name:
-        the_filters &= PlaceModel.business_name.contains(business_name)
+        the_filters.append(PlaceModel.business_name.contains(business_name))
     if address:
-        the_filters &= PlaceModel.address.contains(address)
+        the_filters.append(PlaceModel.address.contains(address))
     if website:
-        the_filters &= PlaceModel.website.contains(website)
+        the_filters.append(PlaceModel.website.contains(website))
     if coorporation_uuid:
-        the_filters &= PlaceModel.corporation_uuid == coorporation_uuid
-    if the_filters is not None:
-        args.append(the_filters)
+        the_filters.append(PlaceModel.corporation_uuid == coorporation_uuid)
+
+    plan = PLACE_QUERY_PLANNER.plan(
+        partition_key,
+        {
+            "region": (EQ, region),
+            "search_name": (BEGINS_WITH, search),
+            "updated_at": (RANGE, updated_window(kwargs)),
+        },
+        the_filters,
+        # Sync reads (updated_since/updated_before) stream in time order.
+        order_by="updated_at",
+    )
+    return plan.inquiry_funct, plan.count_funct, plan.args
+
+
+def _query_geohash_cell(partition_key: str, cell: str) -> List[PlaceModel]:
+    if not cell:
+        return list(PlaceModel.query(partition_key))
+    return list(
+        PlaceModel.geohash_index.query(
+            partition_key, PlaceModel.geohash.startswith(cell)
+        )
+    )
+
+
+@monitor_decorator
+def resolve_places_near(info: ResolveInfo, **kwargs: Dict[str, Any]) -> PlaceListType:
+    """
+    Places within radius_km of a point, nearest first. The covering geohash
+    cells are queried concurrently and exact distances computed in one
+    vectorized pass before sorting.
+    """
+    partition_key = info.context["partition_key"]
+    latitude = kwargs["latitude"]
+    longitude = kwargs["longitude"]
+    radius_km = kwargs["radius_km"]
+    limit = min(
+        kwargs.get("limit") or Config.get_cursor_default_page_size(),
+        Config.get_cursor_max_page_size(),
+    )
+
+    cells = covering_cells(latitude, longitude, radius_km)
+    with ThreadPoolExecutor(max_workers=len(cells)) as executor:
+        cell_places = executor.map(
+            functools.partial(_query_geohash_cell, partition_key), cells
+        )
+        places = {place.place_uuid: place for chunk in cell_places for place in chunk}
+
+    candidates = [
+        (place, parse_coordinate(place.latitude), parse_coordinate(place.longitude))
+        for place in places.values()
+    ]
+    candidates = [candidate for candidate in candidates if None not in candidate[1:]]
+    if not candidates:
+        return PlaceListType(place_list=[], total=0)
+
+    distances = haversine_km(
+        latitude,
+        longitude,
+        [candidate[1] for candidate in candidates],
+        [candidate[2] for candidate in candidates],
+    )
+    nearest = [
+        (distance, candidate[0])
+        for distance, candidate in zip(distances.tolist(), candidates)
+        if distance <= radius_km
+    ]
+    nearest.sort(key=lambda pair: pair[0])
+
+    place_list = []
+    for distance, place in nearest[:limit]:
+        place_type = get_place_type(info, place)
+        place_type.distance_km = round(distance, 3)
+        place_list.append(place_type)
+    return PlaceListType(place_list=place_list, total=len(nearest))
+
+
+def backfill_place_geohashes(logger: logging.Logger) -> int:
+    """Write geohash on places created before it existed; returns places updated."""
+    updated = 0
+    for place in parallel_scan(PlaceModel):
+        geohash = place_geohash(place.latitude, place.longitude)
+        if geohash is None or place.geohash == geohash:
+            continue
+        place.update(actions=[PlaceModel.geohash.set(geohash)])
+        updated += 1
+
+    logger.info(f"Backfilled geohash on {updated} place(s).")
+    return updated
+
+
+def _new_place_cols(info: ResolveInfo, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    cols = {
+        "region": kwargs["region"],
+        "latitude": kwargs["latitude"],
+        "longitude": kwargs["longitude"],
+        "business_name": kwargs["business_name"],
+        "address": kwargs["address"],
+        "endpoint_id": info.context.get("endpoint_id"),
+        "part_id": info.context.get("part_id"),
+        "updated_by": kwargs["updated_by"],
+        "created_at": pendulum.now("UTC"),
+        "updated_at": pendulum.now("UTC"),
+    }
+    for key in ["phone_number", "types", "website", "corporation_uuid"]:
+        if key in kwargs:
+            cols[key] = kwargs[key]
+    search_name = build_search_name("place", kwargs)
+    if search_name is not None:
+        cols["search_name"] = search_name
+    geohash = place_geohash(kwargs["latitude"], kwargs["longitude"])
+    if geohash is not None:
+        cols["geohash"] = geohash
+    return cols
+
+
+def build_place_item(
+    info: ResolveInfo, kwargs: Dict[str, Any], entity: Optional[PlaceModel] = None
+) -> PlaceModel:
+    """The full item insertUpdatePlaces puts for kwargs (entity None to create)."""
+    if entity is None:
+        return PlaceModel(
+            kwargs["partition_key"],
+            kwargs["place_uuid"],
+            **_new_place_cols(info, kwargs),
+        )
+
+    return merge_item(
+        PlaceModel,
+        entity,
+        kwargs,
+        PLACE_FIELDS,
+        cols={
+            "search_name": build_search_name("place", kwargs, entity),
+            "geohash": place_geohash(
+                kwargs.get("latitude", entity.latitude),
+                kwargs.get("longitude", entity.longitude),
+            ),
+        },
+    )
 
-    return inquiry_funct, count_funct, args
 
+def insert_update_places(
+    info: ResolveInfo, items: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    return bulk_insert_update(info, "place", items, build_place_item)
 
-@insert_update_decorator(
+
+@upsert_decorator(
     keys={
         "hash_key": "partition_key",
         "range_key": "place_uuid",
     },
-    model_funct=_get_place,
-    count_funct=get_place_count,
     type_funct=get_place_type,
 )
-@purge_cache()
-def insert_update_place(info: ResolveInfo, **kwargs: Dict[str, Any]) -> None:
-    partition_key = kwargs.get("partition_key")
-    place_uuid = kwargs.get("place_uuid")
-    if kwargs.get("entity") is None:
-        cols = {
-            "region": kwargs["region"],
-            "latitude": kwargs["latitude"],
-            "longitude": kwargs["longitude"],
-            "business_name": kwargs["business_name"],
-            "address": kwargs["address"],
-            "endpoint_id": info.context.get("endpoint_id"),
-            "part_id": info.context.get("part_id"),
-            "updated_by": kwargs["updated_by"],
-            "created_at": pendulum.now("UTC"),
-            "updated_at": pendulum.now("UTC"),
-        }
-        for key in ["phone_number", "types", "website", "corporation_uuid"]:
-            if key in kwargs:
-                cols[key] = kwargs[key]
-        PlaceModel(
-            partition_key,
-            place_uuid,
-            **cols,
-        ).save()
-        return
-
-    place = kwargs.get("entity")
-    actions = [
-        PlaceModel.updated_by.set(kwargs["updated_by"]),
-        PlaceModel.updated_at.set(pendulum.now("UTC")),
-    ]
-
-    # Map of kwargs keys to PlaceModel attributes
-    field_map = {
-        "region": PlaceModel.region,
-        "latitude": PlaceModel.latitude,
-        "longitude": PlaceModel.longitude,
-        "business_name": PlaceModel.business_name,
-        "address": PlaceModel.address,
-        "phone_number": PlaceModel.phone_number,
-        "website": PlaceModel.website,
-        "types": PlaceModel.types,
+@purge_cache(list_fields=PLACE_LIST_FIELDS)
+@maintain_entity_counters("place")
+@validate_foreign_keys("place")
+@capture_changes("place", PLACE_FIELDS, "place_uuid")
+def insert_update_place(info: ResolveInfo, **kwargs: Dict[str, Any]) -> Upserted:
+    """
+    Create or update a place with one conditional UpdateItem instead of a read
+    followed by save/update. A generated place_uuid creates (the write fails if
+    the key exists); a given one upserts when every PLACE_REQUIRED_FIELDS
+    argument is present and otherwise only updates an existing place.
+    """
+    partition_key = kwargs["partition_key"]
+    place_uuid = kwargs["place_uuid"]
+    missing = [field for field in PLACE_REQUIRED_FIELDS if field not in kwargs]
+    if kwargs.get("creating") and missing:
+        raise KeyError(missing[0])
+
+    values = {
+        field: None if kwargs[field] == "null" else kwargs[field]
+        for field in PLACE_FIELDS
+        if field in kwargs
     }
+    values["updated_by"] = kwargs["updated_by"]
+    values["updated_at"] = pendulum.now("UTC")
+    if search_name_changed("place", kwargs):
+        values["search_name"] = build_search_name("place", kwargs)
+    if "latitude" in kwargs and "longitude" in kwargs:
+        values["geohash"] = place_geohash(kwargs["latitude"], kwargs["longitude"])
+
+    if kwargs.get("creating"):
+        condition = PlaceModel.place_uuid.does_not_exist()
+    elif missing:
+        condition = PlaceModel.place_uuid.exists()
+    else:
+        condition = None
 
-    # Add actions dynamically based on the presence of keys in kwargs
-    for key, field in field_map.items():
-        if key in kwargs:  # Check if the key exists in kwargs
-            actions.append(field.set(None if kwargs[key] == "null" else kwargs[key]))
-
-    # Handle corporation_uuid separately
-    if kwargs.get("corporation_uuid") is not None:
-        actions.append(PlaceModel.corporation_uuid.set(kwargs.get("corporation_uuid")))
-    elif "corporation_uuid" in kwargs:
-        actions.append(PlaceModel.corporation_uuid.remove())
-
-    # Update the place
-    place.update(actions=actions)
-    return
+    try:
+        upserted = upsert_item(
+            PlaceModel,
+            partition_key,
+            place_uuid,
+            values,
+            create_values={
+                "endpoint_id": info.context.get("endpoint_id"),
+                "part_id": info.context.get("part_id"),
+                "created_at": values["updated_at"],
+            },
+            condition=condition,
+        )
+    except UpdateError as error:
+        if error.cause_response_code != "ConditionalCheckFailedException":
+            raise
+        if kwargs.get("creating"):
+            raise ValueError(f"Place already exists: {place_uuid}") from error
+        raise ValueError(f"Place not found: {place_uuid}") from error
+
+    # A single coordinate change needs the stored other one for the geohash.
+    if ("latitude" in kwargs) != ("longitude" in kwargs):
+        place = upserted.new
+        geohash = place_geohash(place.latitude, place.longitude)
+        if geohash != place.geohash:
+            place.update(
+                actions=[
+                    PlaceModel.geohash.set(geohash)
+                    if geohash is not None
+                    else PlaceModel.geohash.remove()
+                ]
+            )
+    return upserted
 
 
 @delete_decorator(
@@ -282,9 +537,13 @@ def insert_update_place(info: ResolveInfo, **kwargs: Dict[str, Any]) -> None:
         "hash_key": "partition_key",
         "range_key": "place_uuid",
     },
-    model_funct=get_place,
+    model_funct=_get_place,
 )
 @purge_cache()
+@maintain_entity_counters("place", deleting=True)
 def delete_place(info: ResolveInfo, **kwargs: Dict[str, Any]) -> bool:
+    if kwargs.get("entity") is None:
+        return False
+
     kwargs.get("entity").delete()
     return True
@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import datetime
+import json
+import math
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pynamodb.expressions.condition import Condition
+
+from ..handlers.config import Config
+from .counters import (
+    ENTITY_COUNTER_DIMENSIONS,
+    CounterCount,
+    get_counter_key,
+    get_entity_count,
+)
+
+# Operators an index range key can serve as a key condition.
+EQ = "eq"
+BEGINS_WITH = "begins_with"
+# Value is (since, before): since inclusive, before exclusive, either optional.
+RANGE = "range"
+
+# DynamoDB bills eventually consistent reads as half a unit per 4 KB read.
+READ_UNIT_BYTES = 4096
+EVENTUAL_READ_UNIT = 0.5
+
+
+def in_range(value: Any, since: Any = None, before: Any = None) -> bool:
+    if value is None:
+        return False
+    return (since is None or value >= since) and (before is None or value < before)
+
+
+def updated_window(
+    kwargs: Dict[str, Any],
+) -> Tuple[Optional[datetime.datetime], Optional[datetime.datetime]]:
+    """
+    (updated_since, updated_before) of a list request as UTC datetimes, for a
+    RANGE condition on updated_at. Naive values are taken to be UTC.
+    """
+
+    def as_utc(value: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            return value.replace(tzinfo=datetime.timezone.utc)
+        return value.astimezone(datetime.timezone.utc)
+
+    return as_utc(kwargs.get("updated_since")), as_utc(kwargs.get("updated_before"))
+
+
+class IndexSpec(object):
+    """
+    One access path of a model: the base table (no index, which can't narrow
+    a list) or a secondary index whose range key can serve the given key
+    condition operators on range_field.
+    """
+
+    def __init__(
+        self,
+        index: Any = None,
+        range_field: Optional[str] = None,
+        operators: Sequence[str] = (EQ,),
+    ) -> None:
+        self.name = index.Meta.index_name if index is not None else "table"
+        self.index = index
+        self.range_field = range_field
+        self.operators = tuple(operators)
+
+
+class IndexStatistics(object):
+    """Cardinality statistics of one tenant partition, from a sampled page."""
+
+    def __init__(
+        self,
+        partition_items: int,
+        partition_items_exact: bool,
+        sample: Dict[str, List[Any]],
+        sampled_items: int,
+        average_item_bytes: float,
+    ) -> None:
+        self.partition_items = partition_items
+        self.partition_items_exact = partition_items_exact
+        self.sample = sample
+        self.sampled_items = sampled_items
+        self.average_item_bytes = average_item_bytes
+        self.distinct = {
+            field: self._distinct(values) for field, values in sample.items()
+        }
+
+    def _distinct(self, values: List[Any]) -> float:
+        # GEE estimator: values seen once in the sample stand for many unseen
+        # ones, values seen more often are assumed fully observed.
+        frequencies = Counter(Counter(values).values())
+        if not values:
+            return 1.0
+        scale = math.sqrt(max(self.partition_items, len(values)) / len(values))
+        return max(
+            scale * frequencies.get(1, 0)
+            + sum(count for seen, count in frequencies.items() if seen > 1),
+            1.0,
+        )
+
+    def estimate_items(self, field: str, operator: str, value: Any) -> float:
+        values = self.sample.get(field, [])
+        total = self.partition_items
+        if not values:
+            return float(total)
+        if operator == EQ:
+            matches = sum(1 for sampled in values if sampled == value)
+            if matches:
+                return total * matches / len(values)
+            return total / max(self.distinct[field], len(values))
+        if operator == RANGE:
+            matches = sum(1 for sampled in values if in_range(sampled, *value))
+            # Rows outside the sampled span can still match; never estimate 0.
+            return max(total * matches / len(values), total / len(values) / 2)
+        matches = sum(
+            1 for sampled in values if str(sampled or "").startswith(str(value))
+        )
+        if matches:
+            return total * matches / len(values)
+        return total / len(values) / 2
+
+    def read_units(self, items: float) -> float:
+        return max(
+            math.ceil(items * self.average_item_bytes / READ_UNIT_BYTES), 1
+        ) * EVENTUAL_READ_UNIT
+
+
+class QueryPlan(object):
+    """The access path chosen for one list request, with its cost estimate."""
+
+    def __init__(
+        self,
+        planner: "QueryPlanner",
+        partition_key: Optional[str],
+        spec: Optional[IndexSpec],
+        conditions: Dict[str, Tuple[str, Any]],
+        count_funct: Callable,
+        args: List[Any],
+        candidates: Optional[List[Dict[str, Any]]] = None,
+        statistics: Optional[IndexStatistics] = None,
+    ) -> None:
+        self.planner = planner
+        self.partition_key = partition_key
+        self.spec = spec
+        self.conditions = conditions
+        self.count_funct = count_funct
+        self.args = args
+        self.candidates = candidates or []
+        self.statistics = statistics
+
+        if spec is None:
+            funct = planner.scan_funct
+        else:
+            funct = (
+                planner.model_class if spec.index is None else spec.index
+            ).query
+        self.inquiry_funct = PlannedInquiry(funct, self)
+
+    @property
+    def index_name(self) -> str:
+        return "scan" if self.spec is None else self.spec.name
+
+    def explain(self) -> Dict[str, Any]:
+        """The plan as a dict; a plan with a single candidate is costed here."""
+        if self.spec is not None and self.statistics is None:
+            self.statistics, self.candidates = self.planner.cost(
+                self.partition_key, [self.spec], self.conditions
+            )
+
+        if self.spec is None:
+            key_condition, filter_condition = None, (self.args or [None])[0]
+        else:
+            key_condition = self.args[1]
+            filter_condition = self.args[2] if len(self.args) > 2 else None
+        plan = {
+            "entity_type": self.planner.entity_type,
+            "index": self.index_name,
+            "key_condition": None if key_condition is None else str(key_condition),
+            "filter": None if filter_condition is None else str(filter_condition),
+            "candidates": [
+                {
+                    key: value
+                    for key, value in candidate.items()
+                    if not key.startswith("_")
+                }
+                for candidate in self.candidates
+            ],
+        }
+        if self.statistics is not None:
+            chosen = self.candidates[0]
+            plan.update(
+                {
+                    "estimated_items": chosen["estimated_items"],
+                    "estimated_read_units": chosen["estimated_read_units"],
+                    "partition_items": self.statistics.partition_items,
+                    "partition_items_exact": self.statistics.partition_items_exact,
+                    "sampled_items": self.statistics.sampled_items,
+                }
+            )
+        return plan
+
+
+class PlannedInquiry(object):
+    """inquiry_funct that carries the plan it was chosen by (for `explain`)."""
+
+    def __init__(self, funct: Callable, plan: QueryPlan) -> None:
+        self.funct = funct
+        self.plan = plan
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self.funct(*args, **kwargs)
+
+
+class QueryPlanner(object):
+    """
+    Chooses the access path of a list resolver. Each candidate index that can
+    serve one of the requested conditions as its key condition is costed with
+    per-partition statistics the planner samples and keeps itself; the
+    cheapest wins and every other condition becomes a filter.
+    """
+
+    def __init__(
+        self,
+        entity_type: str,
+        model_class: Any,
+        indexes: List[IndexSpec],
+        scan_funct: Optional[Callable] = None,
+    ) -> None:
+        self.entity_type = entity_type
+        self.model_class = model_class
+        self.indexes = indexes
+        self.scan_funct = scan_funct or model_class.scan
+        self._statistics: Dict[str, Tuple[IndexStatistics, float]] = {}
+        self._lock = threading.Lock()
+
+    def _condition(self, field: str, operator: str, value: Any) -> Condition:
+        attribute = getattr(self.model_class, field)
+        if operator == BEGINS_WITH:
+            return attribute.startswith(value)
+        if operator == RANGE:
+            since, before = value
+            if since is None:
+                return attribute < before
+            if before is None:
+                return attribute >= since
+            # A key condition allows a single comparison, and between() is
+            # inclusive: stop one tick (a microsecond for datetimes) short.
+            return attribute.between(since, before - datetime.timedelta.resolution)
+        return attribute == value
+
+    def _sample(self, partition_key: str) -> IndexStatistics:
+        fields = [spec.range_field for spec in self.indexes if spec.range_field]
+        sample: Dict[str, List[Any]] = {field: [] for field in fields}
+        sampled_bytes = 0
+        results = self.model_class.query(
+            partition_key, limit=Config.get_planner_sample_size()
+        )
+        sampled_items = 0
+        for item in results:
+            sampled_items += 1
+            for field in fields:
+                sample[field].append(getattr(item, field, None))
+            sampled_bytes += len(
+                json.dumps(item.attribute_values, default=str).encode("utf-8")
+            )
+
+        exhausted = results.last_evaluated_key is None
+        counted = get_entity_count(
+            partition_key, get_counter_key(self.entity_type)
+        )
+        if counted is not None:
+            partition_items, exact = counted, True
+        else:
+            partition_items, exact = sampled_items, exhausted
+
+        return IndexStatistics(
+            partition_items=max(partition_items, sampled_items),
+            partition_items_exact=exact,
+            sample=sample,
+            sampled_items=sampled_items,
+            average_item_bytes=(
+                sampled_bytes / sampled_items if sampled_items else 0.0
+            ),
+        )
+
+    def statistics(self, partition_key: str) -> IndexStatistics:
+        now = time.monotonic()
+        cached = self._statistics.get(partition_key)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+
+        statistics = self._sample(partition_key)
+        with self._lock:
+            self._statistics[partition_key] = (
+                statistics,
+                now + Config.get_planner_stats_ttl(),
+            )
+        return statistics
+
+    def _count_funct(
+        self,
+        partition_key: str,
+        spec: IndexSpec,
+        conditions: Dict[str, Tuple[str, Any]],
+        fallback: Callable,
+    ) -> Callable:
+        # Unfiltered totals come from the maintained counters where one exists.
+        if spec.range_field is None:
+            return CounterCount(self.entity_type, partition_key, fallback)
+        operator, value = conditions[spec.range_field]
+        if operator == EQ and spec.range_field in ENTITY_COUNTER_DIMENSIONS.get(
+            self.entity_type, []
+        ):
+            return CounterCount(
+                self.entity_type,
+                partition_key,
+                fallback,
+                **{spec.range_field: value},
+            )
+        return fallback
+
+    def cost(
+        self,
+        partition_key: str,
+        specs: List[IndexSpec],
+        conditions: Dict[str, Tuple[str, Any]],
+    ) -> Tuple[IndexStatistics, List[Dict[str, Any]]]:
+        """Estimated items and read units of each access path, cheapest first."""
+        statistics = self.statistics(partition_key)
+        candidates = []
+        for spec in specs:
+            items = (
+                float(statistics.partition_items)
+                if spec.range_field is None
+                else statistics.estimate_items(
+                    spec.range_field, *conditions[spec.range_field]
+                )
+            )
+            candidates.append(
+                {
+                    "index": spec.name,
+                    "estimated_items": round(items),
+                    "estimated_read_units": statistics.read_units(items),
+                    "_items": items,
+                    "_spec": spec,
+                }
+            )
+        # Stable sort: ties keep the declared index order.
+        candidates.sort(key=lambda candidate: candidate["_items"])
+        return statistics, candidates
+
+    def plan(
+        self,
+        partition_key: Optional[str],
+        conditions: Dict[str, Tuple[str, Any]],
+        filters: Optional[List[Condition]] = None,
+        order_by: Optional[str] = None,
+    ) -> QueryPlan:
+        """
+        conditions maps field -> (EQ | BEGINS_WITH | RANGE, value) for every
+        requested argument an index could key on; filters are the remaining
+        conditions. With order_by, an applicable index sorted on that field
+        is used regardless of cost, so results come back in that order.
+        """
+        conditions = {
+            field: condition
+            for field, condition in conditions.items()
+            if condition[1] not in (None, "", (None, None))
+        }
+
+        if not partition_key:
+            the_filters = None
+            for field, (operator, value) in conditions.items():
+                the_filters &= self._condition(field, operator, value)
+            for condition in filters or []:
+                the_filters &= condition
+            return QueryPlan(
+                self,
+                partition_key,
+                None,
+                conditions,
+                self.model_class.count,
+                [the_filters] if the_filters is not None else [],
+            )
+
+        # A key condition never reads more than the whole partition, so the
+        # base table is only the plan when no index applies.
+        usable = [
+            spec
+            for spec in self.indexes
+            if spec.range_field is not None
+            and spec.range_field in conditions
+            and conditions[spec.range_field][0] in spec.operators
+        ] or [spec for spec in self.indexes if spec.range_field is None]
+        ordered = [spec for spec in usable if spec.range_field == order_by]
+        if order_by is not None and ordered:
+            usable = ordered
+
+        statistics, candidates = None, []
+        chosen = usable[0]
+        if len(usable) > 1:
+            statistics, candidates = self.cost(partition_key, usable, conditions)
+            chosen = candidates[0]["_spec"]
+
+        args: List[Any] = [partition_key, None]
+        if chosen.range_field is not None:
+            args[1] = self._condition(
+                chosen.range_field, *conditions[chosen.range_field]
+            )
+
+        the_filters = None
+        for field, (operator, value) in conditions.items():
+            if field != chosen.range_field:
+                the_filters &= self._condition(field, operator, value)
+        for condition in filters or []:
+            the_filters &= condition
+        if the_filters is not None:
+            args.append(the_filters)
+
+        fallback = (
+            self.model_class if chosen.index is None else chosen.index
+        ).count
+        count_funct = (
+            self._count_funct(partition_key, chosen, conditions, fallback)
+            if the_filters is None
+            else fallback
+        )
+
+        return QueryPlan(
+            self,
+            partition_key,
+            chosen,
+            conditions,
+            count_funct,
+            args,
+            candidates,
+            statistics,
+        )
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import json
+import logging
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, Optional
+
+from pynamodb.expressions.condition import Condition
+from silvaengine_utility.serializer import Serializer
+
+from ..handlers.config import Config
+from .list_cache import get_model_class
+
+# Seconds a segment worker waits on a full buffer before re-checking whether
+# the consumer has gone away.
+_PUT_TIMEOUT = 0.1
+
+_SEGMENT_DONE = object()
+
+
+class _SegmentError(object):
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+def _put(buffer: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            buffer.put(item, timeout=_PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def parallel_scan(
+    model_class: Any,
+    filter_condition: Optional[Condition] = None,
+    total_segments: Optional[int] = None,
+    buffer_size: Optional[int] = None,
+    capacity_budget: Optional[float] = None,
+    **scan_kwargs: Any,
+) -> Iterator[Any]:
+    """
+    Scan a table as Segment/TotalSegments across a thread pool, yielding items
+    as they arrive. At most buffer_size items are held ahead of the consumer, so
+    workers block instead of loading the table into memory, and the read
+    capacity budget (RCU/s) is split evenly between segments. Items come back in
+    no particular order. Closing the generator early stops the workers.
+    """
+    total_segments = total_segments or Config.get_scan_total_segments()
+    capacity_budget = capacity_budget or Config.get_scan_capacity_budget()
+    rate_limit = capacity_budget / total_segments if capacity_budget else None
+    buffer: queue.Queue = queue.Queue(
+        maxsize=buffer_size or Config.get_scan_buffer_size()
+    )
+    stop = threading.Event()
+
+    def scan_segment(segment: int) -> None:
+        try:
+            for item in model_class.scan(
+                filter_condition,
+                segment=segment,
+                total_segments=total_segments,
+                rate_limit=rate_limit,
+                **scan_kwargs,
+            ):
+                if not _put(buffer, item, stop):
+                    return
+        except Exception as e:
+            _put(buffer, _SegmentError(e), stop)
+        _put(buffer, _SEGMENT_DONE, stop)
+
+    executor = ThreadPoolExecutor(
+        max_workers=total_segments, thread_name_prefix="ame-scan"
+    )
+    try:
+        for segment in range(total_segments):
+            executor.submit(scan_segment, segment)
+
+        remaining = total_segments
+        while remaining:
+            item = buffer.get()
+            if item is _SEGMENT_DONE:
+                remaining -= 1
+            elif isinstance(item, _SegmentError):
+                raise item.error
+            else:
+                yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=False)
+
+
+class ParallelScanIterator(object):
+    """Iterator over a parallel scan exposing the ResultIterator attributes used by resolvers."""
+
+    def __init__(self, items: Iterator[Any]) -> None:
+        self._items = items
+        self._total_count = 0
+
+    def __iter__(self) -> "ParallelScanIterator":
+        return self
+
+    def __next__(self) -> Any:
+        item = next(self._items)
+        self._total_count += 1
+        return item
+
+    @property
+    def last_evaluated_key(self) -> None:
+        # A parallel scan always runs to completion.
+        return None
+
+    @property
+    def total_count(self) -> int:
+        return self._total_count
+
+
+class ParallelScan(object):
+    """
+    Drop-in for Model.scan as a list resolver's inquiry_funct. Full scans run
+    segmented in parallel; page reads (limit or last_evaluated_key given) stay
+    serial, since they are bounded and a cursor addresses a single scan.
+    """
+
+    def __init__(self, model_class: Any) -> None:
+        self.model_class = model_class
+
+    def __call__(
+        self,
+        filter_condition: Optional[Condition] = None,
+        limit: Optional[int] = None,
+        last_evaluated_key: Optional[Dict[str, Any]] = None,
+        **scan_kwargs: Any,
+    ) -> Any:
+        if limit is not None or last_evaluated_key is not None:
+            return self.model_class.scan(
+                filter_condition,
+                limit=limit,
+                last_evaluated_key=last_evaluated_key,
+                **scan_kwargs,
+            )
+        return ParallelScanIterator(
+            parallel_scan(self.model_class, filter_condition, **scan_kwargs)
+        )
+
+
+def export_entities(
+    logger: logging.Logger,
+    entity_type: str,
+    bucket_name: str,
+    object_key: str,
+    filter_condition: Optional[Condition] = None,
+) -> Dict[str, Any]:
+    """
+    Export every item of an entity's table to S3 as JSON lines via a parallel
+    scan. Items are spooled to a temporary file, so memory stays bounded by the
+    scan buffer regardless of table size.
+    """
+    started = time.perf_counter()
+    count = 0
+    with tempfile.TemporaryFile(mode="w+b") as spool:
+        for item in parallel_scan(get_model_class(entity_type), filter_condition):
+            spool.write(
+                json.dumps(
+                    Serializer.json_normalize(item.attribute_values), default=str
+                ).encode("utf-8")
+            )
+            spool.write(b"\n")
+            count += 1
+
+        spool.seek(0)
+        Config.aws_s3.upload_fileobj(spool, bucket_name, object_key)
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Exported {count} {entity_type} item(s) to s3://{bucket_name}/{object_key} in {elapsed:.1f}s"
+    )
+    return {
+        "entity_type": entity_type,
+        "bucket_name": bucket_name,
+        "object_key": object_key,
+        "count": count,
+    }
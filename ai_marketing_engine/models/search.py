@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import logging
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+from .list_cache import get_model_class
+from .scan import parallel_scan
+
+# Source attributes of each entity's search_name, in the order they're joined.
+SEARCH_NAME_FIELDS: Dict[str, List[str]] = {
+    "place": ["business_name"],
+    "contact_profile": ["first_name", "last_name"],
+    "corporation_profile": ["business_name"],
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_search_key(*parts: Optional[str]) -> Optional[str]:
+    """Lower-cased, accent-folded, whitespace-collapsed form used for prefix search."""
+    text = " ".join(str(part) for part in parts if part not in (None, "", "null"))
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = _WHITESPACE.sub(" ", text.casefold()).strip()
+    return text or None
+
+
+def build_search_name(
+    entity_type: str, kwargs: Dict[str, Any], entity: Any = None
+) -> Optional[str]:
+    """search_name for an entity after applying the mutation arguments."""
+    values = []
+    for field in SEARCH_NAME_FIELDS[entity_type]:
+        value = kwargs[field] if field in kwargs else getattr(entity, field, None)
+        values.append(None if value == "null" else value)
+    return normalize_search_key(*values)
+
+
+def search_name_changed(entity_type: str, kwargs: Dict[str, Any]) -> bool:
+    return any(field in kwargs for field in SEARCH_NAME_FIELDS[entity_type])
+
+
+def search_name_action(
+    model_class: Any, entity_type: str, entity: Any, kwargs: Dict[str, Any]
+) -> Any:
+    """Update action keeping search_name in step with its source fields."""
+    search_name = build_search_name(entity_type, kwargs, entity)
+    if search_name is None:
+        return model_class.search_name.remove()
+    return model_class.search_name.set(search_name)
+
+
+def backfill_search_names(logger: logging.Logger, entity_type: str) -> int:
+    """Write search_name on items created before it existed; returns items updated."""
+    model_class = get_model_class(entity_type)
+    updated = 0
+    for item in parallel_scan(model_class):
+        search_name = build_search_name(entity_type, {}, item)
+        if search_name is None or getattr(item, "search_name", None) == search_name:
+            continue
+        item.update(actions=[model_class.search_name.set(search_name)])
+        updated += 1
+
+    logger.info(f"Backfilled search_name on {updated} {entity_type} item(s).")
+    return updated
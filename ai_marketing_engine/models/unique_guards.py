@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import logging
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+import pendulum
+from pynamodb.attributes import UnicodeAttribute, UTCDateTimeAttribute
+from pynamodb.connection import Connection
+from pynamodb.exceptions import PutError, TransactWriteError
+from pynamodb.transactions import TransactWrite
+from silvaengine_dynamodb_base import BaseModel
+
+# Attribute kept unique per tenant, and the range key owning each value.
+UNIQUE_FIELDS: Dict[str, Tuple[str, str]] = {
+    "contact_profile": ("email", "contact_uuid"),
+    "corporation_profile": ("external_id", "corporation_uuid"),
+}
+FIELD_ENTITY_TYPES: Dict[str, str] = {
+    field: entity_type for entity_type, (field, _) in UNIQUE_FIELDS.items()
+}
+
+# Entity types whose backfill is recorded as done (it is never undone).
+_backfilled: Set[str] = set()
+
+
+class UniqueGuardModel(BaseModel):
+    """
+    Reservation of a unique attribute value. A guard is written in the same
+    conditional transaction as its entity, so a value already owned by another
+    entity cancels the write instead of needing an index pre-query.
+    """
+
+    class Meta(BaseModel.Meta):
+        table_name = "ame-unique_guards"
+
+    # "<partition_key>#<field>#<value>"
+    guard_key = UnicodeAttribute(hash_key=True)
+    partition_key = UnicodeAttribute()
+    guarded_field = UnicodeAttribute()
+    owner_key = UnicodeAttribute()
+    created_at = UTCDateTimeAttribute()
+
+
+def get_guard_key(partition_key: str, field: str, value: str) -> str:
+    return f"{partition_key}#{field}#{value}"
+
+
+def get_backfill_marker_key(entity_type: str) -> str:
+    return f"#backfilled#{entity_type}"
+
+
+def is_backfilled(entity_type: str) -> bool:
+    """Whether backfill_unique_guards has completed for entity_type."""
+    if entity_type in _backfilled:
+        return True
+    try:
+        UniqueGuardModel.get(get_backfill_marker_key(entity_type))
+    except UniqueGuardModel.DoesNotExist:
+        return False
+    _backfilled.add(entity_type)
+    return True
+
+
+def get_indexed_owners(
+    entity_type: str, partition_key: str, values: Sequence[str]
+) -> Dict[str, Optional[str]]:
+    """
+    Owner of each value (None when free) per the entity table's <field>_index.
+    Entities saved before guards existed have none, so until the backfill is
+    done this is checked next to the guards.
+    """
+    from .list_cache import get_model_class
+
+    field, owner_field = UNIQUE_FIELDS[entity_type]
+    model_class = get_model_class(entity_type)
+    index = getattr(model_class, f"{field}_index")
+    owners: Dict[str, Optional[str]] = dict.fromkeys(values)
+    for value in owners:
+        for entity in index.query(
+            partition_key, getattr(model_class, field) == value, limit=1
+        ):
+            owners[value] = getattr(entity, owner_field)
+    return owners
+
+
+def guard_item(
+    partition_key: str, field: str, value: str, owner_key: str
+) -> UniqueGuardModel:
+    return UniqueGuardModel(
+        get_guard_key(partition_key, field, value),
+        partition_key=partition_key,
+        guarded_field=field,
+        owner_key=owner_key,
+        created_at=pendulum.now("UTC"),
+    )
+
+
+def transact_write(model_class: Any) -> TransactWrite:
+    """TransactWrite on a connection configured like model_class's table."""
+    meta = model_class.Meta
+    return TransactWrite(
+        connection=Connection(
+            region=getattr(meta, "region", None),
+            host=getattr(meta, "host", None),
+            aws_access_key_id=getattr(meta, "aws_access_key_id", None),
+            aws_secret_access_key=getattr(meta, "aws_secret_access_key", None),
+        )
+    )
+
+
+def reserve_unique(
+    transaction: TransactWrite,
+    partition_key: str,
+    field: str,
+    value: str,
+    owner_key: str,
+) -> None:
+    """Claim value for owner_key; cancels the transaction if another owns it."""
+    transaction.save(
+        guard_item(partition_key, field, value, owner_key),
+        condition=(
+            UniqueGuardModel.guard_key.does_not_exist()
+            | (UniqueGuardModel.owner_key == owner_key)
+        ),
+    )
+
+
+def release_unique(
+    transaction: TransactWrite,
+    partition_key: str,
+    field: str,
+    value: str,
+    owner_key: str,
+) -> None:
+    """Give up owner_key's claim on value, leaving other owners' claims alone."""
+    transaction.delete(
+        UniqueGuardModel(get_guard_key(partition_key, field, value)),
+        condition=(
+            UniqueGuardModel.guard_key.does_not_exist()
+            | (UniqueGuardModel.owner_key == owner_key)
+        ),
+    )
+
+
+def guard_changes(
+    old_value: Optional[str], new_value: Optional[str]
+) -> Tuple[Optional[str], Optional[str]]:
+    """(value to reserve, value to release) when old_value becomes new_value."""
+    old_value = None if old_value in (None, "", "null") else old_value
+    new_value = None if new_value in (None, "", "null") else new_value
+    if old_value == new_value:
+        return None, None
+    return new_value, old_value
+
+
+def get_unique_owners(
+    partition_key: str, field: str, values: Sequence[str]
+) -> Dict[str, Optional[str]]:
+    """Owner of each value (None when free), read with batch_get."""
+    values = list(dict.fromkeys(values))
+    owners: Dict[str, Optional[str]] = dict.fromkeys(values)
+    keys = {get_guard_key(partition_key, field, value): value for value in values}
+    for guard in UniqueGuardModel.batch_get(list(keys)):
+        owners[keys[guard.guard_key]] = guard.owner_key
+
+    entity_type = FIELD_ENTITY_TYPES[field]
+    free = [value for value, owner in owners.items() if owner is None]
+    if free and not is_backfilled(entity_type):
+        for value, owner in get_indexed_owners(
+            entity_type, partition_key, free
+        ).items():
+            owners[value] = owner
+    return owners
+
+
+def get_unique_owner(partition_key: str, field: str, value: str) -> Optional[str]:
+    try:
+        guard = UniqueGuardModel.get(get_guard_key(partition_key, field, value))
+        return guard.owner_key
+    except UniqueGuardModel.DoesNotExist:
+        return None
+
+
+def duplicate_message(entity_type: str, value: str, owner_key: str) -> str:
+    field, owner_field = UNIQUE_FIELDS[entity_type]
+    label = entity_type.replace("_", " ").capitalize()
+    return (
+        f"{label} with {field} '{value}' already exists for {owner_field}: "
+        f"{owner_key}"
+    )
+
+
+@contextmanager
+def unique_guarded(
+    entity_type: str,
+    transaction: Callable[[], TransactWrite],
+    partition_key: str,
+    owner_key: str,
+    value: Optional[str],
+) -> Iterator[TransactWrite]:
+    """
+    Run a transaction that reserves value for owner_key. When it is cancelled
+    because another entity owns the value, raise the duplicate ValueError.
+    """
+    field = UNIQUE_FIELDS[entity_type][0]
+    if value and not is_backfilled(entity_type):
+        owner = get_indexed_owners(entity_type, partition_key, [value])[value]
+        if owner not in (None, owner_key):
+            raise ValueError(duplicate_message(entity_type, value, owner))
+
+    try:
+        with transaction() as write:
+            yield write
+    except TransactWriteError as error:
+        owner = get_unique_owner(partition_key, field, value) if value else None
+        if owner in (None, owner_key):
+            raise
+        raise ValueError(duplicate_message(entity_type, value, owner)) from error
+
+
+def backfill_unique_guards(logger: logging.Logger, entity_type: str) -> int:
+    """
+    Reserve the unique values of entities saved before guards existed. The
+    first entity seen keeps a value shared by several; the others are logged.
+    Once the scan completes the backfill is recorded as done, which turns off
+    the index lookups next to the guards.
+    """
+    from .list_cache import get_model_class
+    from .scan import parallel_scan
+
+    field, owner_field = UNIQUE_FIELDS[entity_type]
+    written = 0
+    duplicates: List[str] = []
+    for entity in parallel_scan(get_model_class(entity_type)):
+        value = getattr(entity, field, None)
+        if not value:
+            continue
+        owner_key = getattr(entity, owner_field)
+        try:
+            guard_item(entity.partition_key, field, value, owner_key).save(
+                condition=(
+                    UniqueGuardModel.guard_key.does_not_exist()
+                    | (UniqueGuardModel.owner_key == owner_key)
+                )
+            )
+            written += 1
+        except PutError as error:
+            if error.cause_response_code != "ConditionalCheckFailedException":
+                raise
+            duplicates.append(f"{entity.partition_key}#{value} ({owner_key})")
+
+    if duplicates:
+        logger.warning(
+            f"Duplicate {entity_type} {field} values left unguarded: {duplicates}"
+        )
+    UniqueGuardModel(
+        get_backfill_marker_key(entity_type),
+        partition_key="*",
+        guarded_field=field,
+        owner_key="*",
+        created_at=pendulum.now("UTC"),
+    ).save()
+    _backfilled.add(entity_type)
+    logger.info(f"Backfilled {written} {entity_type} {field} guard(s).")
+    return written
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pynamodb.expressions.condition import Condition
+
+from .unique_guards import transact_write
+
+# DynamoDB request limit: TransactWriteItems takes 100 actions.
+TRANSACT_WRITE_SIZE = 100
+
+Operation = Tuple[str, Any, Dict[str, Any]]  # (method, item, keyword arguments)
+
+
+class UnitOfWork(object):
+    """
+    The writes of one mutation, collected and committed with TransactWriteItems
+    when its `with` block exits cleanly (nothing is written if it raises).
+    Takes the save/update/delete calls of a TransactWrite, so it serves as the
+    transaction of unique_guarded. Past TRANSACT_WRITE_SIZE actions the writes
+    are committed as consecutive transactions in the order they were added;
+    operations added within one group() always share a transaction.
+    """
+
+    def __init__(self, model_class: Any) -> None:
+        self.model_class = model_class
+        self._groups: List[List[Operation]] = []
+        self._group: Optional[List[Operation]] = None
+
+    def __enter__(self) -> "UnitOfWork":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.commit()
+
+    def __len__(self) -> int:
+        return sum(len(group) for group in self._groups)
+
+    def _add(self, method: str, item: Any, **kwargs: Any) -> None:
+        if self._group is not None:
+            self._group.append((method, item, kwargs))
+        else:
+            self._groups.append([(method, item, kwargs)])
+
+    def save(self, item: Any, condition: Optional[Condition] = None) -> None:
+        self._add("save", item, condition=condition)
+
+    def update(
+        self, item: Any, actions: List[Any], condition: Optional[Condition] = None
+    ) -> None:
+        self._add("update", item, actions=actions, condition=condition)
+
+    def delete(self, item: Any, condition: Optional[Condition] = None) -> None:
+        self._add("delete", item, condition=condition)
+
+    @contextmanager
+    def group(self) -> Iterator["UnitOfWork"]:
+        """Keep the operations added in the block in one transaction."""
+        self._group = []
+        try:
+            yield self
+        finally:
+            group, self._group = self._group, None
+            if group:
+                self._groups.append(group)
+
+    def chunks(self) -> List[List[Operation]]:
+        """The operations packed into transactions, groups kept whole."""
+        chunks: List[List[Operation]] = [[]]
+        for group in self._groups:
+            if len(group) > TRANSACT_WRITE_SIZE:
+                raise ValueError(
+                    f"A unit of work group holds {len(group)} writes; "
+                    f"a transaction takes {TRANSACT_WRITE_SIZE}."
+                )
+            if len(chunks[-1]) + len(group) > TRANSACT_WRITE_SIZE:
+                chunks.append([])
+            chunks[-1].extend(group)
+        return [chunk for chunk in chunks if chunk]
+
+    def commit(self) -> int:
+        """Write everything collected; returns the number of transactions."""
+        chunks = self.chunks()
+        for chunk in chunks:
+            with transact_write(self.model_class) as transaction:
+                for method, item, kwargs in chunk:
+                    getattr(transaction, method)(item, **kwargs)
+        self._groups = []
+        return len(chunks)
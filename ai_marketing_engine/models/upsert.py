@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import functools
+import traceback
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from graphene import ResolveInfo
+from pynamodb.constants import ALL_OLD
+from pynamodb.expressions.condition import Condition
+
+from .bulk import new_range_key
+
+
+class Upserted(object):
+    """Outcome of upsert_item: the item before the write (None if created) and after."""
+
+    def __init__(self, old: Optional[Any], new: Any) -> None:
+        self.old = old
+        self.new = new
+
+    @property
+    def created(self) -> bool:
+        return self.old is None
+
+    def changed(self, fields: Optional[Sequence[str]]) -> bool:
+        """Whether any of fields (all when None) differs between old and new."""
+        if self.old is None or fields is None:
+            return True
+        return any(
+            getattr(self.old, field, None) != getattr(self.new, field, None)
+            for field in fields
+        )
+
+
+def upsert_item(
+    model_class: Any,
+    hash_key: str,
+    range_key: str,
+    values: Dict[str, Any],
+    create_values: Optional[Dict[str, Any]] = None,
+    condition: Optional[Condition] = None,
+) -> Upserted:
+    """
+    Create or update an item with one UpdateItem and no read: values are set
+    (None removes the attribute), create_values only where still missing
+    (if_not_exists, e.g. created_at). The call returns ALL_OLD; the new item is
+    the old one with the same changes applied, so callers see both sides of the
+    write without a second round trip.
+    """
+    attributes = model_class.get_attributes()
+    actions = [
+        attributes[field].remove() if value is None else attributes[field].set(value)
+        for field, value in values.items()
+    ] + [
+        attributes[field].set(attributes[field] | value)
+        for field, value in (create_values or {}).items()
+    ]
+    hash_value, range_value = model_class(
+        hash_key, range_key
+    )._get_hash_range_key_serialized_values()
+    data = model_class._get_connection().update_item(
+        hash_value,
+        range_key=range_value,
+        actions=actions,
+        condition=condition,
+        return_values=ALL_OLD,
+    )
+
+    old = (
+        model_class.from_raw_data(data["Attributes"])
+        if data and data.get("Attributes")
+        else None
+    )
+    new_values = dict(old.attribute_values) if old is not None else {}
+    for field, value in (create_values or {}).items():
+        new_values.setdefault(field, value)
+    new_values.update(values)
+    new_values.pop(model_class._hash_key_attribute().attr_name, None)
+    new_values.pop(model_class._range_key_attribute().attr_name, None)
+    new = model_class(
+        hash_key,
+        range_key,
+        **{field: value for field, value in new_values.items() if value is not None},
+    )
+    return Upserted(old, new)
+
+
+def upsert_decorator(
+    keys: Dict[str, str], type_funct: Callable[[ResolveInfo, Any], Any]
+) -> Callable:
+    """
+    Stand-in for insert_update_decorator on functions that write with
+    upsert_item and return its Upserted: no existence read before the write
+    and no getter read after it. The hash key defaults to the context's
+    partition_key and a missing range key is generated (the function then
+    creates); the GraphQL type is built from the item the write returned.
+    """
+
+    def actual_decorator(original_function):
+        @functools.wraps(original_function)
+        def wrapper_function(info: ResolveInfo, **kwargs: Dict[str, Any]) -> Any:
+            try:
+                if not kwargs.get(keys["hash_key"]):
+                    kwargs[keys["hash_key"]] = info.context.get(keys["hash_key"])
+                if not kwargs.get(keys["range_key"]):
+                    kwargs[keys["range_key"]] = new_range_key()
+                    kwargs["creating"] = True
+
+                upserted = original_function(info, **kwargs)
+                return type_funct(info, upserted.new)
+            except Exception as e:
+                log = traceback.format_exc()
+                info.context.get("logger").error(log)
+                raise e
+
+        return wrapper_function
+
+    return actual_decorator
@@ -11,27 +11,38 @@ from graphene import ResolveInfo
 
 def initialize_tables(logger: logging.Logger) -> None:
     """
-    Initialize all database tables if they don't exist.
+    Initialize all database tables if they don't exist, and add the global
+    secondary indexes declared since an existing table was created.
     Called during Config.initialize() when initialize_tables=True.
     """
     from .activity_history import ActivityHistoryModel
     from .attribute_value import AttributeValueModel
+    from .cascade_delete import CascadeDeleteJobModel
     from .contact_profile import ContactProfileModel
     from .contact_request import ContactRequestModel
-    from .corporation_profile import CorporationProfileModel
+    from .corporation_profile import CorporationCategoryModel, CorporationProfileModel
+    from .counters import EntityCounterModel
+    from .idempotency import IdempotencyRecordModel
     from .place import PlaceModel
+    from .unique_guards import UniqueGuardModel
 
     models: List = [
         PlaceModel,
         ContactProfileModel,
         ContactRequestModel,
         CorporationProfileModel,
+        CorporationCategoryModel,
         AttributeValueModel,
         ActivityHistoryModel,
+        EntityCounterModel,
+        UniqueGuardModel,
+        CascadeDeleteJobModel,
+        IdempotencyRecordModel,
     ]
 
     for model in models:
         if model.exists():
+            _create_missing_indexes(logger, model)
             continue
 
         table_name = model.Meta.table_name
@@ -40,6 +51,60 @@ def initialize_tables(logger: logging.Logger) -> None:
         logger.info(f"The {table_name} table has been created.")
 
 
+def _create_missing_indexes(logger: logging.Logger, model: Any) -> None:
+    """
+    Create the model's global secondary indexes its existing table lacks. New
+    indexes backfill in the background, so they serve queries once ACTIVE.
+    Local secondary indexes can only be created with the table; missing ones
+    are logged.
+    """
+    table_name = model.Meta.table_name
+    connection = model._get_connection()
+    description = connection.describe_table()
+    existing = {
+        index["IndexName"]
+        for key in ("GlobalSecondaryIndexes", "LocalSecondaryIndexes")
+        for index in description.get(key, [])
+    }
+    schema = model._get_schema()
+
+    for index in schema["local_secondary_indexes"]:
+        if index["index_name"] not in existing:
+            logger.warning(
+                f"The {index['index_name']} local index is missing from the "
+                f"{table_name} table and can only be added by recreating it."
+            )
+
+    client = connection.connection.client
+    for index in schema["global_secondary_indexes"]:
+        if index["index_name"] in existing:
+            continue
+        key_names = {key["AttributeName"] for key in index["key_schema"]}
+        # UpdateTable takes one index creation at a time, on an ACTIVE table.
+        client.get_waiter("table_exists").wait(TableName=table_name)
+        client.update_table(
+            TableName=table_name,
+            AttributeDefinitions=[
+                attribute
+                for attribute in schema["attribute_definitions"]
+                if attribute["AttributeName"] in key_names
+            ],
+            GlobalSecondaryIndexUpdates=[
+                {
+                    "Create": {
+                        "IndexName": index["index_name"],
+                        "KeySchema": index["key_schema"],
+                        "Projection": index["projection"],
+                    }
+                }
+            ],
+        )
+        logger.info(
+            f"The {index['index_name']} index has been added to the {table_name} "
+            "table."
+        )
+
+
 def insert_update_attribute_values(
     info: ResolveInfo,
     data_type: str,
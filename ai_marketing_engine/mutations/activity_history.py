@@ -7,11 +7,12 @@ __author__ = "bibow"
 import traceback
 from typing import Any, Dict
 
-from graphene import Boolean, Field, Int, Mutation, String
+from graphene import Boolean, Field, Float, Mutation, String
 
 from silvaengine_utility import JSONCamelCase
 
 from ..models.activity_history import delete_activity_history, insert_activity_history
+from ..models.idempotency import idempotent_mutation
 from ..types.activity_history import ActivityHistoryType
 
 
@@ -24,8 +25,10 @@ class InsertActivityHistory(Mutation):
         log = String(required=False)
         type = String(required=False)
         updated_by = String(required=True)
+        idempotency_key = String(required=False)
 
     @staticmethod
+    @idempotent_mutation
     def mutate(
         root: Any, info: Any, **kwargs: Dict[str, Any]
     ) -> "InsertActivityHistory":
@@ -44,9 +47,11 @@ class DeleteActivityHistory(Mutation):
 
     class Arguments:
         id = String(required=True)
-        timestamp = Int(required=True)
+        timestamp = Float(required=True)
+        idempotency_key = String(required=False)
 
     @staticmethod
+    @idempotent_mutation
     def mutate(
         root: Any, info: Any, **kwargs: Dict[str, Any]
     ) -> "DeleteActivityHistory":
@@ -13,6 +13,7 @@ from ..models.attribute_value import (
     delete_attribute_value,
     insert_update_attribute_value,
 )
+from ..models.idempotency import idempotent_mutation
 from ..types.attribute_value import AttributeValueType
 
 
@@ -27,8 +28,10 @@ class InsertUpdateAttributeValue(Mutation):
         status = String(required=False)
         value = String(required=False)
         updated_by = String(required=True)
+        idempotency_key = String(required=False)
 
     @staticmethod
+    @idempotent_mutation
     def mutate(
         root: Any, info: Any, **kwargs: Dict[str, Any]
     ) -> "InsertUpdateAttributeValue":
@@ -48,8 +51,10 @@ class DeleteAttributeValue(Mutation):
     class Arguments:
         data_type_attribute_name = String(required=True)
         value_version_uuid = String(required=True)
+        idempotency_key = String(required=False)
 
     @staticmethod
+    @idempotent_mutation
     def mutate(
         root: Any, info: Any, **kwargs: Dict[str, Any]
     ) -> "DeleteAttributeValue":
@@ -0,0 +1,31 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import traceback
+from typing import Any, Dict
+
+from graphene import Boolean, Mutation, String
+
+from ..models.cache import purge_tenant_cache
+
+
+class PurgeTenantCache(Mutation):
+    ok = Boolean()
+    generation = String()
+
+    @staticmethod
+    def mutate(root: Any, info: Any, **kwargs: Dict[str, Any]) -> "PurgeTenantCache":
+        try:
+            # Always scoped to the caller's own partition.
+            generation = purge_tenant_cache(
+                info.context.get("logger"), info.context["partition_key"]
+            )
+        except Exception as e:
+            log = traceback.format_exc()
+            info.context.get("logger").error(log)
+            raise e
+
+        return PurgeTenantCache(ok=True, generation=str(generation))
@@ -7,14 +7,19 @@ __author__ = "bibow"
 import traceback
 from typing import Any, Dict
 
-from graphene import Boolean, Field, Mutation, String
+from graphene import Boolean, Field, InputObjectType, List, Mutation, String
 
 from silvaengine_utility import JSONCamelCase
 
+from ..models.cascade_delete import start_cascade_delete_job
 from ..models.contact_profile import (
     delete_contact_profile,
     insert_update_contact_profile,
+    insert_update_contact_profiles,
 )
+from ..models.idempotency import idempotent_mutation
+from ..types.ai_marketing import BulkItemResultType
+from ..types.cascade_delete import CascadeDeleteJobType
 from ..types.contact_profile import ContactProfileType
 
 
@@ -30,8 +35,10 @@ class InsertUpdateContactProfile(Mutation):
         last_name = String(required=False)
         data = JSONCamelCase(required=False)
         updated_by = String(required=True)
+        idempotency_key = String(required=False)
 
     @staticmethod
+    @idempotent_mutation
     def mutate(
         root: Any, info: Any, **kwargs: Dict[str, Any]
     ) -> "InsertUpdateContactProfile":
@@ -45,21 +52,72 @@ class InsertUpdateContactProfile(Mutation):
         return InsertUpdateContactProfile(contact_profile=contact_profile)
 
 
+class ContactProfileInput(InputObjectType):
+    place_uuid = String(required=False)
+    contact_uuid = String(required=False)
+    email = String(required=False)
+    first_name = String(required=False)
+    last_name = String(required=False)
+    data = JSONCamelCase(required=False)
+
+
+class InsertUpdateContactProfiles(Mutation):
+    results = List(BulkItemResultType)
+
+    class Arguments:
+        contact_profiles = List(ContactProfileInput, required=True)
+        updated_by = String(required=True)
+        idempotency_key = String(required=False)
+
+    @staticmethod
+    @idempotent_mutation
+    def mutate(
+        root: Any, info: Any, **kwargs: Dict[str, Any]
+    ) -> "InsertUpdateContactProfiles":
+        try:
+            results = insert_update_contact_profiles(
+                info,
+                [
+                    dict(contact_profile, updated_by=kwargs["updated_by"])
+                    for contact_profile in kwargs["contact_profiles"]
+                ],
+            )
+        except Exception as e:
+            log = traceback.format_exc()
+            info.context.get("logger").error(log)
+            raise e
+
+        return InsertUpdateContactProfiles(results=results)
+
+
 class DeleteContactProfile(Mutation):
     ok = Boolean()
+    cascade_delete_job = Field(CascadeDeleteJobType)
 
     class Arguments:
         contact_uuid = String(required=True)
+        # Also delete its child entities in a background cascade delete job
+        cascade = Boolean(required=False)
+        idempotency_key = String(required=False)
 
     @staticmethod
+    @idempotent_mutation
     def mutate(
         root: Any, info: Any, **kwargs: Dict[str, Any]
     ) -> "DeleteContactProfile":
         try:
+            cascade = kwargs.pop("cascade", False)
             ok = delete_contact_profile(info, **kwargs)
+            cascade_delete_job = (
+                start_cascade_delete_job(
+                    info, "contact_profile", kwargs["contact_uuid"]
+                )
+                if ok and cascade
+                else None
+            )
         except Exception as e:
             log = traceback.format_exc()
             info.context.get("logger").error(log)
             raise e
 
-        return DeleteContactProfile(ok=ok)
+        return DeleteContactProfile(ok=ok, cascade_delete_job=cascade_delete_job)
@@ -13,6 +13,7 @@ from ..models.contact_request import (
     delete_contact_request,
     insert_update_contact_request,
 )
+from ..models.idempotency import idempotent_mutation
 from ..types.contact_request import ContactRequestType
 
 
@@ -26,8 +27,10 @@ class InsertUpdateContactRequest(Mutation):
         request_title = String(required=False)
         request_detail = String(required=False)
         updated_by = String(required=True)
+        idempotency_key = String(required=False)
 
     @staticmethod
+    @idempotent_mutation
     def mutate(
         root: Any, info: Any, **kwargs: Dict[str, Any]
     ) -> "InsertUpdateContactRequest":
@@ -46,8 +49,10 @@ class DeleteContactRequest(Mutation):
 
     class Arguments:
         request_uuid = String(required=True)
+        idempotency_key = String(required=False)
 
     @staticmethod
+    @idempotent_mutation
     def mutate(
         root: Any, info: Any, **kwargs: Dict[str, Any]
     ) -> "DeleteContactRequest":
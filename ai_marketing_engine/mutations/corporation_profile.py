@@ -7,14 +7,19 @@ __author__ = "bibow"
 import traceback
 from typing import Any, Dict
 
-from graphene import Boolean, Field, List, Mutation, String
+from graphene import Boolean, Field, InputObjectType, List, Mutation, String
 
 from silvaengine_utility import JSONCamelCase
 
+from ..models.cascade_delete import start_cascade_delete_job
 from ..models.corporation_profile import (
     delete_corporation_profile,
     insert_update_corporation_profile,
+    insert_update_corporation_profiles,
 )
+from ..models.idempotency import idempotent_mutation
+from ..types.ai_marketing import BulkItemResultType
+from ..types.cascade_delete import CascadeDeleteJobType
 from ..types.corporation_profile import CorporationProfileType
 
 
@@ -30,8 +35,10 @@ class InsertUpdateCorporationProfile(Mutation):
         address = JSONCamelCase(required=False)
         data = JSONCamelCase(required=False)
         updated_by = String(required=True)
+        idempotency_key = String(required=False)
 
     @staticmethod
+    @idempotent_mutation
     def mutate(
         root: Any, info: Any, **kwargs: Dict[str, Any]
     ) -> "InsertUpdateCorporationProfile":
@@ -45,21 +52,73 @@ class InsertUpdateCorporationProfile(Mutation):
         return InsertUpdateCorporationProfile(corporation_profile=corporation_profile)
 
 
+class CorporationProfileInput(InputObjectType):
+    corporation_uuid = String(required=False)
+    external_id = String(required=False)
+    corporation_type = String(required=False)
+    business_name = String(required=False)
+    categories = List(String, required=False)
+    address = JSONCamelCase(required=False)
+    data = JSONCamelCase(required=False)
+
+
+class InsertUpdateCorporationProfiles(Mutation):
+    results = List(BulkItemResultType)
+
+    class Arguments:
+        corporation_profiles = List(CorporationProfileInput, required=True)
+        updated_by = String(required=True)
+        idempotency_key = String(required=False)
+
+    @staticmethod
+    @idempotent_mutation
+    def mutate(
+        root: Any, info: Any, **kwargs: Dict[str, Any]
+    ) -> "InsertUpdateCorporationProfiles":
+        try:
+            results = insert_update_corporation_profiles(
+                info,
+                [
+                    dict(corporation_profile, updated_by=kwargs["updated_by"])
+                    for corporation_profile in kwargs["corporation_profiles"]
+                ],
+            )
+        except Exception as e:
+            log = traceback.format_exc()
+            info.context.get("logger").error(log)
+            raise e
+
+        return InsertUpdateCorporationProfiles(results=results)
+
+
 class DeleteCorporationProfile(Mutation):
     ok = Boolean()
+    cascade_delete_job = Field(CascadeDeleteJobType)
 
     class Arguments:
         corporation_uuid = String(required=True)
+        # Also delete its child entities in a background cascade delete job
+        cascade = Boolean(required=False)
+        idempotency_key = String(required=False)
 
     @staticmethod
+    @idempotent_mutation
     def mutate(
         root: Any, info: Any, **kwargs: Dict[str, Any]
     ) -> "DeleteCorporationProfile":
         try:
+            cascade = kwargs.pop("cascade", False)
             ok = delete_corporation_profile(info, **kwargs)
+            cascade_delete_job = (
+                start_cascade_delete_job(
+                    info, "corporation_profile", kwargs["corporation_uuid"]
+                )
+                if ok and cascade
+                else None
+            )
         except Exception as e:
             log = traceback.format_exc()
             info.context.get("logger").error(log)
             raise e
 
-        return DeleteCorporationProfile(ok=ok)
+        return DeleteCorporationProfile(ok=ok, cascade_delete_job=cascade_delete_job)
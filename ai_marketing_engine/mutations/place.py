@@ -7,9 +7,13 @@ __author__ = "bibow"
 import traceback
 from typing import Any, Dict
 
-from graphene import Boolean, Field, List, Mutation, String
+from graphene import Boolean, Field, InputObjectType, List, Mutation, String
 
-from ..models.place import delete_place, insert_update_place
+from ..models.cascade_delete import start_cascade_delete_job
+from ..models.idempotency import idempotent_mutation
+from ..models.place import delete_place, insert_update_place, insert_update_places
+from ..types.ai_marketing import BulkItemResultType
+from ..types.cascade_delete import CascadeDeleteJobType
 from ..types.place import PlaceType
 
 
@@ -28,8 +32,10 @@ class InsertUpdatePlace(Mutation):
         types = List(String, required=False)
         corporation_uuid = String(required=False)
         updated_by = String(required=True)
+        idempotency_key = String(required=False)
 
     @staticmethod
+    @idempotent_mutation
     def mutate(root: Any, info: Any, **kwargs: Dict[str, Any]) -> "InsertUpdatePlace":
         try:
             place = insert_update_place(info, **kwargs)
@@ -41,19 +47,70 @@ class InsertUpdatePlace(Mutation):
         return InsertUpdatePlace(place=place)
 
 
+class PlaceInput(InputObjectType):
+    place_uuid = String(required=False)
+    region = String(required=False)
+    latitude = String(required=False)
+    longitude = String(required=False)
+    business_name = String(required=False)
+    address = String(required=False)
+    phone_number = String(required=False)
+    website = String(required=False)
+    types = List(String, required=False)
+    corporation_uuid = String(required=False)
+
+
+class InsertUpdatePlaces(Mutation):
+    results = List(BulkItemResultType)
+
+    class Arguments:
+        places = List(PlaceInput, required=True)
+        updated_by = String(required=True)
+        idempotency_key = String(required=False)
+
+    @staticmethod
+    @idempotent_mutation
+    def mutate(root: Any, info: Any, **kwargs: Dict[str, Any]) -> "InsertUpdatePlaces":
+        try:
+            results = insert_update_places(
+                info,
+                [
+                    dict(place, updated_by=kwargs["updated_by"])
+                    for place in kwargs["places"]
+                ],
+            )
+        except Exception as e:
+            log = traceback.format_exc()
+            info.context.get("logger").error(log)
+            raise e
+
+        return InsertUpdatePlaces(results=results)
+
+
 class DeletePlace(Mutation):
     ok = Boolean()
+    cascade_delete_job = Field(CascadeDeleteJobType)
 
     class Arguments:
         place_uuid = String(required=True)
+        # Also delete its child entities in a background cascade delete job
+        cascade = Boolean(required=False)
+        idempotency_key = String(required=False)
 
     @staticmethod
+    @idempotent_mutation
     def mutate(root: Any, info: Any, **kwargs: Dict[str, Any]) -> "DeletePlace":
         try:
+            cascade = kwargs.pop("cascade", False)
             ok = delete_place(info, **kwargs)
+            cascade_delete_job = (
+                start_cascade_delete_job(info, "place", kwargs["place_uuid"])
+                if ok and cascade
+                else None
+            )
         except Exception as e:
             log = traceback.format_exc()
             info.context.get("logger").error(log)
             raise e
 
-        return DeletePlace(ok=ok)
+        return DeletePlace(ok=ok, cascade_delete_job=cascade_delete_job)
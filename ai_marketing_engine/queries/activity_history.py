@@ -7,10 +7,10 @@ __author__ = "bibow"
 from typing import Any, Dict
 
 from graphene import ResolveInfo
-from silvaengine_utility import method_cache
 
 from ..handlers.config import Config
 from ..models import activity_history
+from ..models.list_cache import key_list_cache
 from ..types.activity_history import ActivityHistoryListType, ActivityHistoryType
 
 
@@ -20,7 +20,10 @@ def resolve_activity_history(
     return activity_history.resolve_activity_history(info, **kwargs)
 
 
-@method_cache(
+@key_list_cache(
+    entity_type="activity_history",
+    list_type_class=ActivityHistoryListType,
+    type_funct=activity_history.get_activity_history_type,
     ttl=Config.get_cache_ttl(),
     cache_name=Config.get_cache_name("queries", "activity_history"),
     cache_enabled=Config.is_cache_enabled,
@@ -7,10 +7,10 @@ __author__ = "bibow"
 from typing import Any, Dict
 
 from graphene import ResolveInfo
-from silvaengine_utility import method_cache
 
 from ..handlers.config import Config
 from ..models import attribute_value
+from ..models.list_cache import key_list_cache
 from ..types.attribute_value import AttributeValueListType, AttributeValueType
 
 
@@ -20,7 +20,10 @@ def resolve_attribute_value(
     return attribute_value.resolve_attribute_value(info, **kwargs)
 
 
-@method_cache(
+@key_list_cache(
+    entity_type="attribute_value",
+    list_type_class=AttributeValueListType,
+    type_funct=attribute_value.get_attribute_value_type,
     ttl=Config.get_cache_ttl(),
     cache_name=Config.get_cache_name("queries", "attribute_value"),
     cache_enabled=Config.is_cache_enabled,
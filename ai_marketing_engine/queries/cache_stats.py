@@ -0,0 +1,16 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+from typing import Any, Dict
+
+from graphene import ResolveInfo
+
+from ..models import cache_stats
+from ..types.cache_stats import CacheStatsType
+
+
+def resolve_cache_stats(info: ResolveInfo, **kwargs: Dict[str, Any]) -> CacheStatsType:
+    return cache_stats.resolve_cache_stats(info, **kwargs)
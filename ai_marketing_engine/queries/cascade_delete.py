@@ -0,0 +1,18 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+from typing import Any, Dict
+
+from graphene import ResolveInfo
+
+from ..models import cascade_delete
+from ..types.cascade_delete import CascadeDeleteJobType
+
+
+def resolve_cascade_delete_job(
+    info: ResolveInfo, **kwargs: Dict[str, Any]
+) -> CascadeDeleteJobType:
+    return cascade_delete.resolve_cascade_delete_job(info, **kwargs)
@@ -8,11 +8,10 @@ from typing import Any, Dict
 
 from graphene import ResolveInfo
 
-from silvaengine_utility import method_cache
-
 from ..handlers.config import Config
 
 from ..models import contact_profile
+from ..models.list_cache import key_list_cache
 from ..types.contact_profile import ContactProfileListType, ContactProfileType
 
 
@@ -22,7 +21,10 @@ def resolve_contact_profile(
     return contact_profile.resolve_contact_profile(info, **kwargs)
 
 
-@method_cache(
+@key_list_cache(
+    entity_type="contact_profile",
+    list_type_class=ContactProfileListType,
+    type_funct=contact_profile.get_contact_profile_type,
     ttl=Config.get_cache_ttl(),
     cache_name=Config.get_cache_name("queries", "contact_profile"),
     cache_enabled=Config.is_cache_enabled,
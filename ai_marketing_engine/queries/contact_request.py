@@ -8,11 +8,10 @@ from typing import Any, Dict
 
 from graphene import ResolveInfo
 
-from silvaengine_utility import method_cache
-
 from ..handlers.config import Config
 
 from ..models import contact_request
+from ..models.list_cache import key_list_cache
 from ..types.contact_request import ContactRequestListType, ContactRequestType
 
 
@@ -22,7 +21,10 @@ def resolve_contact_request(
     return contact_request.resolve_contact_request(info, **kwargs)
 
 
-@method_cache(
+@key_list_cache(
+    entity_type="contact_request",
+    list_type_class=ContactRequestListType,
+    type_funct=contact_request.get_contact_request_type,
     ttl=Config.get_cache_ttl(),
     cache_name=Config.get_cache_name("queries", "contact_request"),
     cache_enabled=Config.is_cache_enabled,
@@ -8,11 +8,10 @@ from typing import Any, Dict
 
 from graphene import ResolveInfo
 
-from silvaengine_utility import method_cache
-
 from ..handlers.config import Config
 
 from ..models import corporation_profile
+from ..models.list_cache import key_list_cache
 from ..types.corporation_profile import (
     CorporationProfileListType,
     CorporationProfileType,
@@ -25,7 +24,10 @@ def resolve_corporation_profile(
     return corporation_profile.resolve_corporation_profile(info, **kwargs)
 
 
-@method_cache(
+@key_list_cache(
+    entity_type="corporation_profile",
+    list_type_class=CorporationProfileListType,
+    type_funct=corporation_profile.get_corporation_profile_type,
     ttl=Config.get_cache_ttl(),
     cache_name=Config.get_cache_name("queries", "corporation_profile"),
     cache_enabled=Config.is_cache_enabled,
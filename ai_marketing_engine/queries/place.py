@@ -7,10 +7,10 @@ __author__ = "bibow"
 from typing import Any, Dict
 
 from graphene import ResolveInfo
-from silvaengine_utility import method_cache
 
 from ..handlers.config import Config
 from ..models import place
+from ..models.list_cache import key_list_cache
 from ..types.place import PlaceListType, PlaceType
 
 
@@ -18,10 +18,17 @@ def resolve_place(info: ResolveInfo, **kwargs: Dict[str, Any]) -> PlaceType | No
     return place.resolve_place(info, **kwargs)
 
 
-@method_cache(
+@key_list_cache(
+    entity_type="place",
+    list_type_class=PlaceListType,
+    type_funct=place.get_place_type,
     ttl=Config.get_cache_ttl(),
     cache_name=Config.get_cache_name("queries", "place"),
     cache_enabled=Config.is_cache_enabled,
 )
 def resolve_place_list(info: ResolveInfo, **kwargs: Dict[str, Any]) -> PlaceListType:
     return place.resolve_place_list(info, **kwargs)
+
+
+def resolve_places_near(info: ResolveInfo, **kwargs: Dict[str, Any]) -> PlaceListType:
+    return place.resolve_places_near(info, **kwargs)
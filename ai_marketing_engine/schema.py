@@ -7,22 +7,40 @@ __author__ = "bibow"
 import time
 from typing import Any, Dict
 
-from graphene import Field, Int, List, ObjectType, ResolveInfo, String
+from graphene import (
+    Boolean,
+    DateTime,
+    Field,
+    Float,
+    Int,
+    List,
+    ObjectType,
+    ResolveInfo,
+    String,
+)
 
 from .mutations.activity_history import DeleteActivityHistory, InsertActivityHistory
 from .mutations.attribute_value import DeleteAttributeValue, InsertUpdateAttributeValue
-from .mutations.contact_profile import DeleteContactProfile, InsertUpdateContactProfile
+from .mutations.cache import PurgeTenantCache
+from .mutations.contact_profile import (
+    DeleteContactProfile,
+    InsertUpdateContactProfile,
+    InsertUpdateContactProfiles,
+)
 from .mutations.contact_request import DeleteContactRequest, InsertUpdateContactRequest
 from .mutations.corporation_profile import (
     DeleteCorporationProfile,
     InsertUpdateCorporationProfile,
+    InsertUpdateCorporationProfiles,
 )
-from .mutations.place import DeletePlace, InsertUpdatePlace
+from .mutations.place import DeletePlace, InsertUpdatePlace, InsertUpdatePlaces
 from .queries.activity_history import (
     resolve_activity_history,
     resolve_activity_history_list,
 )
 from .queries.ai_marketing import resolve_presigned_upload_url
+from .queries.cache_stats import resolve_cache_stats
+from .queries.cascade_delete import resolve_cascade_delete_job
 
 # from .queries.ai_marketing import resolve_crm_user_list, resolve_presigned_upload_url
 from .queries.attribute_value import (
@@ -41,9 +59,11 @@ from .queries.corporation_profile import (
     resolve_corporation_profile,
     resolve_corporation_profile_list,
 )
-from .queries.place import resolve_place, resolve_place_list
+from .queries.place import resolve_place, resolve_place_list, resolve_places_near
 from .types.activity_history import ActivityHistoryListType, ActivityHistoryType
-from .types.ai_marketing import PresignedUploadUrlType
+from .types.ai_marketing import PageInfoType, PresignedUploadUrlType
+from .types.cache_stats import CacheStatsType
+from .types.cascade_delete import CascadeDeleteJobType
 from .types.attribute_value import AttributeValueListType, AttributeValueType
 from .types.contact_profile import ContactProfileListType, ContactProfileType
 from .types.contact_request import ContactRequestListType, ContactRequestType
@@ -71,6 +91,9 @@ def type_class():
         ContactRequestType,
         ContactRequestListType,
         PresignedUploadUrlType,
+        PageInfoType,
+        CacheStatsType,
+        CascadeDeleteJobType,
     ]
 
 
@@ -83,17 +106,31 @@ class Query(ObjectType):
         object_key=String(required=True),
     )
 
+    cache_stats = Field(
+        CacheStatsType,
+        cache_name=String(),
+    )
+
+    cascade_delete_job = Field(
+        CascadeDeleteJobType,
+        job_uuid=String(required=True),
+    )
+
     activity_history = Field(
         ActivityHistoryType,
         required=True,
         id=String(required=True),
-        timestamp=Int(required=True),
+        timestamp=Float(required=True),
     )
 
     activity_history_list = Field(
         ActivityHistoryListType,
         page_number=Int(),
         limit=Int(),
+        after=String(),
+        first=Int(),
+        with_total=Boolean(),
+        search=String(),
         id=String(),
         activity_type=String(),
         activity_types=List(String),
@@ -110,6 +147,13 @@ class Query(ObjectType):
         PlaceListType,
         page_number=Int(),
         limit=Int(),
+        after=String(),
+        first=Int(),
+        with_total=Boolean(),
+        explain=Boolean(),
+        updated_since=DateTime(),
+        updated_before=DateTime(),
+        search=String(),
         region=String(),
         latitude=String(),
         longitude=String(),
@@ -119,6 +163,14 @@ class Query(ObjectType):
         corporation_uuid=String(),
     )
 
+    places_near = Field(
+        PlaceListType,
+        latitude=Float(required=True),
+        longitude=Float(required=True),
+        radius_km=Float(required=True),
+        limit=Int(),
+    )
+
     contact_profile = Field(
         ContactProfileType,
         required=True,
@@ -130,6 +182,13 @@ class Query(ObjectType):
         ContactProfileListType,
         page_number=Int(),
         limit=Int(),
+        after=String(),
+        first=Int(),
+        with_total=Boolean(),
+        explain=Boolean(),
+        updated_since=DateTime(),
+        updated_before=DateTime(),
+        search=String(),
         place_uuid=String(),
         email=String(),
         first_name=String(),
@@ -147,6 +206,13 @@ class Query(ObjectType):
         ContactRequestListType,
         page_number=Int(),
         limit=Int(),
+        after=String(),
+        first=Int(),
+        with_total=Boolean(),
+        explain=Boolean(),
+        updated_since=DateTime(),
+        updated_before=DateTime(),
+        search=String(),
         contact_uuid=String(),
         request_title=String(),
         request_detail=String(),
@@ -163,6 +229,13 @@ class Query(ObjectType):
         CorporationProfileListType,
         page_number=Int(),
         limit=Int(),
+        after=String(),
+        first=Int(),
+        with_total=Boolean(),
+        explain=Boolean(),
+        updated_since=DateTime(),
+        updated_before=DateTime(),
+        search=String(),
         corporation_type=String(),
         external_id=String(),
         business_name=String(),
@@ -181,6 +254,9 @@ class Query(ObjectType):
         AttributeValueListType,
         page_number=Int(),
         limit=Int(),
+        after=String(),
+        first=Int(),
+        with_total=Boolean(),
         data_type_attribute_name=String(),
         data_identity=String(),
         value=String(),
@@ -195,6 +271,16 @@ class Query(ObjectType):
     def resolve_ping(self, info: ResolveInfo) -> str:
         return f"Hello at {time.strftime('%X')}!!"
 
+    def resolve_cache_stats(
+        self, info: ResolveInfo, **kwargs: Dict[str, Any]
+    ) -> CacheStatsType:
+        return resolve_cache_stats(info, **kwargs)
+
+    def resolve_cascade_delete_job(
+        self, info: ResolveInfo, **kwargs: Dict[str, Any]
+    ) -> CascadeDeleteJobType | None:
+        return resolve_cascade_delete_job(info, **kwargs)
+
     def resolve_activity_history(
         self, info: ResolveInfo, **kwargs: Dict[str, Any]
     ) -> ActivityHistoryType:
@@ -215,6 +301,11 @@ class Query(ObjectType):
     ) -> PlaceListType:
         return resolve_place_list(info, **kwargs)
 
+    def resolve_places_near(
+        self, info: ResolveInfo, **kwargs: Dict[str, Any]
+    ) -> PlaceListType:
+        return resolve_places_near(info, **kwargs)
+
     def resolve_contact_profile(
         self, info: ResolveInfo, **kwargs: Dict[str, Any]
     ) -> ContactProfileType | None:
@@ -260,12 +351,16 @@ class Mutations(ObjectType):
     insert_activity_history = InsertActivityHistory.Field()
     delete_activity_history = DeleteActivityHistory.Field()
     insert_update_place = InsertUpdatePlace.Field()
+    insert_update_places = InsertUpdatePlaces.Field()
     delete_place = DeletePlace.Field()
     insert_update_corporation_profile = InsertUpdateCorporationProfile.Field()
+    insert_update_corporation_profiles = InsertUpdateCorporationProfiles.Field()
     delete_corporation_profile = DeleteCorporationProfile.Field()
     insert_update_contact_profile = InsertUpdateContactProfile.Field()
+    insert_update_contact_profiles = InsertUpdateContactProfiles.Field()
     delete_contact_profile = DeleteContactProfile.Field()
     insert_update_contact_request = InsertUpdateContactRequest.Field()
     delete_contact_request = DeleteContactRequest.Field()
     insert_update_attribute_value = InsertUpdateAttributeValue.Field()
     delete_attribute_value = DeleteAttributeValue.Field()
+    purge_tenant_cache = PurgeTenantCache.Field()
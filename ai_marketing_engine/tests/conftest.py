@@ -51,6 +51,7 @@ SETTING = {
     "region_name": os.getenv("region_name"),
     "aws_access_key_id": os.getenv("aws_access_key_id"),
     "aws_secret_access_key": os.getenv("aws_secret_access_key"),
+    "cursor_secret": os.getenv("cursor_secret"),
     "functs_on_local": {
         "ai_marketing_graphql": {
             "module_name": "ai_marketing_engine",
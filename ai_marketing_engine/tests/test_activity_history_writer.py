@@ -0,0 +1,140 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the buffered activity history writer."""
+from __future__ import annotations
+
+__author__ = "bibow"
+
+import os
+import sys
+from unittest.mock import MagicMock, Mock, patch
+
+# Add parent directory to path to allow imports when running directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from ai_marketing_engine.handlers.config import Config
+from ai_marketing_engine.models import activity_history, fulltext
+from ai_marketing_engine.models.activity_history import (
+    ActivityHistoryModel,
+    ActivityHistoryWriter,
+)
+
+PARTITION_KEY = "endpoint-1#part-1"
+
+
+def _batch_write(saved, fail=False):
+    batch = MagicMock()
+    batch.__enter__.return_value = batch
+    batch.save.side_effect = saved.append
+    if fail:
+        batch.__exit__.side_effect = RuntimeError("throttled")
+    return Mock(return_value=batch)
+
+
+def _item(id, timestamp=1700000000):
+    return ActivityHistoryModel(id, timestamp, log="updated", type="contact")
+
+
+def test_events_flush_in_chunks_once_the_buffer_is_full():
+    saved = []
+    writer = ActivityHistoryWriter()
+    with patch.object(Config, "ACTIVITY_HISTORY_FLUSH_SIZE", 30), patch.object(
+        Config, "ACTIVITY_HISTORY_FLUSH_INTERVAL", 60
+    ), patch.object(
+        ActivityHistoryModel, "batch_write", _batch_write(saved)
+    ) as batch_write, patch(
+        "ai_marketing_engine.models.cache.purge_entity_cascading_cache"
+    ) as purge:
+        for index in range(29):
+            writer.add(Mock(), _item(f"contact-{index}"), PARTITION_KEY)
+        # The same id/timestamp again replaces the queued event.
+        writer.add(Mock(), _item("contact-0"), PARTITION_KEY)
+        assert saved == [] and len(writer) == 29
+
+        writer.add(Mock(), _item("contact-29"), PARTITION_KEY)
+
+    assert len(writer) == 0
+    assert len(saved) == 30 and batch_write.call_count == 2
+    assert purge.call_count == 30
+
+
+def test_failing_chunk_is_retried_before_flush_returns():
+    saved = []
+    writer = ActivityHistoryWriter()
+    writer.add(Mock(), _item("contact-1"), PARTITION_KEY)
+    batch_write = Mock(
+        side_effect=[_batch_write([], fail=True)(), _batch_write(saved)()]
+    )
+    with patch.object(ActivityHistoryModel, "batch_write", batch_write), patch.object(
+        activity_history._save_chunk.retry, "sleep"
+    ), patch("ai_marketing_engine.models.cache.purge_entity_cascading_cache"):
+        assert writer.flush(Mock()) == 1
+
+    assert batch_write.call_count == 2
+    assert [item.id for item in saved] == ["contact-1"] and len(writer) == 0
+
+
+def test_failed_flush_keeps_its_events_for_the_next_one():
+    saved = []
+    writer = ActivityHistoryWriter()
+    writer.add(Mock(), _item("contact-1"), PARTITION_KEY)
+    with patch.object(
+        ActivityHistoryModel, "batch_write", _batch_write([], fail=True)
+    ), patch.object(activity_history._save_chunk.retry, "sleep"), patch(
+        "ai_marketing_engine.models.cache.purge_entity_cascading_cache"
+    ):
+        assert writer.flush(Mock()) == 0
+    assert len(writer) == 1
+
+    with patch.object(
+        ActivityHistoryModel, "batch_write", _batch_write(saved)
+    ), patch("ai_marketing_engine.models.cache.purge_entity_cascading_cache"):
+        assert writer.flush(Mock()) == 1
+    assert [item.id for item in saved] == ["contact-1"] and len(writer) == 0
+
+
+def test_insert_returns_the_queued_event_without_reading_it_back():
+    writer = ActivityHistoryWriter()
+    info = Mock()
+    info.context = {"partition_key": PARTITION_KEY, "logger": Mock()}
+    with patch.object(
+        activity_history, "activity_history_writer", writer
+    ), patch.object(ActivityHistoryModel, "get") as get, patch.object(
+        fulltext, "get_full_text_index"
+    ) as get_full_text_index:
+        result = activity_history.insert_activity_history(
+            info, id="contact-1", log="created", type="contact", updated_by="tester"
+        )
+
+    get.assert_not_called()
+    # Indexed once the flush has stored it.
+    get_full_text_index.assert_not_called()
+    assert result.id == "contact-1" and result.log == "created"
+    assert len(writer) == 1
+
+
+def test_only_written_events_are_full_text_indexed():
+    index = fulltext.InMemoryFullTextIndex()
+    writer = ActivityHistoryWriter()
+    writer.add(Mock(), _item("contact-1"), PARTITION_KEY)
+    fulltext.set_full_text_index(index)
+    try:
+        with patch.object(
+            ActivityHistoryModel, "batch_write", _batch_write([], fail=True)
+        ), patch.object(activity_history._save_chunk.retry, "sleep"), patch(
+            "ai_marketing_engine.models.cache.purge_entity_cascading_cache"
+        ):
+            writer.flush(Mock())
+        assert index.search("", "activity_history", "updated", 10) == []
+
+        with patch.object(
+            ActivityHistoryModel, "batch_write", _batch_write([])
+        ), patch("ai_marketing_engine.models.cache.purge_entity_cascading_cache"):
+            writer.flush(Mock())
+        hits = index.search("", "activity_history", "updated", 10)
+    finally:
+        fulltext.set_full_text_index(None)
+
+    assert [fulltext.decode_doc_id(doc_id) for doc_id, _ in hits] == [
+        ["contact-1", 1700000000]
+    ]
@@ -0,0 +1,271 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the bulk upsert mutations."""
+from __future__ import annotations
+
+__author__ = "bibow"
+
+import os
+import sys
+from unittest.mock import MagicMock, Mock, patch
+
+import pendulum
+from pynamodb.exceptions import PutError
+
+# Add parent directory to path to allow imports when running directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from ai_marketing_engine.handlers.config import Config
+from ai_marketing_engine.models import bulk, cache, cache_namespace
+from ai_marketing_engine.models import contact_profile, place
+from ai_marketing_engine.models.contact_profile import ContactProfileModel
+from ai_marketing_engine.models.place import PlaceModel
+from ai_marketing_engine.models.unique_guards import UniqueGuardModel
+
+PARTITION_KEY = "endpoint-1#part-1"
+
+
+def _info():
+    return Mock(
+        context={
+            "logger": Mock(),
+            "partition_key": PARTITION_KEY,
+            "endpoint_id": "endpoint-1",
+            "part_id": "part-1",
+        }
+    )
+
+
+def _batch_write(saved):
+    batch = MagicMock()
+    batch.__enter__.return_value = batch
+    batch.save.side_effect = saved.append
+    return Mock(return_value=batch)
+
+
+def _saved(saved):
+    def save(item, condition=None):
+        saved.append(item)
+
+    return save
+
+
+def _free_owners(partition_key, field, values):
+    return dict.fromkeys(values)
+
+
+def _conditional_check_failed():
+    return PutError(
+        cause=Mock(response={"Error": {"Code": "ConditionalCheckFailedException"}})
+    )
+
+
+def _place(place_uuid, region):
+    return PlaceModel(
+        PARTITION_KEY,
+        place_uuid,
+        region=region,
+        latitude="43.65",
+        longitude="-79.38",
+        business_name="Cafe One",
+        address="1 King St",
+        updated_by="seed",
+        created_at=pendulum.datetime(2024, 1, 1),
+        updated_at=pendulum.datetime(2024, 1, 1),
+    )
+
+
+def test_bulk_places_merge_updates_and_report_per_item_errors():
+    saved = []
+    existing = _place("p-1", "west")
+    items = [
+        {"place_uuid": "p-1", "region": "east", "website": None, "updated_by": "u"},
+        {"region": "east", "business_name": "No Coordinates", "updated_by": "u"},
+        {
+            "place_uuid": "p-2",
+            "region": "east",
+            "latitude": "43.7",
+            "longitude": "-79.4",
+            "business_name": "Deli",
+            "address": "2 Queen St",
+            "updated_by": "u",
+        },
+    ]
+
+    with patch.object(PlaceModel, "batch_get", return_value=[existing]), patch.object(
+        PlaceModel, "batch_write", _batch_write(saved)
+    ), patch.object(bulk, "adjust_entity_counter") as adjust, patch.object(
+        bulk, "purge_entity_caches_in_bulk"
+    ) as purge:
+        results = place.insert_update_places(_info(), items)
+
+    assert [(result["key"], result["created"], result["ok"]) for result in results] == [
+        ("p-1", False, True),
+        (results[1]["key"], True, False),
+        ("p-2", True, True),
+    ]
+    assert results[1]["error"] == "Missing argument: latitude"
+
+    updated = next(item for item in saved if item.place_uuid == "p-1")
+    assert (updated.region, updated.business_name) == ("east", "Cafe One")
+    assert updated.created_at == existing.created_at
+    assert updated.search_name == "cafe one"
+    assert updated.geohash
+
+    # Net deltas: p-1 moved west -> east, p-2 was created in the east.
+    assert sorted(call.args[1:] for call in adjust.call_args_list) == [
+        ("place", 1),
+        ("place#region#east", 2),
+        ("place#region#west", -1),
+    ]
+    purge.assert_called_once()
+
+
+def test_bulk_contact_profiles_reject_taken_and_repeated_emails():
+    saved, guards = [], []
+    items = [
+        {"contact_uuid": "c-1", "email": "a@x.com", "place_uuid": "p-1"},
+        {"contact_uuid": "c-2", "email": "b@x.com", "place_uuid": "p-1"},
+        {"contact_uuid": "c-3", "email": "b@x.com", "place_uuid": "p-1"},
+    ]
+    for item in items:
+        item["updated_by"] = "u"
+
+    def owners(partition_key, field, values):
+        return {value: "c-0" if value == "a@x.com" else None for value in values}
+
+    with patch.object(ContactProfileModel, "batch_get", return_value=[]), patch.object(
+        ContactProfileModel, "batch_write", _batch_write(saved)
+    ), patch.object(
+        UniqueGuardModel, "save", autospec=True, side_effect=_saved(guards)
+    ), patch.object(
+        bulk, "get_unique_owners", side_effect=owners
+    ), patch.object(
+        bulk, "find_missing_references", return_value=set()
+    ), patch.object(
+        bulk, "adjust_entity_counter"
+    ), patch.object(
+        bulk, "purge_entity_caches_in_bulk"
+    ):
+        results = contact_profile.insert_update_contact_profiles(_info(), items)
+
+    assert [result["ok"] for result in results] == [False, True, False]
+    assert "c-0" in results[0]["error"]
+    assert "c-2" in results[2]["error"]
+    assert [item.contact_uuid for item in saved] == ["c-2"]
+    assert [(guard.guard_key, guard.owner_key) for guard in guards] == [
+        (f"{PARTITION_KEY}#email#b@x.com", "c-2")
+    ]
+
+
+def test_bulk_claims_unique_values_before_writing_entities():
+    saved, released = [], []
+    items = [
+        {"contact_uuid": "c-1", "email": "a@x.com", "place_uuid": "p-1"},
+        {"contact_uuid": "c-2", "email": "b@x.com", "place_uuid": "p-1"},
+    ]
+    for item in items:
+        item["updated_by"] = "u"
+
+    def claim(guard, condition=None):
+        # Another request took a@x.com after the guards were read.
+        assert saved == []
+        if guard.owner_key == "c-1":
+            raise _conditional_check_failed()
+
+    with patch.object(ContactProfileModel, "batch_get", return_value=[]), patch.object(
+        ContactProfileModel, "batch_write", _batch_write(saved)
+    ), patch.object(
+        UniqueGuardModel, "save", autospec=True, side_effect=claim
+    ), patch.object(
+        UniqueGuardModel, "delete", autospec=True, side_effect=_saved(released)
+    ), patch.object(
+        bulk, "get_unique_owners", side_effect=_free_owners
+    ), patch.object(
+        bulk, "get_unique_owner", return_value="c-9"
+    ), patch.object(
+        bulk, "find_missing_references", return_value=set()
+    ), patch.object(
+        bulk, "adjust_entity_counter"
+    ), patch.object(
+        bulk, "purge_entity_caches_in_bulk"
+    ):
+        results = contact_profile.insert_update_contact_profiles(_info(), items)
+
+    assert [result["ok"] for result in results] == [False, True]
+    assert "c-9" in results[0]["error"]
+    assert [item.contact_uuid for item in saved] == ["c-2"]
+    assert released == []
+
+
+def test_bulk_gives_back_claims_of_failed_entity_writes():
+    released = []
+    batch_write = _batch_write([])
+    batch_write.return_value.__exit__.side_effect = RuntimeError("throttled")
+
+    with patch.object(ContactProfileModel, "batch_get", return_value=[]), patch.object(
+        ContactProfileModel, "batch_write", batch_write
+    ), patch.object(UniqueGuardModel, "save", autospec=True), patch.object(
+        UniqueGuardModel, "delete", autospec=True, side_effect=_saved(released)
+    ), patch.object(
+        bulk, "get_unique_owners", side_effect=_free_owners
+    ), patch.object(
+        bulk, "find_missing_references", return_value=set()
+    ), patch.object(
+        bulk, "purge_entity_caches_in_bulk"
+    ):
+        results = contact_profile.insert_update_contact_profiles(
+            _info(),
+            [
+                {
+                    "contact_uuid": "c-1",
+                    "email": "a@x.com",
+                    "place_uuid": "p-1",
+                    "updated_by": "u",
+                }
+            ],
+        )
+
+    assert results[0]["error"] == "throttled"
+    assert [guard.guard_key for guard in released] == [
+        f"{PARTITION_KEY}#email#a@x.com"
+    ]
+
+
+def test_bulk_failed_follow_up_writes_fail_the_items_and_still_purge():
+    saved = []
+    after_write = Mock(side_effect=RuntimeError("throttled"))
+    item = {
+        "place_uuid": "p-1",
+        "region": "east",
+        "latitude": "43.7",
+        "longitude": "-79.4",
+        "business_name": "Deli",
+        "address": "2 Queen St",
+        "updated_by": "u",
+    }
+
+    with patch.object(PlaceModel, "batch_get", return_value=[]), patch.object(
+        PlaceModel, "batch_write", _batch_write(saved)
+    ), patch.object(bulk, "adjust_entity_counter"), patch.object(
+        bulk, "purge_entity_caches_in_bulk"
+    ) as purge:
+        results = bulk.bulk_insert_update(
+            _info(), "place", [item], place.build_place_item, after_write
+        )
+
+    assert [entity.place_uuid for entity in saved] == ["p-1"]
+    assert results[0]["ok"] is False
+    assert results[0]["error"].endswith("throttled")
+    purge.assert_called_once()
+
+
+def test_bulk_purge_bumps_each_cascading_namespace_once():
+    with patch.object(cache_namespace, "bump_namespace_generation") as bump:
+        cache_names = cache.purge_entity_caches_in_bulk(Mock(), "place", PARTITION_KEY)
+
+    assert len(cache_names) == len(set(cache_names))
+    assert sorted(call.args for call in bump.call_args_list) == sorted(
+        (PARTITION_KEY, cache_name) for cache_name in cache_names
+    )
+    assert Config.get_cache_name("queries", "place") in cache_names
@@ -0,0 +1,225 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests that getters, batch loaders and purges agree on cache keys."""
+from __future__ import annotations
+
+__author__ = "bibow"
+
+import importlib
+import os
+import sys
+from typing import Any, Dict
+from unittest.mock import Mock, patch
+
+import pytest
+
+# Add parent directory to path to allow imports when running directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from ai_marketing_engine.handlers.config import Config
+from ai_marketing_engine.models import cache_keys
+from test_helpers import FakeSharedCache
+
+PARTITION_KEY = "endpoint-1#part-1"
+
+# entity_type -> (model attribute patched on read, key values, loader attribute)
+ENTITY_CASES = {
+    "place": ("PlaceModel", (PARTITION_KEY, "place-1"), "place_loader"),
+    "contact_profile": (
+        "ContactProfileModel",
+        (PARTITION_KEY, "contact-1"),
+        "contact_profile_loader",
+    ),
+    "corporation_profile": (
+        "CorporationProfileModel",
+        (PARTITION_KEY, "corporation-1"),
+        "corporation_loader",
+    ),
+    "contact_request": ("ContactRequestModel", (PARTITION_KEY, "request-1"), None),
+    "attribute_value": (
+        "AttributeValueModel",
+        ("contact-email", "version-1"),
+        None,
+    ),
+    "activity_history": ("ActivityHistoryModel", ("activity-1", 1700000000), None),
+}
+
+
+@pytest.fixture(autouse=True)
+def fake_shared_cache():
+    from ai_marketing_engine.models import cache_namespace, local_cache
+
+    FakeSharedCache.stores = {}
+    cache_namespace._generations.clear()
+    local_cache.clear_local_caches()
+    with patch.object(local_cache, "HybridCacheEngine", FakeSharedCache):
+        with patch.object(cache_namespace, "HybridCacheEngine", FakeSharedCache):
+            yield
+    local_cache.clear_local_caches()
+
+
+def _model_store(entity_type: str) -> Dict[str, Any]:
+    return FakeSharedCache.stores.get(Config.get_cache_name("models", entity_type), {})
+
+
+def _call_getter(entity_type: str, key_values: tuple, **call_kwargs) -> None:
+    """Invoke the real cached getter with the table read stubbed out."""
+    model_class, _, _ = ENTITY_CASES[entity_type]
+    entity_config = Config.get_cache_entity_config()[entity_type]
+    module = importlib.import_module(entity_config["module"])
+    with patch.object(getattr(module, model_class), "get", return_value={"ok": 1}):
+        getter = getattr(module, entity_config["getter"])
+        if call_kwargs.get("by_name"):
+            getter(**dict(zip(cache_keys.get_key_fields(entity_type), key_values)))
+        else:
+            getter(*key_values)
+
+
+def _run_purge(entity_type: str, key_values: tuple) -> None:
+    """Run the entity's purge_cache decorator as a mutation would."""
+    from ai_marketing_engine.models import cache as cache_module
+
+    entity_config = Config.get_cache_entity_config()[entity_type]
+    module = importlib.import_module(entity_config["module"])
+    kwargs = {
+        field: value
+        for field, value in zip(cache_keys.get_key_fields(entity_type), key_values)
+        if field != "partition_key"
+    }
+    info = Mock(context={"partition_key": PARTITION_KEY, "logger": Mock()})
+
+    with patch.object(cache_module, "_get_cascading_cache_purger"):
+        module.purge_cache()(lambda info, **kwargs: True)(info, **kwargs)
+
+
+@pytest.mark.parametrize("entity_type", sorted(ENTITY_CASES))
+def test_getter_keys_ignore_call_style(entity_type):
+    """Positional and keyword getter calls share one entry."""
+    _, key_values, _ = ENTITY_CASES[entity_type]
+
+    _call_getter(entity_type, key_values)
+    _call_getter(entity_type, key_values, by_name=True)
+
+    assert len(_model_store(entity_type)) == 1
+
+
+@pytest.mark.parametrize("entity_type", sorted(ENTITY_CASES))
+def test_purge_evicts_getter_entry(entity_type):
+    """Each mutation's purge removes exactly the entry the getter wrote."""
+    _, key_values, _ = ENTITY_CASES[entity_type]
+    _call_getter(entity_type, key_values)
+    assert len(_model_store(entity_type)) == 1
+
+    _run_purge(entity_type, key_values)
+
+    assert _model_store(entity_type) == {}
+
+
+@pytest.mark.parametrize(
+    "entity_type",
+    sorted(entity for entity, case in ENTITY_CASES.items() if case[2]),
+)
+def test_loader_and_getter_share_keys(entity_type):
+    """Batch loaders address the getter's entries and purges evict them."""
+    from ai_marketing_engine.models.batch_loaders import RequestLoaders
+
+    _, key_values, loader_name = ENTITY_CASES[entity_type]
+    loader = getattr(RequestLoaders({"logger": Mock()}), loader_name)
+
+    _call_getter(entity_type, key_values)
+    assert loader.generate_cache_key(key_values) in _model_store(entity_type)
+
+    loader.set_cache_data(key_values, {"ok": 2})
+    assert len(_model_store(entity_type)) == 1
+
+    _run_purge(entity_type, key_values)
+    assert _model_store(entity_type) == {}
+
+
+def test_whole_second_activity_delete_evicts_the_float_keyed_entry():
+    """A GraphQL Float timestamp and the stored int address one entry."""
+    from ai_marketing_engine.models import activity_history
+
+    _call_getter("activity_history", ("activity-1", 1700000000.0))
+    assert len(_model_store("activity_history")) == 1
+
+    # delete_activity_history purges with the loaded entity's int timestamp.
+    _run_purge("activity_history", ("activity-1", 1700000000))
+    assert _model_store("activity_history") == {}
+
+    with patch.object(
+        activity_history.ActivityHistoryModel,
+        "get",
+        side_effect=activity_history.ActivityHistoryModel.DoesNotExist,
+    ) as mock_get:
+        assert activity_history.get_activity_history("activity-1", 1700000000.0) is None
+    mock_get.assert_called_once()
+
+
+def test_attribute_loader_and_purge_share_keys():
+    """Attribute bags written by the loader are evicted by their purge."""
+    from ai_marketing_engine.models import cache as cache_module
+    from ai_marketing_engine.models.attribute_value import purge_attributes_data_cache
+    from ai_marketing_engine.models.batch_loaders import RequestLoaders
+
+    loader = RequestLoaders({"logger": Mock()}).contact_data_loader
+    key_values = (PARTITION_KEY, "contact-1", "contact")
+    loader.set_cache_data(key_values, {"email": "a@example.com"})
+    assert len(_model_store("attributes_data")) == 1
+
+    info = Mock(context={"partition_key": PARTITION_KEY, "logger": Mock()})
+    with patch.object(cache_module, "_get_cascading_cache_purger"):
+        purge_attributes_data_cache()(lambda info, **kwargs: True)(
+            info, data_identity="contact-1", data_type="contact"
+        )
+
+    assert _model_store("attributes_data") == {}
+
+
+def test_cache_key_templates_use_partition_key():
+    """Entity key templates never mix endpoint_id and partition_key."""
+    for entity_type, entity_config in Config.get_cache_entity_config().items():
+        for template in entity_config["cache_keys"]:
+            source, field = template.split(":", 1)
+            assert source in ("context", "key"), entity_type
+            if source == "context":
+                assert field == "partition_key", entity_type
+
+
+def test_missing_entities_are_negatively_cached_until_created():
+    """A not-found lookup costs one GetItem until a create purges the marker."""
+    from ai_marketing_engine.models import place
+
+    key_values = (PARTITION_KEY, "place-new")
+    with patch.object(
+        place.PlaceModel, "get", side_effect=place.PlaceModel.DoesNotExist
+    ) as mock_get:
+        with patch.object(place.PlaceModel, "count") as mock_count:
+            assert place.get_place(*key_values) is None
+            assert place.resolve_place(
+                Mock(context={"partition_key": PARTITION_KEY}), place_uuid="place-new"
+            ) is None
+
+            assert mock_get.call_count == 1
+            mock_count.assert_not_called()
+
+            _run_purge("place", key_values)
+            assert place.get_place(*key_values) is None
+            assert mock_get.call_count == 2
+
+
+def test_write_paths_never_read_the_cached_entity():
+    """A cached not-found marker cannot turn an update into a create."""
+    from ai_marketing_engine.models import contact_profile
+
+    key_values = (PARTITION_KEY, "contact-stale")
+    existing = Mock(contact_uuid="contact-stale")
+    with patch.object(
+        contact_profile.ContactProfileModel,
+        "get",
+        side_effect=[contact_profile.ContactProfileModel.DoesNotExist, existing],
+    ) as mock_get:
+        assert contact_profile.get_contact_profile(*key_values) is None
+        # The row is created elsewhere; the cached marker is now stale.
+        assert contact_profile.get_contact_profile_count(*key_values) == 1
+        assert mock_get.call_count == 2
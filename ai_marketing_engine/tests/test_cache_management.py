@@ -22,6 +22,7 @@ from ai_marketing_engine.models.cache import (
     _get_cascading_cache_purger,
     purge_entity_cascading_cache,
 )
+from test_helpers import FakeSharedCache
 
 
 class TestCacheManagement:
@@ -215,6 +216,395 @@ class TestBatchLoaderCache:
         mock_cache_instance.set.assert_called_once()
 
 
+class TestLocalCacheTier:
+    """Test suite for the byte-bounded local cache tier."""
+
+    def test_lru_eviction_respects_byte_budget(self):
+        """Test that least-recently-used entries are evicted past the budget."""
+        from ai_marketing_engine.models.local_cache import LocalCacheTier, estimate_size
+
+        entry_size = estimate_size("x" * 100)
+        tier = LocalCacheTier("test-cache", max_bytes=entry_size * 2)
+
+        tier.set("a", "x" * 100)
+        tier.set("b", "x" * 100)
+        assert tier.get("a") == "x" * 100  # "a" becomes most recently used
+        tier.set("c", "x" * 100)
+
+        assert tier.get("b") is None
+        assert tier.get("a") is not None
+        assert tier.get("c") is not None
+
+        stats = tier.stats()
+        assert stats["evictions"] == 1
+        assert stats["entries"] == 2
+        assert stats["current_bytes"] <= stats["max_bytes"]
+        assert stats["hits"] == 3
+        assert stats["misses"] == 1
+
+    def test_oversized_entries_are_rejected(self):
+        """Test that an entry larger than the whole budget is not stored."""
+        from ai_marketing_engine.models.local_cache import LocalCacheTier
+
+        tier = LocalCacheTier("test-cache", max_bytes=10)
+        tier.set("big", "x" * 1000)
+
+        assert tier.get("big") is None
+        assert tier.stats()["rejections"] == 1
+        assert tier.stats()["current_bytes"] == 0
+
+    def test_expired_entries_are_misses(self):
+        """Test that entries past their TTL are dropped on read."""
+        from ai_marketing_engine.models.local_cache import LocalCacheTier
+
+        tier = LocalCacheTier("test-cache", max_bytes=1024 * 1024)
+        with patch("ai_marketing_engine.models.local_cache.time.monotonic") as clock:
+            clock.return_value = 100.0
+            tier.set("key", {"value": 1}, ttl=10)
+            clock.return_value = 111.0
+            assert tier.get("key") is None
+
+        assert tier.stats()["expirations"] == 1
+        assert tier.stats()["current_bytes"] == 0
+
+    def test_cache_budget_per_cache_name(self):
+        """Test that per cache name budgets override the default."""
+        cache_name = Config.get_cache_name("models", "place")
+        with patch.object(Config, "CACHE_LOCAL_BUDGETS", {cache_name: 1024}):
+            assert Config.get_cache_local_budget(cache_name) == 1024
+            assert (
+                Config.get_cache_local_budget("ai_marketing_engine.models.other")
+                == Config.CACHE_LOCAL_MAX_BYTES
+            )
+
+    @patch("ai_marketing_engine.models.cache._get_cascading_cache_purger")
+    def test_purge_leaves_other_local_entries_alone(self, mock_get_purger):
+        """Test that purging an entity does not empty the cascading local tiers."""
+        from ai_marketing_engine.models.local_cache import get_local_cache
+
+        mock_get_purger.return_value = Mock()
+        place_tier = get_local_cache(Config.get_cache_name("models", "place"))
+        contact_tier = get_local_cache(
+            Config.get_cache_name("models", "contact_profile")
+        )
+        place_tier.set("other-place-key", {"place_uuid": "place-2"})
+        contact_tier.set("contact-key", {"contact_uuid": "contact-1"})
+
+        purge_entity_cascading_cache(Mock(), "place")
+
+        assert place_tier.get("other-place-key") is not None
+        assert contact_tier.get("contact-key") is not None
+        place_tier.clear()
+        contact_tier.clear()
+
+
+class TestCacheStats:
+    """Test suite for cache hit/miss telemetry."""
+
+    def test_recorder_aggregates_per_cache_name_and_partition(self):
+        """Test that counters are kept per (cache_name, partition_key)."""
+        from ai_marketing_engine.models.cache_stats import CacheStatsRecorder
+
+        recorder = CacheStatsRecorder()
+        recorder.record_hit("models.place", "tenant-a")
+        recorder.record_hit("models.place", "tenant-a")
+        recorder.record_miss("models.place", "tenant-a")
+        recorder.record_fill("models.place", "tenant-a", 10.0)
+        recorder.record_fill("models.place", "tenant-a", 20.0)
+        recorder.record_purge("models.place", "tenant-b")
+
+        entries = recorder.snapshot(partition_key="tenant-a")
+        assert len(entries) == 1
+        assert entries[0]["hits"] == 2
+        assert entries[0]["misses"] == 1
+        assert entries[0]["fills"] == 2
+        assert entries[0]["hit_rate"] == round(2 / 3, 4)
+        assert entries[0]["avg_fill_latency_ms"] == 15.0
+
+        purged = recorder.snapshot(partition_key="tenant-b")
+        assert purged[0]["purges"] == 1
+        assert purged[0]["hit_rate"] is None
+
+    def test_query_only_reports_the_callers_tenant(self):
+        """Test that cacheStats cannot be widened to other tenants."""
+        from ai_marketing_engine.models import cache_stats
+
+        recorder = cache_stats.CacheStatsRecorder()
+        recorder.record_hit("models.place", "tenant-a")
+        recorder.record_hit("models.place", "tenant-b")
+        info = Mock(context={"partition_key": "tenant-a"})
+
+        with patch.object(cache_stats, "cache_stats", recorder):
+            stats = cache_stats.resolve_cache_stats(
+                info, partition_key="tenant-b", all_partitions=True
+            )
+
+        assert [entry.partition_key for entry in stats.entries] == ["tenant-a"]
+        assert not hasattr(stats, "local_tiers")
+        with pytest.raises(ValueError):
+            cache_stats.resolve_cache_stats(Mock(context={}))
+
+    def test_recorder_flushes_structured_log(self):
+        """Test that the periodic flush writes one JSON log line."""
+        from ai_marketing_engine.models.cache_stats import CacheStatsRecorder
+
+        logger = Mock(spec=logging.Logger)
+        recorder = CacheStatsRecorder()
+        recorder.configure(logger, flush_interval=1)
+        recorder._last_flush -= 2
+
+        recorder.record_hit("models.place", "tenant-a")
+
+        logger.info.assert_called_once()
+        payload = json.loads(logger.info.call_args[0][0])
+        assert payload["event"] == "ai_marketing_engine.cache_stats"
+        assert payload["stats"][0]["hits"] == 1
+
+    def test_tiered_engine_records_hits_and_misses(self):
+        """Test that TieredCacheEngine lookups feed the recorder."""
+        from ai_marketing_engine.models import local_cache
+
+        with patch.object(local_cache, "HybridCacheEngine") as mock_engine_class:
+            with patch.object(local_cache, "cache_stats") as mock_stats:
+                mock_engine_class.return_value.get.return_value = None
+                engine = local_cache.TieredCacheEngine(
+                    "ai_marketing_engine.models.test"
+                )
+
+                engine.get("missing", partition_key="tenant-a")
+                engine.set("present", {"value": 1}, partition_key="tenant-a")
+                engine.get("present", partition_key="tenant-a")
+
+        mock_stats.record_miss.assert_called_once_with(
+            "ai_marketing_engine.models.test", "tenant-a"
+        )
+        mock_stats.record_hit.assert_called_once_with(
+            "ai_marketing_engine.models.test", "tenant-a"
+        )
+
+
+class TestTenantCachePurge:
+    """Test suite for tenant-scoped cache namespaces."""
+
+    @pytest.fixture(autouse=True)
+    def fake_shared_cache(self):
+        from ai_marketing_engine.models import cache_namespace, local_cache
+
+        FakeSharedCache.stores = {}
+        cache_namespace._generations.clear()
+        local_cache.clear_local_caches()
+        with patch.object(local_cache, "HybridCacheEngine", FakeSharedCache):
+            with patch.object(cache_namespace, "HybridCacheEngine", FakeSharedCache):
+                yield
+        cache_namespace._generations.clear()
+        local_cache.clear_local_caches()
+
+    def test_purge_tenant_cache_only_affects_one_partition(self):
+        """Test that a tenant purge invalidates that tenant's entries in every cache name."""
+        from ai_marketing_engine.models.cache import purge_tenant_cache
+        from ai_marketing_engine.models.local_cache import TieredCacheEngine
+
+        models = TieredCacheEngine("ai_marketing_engine.models.place")
+        loaders = TieredCacheEngine("ai_marketing_engine.queries.place")
+        for partition_key in ["tenant-a", "tenant-b"]:
+            models.set(f"{partition_key}:1", {"v": 1}, partition_key=partition_key)
+            loaders.set(f"{partition_key}:1", {"v": 2}, partition_key=partition_key)
+
+        purge_tenant_cache(Mock(spec=logging.Logger), "tenant-a")
+
+        assert models.get("tenant-a:1", partition_key="tenant-a") is None
+        assert loaders.get("tenant-a:1", partition_key="tenant-a") is None
+        assert models.get("tenant-b:1", partition_key="tenant-b") == {"v": 1}
+        assert loaders.get("tenant-b:1", partition_key="tenant-b") == {"v": 2}
+
+        # Entries written after the purge are served normally.
+        models.set("tenant-a:1", {"v": 3}, partition_key="tenant-a")
+        assert models.get("tenant-a:1", partition_key="tenant-a") == {"v": 3}
+
+    def test_purge_reaches_other_containers_after_refresh(self):
+        """Test that a generation bumped elsewhere is picked up once the memo expires."""
+        from ai_marketing_engine.models import cache_namespace
+        from ai_marketing_engine.models.local_cache import TieredCacheEngine
+
+        engine = TieredCacheEngine("ai_marketing_engine.models.place")
+        engine.set("k", {"v": 1}, partition_key="tenant-a")
+
+        # Simulate another container bumping the shared generation.
+        FakeSharedCache(cache_namespace.NAMESPACE_CACHE_NAME).set("tenant-a", 42)
+        assert engine.get("k", partition_key="tenant-a") == {"v": 1}
+
+        cache_namespace._generations.clear()
+        assert engine.get("k", partition_key="tenant-a") is None
+
+    def test_local_refill_keeps_the_shared_entry_expiry(self):
+        """Test that a shared hit is copied locally for the entry's remaining TTL."""
+        from ai_marketing_engine.models import local_cache
+        from ai_marketing_engine.models.local_cache import NOT_FOUND, TieredCacheEngine
+
+        writer = TieredCacheEngine("ai_marketing_engine.models.place")
+        with patch("ai_marketing_engine.models.cache_namespace.time.time") as clock:
+            clock.return_value = 1000.0
+            writer.set("k", NOT_FOUND, ttl=60, partition_key="tenant-a")
+
+            # Another container reads the marker 50 seconds later.
+            local_cache.clear_local_caches()
+            clock.return_value = 1050.0
+            with patch.object(writer.local, "set") as local_set:
+                assert writer.get("k", partition_key="tenant-a") == NOT_FOUND
+            assert local_set.call_args.kwargs["ttl"] == 10
+
+            # Past its expiry the shared copy is no longer served or copied.
+            clock.return_value = 1061.0
+            assert writer.get("k", partition_key="tenant-a") is None
+
+    def test_method_cache_keys_resolvers_by_partition(self):
+        """Test that info-first resolvers share entries per partition_key."""
+        from ai_marketing_engine.models.local_cache import method_cache
+
+        calls = []
+
+        @method_cache(ttl=60, cache_name="ai_marketing_engine.queries.test")
+        def resolve_things(info, **kwargs):
+            calls.append(info.context["partition_key"])
+            return {"things": [kwargs.get("name")]}
+
+        def make_info(partition_key):
+            return Mock(context={"partition_key": partition_key}, field_name="things")
+
+        resolve_things(make_info("tenant-a"), name="x")
+        resolve_things(make_info("tenant-a"), name="x")
+        resolve_things(make_info("tenant-b"), name="x")
+
+        assert calls == ["tenant-a", "tenant-b"]
+
+    def test_entity_purge_retires_tenant_list_caches(self):
+        """Test that an entity purge bumps the list namespaces of its tenant only."""
+        from ai_marketing_engine.models import cache as cache_module
+        from ai_marketing_engine.models.local_cache import TieredCacheEngine
+
+        lists = TieredCacheEngine(Config.get_cache_name("queries", "place"))
+        lists.set("page-1", {"place_list": []}, partition_key="tenant-a")
+        lists.set("page-1b", {"place_list": []}, partition_key="tenant-b")
+
+        with patch.object(cache_module, "_get_cascading_cache_purger"):
+            purge_entity_cascading_cache(
+                Mock(spec=logging.Logger),
+                "place",
+                context_keys={"partition_key": "tenant-a"},
+                entity_keys={"place_uuid": "p-1"},
+            )
+
+        assert lists.get("page-1", partition_key="tenant-a") is None
+        assert lists.get("page-1b", partition_key="tenant-b") == {"place_list": []}
+
+
+class TestKeyListCache:
+    """Test suite for list caches that store keys and hydrate through entity caches."""
+
+    @pytest.fixture(autouse=True)
+    def fake_shared_cache(self):
+        from ai_marketing_engine.models import cache_namespace, local_cache
+
+        FakeSharedCache.stores = {}
+        cache_namespace._generations.clear()
+        local_cache.clear_local_caches()
+        with patch.object(local_cache, "HybridCacheEngine", FakeSharedCache):
+            with patch.object(cache_namespace, "HybridCacheEngine", FakeSharedCache):
+                yield
+        local_cache.clear_local_caches()
+
+    @staticmethod
+    def _place(place_uuid: str, business_name: str) -> Mock:
+        return Mock(
+            partition_key="tenant-a", place_uuid=place_uuid, business_name=business_name
+        )
+
+    def _resolver(self, calls):
+        from ai_marketing_engine.models.list_cache import key_list_cache
+
+        list_type = lambda **kwargs: Mock(**kwargs)
+
+        @key_list_cache(
+            entity_type="place",
+            list_type_class=list_type,
+            type_funct=lambda info, place: place.business_name,
+            ttl=60,
+            cache_name=Config.get_cache_name("queries", "place"),
+        )
+        def resolve_place_list(info, **kwargs):
+            calls.append(kwargs)
+            return Mock(
+                place_list=[self._place("p-1", "One"), self._place("p-2", "Two")],
+                page_size=10,
+                page_number=1,
+                total=2,
+            )
+
+        return resolve_place_list
+
+    def test_cached_page_holds_only_keys(self):
+        """Test that a cached page stores ordered keys plus paging metadata."""
+        calls = []
+        resolve_place_list = self._resolver(calls)
+        info = Mock(context={"partition_key": "tenant-a"})
+
+        resolve_place_list(info, region="west")
+
+        store = FakeSharedCache.stores[Config.get_cache_name("queries", "place")]
+        (envelope,) = store.values()
+        assert envelope["value"] == {
+            "keys": [["tenant-a", "p-1"], ["tenant-a", "p-2"]],
+            "page_size": 10,
+            "page_number": 1,
+            "total": 2,
+        }
+
+    def test_hits_hydrate_through_entity_cache_and_batch_get(self):
+        """Test that hits read cached entities and batch_get only the misses."""
+        from ai_marketing_engine.models.local_cache import TieredCacheEngine
+        from ai_marketing_engine.models.cache_keys import build_entity_key
+        from ai_marketing_engine.models.place import PlaceModel
+
+        calls = []
+        resolve_place_list = self._resolver(calls)
+        info = Mock(context={"partition_key": "tenant-a"})
+        resolve_place_list(info, region="west")
+
+        # p-1 was updated and re-cached by its getter; p-2 is not cached.
+        entity_cache = TieredCacheEngine(Config.get_cache_name("models", "place"))
+        entity_cache.set(
+            build_entity_key(entity_cache, "place", ("tenant-a", "p-1")),
+            self._place("p-1", "One (renamed)"),
+            partition_key="tenant-a",
+        )
+        with patch.object(
+            PlaceModel, "batch_get", return_value=[self._place("p-2", "Two")]
+        ) as mock_batch_get:
+            result = resolve_place_list(info, region="west")
+
+        assert len(calls) == 1
+        mock_batch_get.assert_called_once_with([("tenant-a", "p-2")])
+        assert result.place_list == ["One (renamed)", "Two"]
+        assert result.total == 2
+
+    def test_membership_changed_only_for_list_fields(self):
+        """Test that only creates, deletes and list-field updates retire lists."""
+        from ai_marketing_engine.models.list_cache import membership_changed
+        from ai_marketing_engine.models.place import PLACE_LIST_FIELDS
+
+        entity = Mock(region="west", phone_number="1")
+
+        assert membership_changed({"region": "east"}, PLACE_LIST_FIELDS)
+        assert membership_changed({"entity": entity}, None)
+        assert not membership_changed(
+            {"entity": entity, "phone_number": "2", "region": "west"},
+            PLACE_LIST_FIELDS,
+        )
+        assert membership_changed(
+            {"entity": entity, "region": "east"}, PLACE_LIST_FIELDS
+        )
+
+
 class TestCacheDecorators:
     """Test suite for cache decorators (@method_cache, @purge_cache)."""
 
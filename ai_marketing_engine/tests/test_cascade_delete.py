@@ -0,0 +1,169 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the background cascade delete jobs."""
+from __future__ import annotations
+
+__author__ = "bibow"
+
+import os
+import sys
+from contextlib import ExitStack
+from unittest.mock import MagicMock, Mock, patch
+
+# Add parent directory to path to allow imports when running directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from ai_marketing_engine.models import cascade_delete
+from ai_marketing_engine.models.attribute_value import AttributeValueModel
+from ai_marketing_engine.models.cascade_delete import CascadeDeleteJobModel
+from ai_marketing_engine.models.contact_profile import ContactProfileModel
+from ai_marketing_engine.models.contact_request import ContactRequestModel
+
+PARTITION_KEY = "endpoint-1#part-1"
+
+
+def _batch_write(deleted):
+    batch = MagicMock()
+    batch.__enter__.return_value = batch
+    batch.delete.side_effect = deleted.append
+    return Mock(return_value=batch)
+
+
+def _children(stack, deleted):
+    """Patch a place p-1 holding contact c-1 with one request and one attribute."""
+    contacts = [ContactProfileModel(PARTITION_KEY, "c-1", place_uuid="p-1")]
+    request = ContactRequestModel(
+        PARTITION_KEY, "r-1", contact_uuid="c-1", place_uuid="p-1"
+    )
+    attribute = AttributeValueModel(
+        "contact-tier", "v-1", data_identity="c-1", partition_key=PARTITION_KEY
+    )
+
+    def contacts_of_place(*args, **kwargs):
+        # Once c-1 is deleted the index no longer returns it.
+        return [] if delete_node.called else contacts
+
+    delete_node = stack.enter_context(
+        patch.object(cascade_delete, "_delete_node", return_value=True)
+    )
+    for target, attribute_name, value in [
+        (ContactProfileModel.place_uuid_index, "query", contacts_of_place),
+        (ContactRequestModel.place_uuid_index, "query", lambda *a, **k: []),
+        (ContactRequestModel.contact_uuid_index, "query", lambda *a, **k: [request]),
+        (
+            AttributeValueModel.data_identity_data_type_attribute_name_index,
+            "query",
+            lambda *a, **k: [attribute],
+        ),
+    ]:
+        stack.enter_context(patch.object(target, attribute_name, side_effect=value))
+    for model_class in (ContactRequestModel, AttributeValueModel):
+        stack.enter_context(
+            patch.object(model_class, "batch_write", _batch_write(deleted))
+        )
+    stack.enter_context(patch.object(CascadeDeleteJobModel, "save"))
+    stack.enter_context(patch.object(cascade_delete, "purge_entity_caches_in_bulk"))
+    stack.enter_context(patch.object(cascade_delete, "get_full_text_index"))
+    return delete_node, stack.enter_context(
+        patch.object(cascade_delete, "adjust_entity_counter")
+    )
+
+
+def test_place_cascade_empties_and_deletes_its_contacts():
+    deleted = []
+    with ExitStack() as stack:
+        delete_node, adjust = _children(stack, deleted)
+        job = cascade_delete.start_cascade_delete(PARTITION_KEY, "place", "p-1")
+        cascade_delete.run_cascade_delete(
+            Mock(), {"partition_key": PARTITION_KEY}, job
+        )
+
+    assert job.status == cascade_delete.COMPLETED and job.stack == []
+    assert job.deleted.as_dict() == {
+        "contact_request": 1,
+        "attribute_value": 1,
+        "contact_profile": 1,
+    }
+    assert [type(item) for item in deleted] == [
+        ContactRequestModel,
+        AttributeValueModel,
+    ]
+    # The root place was deleted by the mutation; only its contact is here.
+    assert [call.args[1:] for call in delete_node.call_args_list] == [
+        ("contact_profile", "c-1")
+    ]
+    assert sorted(call.args[1:] for call in adjust.call_args_list) == [
+        ("contact_request", -1),
+        ("contact_request#contact_uuid#c-1", -1),
+        ("contact_request#place_uuid#p-1", -1),
+    ]
+
+
+def test_out_of_budget_run_keeps_its_stack_and_resumes():
+    deleted = []
+    with ExitStack() as stack:
+        delete_node, _ = _children(stack, deleted)
+        job = cascade_delete.start_cascade_delete(PARTITION_KEY, "place", "p-1")
+        # The budget runs out after the first step (stacking contact c-1).
+        with patch.object(
+            cascade_delete._Budget, "exhausted", side_effect=[False, True]
+        ):
+            cascade_delete.run_cascade_delete(
+                Mock(), {"partition_key": PARTITION_KEY}, job
+            )
+
+        assert job.status == cascade_delete.RUNNING
+        assert job.stack == ["place#p-1", "contact_profile#c-1"]
+        assert deleted == []
+
+        cascade_delete.run_cascade_delete(
+            Mock(), {"partition_key": PARTITION_KEY}, job
+        )
+
+    assert job.status == cascade_delete.COMPLETED
+    assert len(deleted) == 2
+    delete_node.assert_called_once()
+
+
+def test_child_left_in_place_by_its_delete_fails_the_job():
+    deleted = []
+    with ExitStack() as stack:
+        delete_node, _ = _children(stack, deleted)
+        delete_node.return_value = False
+        stack.enter_context(
+            patch.object(cascade_delete, "_node_exists", return_value=True)
+        )
+        job = cascade_delete.start_cascade_delete(PARTITION_KEY, "place", "p-1")
+        cascade_delete.run_cascade_delete(
+            Mock(), {"partition_key": PARTITION_KEY}, job
+        )
+
+    assert job.status == cascade_delete.FAILED
+    assert job.stack == ["place#p-1", "contact_profile#c-1"]
+    assert job.error == "contact_profile#c-1 still exists after its delete."
+    delete_node.assert_called_once()
+
+
+def test_child_already_gone_is_not_stacked_again():
+    deleted = []
+    with ExitStack() as stack:
+        delete_node, _ = _children(stack, deleted)
+        delete_node.return_value = False
+        stack.enter_context(
+            patch.object(cascade_delete, "_node_exists", return_value=False)
+        )
+        # The index keeps listing the deleted contact for the whole run.
+        stack.enter_context(
+            patch.object(
+                ContactProfileModel.place_uuid_index,
+                "query",
+                return_value=[ContactProfileModel(PARTITION_KEY, "c-1")],
+            )
+        )
+        job = cascade_delete.start_cascade_delete(PARTITION_KEY, "place", "p-1")
+        cascade_delete.run_cascade_delete(
+            Mock(), {"partition_key": PARTITION_KEY}, job
+        )
+
+    assert job.status == cascade_delete.COMPLETED and job.stack == []
+    delete_node.assert_called_once()
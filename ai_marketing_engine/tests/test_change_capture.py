@@ -0,0 +1,171 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for field-level change capture into ActivityHistory."""
+from __future__ import annotations
+
+__author__ = "bibow"
+
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import pendulum
+
+# Add parent directory to path to allow imports when running directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from ai_marketing_engine.models import (
+    activity_history,
+    attribute_value,
+    change_capture,
+    unit_of_work,
+)
+from ai_marketing_engine.models.attribute_value import AttributeValueModel
+from ai_marketing_engine.models.contact_request import (
+    CONTACT_REQUEST_FIELDS,
+    ContactRequestModel,
+)
+from ai_marketing_engine.models.place import PlaceModel
+from ai_marketing_engine.models.upsert import Upserted
+
+PARTITION_KEY = "endpoint-1#part-1"
+
+
+def _info():
+    return Mock(context={"logger": Mock(), "partition_key": PARTITION_KEY})
+
+
+def _captured(add):
+    return [call.args[1] for call in add.call_args_list]
+
+
+def test_update_records_only_the_changed_fields():
+    entity = ContactRequestModel(
+        PARTITION_KEY,
+        "r-1",
+        contact_uuid="c-1",
+        place_uuid="p-1",
+        request_title="Quote",
+        request_detail="Two desks",
+    )
+
+    @change_capture.capture_changes(
+        "contact_request", CONTACT_REQUEST_FIELDS, "request_uuid"
+    )
+    def insert_update(info, **kwargs):
+        # Like Model.update, the write refreshes the entity in place.
+        entity.request_title = kwargs["request_title"]
+
+    with patch.object(change_capture.activity_history_writer, "add") as add:
+        insert_update(
+            _info(),
+            request_uuid="r-1",
+            entity=entity,
+            request_title="Quote for desks",
+            request_detail="Two desks",
+            updated_by="tester",
+        )
+
+    [row] = _captured(add)
+    assert (row.id, row.type, row.log, row.updated_by) == (
+        "r-1",
+        "contact_request",
+        "updated",
+        "tester",
+    )
+    assert row.data_diff.as_dict() == {
+        "request_title": {"old": "Quote", "new": "Quote for desks"}
+    }
+    assert add.call_args.args[2] == PARTITION_KEY
+
+
+def test_upsert_that_creates_records_the_set_fields():
+    new = PlaceModel(PARTITION_KEY, "p-1", business_name="Cafe One", region="west")
+
+    @change_capture.capture_changes(
+        "place", ["business_name", "region", "address"], "place_uuid"
+    )
+    def insert_update(info, **kwargs):
+        return Upserted(None, new)
+
+    with patch.object(change_capture.activity_history_writer, "add") as add:
+        insert_update(_info(), place_uuid="p-1", updated_by="tester")
+
+    [row] = _captured(add)
+    assert row.log == "created"
+    assert row.data_diff.as_dict() == {
+        "business_name": {"old": None, "new": "Cafe One"},
+        "region": {"old": None, "new": "west"},
+    }
+
+
+def test_attribute_bag_records_changed_attributes_in_one_row():
+    active = [
+        AttributeValueModel("contact-tier", "v-1", value="silver"),
+        AttributeValueModel("contact-phone", "v-2", value="555"),
+    ]
+
+    with patch.object(
+        AttributeValueModel.data_identity_data_type_attribute_name_index,
+        "query",
+        return_value=active,
+    ), patch.object(unit_of_work, "transact_write"), patch(
+        "ai_marketing_engine.models.cache.purge_entity_cascading_cache"
+    ), patch.object(
+        change_capture.activity_history_writer, "add"
+    ) as add:
+        attribute_value.insert_update_attribute_values(
+            _info(),
+            data_type="contact",
+            data_identity="c-1",
+            data={"tier": "gold", "phone": "555", "source": "web"},
+            updated_by="tester",
+        )
+
+    [row] = _captured(add)
+    assert (row.id, row.type) == ("c-1", "contact_data")
+    assert row.data_diff.as_dict() == {
+        "tier": {"old": "silver", "new": "gold"},
+        "source": {"old": None, "new": "web"},
+    }
+
+
+def test_profile_row_carries_its_attribute_bag_changes():
+    @change_capture.capture_changes(
+        "contact_profile", ["first_name", "last_name"], "contact_uuid"
+    )
+    def insert_update(info, **kwargs):
+        change_capture.record_data_changes(
+            info, "contact", "c-1", "tester", {"tier": {"old": None, "new": "gold"}}
+        )
+
+    with patch.object(change_capture.activity_history_writer, "add") as add:
+        insert_update(
+            _info(), contact_uuid="c-1", first_name="Ada", updated_by="tester"
+        )
+
+    [row] = _captured(add)
+    assert (row.id, row.type, row.log) == ("c-1", "contact_profile", "created")
+    assert row.data_diff.as_dict() == {
+        "first_name": {"old": None, "new": "Ada"},
+        "data": {"tier": {"old": None, "new": "gold"}},
+    }
+
+
+def test_changes_in_the_same_second_keep_separate_rows():
+    now = pendulum.datetime(2026, 1, 1, tz="UTC")
+    with patch.object(change_capture.pendulum, "now", return_value=now), patch.object(
+        activity_history, "_last_timestamp", 0
+    ), patch.object(change_capture.activity_history_writer, "add") as add:
+        for title in ["Quote", "Quote for desks"]:
+            change_capture.record_changes(
+                _info(),
+                "contact_request",
+                "r-1",
+                "tester",
+                {"request_title": {"old": None, "new": title}},
+            )
+
+    first, second = _captured(add)
+    assert first.timestamp < second.timestamp
+    assert int(first.timestamp) == int(second.timestamp) == int(now.timestamp())
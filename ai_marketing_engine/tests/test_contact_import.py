@@ -0,0 +1,91 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the streaming contact import."""
+from __future__ import annotations
+
+__author__ = "bibow"
+
+import json
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+
+# Add parent directory to path to allow imports when running directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from ai_marketing_engine.handlers.config import Config
+from ai_marketing_engine.models import contact_import
+
+PARTITION_KEY = "endpoint-1#part-1"
+
+
+def _results(info, entity_type, items, build_item, after_write=None):
+    return [
+        {"index": index, "key": item["contact_uuid"], "created": True, "ok": True}
+        for index, item in enumerate(items)
+    ]
+
+
+def test_csv_rows_put_extra_columns_in_the_data_bag(tmp_path):
+    source = tmp_path / "contacts.csv"
+    source.write_text("email,first_name,tier,notes\na@x.com,Ann,gold,\n")
+
+    assert list(contact_import.read_import_rows(str(source))) == [
+        {"email": "a@x.com", "first_name": "Ann", "data": {"tier": "gold"}}
+    ]
+
+
+def test_import_dedupes_emails_and_resumes_from_checkpoint(tmp_path):
+    source = tmp_path / "contacts.jsonl"
+    rows = [
+        {"email": "a@x.com", "first_name": "Ann"},
+        {"email": "a@x.com", "last_name": "Lee", "data": {"tier": "gold"}},
+        {"email": "b@x.com", "place_uuid": "p-9"},
+        {"email": "c@x.com"},
+    ]
+    source.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    checkpoint_path = str(source) + ".checkpoint"
+    context = {"partition_key": PARTITION_KEY}
+
+    def owners(partition_key, emails):
+        return {email: "c-b" if email == "b@x.com" else None for email in emails}
+
+    def run():
+        return contact_import.import_contact_profiles(
+            Mock(), context, str(source), "importer", place_uuid="p-1"
+        )
+
+    with patch.object(Config, "IMPORT_CHUNK_SIZE", 2), patch.object(
+        contact_import, "find_contact_uuids_by_email", side_effect=owners
+    ) as lookup, patch.object(
+        contact_import,
+        "bulk_insert_update",
+        side_effect=[
+            [{"index": 0, "key": "c-a", "created": True, "ok": True}],
+            RuntimeError("throttled"),
+        ],
+    ) as bulk:
+        with pytest.raises(RuntimeError):
+            run()
+
+        # The first chunk's two rows for a@x.com were written as one contact.
+        (merged,) = bulk.call_args_list[0].args[2]
+        assert merged["first_name"] == "Ann" and merged["last_name"] == "Lee"
+        assert merged["place_uuid"] == "p-1" and merged["data"] == {"tier": "gold"}
+        with open(checkpoint_path) as checkpoint:
+            assert json.load(checkpoint)["rows"] == 2
+
+        bulk.side_effect = _results
+        summary = run()
+
+    assert summary == {"rows": 4, "created": 3, "updated": 0, "failed": 0}
+    resumed = bulk.call_args_list[-1].args[2]
+    assert [item["email"] for item in resumed] == ["b@x.com", "c@x.com"]
+    # b@x.com already exists, so it keeps its contact and place.
+    assert resumed[0]["contact_uuid"] == "c-b"
+    assert resumed[0]["place_uuid"] == "p-9"
+    assert resumed[1]["place_uuid"] == "p-1"
+    assert lookup.call_args_list[-1].args[1] == ["b@x.com", "c@x.com"]
+    assert not os.path.exists(checkpoint_path)
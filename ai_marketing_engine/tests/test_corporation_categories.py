@@ -0,0 +1,148 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the corporation category membership fan-out."""
+from __future__ import annotations
+
+__author__ = "bibow"
+
+import inspect
+import os
+import sys
+from unittest.mock import MagicMock, Mock, patch
+
+# Add parent directory to path to allow imports when running directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from ai_marketing_engine.models import corporation_profile
+from ai_marketing_engine.models.corporation_profile import CategoryMembers
+
+PARTITION_KEY = "endpoint-1#part-1"
+
+
+def _transaction():
+    transaction = MagicMock()
+    transaction.__enter__.return_value = transaction
+    return transaction
+
+
+def _members(calls):
+    return sorted(
+        (call.args[0].category_key, call.args[0].corporation_uuid) for call in calls
+    )
+
+
+def test_update_writes_membership_changes_in_one_transaction():
+    insert_update = inspect.unwrap(
+        corporation_profile.insert_update_corporation_profile
+    )
+    entity = Mock(partition_key=PARTITION_KEY, categories=["bakery", "cafe"])
+    transaction = _transaction()
+    info = Mock(context={"logger": Mock(), "partition_key": PARTITION_KEY})
+
+    with patch.object(
+        corporation_profile, "_transaction", return_value=transaction
+    ), patch.object(corporation_profile, "insert_update_attribute_values"):
+        insert_update(
+            info,
+            corporation_uuid="corp-1",
+            entity=entity,
+            updated_by="tester",
+            categories=["cafe", "deli"],
+        )
+
+    entity.update.assert_not_called()
+    assert transaction.update.call_args.args[0] is entity
+    assert _members(transaction.save.call_args_list) == [
+        (f"{PARTITION_KEY}#deli", "corp-1")
+    ]
+    assert _members(transaction.delete.call_args_list) == [
+        (f"{PARTITION_KEY}#bakery", "corp-1")
+    ]
+
+
+def test_update_without_category_change_skips_the_transaction():
+    insert_update = inspect.unwrap(
+        corporation_profile.insert_update_corporation_profile
+    )
+    entity = Mock(partition_key=PARTITION_KEY, categories=["cafe"])
+    info = Mock(context={"logger": Mock(), "partition_key": PARTITION_KEY})
+
+    with patch.object(corporation_profile, "_transaction") as transaction, patch.object(
+        corporation_profile, "insert_update_attribute_values"
+    ):
+        insert_update(
+            info,
+            corporation_uuid="corp-1",
+            entity=entity,
+            updated_by="tester",
+            business_name="Cafe One",
+        )
+
+    transaction.assert_not_called()
+    entity.update.assert_called_once()
+
+
+def test_delete_removes_memberships_with_the_profile():
+    delete = inspect.unwrap(corporation_profile.delete_corporation_profile)
+    entity = Mock(
+        partition_key=PARTITION_KEY,
+        corporation_uuid="corp-1",
+        categories=["cafe"],
+        external_id=None,
+    )
+    transaction = _transaction()
+
+    with patch.object(corporation_profile, "_transaction", return_value=transaction):
+        assert delete(Mock(), entity=entity) is True
+
+    deleted = [call.args[0] for call in transaction.delete.call_args_list]
+    assert deleted[0] is entity
+    assert _members(transaction.delete.call_args_list[1:]) == [
+        (f"{PARTITION_KEY}#cafe", "corp-1")
+    ]
+
+
+def test_category_list_queries_the_fan_out():
+    info = Mock(context={"partition_key": PARTITION_KEY})
+    resolve_list = corporation_profile.resolve_corporation_profile_list
+    inquiry_funct, count_funct, args = resolve_list(
+        info, category="cafe", corporation_type="retail"
+    )
+    assert isinstance(inquiry_funct, CategoryMembers)
+    assert count_funct == inquiry_funct.count
+    assert args == []
+
+    members = MagicMock()
+    members.__iter__.return_value = iter(
+        [Mock(corporation_uuid="corp-2"), Mock(corporation_uuid="corp-1")]
+    )
+    members.last_evaluated_key = {"corporation_uuid": {"S": "corp-1"}}
+    hydrated = [
+        Mock(corporation_type="retail"),
+        Mock(corporation_type="wholesale"),
+    ]
+    with patch.object(
+        corporation_profile.CorporationCategoryModel, "query", return_value=members
+    ) as query, patch.object(
+        corporation_profile, "hydrate_entities", return_value=hydrated
+    ) as hydrate:
+        results = inquiry_funct(limit=2, last_evaluated_key=None)
+
+    query.assert_called_once_with(
+        f"{PARTITION_KEY}#cafe", limit=2, last_evaluated_key=None
+    )
+    hydrate.assert_called_once_with(
+        "corporation_profile", [[PARTITION_KEY, "corp-2"], [PARTITION_KEY, "corp-1"]]
+    )
+    assert list(results) == hydrated[:1]
+    assert results.last_evaluated_key == {"corporation_uuid": {"S": "corp-1"}}
+
+
+def test_external_id_keeps_category_as_a_filter():
+    info = Mock(context={"partition_key": PARTITION_KEY})
+    inquiry_funct, _, args = corporation_profile.resolve_corporation_profile_list(
+        info, category="cafe", external_id="ext-1"
+    )
+
+    assert inquiry_funct.plan.index_name == "external_id-index"
+    assert str(args[2]) == "contains (categories, {'S': 'cafe'})"
@@ -0,0 +1,102 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for maintained entity counters."""
+from __future__ import annotations
+
+__author__ = "bibow"
+
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+
+# Add parent directory to path to allow imports when running directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from ai_marketing_engine.models import counters
+from ai_marketing_engine.models.counters import (
+    CounterCount,
+    maintain_entity_counters,
+)
+
+PARTITION_KEY = "endpoint-1#part-1"
+
+
+def _write(deleting=False, result=True, **kwargs):
+    info = Mock(context={"partition_key": PARTITION_KEY, "logger": Mock()})
+    with patch.object(counters, "adjust_entity_counter") as adjust:
+        maintain_entity_counters("place", deleting=deleting)(
+            lambda info, **kwargs: result
+        )(info, **kwargs)
+    return sorted(call.args for call in adjust.call_args_list)
+
+
+def test_create_increments_tenant_and_dimension_counters():
+    assert _write(place_uuid="p-1", region="west") == [
+        (PARTITION_KEY, "place", 1),
+        (PARTITION_KEY, "place#region#west", 1),
+    ]
+
+
+def test_update_moves_only_changed_dimensions():
+    entity = Mock(region="west")
+
+    assert _write(entity=entity, business_name="Renamed") == []
+    assert _write(entity=entity, region="east") == [
+        (PARTITION_KEY, "place#region#east", 1),
+        (PARTITION_KEY, "place#region#west", -1),
+    ]
+
+
+def test_delete_decrements_only_when_deleted():
+    entity = Mock(region="west")
+
+    assert _write(deleting=True, entity=entity) == [
+        (PARTITION_KEY, "place", -1),
+        (PARTITION_KEY, "place#region#west", -1),
+    ]
+    assert _write(deleting=True, result=False, entity=entity) == []
+
+
+def test_counter_failures_do_not_fail_the_write():
+    info = Mock(context={"partition_key": PARTITION_KEY, "logger": Mock()})
+    with patch.object(
+        counters, "adjust_entity_counter", side_effect=RuntimeError("throttled")
+    ):
+        result = maintain_entity_counters("place")(lambda info, **kwargs: "ok")(
+            info, region="west"
+        )
+
+    assert result == "ok"
+    info.context["logger"].error.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "dimensions, counter_key",
+    [
+        ({"region": None}, "place"),
+        ({"region": "west"}, "place#region#west"),
+    ],
+)
+def test_counter_count_reads_seeded_counter(dimensions, counter_key):
+    fallback = Mock(return_value=99)
+    count = CounterCount("place", PARTITION_KEY, fallback, **dimensions)
+
+    with patch.object(counters, "get_entity_count", return_value=7) as get_count:
+        assert count(PARTITION_KEY, None) == 7
+
+    get_count.assert_called_once_with(PARTITION_KEY, counter_key)
+    fallback.assert_not_called()
+
+
+def test_unseeded_counter_falls_back_and_seeds():
+    fallback = Mock(return_value=42)
+    count = CounterCount("place", PARTITION_KEY, fallback)
+
+    with patch.object(counters, "get_entity_count", return_value=None):
+        with patch.object(counters, "seed_entity_counter") as seed:
+            assert count(PARTITION_KEY, None) == 42
+
+    fallback.assert_called_once_with(PARTITION_KEY, None)
+    seed.assert_called_once_with(PARTITION_KEY, "place", 42)
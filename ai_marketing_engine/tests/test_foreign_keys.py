@@ -0,0 +1,111 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the foreign-key existence checks."""
+from __future__ import annotations
+
+__author__ = "bibow"
+
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+
+# Add parent directory to path to allow imports when running directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from ai_marketing_engine.models import bulk, contact_request, foreign_keys
+from ai_marketing_engine.models.batch_loaders import RequestLoaders
+from ai_marketing_engine.models.contact_profile import ContactProfileModel
+from ai_marketing_engine.models.place import PlaceModel
+
+PARTITION_KEY = "endpoint-1#part-1"
+
+
+def _context():
+    context = {"logger": Mock(), "partition_key": PARTITION_KEY}
+    context["batch_loaders"] = RequestLoaders(context, cache_enabled=False)
+    return context
+
+
+def test_missing_references_are_batch_loaded_once_per_entity_type():
+    references = [
+        ("place", PARTITION_KEY, "p-1"),
+        ("place", PARTITION_KEY, "p-2"),
+        ("place", PARTITION_KEY, "p-1"),
+        ("contact_profile", PARTITION_KEY, "c-1"),
+    ]
+    found = PlaceModel(PARTITION_KEY, "p-1")
+
+    with patch.object(
+        PlaceModel, "batch_get", return_value=[found]
+    ) as place_get, patch.object(
+        ContactProfileModel, "batch_get", return_value=[]
+    ) as contact_get:
+        missing = foreign_keys.find_missing_references(_context(), references)
+
+    assert missing == {
+        ("place", PARTITION_KEY, "p-2"),
+        ("contact_profile", PARTITION_KEY, "c-1"),
+    }
+    place_get.assert_called_once_with(
+        [(PARTITION_KEY, "p-1"), (PARTITION_KEY, "p-2")]
+    )
+    contact_get.assert_called_once_with([(PARTITION_KEY, "c-1")])
+
+
+def test_failed_reference_lookup_raises_instead_of_reporting_missing():
+    references = [("place", PARTITION_KEY, "p-1")]
+
+    with patch.object(
+        PlaceModel, "batch_get", side_effect=RuntimeError("throttled")
+    ):
+        with pytest.raises(RuntimeError, match="throttled"):
+            foreign_keys.find_missing_references(_context(), references)
+
+
+def test_contact_request_for_a_missing_contact_is_rejected_before_writing():
+    info = Mock(context=_context())
+
+    with patch.object(
+        ContactProfileModel, "batch_get", return_value=[]
+    ), patch.object(
+        PlaceModel, "batch_get", return_value=[PlaceModel(PARTITION_KEY, "p-1")]
+    ), patch.object(
+        contact_request.ContactRequestModel, "save"
+    ) as save:
+        with pytest.raises(
+            ValueError, match="Contact profile not found for contact_uuid: c-9"
+        ):
+            contact_request.insert_update_contact_request(
+                info,
+                partition_key=PARTITION_KEY,
+                contact_uuid="c-9",
+                place_uuid="p-1",
+                request_title="Quote",
+                request_detail="Please call",
+                updated_by="tester",
+            )
+
+    save.assert_not_called()
+
+
+def test_bulk_places_fail_items_with_a_missing_corporation():
+    items = [
+        {"place_uuid": "p-1", "corporation_uuid": "co-1", "updated_by": "u"},
+        {"place_uuid": "p-2", "corporation_uuid": "co-9", "updated_by": "u"},
+    ]
+    missing = {("corporation_profile", PARTITION_KEY, "co-9")}
+
+    bulk_items = [bulk.BulkItem(index, item) for index, item in enumerate(items)]
+
+    with patch.object(
+        bulk, "find_missing_references", return_value=missing
+    ) as find_missing:
+        bulk._check_foreign_keys(_context(), "place", bulk_items)
+
+    find_missing.assert_called_once()
+    assert [bulk_item.error for bulk_item in bulk_items] == [
+        None,
+        "Corporation profile not found for corporation_uuid: co-9",
+    ]
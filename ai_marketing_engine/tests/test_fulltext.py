@@ -0,0 +1,142 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the full-text index subsystem."""
+from __future__ import annotations
+
+__author__ = "bibow"
+
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+
+# Add parent directory to path to allow imports when running directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from ai_marketing_engine.models import fulltext
+from ai_marketing_engine.models.fulltext import (
+    FullTextSearch,
+    InMemoryFullTextIndex,
+    SQLiteFullTextIndex,
+    encode_doc_id,
+    maintain_full_text_index,
+)
+
+PARTITION_KEY = "endpoint-1#part-1"
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def index(request, tmp_path):
+    if request.param == "sqlite":
+        backend = SQLiteFullTextIndex(str(tmp_path / "fulltext.db"))
+    else:
+        backend = InMemoryFullTextIndex()
+    fulltext.set_full_text_index(backend)
+    yield backend
+    fulltext.set_full_text_index(None)
+
+
+def test_search_ranks_folds_and_matches_prefixes(index):
+    index.index(PARTITION_KEY, "contact_request", "a", "Question about an order price")
+    index.index(PARTITION_KEY, "contact_request", "b", "Café pricing, pricing tiers")
+    index.index(PARTITION_KEY, "contact_request", "c", "Opening hours")
+
+    def search(query):
+        hits = index.search(PARTITION_KEY, "contact_request", query, 10)
+        return [doc for doc, _ in hits]
+
+    assert search("PRIC") == ["b", "a"]
+    assert search("cafe pricing") == ["b"]
+    # FTS5 operators in user input are treated as plain words.
+    assert search('hours" *') == ["c"]
+
+
+def test_scopes_are_isolated_and_removal_sticks(index):
+    index.index(PARTITION_KEY, "contact_request", "a", "refund please")
+    index.index("endpoint-2#part-1", "contact_request", "b", "refund please")
+    index.index(PARTITION_KEY, "contact_request", "a", "shipping delay")
+
+    assert index.search(PARTITION_KEY, "contact_request", "refund", 10) == []
+    index.remove(PARTITION_KEY, "contact_request", "a")
+    assert index.search(PARTITION_KEY, "contact_request", "shipping", 10) == []
+    assert len(index.search("endpoint-2#part-1", "contact_request", "refund", 10)) == 1
+
+
+def test_write_paths_maintain_the_index(index):
+    info = Mock(context={"partition_key": PARTITION_KEY, "logger": Mock()})
+
+    maintain_full_text_index("contact_request")(lambda info, **kwargs: None)(
+        info, request_uuid="r-1", request_title="Need a quote", request_detail="Bulk"
+    )
+    doc_id = encode_doc_id([PARTITION_KEY, "r-1"])
+    hits = index.search(PARTITION_KEY, "contact_request", "quote bulk", 10)
+    assert [doc for doc, _ in hits] == [doc_id]
+
+    entity = Mock(partition_key=PARTITION_KEY, request_uuid="r-1")
+    maintain_full_text_index("contact_request", deleting=True)(
+        lambda info, **kwargs: True
+    )(info, request_uuid="r-1", entity=entity)
+    assert index.search(PARTITION_KEY, "contact_request", "quote", 10) == []
+
+
+def test_full_text_search_hydrates_in_rank_order(index):
+    for request_uuid, text in [("r-1", "late order"), ("r-2", "late late late")]:
+        index.index(
+            PARTITION_KEY,
+            "contact_request",
+            encode_doc_id([PARTITION_KEY, request_uuid]),
+            text,
+        )
+    hydrated = [
+        Mock(request_uuid="r-2", place_uuid="p-1"),
+        Mock(request_uuid="r-1", place_uuid="p-2"),
+    ]
+
+    with patch.object(fulltext, "hydrate_entities", return_value=hydrated) as hydrate:
+        search = FullTextSearch(
+            "contact_request",
+            PARTITION_KEY,
+            "late",
+            accept=lambda entity: entity.place_uuid == "p-1",
+        )
+        results = search(limit=10)
+
+    hydrate.assert_called_once_with(
+        "contact_request", [[PARTITION_KEY, "r-2"], [PARTITION_KEY, "r-1"]]
+    )
+    assert [entity.request_uuid for entity in results] == ["r-2"]
+    assert results.last_evaluated_key is None
+
+
+def test_embedded_index_is_complete_only_while_its_rebuild_is_fresh(index):
+    assert not index.is_complete("contact_request")
+
+    with patch.object(fulltext.time, "time", return_value=1000.0), patch.object(
+        fulltext, "parallel_scan", return_value=[]
+    ):
+        fulltext.rebuild_full_text_index(Mock(), "contact_request")
+    assert not index.is_complete("activity_history")
+
+    with patch.object(fulltext.Config, "FULL_TEXT_INDEX_MAX_AGE", 900):
+        with patch.object(fulltext.time, "time", return_value=1900.0):
+            assert index.is_complete("contact_request")
+        with patch.object(fulltext.time, "time", return_value=1901.0):
+            assert not index.is_complete("contact_request")
+
+
+def test_search_falls_back_to_contains_until_the_index_is_built(index):
+    from ai_marketing_engine.models import activity_history
+
+    info = Mock(context={"partition_key": PARTITION_KEY, "logger": Mock()})
+    inquiry_funct, _, args = activity_history.resolve_activity_history_list(
+        info, id="c-1", search="refund"
+    )
+    assert not isinstance(inquiry_funct, FullTextSearch)
+    assert "contains (log, {'S': 'refund'})" in str(args[-1])
+
+    index.mark_built("activity_history", fulltext.time.time())
+    inquiry_funct, _, _ = activity_history.resolve_activity_history_list(
+        info, id="c-1", search="refund"
+    )
+    assert isinstance(inquiry_funct, FullTextSearch)
@@ -0,0 +1,84 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for geohash proximity search."""
+from __future__ import annotations
+
+__author__ = "bibow"
+
+import math
+import os
+import random
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+
+# Add parent directory to path to allow imports when running directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from ai_marketing_engine.models.geo import (
+    covering_cells,
+    encode_geohash,
+    haversine_km,
+    place_geohash,
+)
+
+PARTITION_KEY = "endpoint-1#part-1"
+
+
+def test_encode_geohash():
+    assert encode_geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert place_geohash("57.64911", "10.40744") == "u4pruydqq"
+    assert place_geohash("not-a-number", "10.4") is None
+
+
+def test_haversine_is_vectorized():
+    distances = haversine_km(48.8566, 2.3522, [51.5074, 48.8566], [-0.1278, 2.3522])
+
+    assert distances[0] == pytest.approx(343.5, abs=1.0)
+    assert distances[1] == pytest.approx(0.0)
+
+
+@pytest.mark.parametrize(
+    "latitude, longitude, radius_km",
+    [(37.7749, -122.4194, 2.0), (-33.8688, 151.2093, 25.0), (64.1466, -21.9426, 8.0)],
+)
+def test_covering_cells_contain_every_point_in_radius(latitude, longitude, radius_km):
+    cells = covering_cells(latitude, longitude, radius_km)
+    rng = random.Random(7)
+
+    for _ in range(500):
+        bearing = rng.uniform(0, 2 * math.pi)
+        distance = radius_km * math.sqrt(rng.random())
+        point_lat = latitude + distance / 110.574 * math.cos(bearing)
+        point_lon = longitude + distance / (
+            111.320 * math.cos(math.radians(latitude))
+        ) * math.sin(bearing)
+
+        geohash = encode_geohash(point_lat, point_lon)
+        assert any(geohash.startswith(cell) for cell in cells)
+
+
+def test_places_near_sorts_by_exact_distance():
+    from ai_marketing_engine.models import place
+
+    places = [
+        Mock(place_uuid="far", latitude="37.80", longitude="-122.42"),
+        Mock(place_uuid="near", latitude="37.775", longitude="-122.419"),
+        Mock(place_uuid="mid", latitude="37.78", longitude="-122.41"),
+        Mock(place_uuid="bad", latitude="", longitude="-122.41"),
+    ]
+    info = Mock(context={"partition_key": PARTITION_KEY})
+
+    with patch.object(place, "_query_geohash_cell", return_value=places) as query:
+        with patch.object(
+            place, "get_place_type", side_effect=lambda info, p: Mock(uuid=p.place_uuid)
+        ):
+            result = place.resolve_places_near(
+                info, latitude=37.7749, longitude=-122.4194, radius_km=2.0, limit=5
+            )
+
+    assert query.call_count == len(covering_cells(37.7749, -122.4194, 2.0))
+    assert [item.uuid for item in result.place_list] == ["near", "mid"]
+    assert result.total == 2
+    assert result.place_list[0].distance_km < result.place_list[1].distance_km
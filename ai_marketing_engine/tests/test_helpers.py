@@ -146,3 +146,24 @@ def validate_nested_resolver_result(
         assert key in current, f"{path_str} missing expected key '{key}'"
 
     logger.info(f"Validated structure at {path_str}: {list(current.keys())}")
+
+
+class FakeSharedCache:
+    """Dict-backed stand-in for HybridCacheEngine, shared across instances by name."""
+
+    stores: Dict[str, Dict[str, Any]] = {}
+
+    def __init__(self, cache_name: str) -> None:
+        self.store = self.stores.setdefault(cache_name, {})
+
+    def _generate_key(self, prefix: str, key_data: str) -> str:
+        return f"{prefix}:{key_data}"
+
+    def get(self, key: str) -> Any:
+        return self.store.get(key)
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        self.store[key] = value
+
+    def delete(self, key: str) -> None:
+        self.store.pop(key, None)
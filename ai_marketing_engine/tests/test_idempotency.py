@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for idempotency keys on mutations."""
+from __future__ import annotations
+
+__author__ = "bibow"
+
+import decimal
+import json
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import pendulum
+import pytest
+
+# Add parent directory to path to allow imports when running directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from ai_marketing_engine.models import idempotency
+from ai_marketing_engine.models.idempotency import IdempotencyRecordModel
+from ai_marketing_engine.mutations import activity_history
+from ai_marketing_engine.mutations.activity_history import InsertActivityHistory
+from ai_marketing_engine.types.activity_history import ActivityHistoryType
+
+PARTITION_KEY = "endpoint-1#part-1"
+ARGUMENTS = {"id": "contact-1", "log": "created", "updated_by": "tester"}
+
+
+def _info():
+    info = Mock()
+    info.context = {"partition_key": PARTITION_KEY, "logger": Mock()}
+    info.return_type.graphene_type = InsertActivityHistory
+    return info
+
+
+def _activity_history():
+    return ActivityHistoryType(
+        id="contact-1",
+        timestamp=decimal.Decimal(1700000000),
+        log="created",
+        updated_by="tester",
+        updated_at=pendulum.datetime(2024, 1, 2, 3, 4, 5),
+    )
+
+
+def test_first_call_runs_and_stores_its_payload():
+    with patch.object(
+        activity_history, "insert_activity_history", return_value=_activity_history()
+    ) as insert, patch.object(IdempotencyRecordModel, "save") as save, patch.object(
+        IdempotencyRecordModel, "update"
+    ) as update:
+        payload = InsertActivityHistory.mutate(
+            None, _info(), idempotency_key="key-1", **ARGUMENTS
+        )
+
+    # The key is not passed on to the model function.
+    insert.assert_called_once()
+    assert "idempotency_key" not in insert.call_args.kwargs
+    save.assert_called_once()
+    assert payload.activity_history.id == "contact-1"
+    status, result = [
+        action.values[1].value["S"]
+        for action in update.call_args.kwargs["actions"][:2]
+    ]
+    assert status == idempotency.COMPLETED
+    assert json.loads(result)["activity_history"]["updated_at"] == (
+        "2024-01-02T03:04:05+00:00"
+    )
+
+
+def test_replay_returns_the_stored_payload_without_running():
+    stored = json.dumps(
+        idempotency.dump_payload(
+            InsertActivityHistory(activity_history=_activity_history())
+        )
+    )
+    record = IdempotencyRecordModel(
+        "record",
+        status=idempotency.COMPLETED,
+        arguments_hash=idempotency._arguments_hash(ARGUMENTS),
+        result=stored,
+    )
+    with patch.object(idempotency, "_reserve", return_value=record), patch.object(
+        activity_history, "insert_activity_history"
+    ) as insert:
+        payload = InsertActivityHistory.mutate(
+            None, _info(), idempotency_key="key-1", **ARGUMENTS
+        )
+
+    insert.assert_not_called()
+    assert isinstance(payload, InsertActivityHistory)
+    assert payload.activity_history.timestamp == decimal.Decimal(1700000000)
+    assert payload.activity_history.updated_at == pendulum.datetime(
+        2024, 1, 2, 3, 4, 5
+    )
+
+
+def test_key_reused_with_other_arguments_is_rejected():
+    record = IdempotencyRecordModel(
+        "record",
+        status=idempotency.COMPLETED,
+        arguments_hash=idempotency._arguments_hash(ARGUMENTS),
+        result="{}",
+    )
+    with patch.object(idempotency, "_reserve", return_value=record), patch.object(
+        activity_history, "insert_activity_history"
+    ) as insert:
+        with pytest.raises(ValueError, match="other arguments"):
+            InsertActivityHistory.mutate(
+                None, _info(), idempotency_key="key-1", **dict(ARGUMENTS, log="x")
+            )
+
+    insert.assert_not_called()
+
+
+def test_failed_call_releases_its_key():
+    with patch.object(
+        activity_history, "insert_activity_history", side_effect=RuntimeError("boom")
+    ), patch.object(IdempotencyRecordModel, "save"), patch.object(
+        IdempotencyRecordModel, "delete"
+    ) as delete:
+        with pytest.raises(RuntimeError):
+            InsertActivityHistory.mutate(
+                None, _info(), idempotency_key="key-1", **ARGUMENTS
+            )
+
+    delete.assert_called_once()
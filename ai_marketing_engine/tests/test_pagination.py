@@ -0,0 +1,163 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for cursor pagination of list resolvers."""
+from __future__ import annotations
+
+__author__ = "bibow"
+
+import datetime
+import os
+import sys
+from unittest.mock import MagicMock, Mock, patch
+
+import pytest
+
+# Add parent directory to path to allow imports when running directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from ai_marketing_engine.handlers.config import Config
+from ai_marketing_engine.models.pagination import (
+    decode_cursor,
+    encode_cursor,
+    high_watermark,
+    paginated_list_decorator,
+)
+
+PARTITION_KEY = "endpoint-1#part-1"
+LAST_EVALUATED_KEY = {
+    "partition_key": {"S": PARTITION_KEY},
+    "place_uuid": {"S": "place-2"},
+}
+
+
+@pytest.fixture(autouse=True)
+def cursor_secret():
+    with patch.object(Config, "CURSOR_SECRET", b"test-secret"):
+        yield
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(PARTITION_KEY, LAST_EVALUATED_KEY)
+    assert decode_cursor(cursor, PARTITION_KEY) == LAST_EVALUATED_KEY
+
+
+@pytest.mark.parametrize(
+    "mutate",
+    [
+        lambda cursor: cursor[:-2] + ("AA" if cursor[-2:] != "AA" else "BB"),
+        lambda cursor: "e30" + cursor[cursor.index(".") :],
+        lambda cursor: cursor.replace(".", ""),
+        lambda cursor: "not-a-cursor",
+    ],
+)
+def test_tampered_cursor_is_rejected(mutate):
+    cursor = encode_cursor(PARTITION_KEY, LAST_EVALUATED_KEY)
+    with pytest.raises(ValueError):
+        decode_cursor(mutate(cursor), PARTITION_KEY)
+
+
+def test_cursor_is_bound_to_partition():
+    cursor = encode_cursor(PARTITION_KEY, LAST_EVALUATED_KEY)
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "endpoint-2#part-1")
+
+
+def test_cursor_secret_is_required():
+    with patch.object(Config, "CURSOR_SECRET", None):
+        with pytest.raises(ValueError, match="cursor_secret"):
+            encode_cursor(PARTITION_KEY, LAST_EVALUATED_KEY)
+
+
+def _resolver(results):
+    inquiry_funct = MagicMock(return_value=results)
+
+    @paginated_list_decorator(
+        attributes_to_get=["partition_key", "place_uuid"],
+        list_type_class=lambda **kwargs: Mock(**kwargs),
+        type_funct=lambda info, item: item,
+    )
+    def resolve_place_list(info, **kwargs):
+        return inquiry_funct, Mock(), [PARTITION_KEY, None]
+
+    return resolve_place_list, inquiry_funct
+
+
+def test_cursor_request_reads_one_page_from_last_evaluated_key():
+    results = MagicMock()
+    results.__iter__.return_value = iter(["place-3", "place-4"])
+    results.last_evaluated_key = {"place_uuid": {"S": "place-4"}}
+    resolve_place_list, inquiry_funct = _resolver(results)
+    info = Mock(context={"partition_key": PARTITION_KEY})
+
+    page = resolve_place_list(
+        info, first=2, after=encode_cursor(PARTITION_KEY, LAST_EVALUATED_KEY)
+    )
+
+    inquiry_funct.assert_called_once_with(
+        PARTITION_KEY, None, limit=2, last_evaluated_key=LAST_EVALUATED_KEY
+    )
+    assert page.place_list == ["place-3", "place-4"]
+    assert page.page_info.has_next_page is True
+    assert decode_cursor(page.page_info.end_cursor, PARTITION_KEY) == {
+        "place_uuid": {"S": "place-4"}
+    }
+
+
+def test_last_page_has_no_end_cursor():
+    results = MagicMock()
+    results.__iter__.return_value = iter(["place-5"])
+    results.last_evaluated_key = None
+    resolve_place_list, inquiry_funct = _resolver(results)
+    info = Mock(context={"partition_key": PARTITION_KEY})
+
+    page = resolve_place_list(info, first=1000)
+
+    assert inquiry_funct.call_args.kwargs == {
+        "limit": Config.get_cursor_max_page_size(),
+        "last_evaluated_key": None,
+    }
+    assert page.page_info.end_cursor is None
+    assert page.page_info.has_next_page is False
+
+
+def test_cursor_pages_count_only_when_asked():
+    results = MagicMock()
+    results.__iter__.return_value = iter([])
+    results.last_evaluated_key = None
+    count_funct = Mock(return_value=12)
+    info = Mock(context={"partition_key": PARTITION_KEY})
+
+    @paginated_list_decorator(
+        attributes_to_get=["partition_key", "place_uuid"],
+        list_type_class=lambda **kwargs: Mock(**kwargs),
+        type_funct=lambda info, item: item,
+    )
+    def resolve_place_list(info, **kwargs):
+        return MagicMock(return_value=results), count_funct, [PARTITION_KEY, None]
+
+    assert resolve_place_list(info, first=5).total is None
+    count_funct.assert_not_called()
+
+    assert resolve_place_list(info, first=5, with_total=True).total == 12
+    count_funct.assert_called_once_with(PARTITION_KEY, None)
+
+
+def test_high_watermark_is_latest_updated_at():
+    earlier = datetime.datetime(2024, 5, 1, 8, 0, tzinfo=datetime.timezone.utc)
+    later = datetime.datetime(2024, 5, 1, 9, 30, tzinfo=datetime.timezone.utc)
+    results = MagicMock()
+    results.__iter__.return_value = iter(
+        [Mock(updated_at=later), Mock(updated_at=earlier)]
+    )
+    results.last_evaluated_key = None
+    resolve_place_list, _ = _resolver(results)
+    info = Mock(context={"partition_key": PARTITION_KEY})
+
+    page = resolve_place_list(info, first=10)
+
+    assert page.page_info.high_watermark == later.isoformat()
+    # Types carry updated_at serialized; those are compared as datetimes too.
+    assert high_watermark(
+        [Mock(updated_at="2024-05-01T10:00:00+02:00"), Mock(updated_at=earlier)]
+    ) == earlier.isoformat()
+    assert high_watermark([Mock(updated_at=None)]) is None
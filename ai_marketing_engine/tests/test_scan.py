@@ -0,0 +1,83 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the parallel segmented scan engine."""
+from __future__ import annotations
+
+__author__ = "bibow"
+
+import os
+import sys
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+# Add parent directory to path to allow imports when running directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from ai_marketing_engine.models.scan import ParallelScan, parallel_scan
+
+
+class FakeSegmentedModel:
+    """Model whose scan yields `per_segment` items tagged with their segment."""
+
+    def __init__(self, per_segment: int = 5, failing_segment: int = None):
+        self.per_segment = per_segment
+        self.failing_segment = failing_segment
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def scan(self, filter_condition=None, segment=None, total_segments=None, **kwargs):
+        with self.lock:
+            self.calls.append(dict(kwargs, segment=segment, total_segments=total_segments))
+        if segment == self.failing_segment:
+            raise RuntimeError("segment failed")
+        for index in range(self.per_segment):
+            yield (segment, index)
+
+
+def test_parallel_scan_reads_every_segment():
+    model = FakeSegmentedModel(per_segment=50)
+
+    items = list(parallel_scan(model, total_segments=4, buffer_size=3))
+
+    assert sorted(items) == [(s, i) for s in range(4) for i in range(50)]
+    assert sorted(call["segment"] for call in model.calls) == [0, 1, 2, 3]
+    assert {call["total_segments"] for call in model.calls} == {4}
+
+
+def test_capacity_budget_is_split_between_segments():
+    model = FakeSegmentedModel(per_segment=1)
+
+    list(parallel_scan(model, total_segments=4, capacity_budget=100))
+
+    assert {call["rate_limit"] for call in model.calls} == {25}
+
+
+def test_segment_errors_reach_the_consumer():
+    model = FakeSegmentedModel(per_segment=1, failing_segment=2)
+
+    with pytest.raises(RuntimeError, match="segment failed"):
+        list(parallel_scan(model, total_segments=4))
+
+
+def test_closing_early_stops_workers():
+    model = FakeSegmentedModel(per_segment=10000)
+    items = parallel_scan(model, total_segments=2, buffer_size=2)
+
+    assert next(items) is not None
+    items.close()
+
+    for thread in threading.enumerate():
+        if thread.name.startswith("ame-scan"):
+            thread.join(timeout=2)
+            assert not thread.is_alive()
+
+
+def test_page_reads_stay_serial():
+    model = MagicMock()
+    scan = ParallelScan(model)
+
+    scan(None, limit=10, last_evaluated_key=None)
+
+    model.scan.assert_called_once_with(None, limit=10, last_evaluated_key=None)
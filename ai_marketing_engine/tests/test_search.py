@@ -0,0 +1,112 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for normalized name prefix search."""
+from __future__ import annotations
+
+__author__ = "bibow"
+
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+
+# Add parent directory to path to allow imports when running directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from ai_marketing_engine.models.search import build_search_name, normalize_search_key
+
+PARTITION_KEY = "endpoint-1#part-1"
+
+
+@pytest.mark.parametrize(
+    "parts, expected",
+    [
+        (("Café  Crème",), "cafe creme"),
+        (("ÉCOLE", "Straße"), "ecole strasse"),
+        ((None, "Smith"), "smith"),
+        (("  ", "null"), None),
+    ],
+)
+def test_normalize_search_key(parts, expected):
+    assert normalize_search_key(*parts) == expected
+
+
+def test_search_name_merges_update_with_entity():
+    entity = Mock(first_name="José", last_name="García")
+
+    assert build_search_name("contact_profile", {"last_name": "Núñez"}, entity) == (
+        "jose nunez"
+    )
+    assert build_search_name("contact_profile", {"first_name": "null"}, entity) == (
+        "garcia"
+    )
+
+
+def _place_list_args(**kwargs):
+    from ai_marketing_engine.models import place
+
+    info = Mock(context={"partition_key": PARTITION_KEY})
+    return place, place.resolve_place_list(info, **kwargs)
+
+
+def test_search_runs_as_key_condition():
+    place, (inquiry_funct, count_funct, args) = _place_list_args(search="  CAFÉ ")
+
+    assert inquiry_funct.plan.index_name == "search_name-index"
+    assert count_funct == place.PlaceModel.search_name_index.count
+    assert args[0] == PARTITION_KEY
+    assert str(args[1]) == "begins_with (search_name, {'S': 'cafe'})"
+    assert len(args) == 2
+
+
+def test_search_filters_when_another_index_is_used():
+    from ai_marketing_engine.models import place
+    from ai_marketing_engine.models.query_planner import IndexStatistics
+
+    # "west" is rare in the partition, names starting "cafe" are common.
+    statistics = IndexStatistics(
+        partition_items=100,
+        partition_items_exact=True,
+        sample={
+            "region": ["west"] + ["east"] * 9,
+            "search_name": ["cafe one"] * 5 + ["bar"] * 5,
+        },
+        sampled_items=10,
+        average_item_bytes=512,
+    )
+    with patch.object(
+        place.PLACE_QUERY_PLANNER, "statistics", return_value=statistics
+    ):
+        _, (inquiry_funct, _, args) = _place_list_args(search="cafe", region="west")
+
+    assert inquiry_funct.plan.index_name == "region-index"
+    assert str(args[2]) == "begins_with (search_name, {'S': 'cafe'})"
+
+
+def test_initialize_tables_adds_missing_indexes_to_existing_tables():
+    from ai_marketing_engine.models.contact_profile import ContactProfileModel
+    from ai_marketing_engine.models.utils import _create_missing_indexes
+
+    connection = Mock()
+    connection.describe_table.return_value = {
+        "GlobalSecondaryIndexes": [
+            {"IndexName": "email-index"},
+            {"IndexName": "place_uuid-index"},
+        ]
+    }
+    with patch.object(ContactProfileModel, "_get_connection", return_value=connection):
+        _create_missing_indexes(Mock(), ContactProfileModel)
+
+    client = connection.connection.client
+    created = [
+        call.kwargs["GlobalSecondaryIndexUpdates"][0]["Create"]["IndexName"]
+        for call in client.update_table.call_args_list
+    ]
+    assert created == ["search_name-index", "updated_at-index"]
+    assert client.update_table.call_args_list[0].kwargs[
+        "AttributeDefinitions"
+    ] == [
+        {"AttributeName": "partition_key", "AttributeType": "S"},
+        {"AttributeName": "search_name", "AttributeType": "S"},
+    ]
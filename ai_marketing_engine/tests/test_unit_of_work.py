@@ -0,0 +1,112 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the transactional unit of work of entity and attribute writes."""
+from __future__ import annotations
+
+__author__ = "bibow"
+
+import inspect
+import os
+import sys
+from unittest.mock import MagicMock, Mock, patch
+
+import pendulum
+import pytest
+
+# Add parent directory to path to allow imports when running directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from ai_marketing_engine.models import change_capture, contact_profile, unit_of_work
+from ai_marketing_engine.models.attribute_value import AttributeValueModel
+from ai_marketing_engine.models.unit_of_work import TRANSACT_WRITE_SIZE, UnitOfWork
+
+PARTITION_KEY = "endpoint-1#part-1"
+
+
+def _transactions():
+    transactions = []
+
+    def transact_write(model_class):
+        transaction = MagicMock()
+        transaction.__enter__.return_value = transaction
+        transactions.append(transaction)
+        return transaction
+
+    return transactions, transact_write
+
+
+def _operations(transaction):
+    return [
+        (call[0], call.args[0]) for call in transaction.method_calls if call.args
+    ]
+
+
+def test_groups_stay_whole_across_transactions():
+    transactions, transact_write = _transactions()
+    with patch.object(unit_of_work, "transact_write", side_effect=transact_write):
+        with UnitOfWork(AttributeValueModel) as unit:
+            unit.update(Mock(name="entity"), actions=[])
+            for index in range(TRANSACT_WRITE_SIZE // 2):
+                with unit.group():
+                    unit.update(Mock(name=f"retired-{index}"), actions=[])
+                    unit.save(Mock(name=f"version-{index}"))
+
+    # 1 + 100 writes: the last pair moves to a second transaction whole.
+    assert [len(_operations(t)) for t in transactions] == [TRANSACT_WRITE_SIZE - 1, 2]
+
+
+def test_nothing_is_written_when_the_block_raises():
+    with patch.object(unit_of_work, "transact_write") as transact_write:
+        with pytest.raises(RuntimeError):
+            with UnitOfWork(AttributeValueModel) as unit:
+                unit.save(Mock())
+                raise RuntimeError("validation failed")
+
+    transact_write.assert_not_called()
+
+
+def test_profile_update_commits_with_its_attribute_versions():
+    insert_update = inspect.unwrap(contact_profile.insert_update_contact_profile)
+    entity = Mock(partition_key=PARTITION_KEY, contact_uuid="c-1", email="a@x.com")
+    active = AttributeValueModel(
+        "contact-tier",
+        "v-1",
+        data_identity="c-1",
+        value="silver",
+        updated_at=pendulum.now("UTC"),
+    )
+    transactions, transact_write = _transactions()
+
+    with patch.object(
+        AttributeValueModel.data_identity_data_type_attribute_name_index,
+        "query",
+        return_value=[active],
+    ) as query, patch.object(
+        unit_of_work, "transact_write", side_effect=transact_write
+    ), patch(
+        "ai_marketing_engine.models.cache.purge_entity_cascading_cache"
+    ), patch.object(
+        change_capture.activity_history_writer, "add"
+    ):
+        insert_update(
+            Mock(context={"logger": Mock(), "partition_key": PARTITION_KEY}),
+            partition_key=PARTITION_KEY,
+            contact_uuid="c-1",
+            entity=entity,
+            first_name="Ann",
+            data={"tier": "gold", "source": "web"},
+            updated_by="tester",
+        )
+
+    # One read for the whole bag, one transaction for every write.
+    query.assert_called_once()
+    entity.update.assert_not_called()
+    [transaction] = transactions
+    operations = _operations(transaction)
+    assert operations[0] == ("update", entity)
+    assert operations[1] == ("update", active)
+    assert [
+        (method, item.data_type_attribute_name, item.value)
+        for method, item in operations[2:]
+        if method == "save"
+    ] == [("save", "contact-tier", "gold"), ("save", "contact-source", "web")]
@@ -0,0 +1,135 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the single-UpdateItem upsert path."""
+from __future__ import annotations
+
+__author__ = "bibow"
+
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import pendulum
+import pytest
+from botocore.exceptions import ClientError
+from pynamodb.constants import ALL_OLD
+from pynamodb.exceptions import UpdateError
+
+# Add parent directory to path to allow imports when running directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from ai_marketing_engine.models import cache, counters, place
+from ai_marketing_engine.models.place import PlaceModel
+
+PARTITION_KEY = "endpoint-1#part-1"
+CREATED_AT = pendulum.datetime(2024, 1, 1, tz="UTC")
+
+
+def _info():
+    return Mock(
+        context={
+            "logger": Mock(),
+            "partition_key": PARTITION_KEY,
+            "endpoint_id": "endpoint-1",
+            "part_id": "part-1",
+        }
+    )
+
+
+def _stored_place():
+    return PlaceModel(
+        PARTITION_KEY,
+        "p-1",
+        region="west",
+        latitude="43.65",
+        longitude="-79.38",
+        business_name="Cafe One",
+        address="1 King St",
+        endpoint_id="endpoint-1",
+        part_id="part-1",
+        updated_by="seed",
+        created_at=CREATED_AT,
+        updated_at=CREATED_AT,
+    )
+
+
+def _connection(response):
+    connection = Mock()
+    if isinstance(response, Exception):
+        connection.update_item.side_effect = response
+    else:
+        connection.update_item.return_value = response
+    return patch.object(PlaceModel, "_get_connection", return_value=connection)
+
+
+def test_update_is_one_update_item_returning_the_old_place():
+    response = {"Attributes": _stored_place().serialize()}
+
+    with _connection(response) as get_connection, patch.object(
+        PlaceModel, "get"
+    ) as get, patch.object(
+        counters, "adjust_entity_counter"
+    ) as adjust, patch.object(
+        cache, "purge_entity_cascading_cache"
+    ) as purge:
+        place_type = place.insert_update_place(
+            _info(), place_uuid="p-1", region="east", updated_by="editor"
+        )
+
+    get.assert_not_called()
+    update_item = get_connection.return_value.update_item
+    update_item.assert_called_once()
+    assert update_item.call_args.kwargs["return_values"] == ALL_OLD
+    # Only an existing place may be updated without the required fields.
+    assert update_item.call_args.kwargs["condition"] is not None
+
+    assert (place_type.region, place_type.business_name) == ("east", "Cafe One")
+    assert place_type.updated_by == "editor"
+    assert pendulum.parse(str(place_type.created_at)) == CREATED_AT
+    assert sorted(call.args[1:] for call in adjust.call_args_list) == [
+        ("place#region#east", 1),
+        ("place#region#west", -1),
+    ]
+    assert purge.call_args.kwargs["invalidate_lists"] is True
+
+
+def test_create_sets_creation_fields_only_if_missing():
+    with _connection({}) as get_connection, patch.object(
+        counters, "adjust_entity_counter"
+    ) as adjust, patch.object(cache, "purge_entity_cascading_cache"):
+        place_type = place.insert_update_place(
+            _info(),
+            region="east",
+            latitude="43.7",
+            longitude="-79.4",
+            business_name="Deli",
+            address="2 Queen St",
+            updated_by="editor",
+        )
+
+    actions = get_connection.return_value.update_item.call_args.kwargs["actions"]
+    assert str(actions[-1]).startswith("created_at = if_not_exists (created_at")
+    assert place_type.place_uuid and place_type.geohash
+    assert place_type.search_name == "deli"
+    assert sorted(call.args[1:] for call in adjust.call_args_list) == [
+        ("place", 1),
+        ("place#region#east", 1),
+    ]
+
+
+def test_update_of_a_missing_place_is_rejected():
+    failed = UpdateError(
+        "Failed to update item",
+        ClientError(
+            {"Error": {"Code": "ConditionalCheckFailedException", "Message": ""}},
+            "UpdateItem",
+        ),
+    )
+
+    with _connection(failed), patch.object(counters, "adjust_entity_counter") as adjust:
+        with pytest.raises(ValueError, match="Place not found: p-9"):
+            place.insert_update_place(
+                _info(), place_uuid="p-9", region="east", updated_by="editor"
+            )
+
+    adjust.assert_not_called()
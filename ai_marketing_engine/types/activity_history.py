@@ -9,6 +9,8 @@ from graphene import DateTime, Decimal, List, ObjectType, String, Field
 from silvaengine_dynamodb_base import ListObjectType
 from silvaengine_utility import JSONCamelCase
 
+from .ai_marketing import PageInfoType
+
 
 class ActivityHistoryType(ObjectType):
     id = String()
@@ -22,3 +24,4 @@ class ActivityHistoryType(ObjectType):
 
 class ActivityHistoryListType(ListObjectType):
     activity_history_list = List(ActivityHistoryType)
+    page_info = Field(PageInfoType)
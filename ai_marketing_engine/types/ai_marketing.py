@@ -4,10 +4,27 @@ from __future__ import print_function
 
 __author__ = "bibow"
 
-from graphene import Int, ObjectType, String
+from graphene import Boolean, Int, ObjectType, String
 
 
 class PresignedUploadUrlType(ObjectType):
     url = String()
     object_key = String()
     expiration = Int()
+
+
+class PageInfoType(ObjectType):
+    end_cursor = String()
+    has_next_page = Boolean()
+    # Latest updated_at on the page (ISO 8601); pass as updatedSince to resume
+    high_watermark = String()
+
+
+class BulkItemResultType(ObjectType):
+    # Position of the item in the request
+    index = Int()
+    # Range key of the item (generated for new items)
+    key = String()
+    created = Boolean()
+    ok = Boolean()
+    error = String()
@@ -4,11 +4,14 @@ from __future__ import print_function
 
 __author__ = "bibow"
 
-from graphene import DateTime, Decimal, List, ObjectType, String
+from graphene import DateTime, Decimal, List, ObjectType, String, Field
 
 from silvaengine_dynamodb_base import ListObjectType
 from silvaengine_utility import JSONCamelCase
 
+from .ai_marketing import PageInfoType
+
+
 class AttributeValueType(ObjectType):
     data_type_attribute_name = String()
     value_version_uuid = String()
@@ -23,3 +26,4 @@ class AttributeValueType(ObjectType):
 
 class AttributeValueListType(ListObjectType):
     attribute_value_list = List(AttributeValueType)
+    page_info = Field(PageInfoType)
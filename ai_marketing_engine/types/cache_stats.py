@@ -0,0 +1,23 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+from graphene import Float, Int, List, ObjectType, String
+
+
+class CacheStatsEntryType(ObjectType):
+    cache_name = String()
+    partition_key = String()
+    hits = Int()
+    misses = Int()
+    fills = Int()
+    purges = Int()
+    hit_rate = Float()
+    avg_fill_latency_ms = Float()
+
+
+class CacheStatsType(ObjectType):
+    since = Int()
+    entries = List(CacheStatsEntryType)
@@ -0,0 +1,22 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+from graphene import DateTime, Field, Int, ObjectType, String
+
+from silvaengine_utility import JSONCamelCase
+
+
+class CascadeDeleteJobType(ObjectType):
+    job_uuid = String()
+    entity_type = String()
+    entity_uuid = String()
+    status = String()
+    # Entities on the job stack whose children are not all deleted yet
+    pending = Int()
+    deleted = Field(JSONCamelCase)
+    error = String()
+    created_at = DateTime()
+    updated_at = DateTime()
@@ -9,6 +9,7 @@ from silvaengine_dynamodb_base import ListObjectType
 from silvaengine_utility import JSONCamelCase
 
 from ..models.batch_loaders import get_loaders
+from .ai_marketing import PageInfoType
 from .place import PlaceType
 
 
@@ -28,6 +29,7 @@ class ContactProfileType(ObjectType):
     # Dynamic attributes for contact – keep as JSONCamelCase, resolved lazily
     data = Field(JSONCamelCase)
 
+    search_name = String()
     updated_by = String()
     created_at = DateTime()
     updated_at = DateTime()
@@ -79,3 +81,5 @@ class ContactProfileType(ObjectType):
 
 class ContactProfileListType(ListObjectType):
     contact_profile_list = List(ContactProfileType)
+    page_info = Field(PageInfoType)
+    query_plan = Field(JSONCamelCase)
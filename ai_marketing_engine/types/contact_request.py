@@ -7,8 +7,10 @@ __author__ = "bibow"
 from graphene import DateTime, Field, List, ObjectType, String
 
 from silvaengine_dynamodb_base import ListObjectType
+from silvaengine_utility import JSONCamelCase
 
 from ..models.batch_loaders import get_loaders
+from .ai_marketing import PageInfoType
 from .contact_profile import ContactProfileType
 
 
@@ -62,3 +64,5 @@ class ContactRequestType(ObjectType):
 
 class ContactRequestListType(ListObjectType):
     contact_request_list = List(ContactRequestType)
+    page_info = Field(PageInfoType)
+    query_plan = Field(JSONCamelCase)
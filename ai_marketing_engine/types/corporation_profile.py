@@ -10,6 +10,7 @@ from silvaengine_dynamodb_base import ListObjectType
 from silvaengine_utility import JSONCamelCase
 
 from ..models.batch_loaders import get_loaders
+from .ai_marketing import PageInfoType
 
 
 class CorporationProfileType(ObjectType):
@@ -26,6 +27,7 @@ class CorporationProfileType(ObjectType):
     # Dynamic attributes bag – still JSONCamelCase, but lazily resolved
     data = Field(JSONCamelCase)
 
+    search_name = String()
     updated_by = String()
     created_at = DateTime()
     updated_at = DateTime()
@@ -54,3 +56,5 @@ class CorporationProfileType(ObjectType):
 
 class CorporationProfileListType(ListObjectType):
     corporation_profile_list = List(CorporationProfileType)
+    page_info = Field(PageInfoType)
+    query_plan = Field(JSONCamelCase)
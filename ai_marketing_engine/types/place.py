@@ -4,11 +4,13 @@ from __future__ import print_function
 
 __author__ = "bibow"
 
-from graphene import DateTime, Field, List, ObjectType, String
+from graphene import DateTime, Field, Float, List, ObjectType, String
 
 from silvaengine_dynamodb_base import ListObjectType
+from silvaengine_utility import JSONCamelCase
 
 from ..models.batch_loaders import get_loaders
+from .ai_marketing import PageInfoType
 from .corporation_profile import CorporationProfileType
 
 
@@ -30,6 +32,10 @@ class PlaceType(ObjectType):
     corporation_uuid = String()  # keep raw id
     corporation_profile = Field(lambda: CorporationProfileType)
 
+    search_name = String()
+    geohash = String()
+    # Set by placesNear only
+    distance_km = Float()
     updated_by = String()
     updated_at = DateTime()
     created_at = DateTime()
@@ -67,3 +73,5 @@ class PlaceType(ObjectType):
 
 class PlaceListType(ListObjectType):
     place_list = List(PlaceType)
+    page_info = Field(PageInfoType)
+    query_plan = Field(JSONCamelCase)